@@ -23,7 +23,7 @@
 
 # Python module imports.
 from math import pi
-from os import F_OK, R_OK, X_OK, access, getcwd, listdir, sep
+from os import F_OK, R_OK, X_OK, access, getcwd, listdir, rename, sep
 from os.path import isdir
 from re import search
 import sys
@@ -37,7 +37,7 @@ from lib.text.sectioning import title, subtitle
 from lib.text.string import LIST, PARAGRAPH, SECTION, SUBSECTION, TITLE, to_docstring
 from lib.timing import print_elapsed_time
 from pipe_control.interatomic import interatomic_loop
-from pipe_control.mol_res_spin import exists_mol_res_spin_data, return_spin, spin_loop
+from pipe_control.mol_res_spin import count_spins, exists_mol_res_spin_data, return_spin, spin_loop
 from pipe_control.pipes import cdp_name, get_pipe, has_pipe, pipe_names, switch
 from pipe_control.spectrometer import get_frequencies
 from prompt.interpreter import Interpreter
@@ -97,6 +97,7 @@ doc = [
         [PARAGRAPH, "The global diffusion tensor is fixed and the multiple model-free models are fitted to each spin."],
         [PARAGRAPH, "AIC model selection is used to select the models for each spin."],
         [PARAGRAPH, "All model-free and diffusion parameters are allowed to vary and a global optimisation of all parameters is carried out."],
+        [PARAGRAPH, "If the incremental flag is True, the rounds are carried out incrementally.  Each model-free model optimisation of a round is checkpointed by its results file, so that an interrupted analysis will resume with the first model-free model of the round which has not yet been optimised.  If the diffusion tensor is identical to that used in the previous round, the model-free optimisation of each spin would give identical results, hence the results of the previous round are reused rather than repeating the grid search and minimisation.  Otherwise the model is optimised from scratch, starting with the grid search.  If the warm_start flag is also True, the spins for which the model-free model was selected in the previous round are instead warm started from the previous round's parameter values, skipping their grid search, and only the remaining spins are grid searched.  As the minimisation then starts from the minimum found with the old diffusion tensor rather than from the grid search, a different minimum may be found, hence the warm start is off by default."],
 
         [SUBSECTION, "Model III - Prolate spheroid"],
         [PARAGRAPH, "The methods used are identical to those of diffusion model MII, except that an axially symmetric diffusion tensor with Da >= 0 is used.  The base directory containing all the results is './prolate/'."],
@@ -125,7 +126,7 @@ class dAuvergne_protocol:
     opt_func_tol = 1e-25
     opt_max_iterations = int(1e7)
 
-    def __init__(self, pipe_name=None, pipe_bundle=None, results_dir=None, write_results_dir=None, diff_model=None, mf_models=['m0', 'm1', 'm2', 'm3', 'm4', 'm5', 'm6', 'm7', 'm8', 'm9'], local_tm_models=['tm0', 'tm1', 'tm2', 'tm3', 'tm4', 'tm5', 'tm6', 'tm7', 'tm8', 'tm9'], grid_inc=11, diff_tensor_grid_inc={'sphere': 11, 'prolate': 11, 'oblate': 11, 'ellipsoid': 6}, min_algor='newton', mc_sim_num=500, max_iter=None, user_fns=None, conv_loop=True):
+    def __init__(self, pipe_name=None, pipe_bundle=None, results_dir=None, write_results_dir=None, diff_model=None, mf_models=['m0', 'm1', 'm2', 'm3', 'm4', 'm5', 'm6', 'm7', 'm8', 'm9'], local_tm_models=['tm0', 'tm1', 'tm2', 'tm3', 'tm4', 'tm5', 'tm6', 'tm7', 'tm8', 'tm9'], grid_inc=11, diff_tensor_grid_inc={'sphere': 11, 'prolate': 11, 'oblate': 11, 'ellipsoid': 6}, min_algor='newton', mc_sim_num=500, max_iter=None, user_fns=None, conv_loop=True, incremental=False, warm_start=False):
         """Perform the full model-free analysis protocol of d'Auvergne and Gooley, 2008b.
 
         @keyword pipe_name:             The name of the data pipe containing the sequence info.  This data pipe should have all values set including the CSA value, the bond length, the heteronucleus name and proton name.  It should also have all relaxation data loaded.
@@ -156,6 +157,10 @@ class dAuvergne_protocol:
         @type user_fns:                 dict
         @keyword conv_loop:             Automatic looping over all rounds until convergence.
         @type conv_loop:                bool
+        @keyword incremental:           Checkpoint each model-free model optimisation of a round, to resume interrupted rounds, and reuse the model-free results of the previous round if the diffusion tensor has not changed.
+        @type incremental:              bool
+        @keyword warm_start:            For the incremental mode, when the diffusion tensor has changed, start the minimisation of the spins with an unchanged selected model from the previous round's values rather than from the grid search.  This can change which minimum is found.
+        @type warm_start:               bool
         """
 
         # Initial printout.
@@ -177,6 +182,8 @@ class dAuvergne_protocol:
             self.mc_sim_num = mc_sim_num
             self.max_iter = max_iter
             self.conv_loop = conv_loop
+            self.incremental = incremental
+            self.warm_start = warm_start
 
             # The model-free data pipe names.
             self.mf_model_pipes = []
@@ -352,6 +359,10 @@ class dAuvergne_protocol:
         # Looping.
         if not isinstance(self.conv_loop, bool):
             raise RelaxError("The conv_loop user variable '%s' is incorrectly set.  It should be one of the booleans True or False." % self.conv_loop)
+        if not isinstance(self.incremental, bool):
+            raise RelaxError("The incremental user variable '%s' is incorrectly set.  It should be one of the booleans True or False." % self.incremental)
+        if not isinstance(self.warm_start, bool):
+            raise RelaxError("The warm_start user variable '%s' is incorrectly set.  It should be one of the booleans True or False." % self.warm_start)
 
 
     def convergence(self):
@@ -568,15 +579,8 @@ class dAuvergne_protocol:
             # Assume the round is complete.
             complete_round = i
 
-            # The file root.
-            file_root = base_dir + sep + "round_%i" % i + sep + 'opt' + sep + 'results'
-
             # Stop looping when the opt/results file is found.
-            if access(file_root + '.bz2', F_OK):
-                break
-            if access(file_root + '.gz', F_OK):
-                break
-            if access(file_root, F_OK):
+            if self.has_results(base_dir + sep + "round_%i" % i + sep + 'opt'):
                 break
 
         # No round, so assume the initial state.
@@ -681,7 +685,7 @@ class dAuvergne_protocol:
                     self.interpreter.minimise.execute(self.min_algor, func_tol=self.opt_func_tol, max_iter=self.opt_max_iterations)
 
                     # Write the results.
-                    self.interpreter.results.write(file='results', dir=self.base_dir, force=True)
+                    self.write_checkpoint(dir=self.base_dir)
 
 
                 # Normal round of optimisation for diffusion models MII to MV.
@@ -709,7 +713,7 @@ class dAuvergne_protocol:
 
                     # Write the results.
                     dir = self.base_dir + 'opt'
-                    self.interpreter.results.write(file='results', dir=dir, force=True)
+                    self.write_checkpoint(dir=dir)
 
                     # Test for convergence.
                     converged = self.convergence()
@@ -829,6 +833,27 @@ class dAuvergne_protocol:
             raise RelaxError("Unknown diffusion model, change the value of 'self.diff_model'")
 
 
+    def has_results(self, dir):
+        """Determine if a results file, possibly compressed, exists in the given directory.
+
+        @param dir: The directory to check.
+        @type dir:  str
+        @return:    True if the results file exists.
+        @rtype:     bool
+        """
+
+        # The file root.
+        file_root = dir + sep + 'results'
+
+        # Check for the compressed and uncompressed files.
+        for ext in ['.bz2', '.gz', '']:
+            if access(file_root + ext, F_OK):
+                return True
+
+        # No results.
+        return False
+
+
     def load_tensor(self):
         """Function for loading the optimised diffusion tensor."""
 
@@ -856,7 +881,7 @@ class dAuvergne_protocol:
 
         # Write the results.
         if write_flag:
-            self.interpreter.results.write(file='results', dir=dir, force=True)
+            self.write_checkpoint(dir=dir)
 
 
     def multi_model(self, local_tm=False):
@@ -877,9 +902,18 @@ class dAuvergne_protocol:
             # Place the model name into the status container.
             status.auto_analysis[self.pipe_bundle].current_model = models[i]
 
-            # Create the data pipe (by copying).
+            # Delete the old data pipe.
             if has_pipe(self.pipes[i]):
                 self.interpreter.pipe.delete(self.pipes[i])
+
+            # The results directory.
+            dir = self.base_dir + models[i]
+
+            # Incremental mode, reusing the checkpointed results of an interrupted round or the results of the previous round.
+            if self.incremental and self.reuse_results(pipe=self.pipes[i], model=models[i], dir=dir, local_tm=local_tm):
+                continue
+
+            # Create the data pipe (by copying).
             self.interpreter.pipe.copy(self.pipe_name, self.pipes[i], bundle_to=self.pipe_bundle)
             self.interpreter.pipe.switch(self.pipes[i])
 
@@ -891,16 +925,27 @@ class dAuvergne_protocol:
             # Select the model-free model.
             self.interpreter.model_free.select_model(model=models[i])
 
+            # Incremental mode, optionally warm starting the spins from the previous round.
+            seeded = []
+            if self.incremental and self.warm_start and not local_tm:
+                seeded = self.warm_start_spins(model=models[i])
+
+            # Grid search, deselecting the warm started spins.
+            for spin in seeded:
+                spin.select = False
+            if count_spins():
+                self.interpreter.minimise.grid_search(inc=self.grid_inc)
+            for spin in seeded:
+                spin.select = True
+
             # Minimise.
-            self.interpreter.minimise.grid_search(inc=self.grid_inc)
             self.interpreter.minimise.execute(self.min_algor, func_tol=self.opt_func_tol, max_iter=self.opt_max_iterations)
 
             # Model elimination.
             self.interpreter.eliminate()
 
             # Write the results.
-            dir = self.base_dir + models[i]
-            self.interpreter.results.write(file='results', dir=dir, force=True)
+            self.write_checkpoint(dir=dir)
 
         # Unset the status.
         status.auto_analysis[self.pipe_bundle].current_model = None
@@ -920,6 +965,64 @@ class dAuvergne_protocol:
         return name
 
 
+    def reuse_results(self, pipe=None, model=None, dir=None, local_tm=False):
+        """Load the checkpointed or previous round results of the model-free model, for the incremental mode.
+
+        The results of the current round are loaded if they exist, as this round has been interrupted after the optimisation of the model.  Otherwise the results of the previous round are loaded and kept if the diffusion tensor they were optimised with is identical to the current tensor, as the optimisation would then give identical results.  If the tensor has changed, the model is optimised again, from the grid search or, if the warm_start flag is set, with the spins warm started via warm_start_spins().
+
+
+        @keyword pipe:      The name of the data pipe to create for the model.
+        @type pipe:         str
+        @keyword model:     The model-free model.
+        @type model:        str
+        @keyword dir:       The results directory of the model for the current round.
+        @type dir:          str
+        @keyword local_tm:  A flag which if True indicates that the local tm models are being optimised.
+        @type local_tm:     bool
+        @return:            True if the results have been loaded into the data pipe, and False if the model must be optimised.
+        @rtype:             bool
+        """
+
+        # The checkpointed results of the current round.
+        if self.has_results(dir):
+            # Printout.
+            print("Loading the checkpointed results of the model-free model '%s' from '%s'." % (model, dir))
+
+            # Create the data pipe and load the results.
+            self.interpreter.pipe.create(pipe, 'mf', bundle=self.pipe_bundle)
+            self.interpreter.results.read(file='results', dir=dir)
+            return True
+
+        # No previous round (the local tm models and the first round have no prior model-free results).
+        if local_tm or self.round < 2:
+            return False
+
+        # The results of the previous round.
+        prev_dir = self.results_dir + self.diff_model + sep + 'round_' + repr(self.round-1) + sep + model
+        if not self.has_results(prev_dir):
+            return False
+
+        # Load the results of the previous round.
+        self.interpreter.pipe.create(pipe, 'mf', bundle=self.pipe_bundle)
+        self.interpreter.results.read(file='results', dir=prev_dir)
+
+        # Compare the diffusion tensor used in the previous round to the current tensor.
+        prev_tensor = get_pipe(pipe).diff_tensor
+        tensor = get_pipe(self.name_pipe('previous')).diff_tensor
+        for param in self.conv_data.diff_params:
+            # The tensor has changed, so the model must be optimised from scratch.
+            if getattr(prev_tensor, param) != getattr(tensor, param):
+                self.interpreter.pipe.delete(pipe)
+                return False
+
+        # Printout.
+        print("The diffusion tensor is unchanged, reusing the results of the model-free model '%s' from '%s'." % (model, prev_dir))
+
+        # Checkpoint the reused results for this round.
+        self.write_checkpoint(dir=dir)
+        return True
+
+
     def status_setup(self):
         """Initialise the status object."""
 
@@ -949,6 +1052,71 @@ class dAuvergne_protocol:
         status.auto_analysis[self.pipe_bundle].convergence = False
 
 
+    def warm_start_spins(self, model=None):
+        """Set the parameter values of the spins to those of the previous round, for the incremental mode with the warm_start flag.
+
+        Only the spins for which the model-free model was selected in the previous round, and which have values for all parameters, are warm started.  The grid search can then be skipped for these spins.
+
+
+        @keyword model: The model-free model, which must already be selected in the current data pipe.
+        @type model:    str
+        @return:        The spin containers of the current data pipe which have been warm started.
+        @rtype:         list of SpinContainer instances
+        """
+
+        # The data pipe of the previous round.
+        prev_pipe = self.name_pipe('previous')
+
+        # Loop over the selected spins.
+        seeded = []
+        for spin, spin_id in spin_loop(return_id=True, skip_desel=True):
+            # The spin of the previous round, skipping spins with a different selected model.
+            prev_spin = return_spin(spin_id=spin_id, pipe=prev_pipe)
+            if prev_spin == None or not prev_spin.select or getattr(prev_spin, 'model', None) != model:
+                continue
+
+            # The parameter values of the previous round.
+            values = []
+            for param in spin.params:
+                values.append(getattr(prev_spin, param, None))
+
+            # Skip spins with missing values.
+            if None in values:
+                continue
+
+            # Warm start the spin.
+            for j in range(len(spin.params)):
+                setattr(spin, spin.params[j], values[j])
+            seeded.append(spin)
+
+        # Printout.
+        if len(seeded):
+            print("Warm starting %i spins from the results of the previous round for the model-free model '%s'." % (len(seeded), model))
+
+        # Return the spins.
+        return seeded
+
+
+    def write_checkpoint(self, dir=None):
+        """Write the results file of the current data pipe, replacing the file in one step.
+
+        The results are first written to a temporary file which is then renamed, so that if the analysis is killed while writing, no partially written results file is left behind to be found by has_results().
+
+
+        @keyword dir:   The directory to place the results file into.
+        @type dir:      str
+        """
+
+        # Write the temporary file.
+        self.interpreter.results.write(file='results.tmp', dir=dir, force=True)
+
+        # Rename the file, keeping the compression extension.
+        for ext in ['.bz2', '.gz', '']:
+            if access(dir + sep + 'results.tmp' + ext, F_OK):
+                rename(dir + sep + 'results.tmp' + ext, dir + sep + 'results' + ext)
+                break
+
+
     def write_results(self):
         """Create Grace plots of the final model-free results."""
 
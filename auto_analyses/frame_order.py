@@ -1443,7 +1443,7 @@ class Frame_order_analysis:
         """
 
         # Unpack the info.
-        max_num, oversample = info
+        max_num, oversample, tol = info
 
         # Nothing to do.
         if max_num == None:
@@ -1451,11 +1451,11 @@ class Frame_order_analysis:
 
         # No oversampling specified.
         if oversample == None:
-            self.interpreter.frame_order.sobol_setup(max_num=max_num)
+            self.interpreter.frame_order.sobol_setup(max_num=max_num, tol=tol)
 
         # Full setup.
         else:
-            self.interpreter.frame_order.sobol_setup(max_num=max_num, oversample=oversample)
+            self.interpreter.frame_order.sobol_setup(max_num=max_num, oversample=oversample, tol=tol)
 
 
 
@@ -1474,6 +1474,7 @@ class Optimisation_settings:
         self._grid_zoom = []
         self._grid_sobol_max_points = []
         self._grid_sobol_oversample = []
+        self._grid_sobol_tol = []
         self._grid_quad_int = []
         self._grid_pivot_search = []
 
@@ -1484,6 +1485,7 @@ class Optimisation_settings:
         self._min_max_iter = []
         self._min_sobol_max_points = []
         self._min_sobol_oversample = []
+        self._min_sobol_tol = []
         self._min_quad_int = []
 
 
@@ -1507,7 +1509,7 @@ class Optimisation_settings:
             raise RelaxError("The iteration index %i is too high, only %i minimisations are set up." % (i, self._min_count))
 
 
-    def add_grid(self, inc=None, zoom=None, sobol_max_points=None, sobol_oversample=None, quad_int=False, pivot_search=True):
+    def add_grid(self, inc=None, zoom=None, sobol_max_points=None, sobol_oversample=None, sobol_tol=None, quad_int=False, pivot_search=True):
         """Add a grid search step.
 
         @keyword inc:               The grid search size (the number of increments per dimension).
@@ -1518,6 +1520,8 @@ class Optimisation_settings:
         @type sobol_max_points:     None or int
         @keyword sobol_oversample:  The Sobol' oversampling factor.  See the frame_order.sobol_setup user function for details.
         @type sobol_oversample:     None or int
+        @keyword sobol_tol:         The PCS error tolerance, in ppm, for the adaptive numerical integration.  The number of Sobol' points will then be chosen automatically for each target function call, with sobol_max_points as the upper limit.  A large tolerance allows the early optimisation stages to be cheap, while a small tolerance gives high precision in the final stages.  This is only used if sobol_max_points is supplied, and if None, all sobol_max_points points will be used.  See the frame_order.sobol_setup user function for details.
+        @type sobol_tol:            None or float
         @keyword quad_int:          The SciPy quadratic integration flag.  See the frame_order.quad_int user function for details.
         @type quad_int:             bool
         @keyword pivot_search:      A flag which if False will prevent the pivot point from being included in the grid search.
@@ -1529,6 +1533,7 @@ class Optimisation_settings:
         is_int(zoom, name='zoom', can_be_none=True)
         is_int(sobol_max_points, name='sobol_max_points', can_be_none=True)
         is_int(sobol_oversample, name='sobol_oversample', can_be_none=True)
+        is_float(sobol_tol, name='sobol_tol', can_be_none=True)
         is_bool(quad_int, name='quad_int')
 
         # Store the values.
@@ -1536,6 +1541,7 @@ class Optimisation_settings:
         self._grid_zoom.append(zoom)
         self._grid_sobol_max_points.append(sobol_max_points)
         self._grid_sobol_oversample.append(sobol_oversample)
+        self._grid_sobol_tol.append(sobol_tol)
         self._grid_quad_int.append(quad_int)
         self._grid_pivot_search.append(pivot_search)
 
@@ -1543,7 +1549,7 @@ class Optimisation_settings:
         self._grid_count += 1
 
 
-    def add_min(self, min_algor='simplex', func_tol=1e-25, max_iter=1000000, sobol_max_points=None, sobol_oversample=None, quad_int=False):
+    def add_min(self, min_algor='simplex', func_tol=1e-25, max_iter=1000000, sobol_max_points=None, sobol_oversample=None, sobol_tol=None, quad_int=False):
         """Add an optimisation step.
 
         @keyword min_algor:         The optimisation technique.
@@ -1556,6 +1562,8 @@ class Optimisation_settings:
         @type sobol_max_points:     None or int
         @keyword sobol_oversample:  The Sobol' oversampling factor.  See the frame_order.sobol_setup user function for details.
         @type sobol_oversample:     None or int
+        @keyword sobol_tol:         The PCS error tolerance, in ppm, for the adaptive numerical integration.  The number of Sobol' points will then be chosen automatically for each target function call, with sobol_max_points as the upper limit.  A large tolerance allows the early optimisation stages to be cheap, while a small tolerance gives high precision in the final stages.  This is only used if sobol_max_points is supplied, and if None, all sobol_max_points points will be used.  See the frame_order.sobol_setup user function for details.
+        @type sobol_tol:            None or float
         @keyword quad_int:          The SciPy quadratic integration flag.  See the frame_order.quad_int user function for details.
         @type quad_int:             bool
         """
@@ -1566,6 +1574,7 @@ class Optimisation_settings:
         is_int(max_iter, name='max_iter', can_be_none=True)
         is_int(sobol_max_points, name='sobol_max_points', can_be_none=True)
         is_int(sobol_oversample, name='sobol_oversample', can_be_none=True)
+        is_float(sobol_tol, name='sobol_tol', can_be_none=True)
         is_bool(quad_int, name='quad_int')
 
         # Store the values.
@@ -1574,6 +1583,7 @@ class Optimisation_settings:
         self._min_max_iter.append(max_iter)
         self._min_sobol_max_points.append(sobol_max_points)
         self._min_sobol_oversample.append(sobol_oversample)
+        self._min_sobol_tol.append(sobol_tol)
         self._min_quad_int.append(quad_int)
 
         # Increment the count.
@@ -1629,19 +1639,19 @@ class Optimisation_settings:
 
 
     def get_grid_sobol_info(self, i):
-        """Return the number of numerical integration points and oversampling factor for the given iteration.
+        """Return the number of numerical integration points, oversampling factor and adaptive integration tolerance for the given iteration.
 
         @param i:   The grid search iteration from the loop_grid() method.
         @type i:    int
-        @return:    The number of numerical integration points for the iteration and the oversampling factor.
-        @rtype:     int, int
+        @return:    The number of numerical integration points for the iteration, the oversampling factor, and the adaptive integration PCS error tolerance.
+        @rtype:     int, int, float
         """
 
         # Check the index.
         self._check_index(i, iter_type='grid')
 
         # Return the value.
-        return self._grid_sobol_max_points[i], self._grid_sobol_oversample[i]
+        return self._grid_sobol_max_points[i], self._grid_sobol_oversample[i], self._grid_sobol_tol[i]
 
 
     def get_grid_zoom_level(self, i):
@@ -1725,19 +1735,19 @@ class Optimisation_settings:
 
 
     def get_min_sobol_info(self, i):
-        """Return the number of numerical integration points and oversampling factor for the given iteration.
+        """Return the number of numerical integration points, oversampling factor and adaptive integration tolerance for the given iteration.
 
         @param i:   The minimisation iteration from the loop_min() method.
         @type i:    int
-        @return:    The number of numerical integration points for the iteration and the oversampling factor.
-        @rtype:     int, int
+        @return:    The number of numerical integration points for the iteration, the oversampling factor, and the adaptive integration PCS error tolerance.
+        @rtype:     int, int, float
         """
 
         # Check the index.
         self._check_index(i, iter_type='min')
 
         # Return the value.
-        return self._min_sobol_max_points[i], self._min_sobol_oversample[i]
+        return self._min_sobol_max_points[i], self._min_sobol_oversample[i], self._min_sobol_tol[i]
 
 
     def has_grid(self):
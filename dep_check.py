@@ -326,8 +326,8 @@ except ImportError:
 # Relaxation curve fitting.
 try:
     from target_functions import relax_fit
-    from target_functions.relax_fit import setup
-    del setup
+    from target_functions.relax_fit import setup, setup_fitter
+    del setup, setup_fitter
     C_module_exp_fn = True
 except ImportError:
     # The OS.
@@ -24,6 +24,7 @@
 
 # Python imports.
 from math import pi
+from numpy import stack
 from numpy.linalg import eigvals
 
 # relax module imports.
@@ -195,6 +196,39 @@ def maxA(tensor):
     return max(abs(eigvals(tensor)))
 
 
+def projections_5D(vect):
+    """Project unit vectors onto the five alignment tensor elements {Axx, Ayy, Axy, Axz, Ayz}.
+
+    The projections are the values of::
+
+         T   dAi
+        mu . ---- . mu,
+             dAmn
+
+    so that mu^T . Ai . mu is the dot product of the projections with the 5D alignment tensor.  These are::
+
+        | x**2 - z**2 |
+        | y**2 - z**2 |
+        |    2xy      |.
+        |    2xz      |
+        |    2yz      |
+
+
+    @param vect:    The unit vectors, with the last dimension being the coordinates.
+    @type vect:     numpy rank-N array
+    @return:        The projections, with the last dimension of size 5.
+    @rtype:         numpy rank-N array
+    """
+
+    # The coordinates.
+    x = vect[..., 0]
+    y = vect[..., 1]
+    z = vect[..., 2]
+
+    # The projections.
+    return stack([x**2 - z**2, y**2 - z**2, 2.0*x*y, 2.0*x*z, 2.0*y*z], axis=-1)
+
+
 def to_5D(vector_5D, tensor):
     """Convert the rank-2 3D alignment tensor matrix to the 5D vector format.
 
@@ -26,5 +26,6 @@ __all__ = [
     'correlation_time',
     'direction_cosine',
     'main',
+    'memo',
     'weights'
 ]
@@ -0,0 +1,114 @@
+###############################################################################
+#                                                                             #
+# Copyright (C) 2015 Edward d'Auvergne                                        #
+#                                                                             #
+# This file is part of the program relax (http://www.nmr-relax.com).          #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+# Module docstring.
+"""Memoisation of the diffusion tensor geometry.
+
+The direction cosines, weights and correlation times, together with their gradients and Hessians, only depend on the diffusion tensor parameters and the fixed bond vector of the spin.  The calculation functions of the direction_cosine, weights and correlation_time modules store their results in the spin specific data container and in the diffusion tensor data container.  Hence if the tensor parameters are unchanged since a function was last called for a spin, the results already present in the data containers are still valid and the calculation can be skipped.
+"""
+
+
+# The names of the geometry calculation functions of the diffusion tensor data container.
+GEOMETRY_FUNCS = ['calc_di', 'calc_ddi', 'calc_d2di', 'calc_ci', 'calc_dci', 'calc_d2ci', 'calc_ti', 'calc_dti', 'calc_d2ti']
+
+
+class Geometry_memo:
+    def __init__(self, diff_data):
+        """Replace the geometry calculation functions of the diffusion tensor data container by memoised versions.
+
+        The memo is stored as the diff_data.memo object.
+
+
+        @param diff_data:   The diffusion tensor data container, with the 'params' object and the geometry calculation functions set.
+        @type diff_data:    class instance
+        """
+
+        # The tensor parameter values of the current generation, and the generation number.
+        self.params = None
+        self.generation = 0
+
+        # The counters.
+        self.calls = 0
+        self.hits = 0
+
+        # Wrap the functions.
+        for name in GEOMETRY_FUNCS:
+            func = getattr(diff_data, name, None)
+            if func:
+                setattr(diff_data, name, self.wrap(name, func))
+
+        # Store the memo.
+        diff_data.memo = self
+
+
+    def reuse_rate(self):
+        """Return the fraction of the geometry function calls which have been skipped.
+
+        @return:    The reuse rate, between 0 and 1.
+        @rtype:     float
+        """
+
+        # No calls.
+        if not self.calls:
+            return 0.0
+
+        # The rate.
+        return float(self.hits) / self.calls
+
+
+    def wrap(self, name, func):
+        """Create the memoised version of the geometry calculation function.
+
+        @param name:    The name of the function.
+        @type name:     str
+        @param func:    The geometry calculation function.
+        @type func:     function
+        @return:        The memoised function, with the same arguments.
+        @rtype:         function
+        """
+
+        # The memoised function.
+        def memoised(data, diff_data):
+            # Count the call.
+            self.calls += 1
+
+            # A change of the tensor parameters starts a new generation, invalidating all results.
+            params = tuple(diff_data.params)
+            if params != self.params:
+                self.params = params
+                self.generation += 1
+
+            # The functions already called for the spin in this generation.
+            if getattr(data, 'geometry_generation', None) != self.generation:
+                data.geometry_generation = self.generation
+                data.geometry_done = set()
+
+            # Skip the calculation.
+            if name in data.geometry_done:
+                self.hits += 1
+                return
+
+            # Calculate.
+            func(data, diff_data)
+            data.geometry_done.add(name)
+
+        # Return the function.
+        return memoised
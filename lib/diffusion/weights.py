@@ -22,7 +22,7 @@
 
 # Python module imports.
 from math import sqrt
-from numpy import outer
+from numpy import einsum
 
 
 ##########
@@ -136,8 +136,8 @@ def calc_spheroid_d2ci(data, diff_data):
     where the orientation parameter set O is {theta, phi}.
     """
 
-    # Outer product.
-    op = outer(data.ddz_dO, data.ddz_dO)
+    # Outer product (the last dimension of the gradient, if present, is the spin index for the calculation of all spins at once).
+    op = einsum('i...,j...->ij...', data.ddz_dO, data.ddz_dO)
 
     # Hessian.
     data.d2ci[2:, 2:, 0] = 3.0 * ((9.0 * data.dz**2 - 1.0) * op  +  data.dz * data.three_dz2_one * data.d2dz_dO2)
@@ -787,19 +787,19 @@ def calc_ellipsoid_d2ci(data, diff_data):
     # Oi-Oj partial derivative.
     ###############################
 
-    # Outer products.
-    op_xx = outer(data.ddx_dO, data.ddx_dO)
-    op_yy = outer(data.ddy_dO, data.ddy_dO)
-    op_zz = outer(data.ddz_dO, data.ddz_dO)
+    # Outer products (the last dimension of the gradients, if present, is the spin index for the calculation of all spins at once).
+    op_xx = einsum('i...,j...->ij...', data.ddx_dO, data.ddx_dO)
+    op_yy = einsum('i...,j...->ij...', data.ddy_dO, data.ddy_dO)
+    op_zz = einsum('i...,j...->ij...', data.ddz_dO, data.ddz_dO)
 
-    op_xy = outer(data.ddx_dO, data.ddy_dO)
-    op_yx = outer(data.ddy_dO, data.ddx_dO)
+    op_xy = einsum('i...,j...->ij...', data.ddx_dO, data.ddy_dO)
+    op_yx = einsum('i...,j...->ij...', data.ddy_dO, data.ddx_dO)
 
-    op_xz = outer(data.ddx_dO, data.ddz_dO)
-    op_zx = outer(data.ddz_dO, data.ddx_dO)
+    op_xz = einsum('i...,j...->ij...', data.ddx_dO, data.ddz_dO)
+    op_zx = einsum('i...,j...->ij...', data.ddz_dO, data.ddx_dO)
 
-    op_yz = outer(data.ddy_dO, data.ddz_dO)
-    op_zy = outer(data.ddz_dO, data.ddy_dO)
+    op_yz = einsum('i...,j...->ij...', data.ddy_dO, data.ddz_dO)
+    op_zy = einsum('i...,j...->ij...', data.ddz_dO, data.ddy_dO)
 
     # Components.
     x_comp = data.dx * data.d2dx_dO2 + op_xx
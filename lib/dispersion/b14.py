@@ -110,7 +110,7 @@ Comparison to CR72 full model can be found in the:
 """
 
 # Python module imports.
-from numpy import any, arccosh, arctan2, cos, cosh, fabs, isfinite, log, max, min, power, sin, sinh, sqrt, sum
+from numpy import any, arccosh, arctan2, cos, cosh, fabs, isfinite, log, max, min, ndarray, ones, power, sin, sinh, sqrt, sum, where, zeros
 from numpy.ma import fix_invalid, masked_greater_equal, masked_where
 
 # Repetitive calculations (to speed up calculations).
@@ -128,13 +128,13 @@ def r2eff_B14(r20a=None, r20b=None, pA=None, dw=None, dw_orig=None, kex=None, nc
     @keyword r20b:          The R20 parameter value of state B (R2 with no exchange).
     @type r20b:             numpy float array of rank [NE][NS][NM][NO][ND]
     @keyword pA:            The population of state A.
-    @type pA:               float
+    @type pA:               float or numpy float array of rank [NG][1][1][1][1][1]
     @keyword dw:            The chemical exchange difference between states A and B in rad/s.
     @type dw:               numpy float array of rank [NE][NS][NM][NO][ND]
     @keyword dw_orig:       The chemical exchange difference between states A and B in ppm. This is only for faster checking of zero value, which result in no exchange.
     @type dw_orig:          numpy float array of rank-1
-    @keyword kex:           The kex parameter value (the exchange rate in rad/s).
-    @type kex:              float
+    @keyword kex:           The kex parameter value (the exchange rate in rad/s).  For a grid search, this and all other parameters can have an additional leading grid point axis of length NG.
+    @type kex:              float or numpy float array of rank [NG][1][1][1][1][1]
     @keyword ncyc:          The matrix exponential power array. The number of CPMG blocks.
     @type ncyc:             numpy int16 array of rank [NE][NS][NM][NO][ND]
     @keyword inv_tcpmg:     The inverse of the total duration of the CPMG element (in inverse seconds).
@@ -152,9 +152,15 @@ def r2eff_B14(r20a=None, r20b=None, pA=None, dw=None, dw_orig=None, kex=None, nc
     t_log_tog_neg = False
     t_v1c_less_one = False
 
+    # The grid search mode, whereby all parameters have a leading grid point axis.
+    grid = isinstance(kex, ndarray)
+
     # Catch parameter values that will result in no exchange, returning flat R2eff = R20 lines (when kex = 0.0, k_AB = 0.0).
-    # Test if pA or kex is zero.
-    if kex == 0.0 or pA == 1.0:
+    # Test if pA or kex is zero.  For the grid search, the affected grid points are replaced at the end.
+    if grid:
+        mask_no_ex = ((kex == 0.0) | (pA == 1.0)).ravel()
+        kex = where(kex == 0.0, 1.0, kex)
+    elif kex == 0.0 or pA == 1.0:
         back_calc[:] = r20a
         return
 
@@ -306,8 +312,167 @@ def r2eff_B14(r20a=None, r20b=None, pA=None, dw=None, dw_orig=None, kex=None, nc
     if t_log_tog_neg:
         back_calc[mask_log_tog_neg] = 1e100
 
+    # The grid points without exchange.
+    if grid:
+        back_calc[mask_no_ex] = r20a[mask_no_ex]
+
     # Catch errors, taking a sum over array is the fastest way to check for
     # +/- inf (infinity) and nan (not a number).
     if not isfinite(sum(back_calc)):
         # Replaces nan, inf, etc. with fill value.
         fix_invalid(back_calc, copy=False, fill_value=1e100)
+
+
+def dr2eff_B14(r20a=None, r20b=None, pA=None, dw=None, kex=None, ncyc=None, inv_tcpmg=None, tcp=None):
+    r"""Calculate the partial derivatives of the R2eff values for the B14 model.
+
+    The derivatives are propagated through the chain of real and complex intermediate values of the R2eff equation, with theta being any of the R20A, R20B, dw, pA or kex parameters::
+
+        dR2eff    1 d(R2A0 + R2B0 + kex)    1   /        1       dv1c       1     dRe(Tog) \ 
+        ------  = - -------------------  -  - . | ncyc . --- . ------ + ------- . -------- | ,
+        dtheta    2       dtheta            T   \        v3    dtheta   Re(Tog)   dtheta  /
+
+    where the complex N = g3 + i.g4 is the square root of Psi - i.zeta.  The points replaced by the R2eff function by R20A (dw = 0 or E0 above 700) have a derivative of one with respect to R20A, and the invalid points replaced by 1e100 have zero derivatives.
+
+
+    @keyword r20a:          The R20 parameter value of state A (R2 with no exchange).
+    @type r20a:             numpy float array of rank [NE][NS][NM][NO][ND]
+    @keyword r20b:          The R20 parameter value of state B (R2 with no exchange).
+    @type r20b:             numpy float array of rank [NE][NS][NM][NO][ND]
+    @keyword pA:            The population of state A.
+    @type pA:               float
+    @keyword dw:            The chemical exchange difference between states A and B in rad/s.
+    @type dw:               numpy float array of rank [NE][NS][NM][NO][ND]
+    @keyword kex:           The kex parameter value (the exchange rate in rad/s).
+    @type kex:              float
+    @keyword ncyc:          The matrix exponential power array. The number of CPMG blocks.
+    @type ncyc:             numpy int16 array of rank [NE][NS][NM][NO][ND]
+    @keyword inv_tcpmg:     The inverse of the total duration of the CPMG element (in inverse seconds).
+    @type inv_tcpmg:        numpy float array of rank [NE][NS][NM][NO][ND]
+    @keyword tcp:           The tau_CPMG times (1 / 4.nu1).
+    @type tcp:              numpy float array of rank [NE][NS][NM][NO][ND]
+    @return:                The partial derivatives of the R2eff values with respect to r20a, r20b, dw, pA and kex.
+    @rtype:                 tuple of numpy float arrays of rank [NE][NS][NM][NO][ND]
+    """
+
+    # No exchange.
+    if kex == 0.0 or pA == 1.0:
+        return ones(dw.shape), zeros(dw.shape), zeros(dw.shape), zeros(dw.shape), zeros(dw.shape)
+
+    # Parameter conversions.
+    pB = 1.0 - pA
+    k_BA = pA * kex
+    k_AB = pB * kex
+
+    # Repetitive calculations (to speed up calculations).
+    deltaR2 = r20a - r20b
+    dw2 = dw**2
+    two_tcp = 2.0 * tcp
+
+    # The Carver and Richards (1972) alpha_minus short notation.
+    alpha_m = deltaR2 + k_AB - k_BA
+    zeta = 2.0 * dw * alpha_m
+    Psi = alpha_m**2 + 4.0 * k_BA * k_AB - dw2
+
+    # The complex N = g3 + i.g4 = sqrt(Psi - i.zeta).
+    quad_zeta2_Psi2 = (zeta**2 + Psi**2)**0.25
+    fact = 0.5 * arctan2(-zeta, Psi)
+    g3 = cos(fact) * quad_zeta2_Psi2
+    g4 = sin(fact) * quad_zeta2_Psi2
+    N = g3 + g4*1j
+    NNc = g3**2 + g4**2
+
+    # The time independent factors.
+    F0 = (dw2 + g3**2) / NNc
+    F2 = (dw2 - g4**2) / NNc
+    F1b = (dw + g4) * (dw - g3*1j) / NNc
+    F1a_plus_b = (2. * dw2 + zeta*1j) / NNc
+
+    # The time dependent factors.
+    E0 = two_tcp * g3
+    mask_max_e = E0 > 700.0
+    E0[mask_max_e] = 1.0
+    E2 = two_tcp * g4
+    E1 = (g3 - g4*1j) * tcp
+    v1s = F0 * sinh(E0) - F2 * sin(E2)*1j
+    v4 = F1b * (-alpha_m - g3 ) + F1b * (dw - g4)*1j
+    ex1c = sinh(E1)
+    v5 = (-deltaR2 + kex + dw*1j) * v1s - 2. * (v4 + k_AB * F1a_plus_b) * ex1c
+    v1c = F0 * cosh(E0) - F2 * cos(E2)
+
+    # The invalid values.
+    mask_invalid = v1c < 1.0
+    v1c[mask_invalid] = 2.0
+    v3 = sqrt(v1c**2 - 1.)
+    y = power( (v1c - v3) / (v1c + v3), ncyc)
+    Tog_div = 2. * v3 * N
+    mask_invalid |= Tog_div == 0.0
+    Tog_div[Tog_div == 0.0] = 1.0
+    Tog = 0.5 * (1. + y) + (1. - y) * v5 / Tog_div
+    mask_invalid |= Tog.real < 0.0
+
+    # Avoid the division by zero for the invalid points (v1c = 1, as for the zero padding).
+    v3[v3 == 0.0] = 1.0
+
+    # The derivatives of the parameter conversions with respect to r20a, r20b, dw, pA and kex.
+    ddeltaR2 = [1.0, -1.0, 0.0, 0.0, 0.0]
+    ddw = [0.0, 0.0, 1.0, 0.0, 0.0]
+    dkex = [0.0, 0.0, 0.0, 0.0, 1.0]
+    dk_AB = [0.0, 0.0, 0.0, -kex, pB]
+    dk_BA = [0.0, 0.0, 0.0, kex, pA]
+    ddirect = [0.5, 0.5, 0.0, 0.0, 0.5]
+
+    # Loop over the parameters.
+    derivs = []
+    for i in range(5):
+        # The Carver and Richards (1972) values.
+        dalpha_m = ddeltaR2[i] + dk_AB[i] - dk_BA[i]
+        dzeta = 2.0 * (ddw[i] * alpha_m + dw * dalpha_m)
+        dPsi = 2.0 * alpha_m * dalpha_m + 4.0 * (dk_BA[i] * k_AB + k_BA * dk_AB[i]) - 2.0 * dw * ddw[i]
+        ddw2 = 2.0 * dw * ddw[i]
+
+        # The complex N.
+        dN = (dPsi - dzeta*1j) / (2.0 * N)
+        dg3 = dN.real
+        dg4 = dN.imag
+        dNNc = 2.0 * (g3*dg3 + g4*dg4)
+
+        # The time independent factors.
+        dF0 = (ddw2 + 2.0*g3*dg3 - F0*dNNc) / NNc
+        dF2 = (ddw2 - 2.0*g4*dg4 - F2*dNNc) / NNc
+        dF1b = ((ddw[i] + dg4) * (dw - g3*1j) + (dw + g4) * (ddw[i] - dg3*1j) - F1b*dNNc) / NNc
+        dF1a_plus_b = (2.0*ddw2 + dzeta*1j - F1a_plus_b*dNNc) / NNc
+
+        # The time dependent factors.
+        dE0 = two_tcp * dg3
+        dE2 = two_tcp * dg4
+        dE1 = (dg3 - dg4*1j) * tcp
+        dv1s = dF0 * sinh(E0) + F0 * cosh(E0) * dE0 - (dF2 * sin(E2) + F2 * cos(E2) * dE2)*1j
+        dv4 = dF1b * (-alpha_m - g3 + (dw - g4)*1j) + F1b * (-dalpha_m - dg3 + (ddw[i] - dg4)*1j)
+        dex1c = cosh(E1) * dE1
+        dv5 = (-ddeltaR2[i] + dkex[i] + ddw[i]*1j) * v1s + (-deltaR2 + kex + dw*1j) * dv1s - 2. * ((dv4 + dk_AB[i] * F1a_plus_b + k_AB * dF1a_plus_b) * ex1c + (v4 + k_AB * F1a_plus_b) * dex1c)
+        dv1c = dF0 * cosh(E0) + F0 * sinh(E0) * dE0 - dF2 * cos(E2) + F2 * sin(E2) * dE2
+
+        # The Baldwin (2014) values.
+        dv3 = v1c * dv1c / v3
+        dy = -2.0 * ncyc * y * dv1c / v3
+        dTog_div = 2.0 * (dv3 * N + v3 * dN)
+        dTog = 0.5 * dy - dy * v5 / Tog_div + (1. - y) * (dv5 - v5 * dTog_div / Tog_div) / Tog_div
+
+        # The R2eff derivative.
+        deriv = ddirect[i] - inv_tcpmg * (ncyc * dv1c / v3 + dTog.real / Tog.real)
+
+        # The points replaced by R20A, and the invalid points.
+        deriv[dw == 0.0] = float(i == 0)
+        deriv[mask_max_e] = float(i == 0)
+        deriv[mask_invalid] = 0.0
+
+        # Catch errors, replacing nan and inf values with zero.
+        if not isfinite(sum(deriv)):
+            fix_invalid(deriv, copy=False, fill_value=0.0)
+
+        # Store.
+        derivs.append(deriv)
+
+    # Return the partial derivatives.
+    return tuple(derivs)
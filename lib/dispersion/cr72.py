@@ -93,7 +93,7 @@ More information on the CR72 full model can be found in the:
 """
 
 # Python module imports.
-from numpy import arccosh, cos, cosh, isfinite, fabs, min, max, multiply, sqrt, subtract, sum
+from numpy import arccosh, cos, cosh, isfinite, fabs, min, max, multiply, ndarray, ones, sin, sinh, sqrt, subtract, sum, where, zeros
 from numpy.ma import fix_invalid, masked_greater_equal, masked_where
 
 # Repetitive calculations (to speed up calculations).
@@ -115,13 +115,13 @@ def r2eff_CR72(r20a=None, r20a_orig=None, r20b=None, r20b_orig=None, pA=None, dw
     @keyword r20b_orig:     The R20 parameter value of state B (R2 with no exchange). This is only for faster checking of zero value, which result in no exchange.
     @type r20b_orig:        numpy float array of rank-1
     @keyword pA:            The population of state A.
-    @type pA:               float
+    @type pA:               float or numpy float array of rank [NG][1][1][1][1][1]
     @keyword dw:            The chemical exchange difference between states A and B in rad/s.
     @type dw:               numpy array of rank [NE][NS][NM][NO][ND]
     @keyword dw_orig:       The chemical exchange difference between states A and B in ppm. This is only for faster checking of zero value, which result in no exchange.
     @type dw_orig:          numpy float array of rank-1
-    @keyword kex:           The kex parameter value (the exchange rate in rad/s).
-    @type kex:              float
+    @keyword kex:           The kex parameter value (the exchange rate in rad/s).  For a grid search, this and all other parameters can have an additional leading grid point axis of length NG.
+    @type kex:              float or numpy float array of rank [NG][1][1][1][1][1]
     @keyword cpmg_frqs:     The CPMG nu1 frequencies.
     @type cpmg_frqs:        numpy float array of rank [NE][NS][NM][NO][ND]
     @keyword back_calc:     The array for holding the back calculated R2eff values.  Each element corresponds to one of the CPMG nu1 frequencies.
@@ -132,9 +132,15 @@ def r2eff_CR72(r20a=None, r20a_orig=None, r20b=None, r20b_orig=None, pA=None, dw
     t_dw_zero = False
     t_max_etapos = False
 
+    # The grid search mode, whereby all parameters have a leading grid point axis.
+    grid = isinstance(kex, ndarray)
+
     # Catch parameter values that will result in no exchange, returning flat R2eff = R20 lines (when kex = 0.0, k_AB = 0.0).
-    # Test if pA or kex is zero.
-    if kex == 0.0 or pA == 1.0:
+    # Test if pA or kex is zero.  For the grid search, the affected grid points are replaced at the end.
+    if grid:
+        mask_no_ex = ((kex == 0.0) | (pA == 1.0)).ravel()
+        kex = where(kex == 0.0, 1.0, kex)
+    elif kex == 0.0 or pA == 1.0:
         back_calc[:] = r20a
         return
 
@@ -184,7 +190,10 @@ def r2eff_CR72(r20a=None, r20a_orig=None, r20b=None, r20b_orig=None, pA=None, dw
 
     # The arccosh argument - catch invalid values.
     fact = Dpos * cosh(etapos) - Dneg * cos(etaneg)
-    if min(fact) < 1.0:
+    if grid:
+        mask_fact = (fact < 1.0).reshape(len(fact), -1).any(axis=1)
+        fact[mask_fact] = 1.0
+    elif min(fact) < 1.0:
         back_calc[:] = r20_kex
         return
 
@@ -201,8 +210,157 @@ def r2eff_CR72(r20a=None, r20a_orig=None, r20b=None, r20b_orig=None, pA=None, dw
     if t_max_etapos:
         back_calc[mask_max_etapos.mask] = r20a[mask_max_etapos.mask]
 
+    # The grid points with invalid arccosh arguments or without exchange.
+    if grid:
+        back_calc[mask_fact] = r20_kex[mask_fact]
+        back_calc[mask_no_ex] = r20a[mask_no_ex]
+
     # Catch errors, taking a sum over array is the fastest way to check for
     # +/- inf (infinity) and nan (not a number).
     if not isfinite(sum(back_calc)):
         # Replaces nan, inf, etc. with fill value.
         fix_invalid(back_calc, copy=False, fill_value=1e100)
+
+
+def dr2eff_CR72(r20a=None, r20b=None, pA=None, dw=None, kex=None, cpmg_frqs=None):
+    r"""Calculate the partial derivatives of the R2eff values for the CR72 model.
+
+    The derivatives are propagated through the chain of intermediate values of the R2eff equation, with theta being any of the R20A, R20B, dw, pA or kex parameters::
+
+        dR2eff    1 d(R2A0 + R2B0 + kex)               1                   dF
+        ------  = - ------------------- - nu_cpmg . ------------- . ------ ,
+        dtheta    2       dtheta                    sqrt(F^2 - 1)   dtheta
+
+    where F = D+.cosh(eta+) - D-.cos(eta-).  The sinh(eta+)/eta+ and sin(eta-)/eta- factors are used so that the eta+/- = 0 limits are handled.  The points replaced by the R2eff function by R20A (dw = 0 or eta+ above 700) have a derivative of one with respect to R20A.
+
+
+    @keyword r20a:          The R20 parameter value of state A (R2 with no exchange).
+    @type r20a:             numpy float array of rank [NE][NS][NM][NO][ND]
+    @keyword r20b:          The R20 parameter value of state B (R2 with no exchange).
+    @type r20b:             numpy float array of rank [NE][NS][NM][NO][ND]
+    @keyword pA:            The population of state A.
+    @type pA:               float
+    @keyword dw:            The chemical exchange difference between states A and B in rad/s.
+    @type dw:               numpy array of rank [NE][NS][NM][NO][ND]
+    @keyword kex:           The kex parameter value (the exchange rate in rad/s).
+    @type kex:              float
+    @keyword cpmg_frqs:     The CPMG nu1 frequencies.
+    @type cpmg_frqs:        numpy float array of rank [NE][NS][NM][NO][ND]
+    @return:                The partial derivatives of the R2eff values with respect to r20a, r20b, dw, pA and kex.
+    @rtype:                 tuple of numpy float arrays of rank [NE][NS][NM][NO][ND]
+    """
+
+    # No exchange.
+    if kex == 0.0 or pA == 1.0:
+        return ones(dw.shape), zeros(dw.shape), zeros(dw.shape), zeros(dw.shape), zeros(dw.shape)
+
+    # The B population.
+    pB = 1.0 - pA
+
+    # Repetitive calculations (to speed up calculations).
+    dw2 = dw**2
+    k_BA = pA * kex
+    k_AB = pB * kex
+
+    # The Psi and zeta values.
+    fact = r20a - r20b - k_BA + k_AB
+    Psi = fact**2 - dw2 + 4.0*k_BA*k_AB
+    zeta = 2.0*dw * fact
+    sqrt_psi2_zeta2 = sqrt(Psi**2 + zeta**2)
+
+    # The D+/- values.
+    D_part = (0.5*Psi + dw2) / sqrt_psi2_zeta2
+    Dpos = 0.5 + D_part
+    Dneg = -0.5 + D_part
+
+    # The eta+/- values, and the sinh(eta+)/eta+ and sin(eta-)/eta- factors.
+    eta_fact = eta_scale / cpmg_frqs
+    etapos = eta_fact * sqrt(Psi + sqrt_psi2_zeta2)
+    etaneg = eta_fact * sqrt(-Psi + sqrt_psi2_zeta2)
+    mask_max_etapos = etapos > 700.0
+    etapos[mask_max_etapos] = 1.0
+    sinhc_pos = sinhc(etapos)
+    sinc_neg = sinc(etaneg)
+
+    # The arccosh argument, matching the R2eff function for invalid values.
+    F = Dpos * cosh(etapos) - Dneg * cos(etaneg)
+    if min(F) < 1.0:
+        return 0.5*ones(dw.shape), 0.5*ones(dw.shape), zeros(dw.shape), zeros(dw.shape), 0.5*ones(dw.shape)
+
+    # The arccosh derivative factor.
+    darccosh = cpmg_frqs / sqrt(F**2 - 1.0)
+
+    # The derivatives of fact, Psi, zeta and dw^2 with respect to r20a, r20b, dw, pA and kex.
+    dfact = [1.0, -1.0, 0.0, -2.0*kex, pB - pA]
+    d4kk = [0.0, 0.0, 0.0, 4.0*(pB - pA)*kex**2, 8.0*pA*pB*kex]
+    ddw2 = [0.0, 0.0, 2.0*dw, 0.0, 0.0]
+    ddw = [0.0, 0.0, 1.0, 0.0, 0.0]
+    ddirect = [0.5, 0.5, 0.0, 0.0, 0.5]
+
+    # Loop over the parameters.
+    derivs = []
+    for i in range(5):
+        # The intermediate derivatives.
+        dPsi = 2.0*fact*dfact[i] - ddw2[i] + d4kk[i]
+        dzeta = 2.0*ddw[i]*fact + 2.0*dw*dfact[i]
+        dsqrt = (Psi*dPsi + zeta*dzeta) / sqrt_psi2_zeta2
+        dD_part = ((0.5*dPsi + ddw2[i]) - D_part*dsqrt) / sqrt_psi2_zeta2
+        detapos_etapos = 0.5 * eta_fact**2 * (dPsi + dsqrt)
+        detaneg_etaneg = 0.5 * eta_fact**2 * (dsqrt - dPsi)
+
+        # The arccosh argument derivative.
+        dF = dD_part * (cosh(etapos) - cos(etaneg)) + Dpos*sinhc_pos*detapos_etapos + Dneg*sinc_neg*detaneg_etaneg
+
+        # The R2eff derivative.
+        deriv = ddirect[i] - darccosh * dF
+
+        # The points replaced by R20A.
+        deriv[mask_max_etapos] = 0.0
+        deriv[dw == 0.0] = 0.0
+        if i == 0:
+            deriv[mask_max_etapos] = 1.0
+            deriv[dw == 0.0] = 1.0
+
+        # Catch errors, replacing nan and inf values with zero.
+        if not isfinite(sum(deriv)):
+            fix_invalid(deriv, copy=False, fill_value=0.0)
+
+        # Store.
+        derivs.append(deriv)
+
+    # Return the partial derivatives.
+    return tuple(derivs)
+
+
+def sinc(x):
+    """Return sin(x)/x, using the limit of one for x = 0.
+
+    @param x:   The values.
+    @type x:    numpy float array
+    @return:    The sin(x)/x values.
+    @rtype:     numpy float array
+    """
+
+    # Avoid the division by zero.
+    mask_zero = x == 0.0
+    x = where(mask_zero, 1.0, x)
+
+    # Return the values.
+    return where(mask_zero, 1.0, sin(x) / x)
+
+
+def sinhc(x):
+    """Return sinh(x)/x, using the limit of one for x = 0.
+
+    @param x:   The values.
+    @type x:    numpy float array
+    @return:    The sinh(x)/x values.
+    @rtype:     numpy float array
+    """
+
+    # Avoid the division by zero.
+    mask_zero = x == 0.0
+    x = where(mask_zero, 1.0, x)
+
+    # Return the values.
+    return where(mask_zero, 1.0, sinh(x) / x)
@@ -134,3 +134,104 @@ def r1rho_DPL94(r1rho_prime=None, phi_ex=None, kex=None, theta=None, R1=0.0, spi
     if not isfinite(sum(back_calc)):
         # Replaces nan, inf, etc. with fill value.
         fix_invalid(back_calc, copy=False, fill_value=1e100)
+
+
+def dr1rho_DPL94(r1rho_prime=None, phi_ex=None, kex=None, theta=None, R1=0.0, spin_lock_fields2=None):
+    r"""Calculate the partial derivatives of the R1rho values for the DPL94 model.
+
+    The partial derivatives are::
+
+         dR1rho                        dR1rho
+        -------  =  cos^2(theta) ,    -------  =  sin^2(theta) ,
+          dR1                         dR1rho'
+
+        dR1rho                     kex
+        -------  =  sin^2(theta) . ----------------- ,
+        dphi_ex                    kex^2 + omega_1^2
+
+        dR1rho                         omega_1^2 - kex^2
+        ------  =  sin^2(theta) . phi_ex . --------------------- .
+         dkex                          (kex^2 + omega_1^2)^2
+
+
+    @keyword r1rho_prime:       The R1rho_prime parameter value (R1rho with no exchange).
+    @type r1rho_prime:          numpy float array of rank [NE][NS][NM][NO][ND]
+    @keyword phi_ex:            The phi_ex parameter value (pA * pB * delta_omega^2).
+    @type phi_ex:               numpy float array of rank [NE][NS][NM][NO][ND]
+    @keyword kex:               The kex parameter value (the exchange rate in rad/s).
+    @type kex:                  float
+    @keyword theta:             The rotating frame tilt angles for each dispersion point.
+    @type theta:                numpy float array of rank [NE][NS][NM][NO][ND]
+    @keyword R1:                The R1 relaxation rate.
+    @type R1:                   numpy float array of rank [NE][NS][NM][NO][ND]
+    @keyword spin_lock_fields2: The R1rho spin-lock field strengths squared (in rad^2.s^-2).
+    @type spin_lock_fields2:    numpy float array of rank [NE][NS][NM][NO][ND]
+    @return:                    The partial derivatives of the R1rho values with respect to R1, r1rho_prime, phi_ex and kex.
+    @rtype:                     tuple of numpy float arrays of rank [NE][NS][NM][NO][ND]
+    """
+
+    # Repetitive calculations (to speed up calculations).
+    sin_theta2 = sin(theta)**2
+    kex2 = kex**2
+    denom = kex2 + spin_lock_fields2
+
+    # The partial derivatives.
+    dR1 = cos(theta)**2
+    dphi_ex = sin_theta2 * kex / denom
+    dkex = sin_theta2 * phi_ex * (spin_lock_fields2 - kex2) / denom**2
+
+    # Catch errors, replacing nan and inf values with zero.
+    for deriv in [dphi_ex, dkex]:
+        if not isfinite(sum(deriv)):
+            fix_invalid(deriv, copy=False, fill_value=0.0)
+
+    # Return the partial derivatives.
+    return dR1, sin_theta2, dphi_ex, dkex
+
+
+def d2r1rho_DPL94(r1rho_prime=None, phi_ex=None, kex=None, theta=None, R1=0.0, spin_lock_fields2=None):
+    r"""Calculate the non-zero second partial derivatives of the R1rho values for the DPL94 model.
+
+    As R1rho is linear in R1, R1rho' and phi_ex, the only non-zero second partial derivatives are::
+
+          d2R1rho                       omega_1^2 - kex^2
+        -----------  =  sin^2(theta) . --------------------- ,
+        dphi_ex.dkex                   (kex^2 + omega_1^2)^2
+
+        d2R1rho                              2.kex.(kex^2 - 3.omega_1^2)
+        -------  =  sin^2(theta) . phi_ex . --------------------------- .
+        dkex^2                                (kex^2 + omega_1^2)^3
+
+
+    @keyword r1rho_prime:       The R1rho_prime parameter value (R1rho with no exchange).
+    @type r1rho_prime:          numpy float array of rank [NE][NS][NM][NO][ND]
+    @keyword phi_ex:            The phi_ex parameter value (pA * pB * delta_omega^2).
+    @type phi_ex:               numpy float array of rank [NE][NS][NM][NO][ND]
+    @keyword kex:               The kex parameter value (the exchange rate in rad/s).
+    @type kex:                  float
+    @keyword theta:             The rotating frame tilt angles for each dispersion point.
+    @type theta:                numpy float array of rank [NE][NS][NM][NO][ND]
+    @keyword R1:                The R1 relaxation rate.
+    @type R1:                   numpy float array of rank [NE][NS][NM][NO][ND]
+    @keyword spin_lock_fields2: The R1rho spin-lock field strengths squared (in rad^2.s^-2).
+    @type spin_lock_fields2:    numpy float array of rank [NE][NS][NM][NO][ND]
+    @return:                    The second partial derivatives of the R1rho values with respect to phi_ex and kex, and to kex twice.
+    @rtype:                     tuple of numpy float arrays of rank [NE][NS][NM][NO][ND]
+    """
+
+    # Repetitive calculations (to speed up calculations).
+    sin_theta2 = sin(theta)**2
+    kex2 = kex**2
+    denom = kex2 + spin_lock_fields2
+
+    # The second partial derivatives.
+    dphi_ex_dkex = sin_theta2 * (spin_lock_fields2 - kex2) / denom**2
+    dkex2 = sin_theta2 * phi_ex * 2.0 * kex * (kex2 - 3.0*spin_lock_fields2) / denom**3
+
+    # Catch errors, replacing nan and inf values with zero.
+    for deriv in [dphi_ex_dkex, dkex2]:
+        if not isfinite(sum(deriv)):
+            fix_invalid(deriv, copy=False, fill_value=0.0)
+
+    # Return the second partial derivatives.
+    return dphi_ex_dkex, dkex2
@@ -65,7 +65,7 @@ More information on the LM63 model can be found in the:
 """
 
 # Python module imports.
-from numpy import isfinite, min, sum, tanh
+from numpy import isfinite, min, ndarray, ones, sum, tanh, where, zeros
 from numpy.ma import fix_invalid, masked_where
 
 
@@ -79,8 +79,8 @@ def r2eff_LM63(r20=None, phi_ex=None, kex=None, cpmg_frqs=None, back_calc=None):
     @type r20:              numpy float array of rank [NE][NS][NM][NO][ND]
     @keyword phi_ex:        The phi_ex parameter value (pA * pB * delta_omega^2).
     @type phi_ex:           numpy float array of rank [NE][NS][NM][NO][ND]
-    @keyword kex:           The kex parameter value (the exchange rate in rad/s).
-    @type kex:              float
+    @keyword kex:           The kex parameter value (the exchange rate in rad/s).  For a grid search, this and all other parameters can have an additional leading grid point axis of length NG.
+    @type kex:              float or numpy float array of rank [NG][1][1][1][1][1]
     @keyword cpmg_frqs:     The CPMG nu1 frequencies.
     @type cpmg_frqs:        numpy float array of rank [NE][NS][NM][NO][ND]
     @keyword back_calc:     The array for holding the back calculated R2eff values.  Each element corresponds to one of the CPMG nu1 frequencies.
@@ -90,8 +90,14 @@ def r2eff_LM63(r20=None, phi_ex=None, kex=None, cpmg_frqs=None, back_calc=None):
     # Flag to tell if values should be replaced if phi_ex is zero.
     t_phi_ex_zero = False
 
-    # Catch divide with zeros (to avoid pointless mathematical operations).
-    if kex == 0.0:
+    # The grid search mode, whereby all parameters have a leading grid point axis.
+    grid = isinstance(kex, ndarray)
+
+    # Catch divide with zeros (to avoid pointless mathematical operations).  For the grid search, the affected grid points are replaced at the end.
+    if grid:
+        mask_no_ex = (kex == 0.0).ravel()
+        kex = where(kex == 0.0, 1.0, kex)
+    elif kex == 0.0:
         back_calc[:] = r20
         return
 
@@ -113,8 +119,117 @@ def r2eff_LM63(r20=None, phi_ex=None, kex=None, cpmg_frqs=None, back_calc=None):
     if t_phi_ex_zero:
         back_calc[mask_phi_ex_zero.mask] = r20[mask_phi_ex_zero.mask]
 
+    # The grid points without exchange.
+    if grid:
+        back_calc[mask_no_ex] = r20[mask_no_ex]
+
     # Catch errors, taking a sum over array is the fastest way to check for
     # +/- inf (infinity) and nan (not a number).
     if not isfinite(sum(back_calc)):
         # Replaces nan, inf, etc. with fill value.
         fix_invalid(back_calc, copy=False, fill_value=1e100)
+
+
+def dr2eff_LM63(r20=None, phi_ex=None, kex=None, cpmg_frqs=None):
+    r"""Calculate the partial derivatives of the R2eff values for the LM63 model.
+
+    The partial derivatives are::
+
+        dR2eff      1       4.nu_cpmg
+        ------  =  ---  -  --------- . tanh(x) ,
+        dphi_ex    kex       kex^2
+
+        dR2eff               /    1      8.nu_cpmg              1 - tanh(x)^2 \ 
+        ------  =  phi_ex .  | - ----- + ---------- . tanh(x) - ------------- | ,
+         dkex                \   kex^2     kex^3                    kex^2     /
+
+    where x = kex / (4.nu_cpmg).  The no exchange case of kex = 0 has zero derivatives for the exchange parameters.
+
+
+    @keyword r20:           The R20 parameter value (R2 with no exchange).
+    @type r20:              numpy float array of rank [NE][NS][NM][NO][ND]
+    @keyword phi_ex:        The phi_ex parameter value (pA * pB * delta_omega^2).
+    @type phi_ex:           numpy float array of rank [NE][NS][NM][NO][ND]
+    @keyword kex:           The kex parameter value (the exchange rate in rad/s).
+    @type kex:              float
+    @keyword cpmg_frqs:     The CPMG nu1 frequencies.
+    @type cpmg_frqs:        numpy float array of rank [NE][NS][NM][NO][ND]
+    @return:                The partial derivatives of the R2eff values with respect to r20, phi_ex and kex.
+    @rtype:                 tuple of numpy float arrays of rank [NE][NS][NM][NO][ND]
+    """
+
+    # The R20 derivative.
+    dr20 = ones(r20.shape)
+
+    # No exchange.
+    if kex == 0.0:
+        return dr20, zeros(r20.shape), zeros(r20.shape)
+
+    # Repetitive calculations (to speed up calculations).
+    kex2 = kex**2
+    nu_4 = 4.0 * cpmg_frqs
+    tanh_x = tanh(kex / nu_4)
+
+    # The partial derivatives.
+    dphi_ex = 1.0/kex - nu_4 * tanh_x / kex2
+    dkex = phi_ex * (-1.0/kex2 + 2.0 * nu_4 * tanh_x / kex**3 - (1.0 - tanh_x**2) / kex2)
+
+    # Catch errors, replacing nan and inf values with zero.
+    for deriv in [dphi_ex, dkex]:
+        if not isfinite(sum(deriv)):
+            fix_invalid(deriv, copy=False, fill_value=0.0)
+
+    # Return the partial derivatives.
+    return dr20, dphi_ex, dkex
+
+
+def d2r2eff_LM63(r20=None, phi_ex=None, kex=None, cpmg_frqs=None):
+    r"""Calculate the non-zero second partial derivatives of the R2eff values for the LM63 model.
+
+    As R2eff is linear in R20 and phi_ex, the only non-zero second partial derivatives are::
+
+          d2R2eff         1      8.nu_cpmg              1 - tanh(x)^2
+        -----------  = - ----- + ---------- . tanh(x) - ------------- ,
+        dphi_ex.dkex     kex^2     kex^3                    kex^2
+
+        d2R2eff             /  2     4(1 - tanh(x)^2)   24.nu_cpmg             2.tanh(x).(1 - tanh(x)^2) \ 
+        -------  = phi_ex . | ----- + ---------------- - ---------- . tanh(x) + ------------------------- | ,
+        dkex^2              \ kex^3        kex^3           kex^4                    4.nu_cpmg.kex^2      /
+
+    where x = kex / (4.nu_cpmg).
+
+
+    @keyword r20:           The R20 parameter value (R2 with no exchange).
+    @type r20:              numpy float array of rank [NE][NS][NM][NO][ND]
+    @keyword phi_ex:        The phi_ex parameter value (pA * pB * delta_omega^2).
+    @type phi_ex:           numpy float array of rank [NE][NS][NM][NO][ND]
+    @keyword kex:           The kex parameter value (the exchange rate in rad/s).
+    @type kex:              float
+    @keyword cpmg_frqs:     The CPMG nu1 frequencies.
+    @type cpmg_frqs:        numpy float array of rank [NE][NS][NM][NO][ND]
+    @return:                The second partial derivatives of the R2eff values with respect to phi_ex and kex, and to kex twice.
+    @rtype:                 tuple of numpy float arrays of rank [NE][NS][NM][NO][ND]
+    """
+
+    # No exchange.
+    if kex == 0.0:
+        return zeros(r20.shape), zeros(r20.shape)
+
+    # Repetitive calculations (to speed up calculations).
+    kex2 = kex**2
+    kex3 = kex**3
+    nu_4 = 4.0 * cpmg_frqs
+    tanh_x = tanh(kex / nu_4)
+    sech_x2 = 1.0 - tanh_x**2
+
+    # The second partial derivatives.
+    dphi_ex_dkex = -1.0/kex2 + 2.0 * nu_4 * tanh_x / kex3 - sech_x2 / kex2
+    dkex2 = phi_ex * (2.0/kex3 + 4.0 * sech_x2 / kex3 - 6.0 * nu_4 * tanh_x / kex**4 + 2.0 * tanh_x * sech_x2 / (nu_4 * kex2))
+
+    # Catch errors, replacing nan and inf values with zero.
+    for deriv in [dphi_ex_dkex, dkex2]:
+        if not isfinite(sum(deriv)):
+            fix_invalid(deriv, copy=False, fill_value=0.0)
+
+    # Return the second partial derivatives.
+    return dphi_ex_dkex, dkex2
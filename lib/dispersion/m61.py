@@ -65,7 +65,7 @@ More information on the M61 model can be found in the:
 """
 
 # Python module imports.
-from numpy import any, isfinite, min, sum
+from numpy import any, isfinite, min, ones, sum
 from numpy.ma import fix_invalid, masked_where
 
 
@@ -130,3 +130,90 @@ def r1rho_M61(r1rho_prime=None, phi_ex=None, kex=None, spin_lock_fields2=None, b
     if not isfinite(sum(back_calc)):
         # Replaces nan, inf, etc. with fill value.
         fix_invalid(back_calc, copy=False, fill_value=1e100)
+
+
+def dr1rho_M61(r1rho_prime=None, phi_ex=None, kex=None, spin_lock_fields2=None):
+    r"""Calculate the partial derivatives of the R1rho values for the M61 model.
+
+    The partial derivatives are::
+
+        dR1rho          kex
+        -------  =  ---------------- ,
+        dphi_ex     kex^2 + omega_1^2
+
+        dR1rho                omega_1^2 - kex^2
+        ------  =  phi_ex . --------------------- .
+         dkex               (kex^2 + omega_1^2)^2
+
+
+    @keyword r1rho_prime:       The R1rho_prime parameter value (R1rho with no exchange).
+    @type r1rho_prime:          numpy float array of rank [NE][NS][NM][NO][ND]
+    @keyword phi_ex:            The phi_ex parameter value (pA * pB * delta_omega^2).
+    @type phi_ex:               numpy float array of rank [NE][NS][NM][NO][ND]
+    @keyword kex:               The kex parameter value (the exchange rate in rad/s).
+    @type kex:                  float
+    @keyword spin_lock_fields2: The R1rho spin-lock field strengths squared (in rad^2.s^-2).
+    @type spin_lock_fields2:    numpy float array of rank [NE][NS][NM][NO][ND]
+    @return:                    The partial derivatives of the R1rho values with respect to r1rho_prime, phi_ex and kex.
+    @rtype:                     tuple of numpy float arrays of rank [NE][NS][NM][NO][ND]
+    """
+
+    # Repetitive calculations (to speed up calculations).
+    kex2 = kex**2
+    denom = kex2 + spin_lock_fields2
+
+    # The partial derivatives.
+    dr1rho_prime = ones(r1rho_prime.shape)
+    dphi_ex = kex / denom
+    dkex = phi_ex * (spin_lock_fields2 - kex2) / denom**2
+
+    # Catch errors, replacing nan and inf values with zero.
+    for deriv in [dphi_ex, dkex]:
+        if not isfinite(sum(deriv)):
+            fix_invalid(deriv, copy=False, fill_value=0.0)
+
+    # Return the partial derivatives.
+    return dr1rho_prime, dphi_ex, dkex
+
+
+def d2r1rho_M61(r1rho_prime=None, phi_ex=None, kex=None, spin_lock_fields2=None):
+    r"""Calculate the non-zero second partial derivatives of the R1rho values for the M61 model.
+
+    As R1rho is linear in R1rho' and phi_ex, the only non-zero second partial derivatives are::
+
+          d2R1rho        omega_1^2 - kex^2
+        -----------  = --------------------- ,
+        dphi_ex.dkex   (kex^2 + omega_1^2)^2
+
+        d2R1rho                2.kex.(kex^2 - 3.omega_1^2)
+        -------  =  phi_ex . --------------------------- .
+        dkex^2                  (kex^2 + omega_1^2)^3
+
+
+    @keyword r1rho_prime:       The R1rho_prime parameter value (R1rho with no exchange).
+    @type r1rho_prime:          numpy float array of rank [NE][NS][NM][NO][ND]
+    @keyword phi_ex:            The phi_ex parameter value (pA * pB * delta_omega^2).
+    @type phi_ex:               numpy float array of rank [NE][NS][NM][NO][ND]
+    @keyword kex:               The kex parameter value (the exchange rate in rad/s).
+    @type kex:                  float
+    @keyword spin_lock_fields2: The R1rho spin-lock field strengths squared (in rad^2.s^-2).
+    @type spin_lock_fields2:    numpy float array of rank [NE][NS][NM][NO][ND]
+    @return:                    The second partial derivatives of the R1rho values with respect to phi_ex and kex, and to kex twice.
+    @rtype:                     tuple of numpy float arrays of rank [NE][NS][NM][NO][ND]
+    """
+
+    # Repetitive calculations (to speed up calculations).
+    kex2 = kex**2
+    denom = kex2 + spin_lock_fields2
+
+    # The second partial derivatives.
+    dphi_ex_dkex = (spin_lock_fields2 - kex2) / denom**2
+    dkex2 = phi_ex * 2.0 * kex * (kex2 - 3.0*spin_lock_fields2) / denom**3
+
+    # Catch errors, replacing nan and inf values with zero.
+    for deriv in [dphi_ex_dkex, dkex2]:
+        if not isfinite(sum(deriv)):
+            fix_invalid(deriv, copy=False, fill_value=0.0)
+
+    # Return the second partial derivatives.
+    return dphi_ex_dkex, dkex2
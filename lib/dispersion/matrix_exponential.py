@@ -21,12 +21,15 @@
 ###############################################################################
 
 # Module docstring.
-"""Module for the calculation of the matrix exponential, for higher dimensional data."""
+"""Module for the calculation of the matrix exponential, for higher dimensional data.
+
+The matrix_exponential() function operates on the whole batch of matrices at once.  It uses the closed form solution for the 2x2 matrices of the 2-site models, the scaling and squaring Pade approximant for the 3x3 matrices of the 3-site models, and the eigenvalue decomposition for all larger matrices.
+"""
 
 # Python module imports.
-from numpy import array, any, complex128, dot, einsum, eye, exp, iscomplex, int16, newaxis, multiply, tile, sqrt, version, zeros
+from numpy import abs, array, any, ceil, complex128, dot, einsum, empty, errstate, eye, exp, iscomplex, int16, log2, maximum, newaxis, multiply, sinh, tile, sqrt, version, where, zeros
 from numpy.lib.stride_tricks import as_strided
-from numpy.linalg import eig, inv
+from numpy.linalg import eig, inv, solve
 
 
 def create_index(NE=None, NS=None, NM=None, NO=None, ND=None):
@@ -166,6 +169,100 @@ def data_view_via_striding_array_row_col(data_array=None):
 
 
 def matrix_exponential(A, dtype=None):
+    """Calculate the exact matrix exponential for higher dimensional data.  This of dimension [NE][NS][NM][NO][ND][X][X] or [NS][NM][NO][ND][X][X].
+
+    Here X is the Row and Column length, of the outer square matrix.  All matrices are handled in one vectorised operation.  For X = 2, the closed form solution of matrix_exponential_2x2() is used, and for X = 3 the scaling and squaring Pade approximant of matrix_exponential_pade().  Larger matrices, or numpy < 1.8, fall back to the eigenvalue decomposition of matrix_exponential_eig().
+
+    @param A:               The square matrix to calculate the matrix exponential of.
+    @type A:                numpy float array of rank [NE][NS][NM][NO][ND][X][X]
+    @param dtype:           If provided, forces the calculation to use the data type specified.
+    @type dtype:            data-type, optional
+    @return:                The matrix exponential.  This will have the same dimensionality as the A matrix.
+    @rtype:                 numpy float array of rank [NE][NS][NM][NO][ND][X][X]
+    """
+
+    # Fall back to the eigenvalue decomposition for larger matrices, or if numpy does not support stacked linear algebra.
+    Row = A.shape[-1]
+    if Row > 3 or not stacked_linalg():
+        return matrix_exponential_eig(A, dtype=dtype)
+
+    # Convert dtype, if specified.
+    if dtype != None and A.dtype != dtype:
+        A = A.astype(dtype)
+
+    # Is the original matrix real?
+    complex_flag = any(iscomplex(A))
+
+    # The specialised exponentials.
+    if Row == 2:
+        eA = matrix_exponential_2x2(A)
+    else:
+        eA = matrix_exponential_pade(A)
+
+    # Return the complex matrix.
+    if complex_flag:
+        return eA
+
+    # Return only the real part.
+    else:
+        return array(eA.real)
+
+
+def matrix_exponential_2x2(A):
+    """Calculate the exact matrix exponential of all 2x2 matrices at once using the closed form solution.
+
+    The matrix is written as A = s*I + Q, where s is half of the trace and Q is traceless so that Q**2 = delta**2 * I.  The eigenvalues of A are s +/- delta, and
+
+        exp(A) = exp(s) * (cosh(delta)*I + sinh(delta)/delta * Q).
+
+    The hyperbolic terms are calculated from the exponentials of the eigenvalues to avoid overflows, and a Taylor series is used for sinh(delta)/delta for the degenerate case of delta close to zero.
+
+
+    @param A:   The square matrices to calculate the matrix exponential of.
+    @type A:    numpy float or complex array of rank [...][2][2]
+    @return:    The matrix exponential.  This will always be complex.
+    @rtype:     numpy complex array of rank [...][2][2]
+    """
+
+    # The matrix elements.
+    a = A[..., 0, 0]
+    b = A[..., 0, 1]
+    c = A[..., 1, 0]
+    d = A[..., 1, 1]
+
+    # The half trace s, the diagonal of Q, and the eigenvalue half separation delta.
+    s = (a + d) / 2.0
+    q = (a - d) / 2.0
+    delta = sqrt(q**2 + b*c + 0.0j)
+
+    # The two ranges for delta (the unused branches of the where() calls can overflow or divide by zero).
+    with errstate(over='ignore', divide='ignore', invalid='ignore'):
+        # The exponentials of the two eigenvalues.
+        exp_pos = exp(s + delta)
+        exp_neg = exp(s - delta)
+
+        # exp(s) * cosh(delta).
+        cosh_part = (exp_pos + exp_neg) / 2.0
+
+        # exp(s) * sinh(delta) / delta, avoiding the cancellation in the exponential difference for small delta.
+        small = abs(delta) < 1e-3
+        moderate = abs(delta.real) < 300.0
+        delta2 = delta**2
+        sinh_part = where(moderate, exp(s) * sinh(delta) / where(small, 1.0, delta), (exp_pos - exp_neg) / (2.0 * delta))
+        sinh_part = where(small, exp(s) * (1.0 + delta2/6.0 + delta2**2/120.0), sinh_part)
+
+    # Assemble the exponential.
+    eA = empty(A.shape, cosh_part.dtype)
+    eA[..., 0, 0] = cosh_part + sinh_part * q
+    eA[..., 0, 1] = sinh_part * b
+    eA[..., 1, 0] = sinh_part * c
+    eA[..., 1, 1] = cosh_part - sinh_part * q
+
+    # Return the exponential.
+    return eA
+
+
+def matrix_exponential_eig(A, dtype=None):
     """Calculate the exact matrix exponential using the eigenvalue decomposition approach, for higher dimensional data.  This of dimension [NE][NS][NM][NO][ND][X][X] or [NS][NM][NO][ND][X][X].
 
     Here X is the Row and Column length, of the outer square matrix.
@@ -203,7 +300,7 @@ def matrix_exponential(A, dtype=None):
     complex_flag = any(iscomplex(A))
 
     # If numpy is under 1.8, there would be a need to do eig(A) per matrix.
-    if float(version.version[:3]) < 1.8:
+    if not stacked_linalg():
         # Make array to store results
         if NE != None:
             if dtype != None:
@@ -309,6 +406,57 @@ def matrix_exponential(A, dtype=None):
         return array(eA.real)
 
 
+def matrix_exponential_pade(A):
+    """Calculate the matrix exponential of all small matrices at once using the scaling and squaring Pade approximant.
+
+    Each matrix is scaled by 2^-j, with j chosen so that the 1-norm of the scaled matrix is below 0.5.  The [6/6] Pade approximant, which is accurate to double precision in this range, is then squared j times.  The squaring is performed for the whole batch, with the matrices requiring fewer squarings left unchanged.
+
+
+    @param A:   The square matrices to calculate the matrix exponential of.
+    @type A:    numpy float or complex array of rank [...][X][X]
+    @return:    The matrix exponential.
+    @rtype:     numpy float or complex array of rank [...][X][X]
+    """
+
+    # The Pade approximant order and the identity matrix.
+    order = 6
+    ident = eye(A.shape[-1])
+
+    # The number of squarings required for each matrix, from the 1-norm.
+    norm = abs(A).sum(axis=-2).max(axis=-1)
+    with errstate(divide='ignore'):
+        squarings = maximum(ceil(log2(norm / 0.5)), 0.0).astype(int)
+
+    # Scale the matrices.
+    A_scaled = A / (2.0**squarings)[..., newaxis, newaxis]
+
+    # The numerator and denominator of the Pade approximant.
+    coeff = 1.0
+    power = A_scaled
+    numer = ident + 0.0 * A_scaled
+    denom = ident + 0.0 * A_scaled
+    for k in range(1, order+1):
+        # The next coefficient and matrix power.
+        coeff = coeff * (order - k + 1) / (k * (2.0*order - k + 1))
+        if k > 1:
+            power = einsum('...ij, ...jk', A_scaled, power)
+
+        # Sum the terms.
+        numer = numer + coeff * power
+        denom = denom + (-1)**k * coeff * power
+
+    # The approximant.
+    eA = solve(denom, numer)
+
+    # Undo the scaling by repeated squaring.
+    if squarings.size:
+        for k in range(squarings.max()):
+            eA = where((squarings > k)[..., newaxis, newaxis], einsum('...ij, ...jk', eA, eA), eA)
+
+    # Return the exponential.
+    return eA
+
+
 def matrix_exponential_rank_NS_NM_NO_ND_2_2(A, dtype=None):
     """Calculate the exact matrix exponential using the closed form in terms of the matrix elements., for higher dimensional data.  This is of dimension [NS][NM][NO][ND][2][2].
 
@@ -404,3 +552,14 @@ def matrix_exponential_rank_NS_NM_NO_ND_2_2(A, dtype=None):
         eA_mat[si, mi, oi, di, :] = eA_m
 
     return eA_mat
+
+
+def stacked_linalg():
+    """Determine if the numpy version supports the linear algebra functions operating on stacks of matrices (numpy >= 1.8).
+
+    @return:    True if the stacked linear algebra is supported.
+    @rtype:     bool
+    """
+
+    # Compare the major and minor version numbers.
+    return tuple([int(x) for x in version.version.split('.')[:2]]) >= (1, 8)
@@ -24,7 +24,7 @@
 
 # Python module imports.
 from numpy.lib.stride_tricks import as_strided
-from numpy import float64, int16, zeros
+from numpy import any, einsum, eye, float64, int16, int64, newaxis, where, zeros
 from numpy.linalg import matrix_power
 
 
@@ -47,6 +47,44 @@ def create_index(data):
     return index
 
 
+def matrix_power_rank_NE_NS_NM_NO_ND_x_x(data, power):
+    """Calculate the exact matrix power of all matrices of the higher dimensional data at once.  This of dimension [NE][NS][NM][NO][ND][X][X].
+
+    Here X is the Row and Column length, of the outer square matrix.  Binary exponentiation is used for the whole batch, so the number of matrix multiplications is proportional to the logarithm of the largest power rather than to the number of matrices.
+
+
+    @param data:        The square matrix to calculate the matrix power of.
+    @type data:         numpy float or complex array of rank [NE][NS][NM][NO][ND][X][X]
+    @keyword power:     The matrix power array, which hold the non-negative power integer to which to raise the outer matrix X,X to.
+    @type power:        numpy int array of rank [NE][NS][NM][NO][ND]
+    @return:            The matrix power.  This will have the same dimensionality and data type as the data matrix.
+    @rtype:             numpy float or complex array of rank [NE][NS][NM][NO][ND][X][X]
+    """
+
+    # Initialise the results to the identity matrices.
+    calc = zeros(data.shape, data.dtype)
+    calc[:] = eye(data.shape[-1])
+
+    # The remaining powers.
+    bits = power.astype(int64)
+
+    # Loop over the bits of the powers, multiplying by the repeatedly squared matrices.
+    square = data
+    while any(bits > 0):
+        # Multiply the matrices with the current bit set.
+        odd = (bits % 2) == 1
+        if any(odd):
+            calc = where(odd[..., newaxis, newaxis], einsum('...ij, ...jk', calc, square), calc)
+
+        # The next bit.
+        bits = bits // 2
+        if any(bits > 0):
+            square = einsum('...ij, ...jk', square, square)
+
+    # Return the powers.
+    return calc
+
+
 def matrix_power_strided_rank_NE_NS_NM_NO_ND_x_x(data, power):
     """Calculate the exact matrix power by striding through higher dimensional data.  This of dimension [NE][NS][NM][NO][ND][X][X].
 
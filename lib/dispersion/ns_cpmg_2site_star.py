@@ -57,13 +57,12 @@ More information on the NS CPMG 2-site star full model can be found in the:
 """
 
 # Python module imports.
-from numpy import add, array, conj, dot, einsum, fabs, float64, isfinite, log, min, multiply, sum
+from numpy import add, arange, array, conj, einsum, fabs, float64, isfinite, isnan, log, min, multiply, newaxis, sum
 from numpy.ma import fix_invalid, masked_where
-from numpy.linalg import matrix_power
 
 # relax module imports.
-from lib.float import isNaN
 from lib.dispersion.matrix_exponential import matrix_exponential
+from lib.dispersion.matrix_power import matrix_power_rank_NE_NS_NM_NO_ND_x_x
 
 # Repetitive calculations (to speed up calculations).
 m_r20a = array([
@@ -231,33 +230,23 @@ def r2eff_ns_cpmg_2site_star(M0=None, r20a=None, r20b=None, pA=None, dw=None, dw
     prop_2_mat = evolution_matrix_mat = einsum('...ij, ...jk', eR_mat, ecR2_mat)
     prop_2_mat = evolution_matrix_mat = einsum('...ij, ...jk', prop_2_mat, eR_mat)
 
-    # Loop over the spins
-    for si in range(NS):
-        # Loop over the spectrometer frequencies.
-        for mi in range(NM):
-            # Extract the values from the higher dimensional arrays.
-            num_points_si_mi = int(num_points[0, si, mi, 0])
-
-            # Loop over the time points, back calculating the R2eff values.
-            for di in range(num_points_si_mi):
-                # Extract the values from the higher dimensional arrays.
-                power_si_mi_di = int(power[0, si, mi, 0, di])
-
-                # This is the propagator for an element of [delay tcp; 180 deg pulse; 2 times delay tcp; 180 deg pulse; delay tau], i.e. for 2 times tau-180-tau.
-                prop_2_i = prop_2_mat[0, si, mi, 0, di]
-
-                # Now create the total propagator that will evolve the magnetization under the CPMG train, i.e. it applies the above tau-180-tau-tau-180-tau so many times as required for the CPMG frequency under consideration.
-                prop_total = matrix_power(prop_2_i, power_si_mi_di)
-
-                # Now we apply the above propagator to the initial magnetization vector - resulting in the magnetization that remains after the full CPMG pulse train.  It is called M of t (t is the time after the CPMG train).
-                Moft = dot(prop_total, M0)
-
-                # The next lines calculate the R2eff using a two-point approximation, i.e. assuming that the decay is mono-exponential.
-                Mx = Moft[0].real / M0[0]
-                if Mx <= 0.0 or isNaN(Mx):
-                    back_calc[0, si, mi, 0, di] = 1e99
-                else:
-                    back_calc[0, si, mi, 0, di]= -inv_tcpmg[0, si, mi, 0, di] * log(Mx)
+    # Now create the total propagators that will evolve the magnetization under the CPMG train, i.e. it applies the above tau-180-tau-tau-180-tau so many times as required for each CPMG frequency, for all dispersion points at once.
+    prop_total_mat = matrix_power_rank_NE_NS_NM_NO_ND_x_x(prop_2_mat, power)
+
+    # Now we apply the above propagators to the initial magnetization vector - resulting in the magnetization that remains after the full CPMG pulse train.  It is called M of t (t is the time after the CPMG train).
+    Moft_mat = einsum('...ij, j', prop_total_mat, M0)
+
+    # The next lines calculate the R2eff using a two-point approximation, i.e. assuming that the decay is mono-exponential.
+    Mx = Moft_mat[..., 0].real / M0[0]
+
+    # The dispersion points to calculate, and those with an invalid magnetization.
+    mask_points = arange(ND) < num_points[..., newaxis]
+    mask_invalid = mask_points & ((Mx <= 0.0) | isnan(Mx))
+    mask_valid = mask_points & ~mask_invalid
+
+    # The R2eff values.
+    back_calc[mask_valid] = -inv_tcpmg[mask_valid] * log(Mx[mask_valid])
+    back_calc[mask_invalid] = 1e99
 
     # Replace data in array.
     # If dw is zero.
@@ -51,12 +51,13 @@ More information on the NS MMQ 2-site model can be found in the:
 
 # Python module imports.
 from math import floor
-from numpy import array, conj, complex128, dot, einsum, float64, log, multiply
+from numpy import arange, array, conj, complex128, dot, einsum, float64, isnan, log, multiply, newaxis
 from numpy.linalg import matrix_power
 
 # relax module imports.
 from lib.float import isNaN
 from lib.dispersion.matrix_exponential import matrix_exponential
+from lib.dispersion.matrix_power import matrix_power_rank_NE_NS_NM_NO_ND_x_x
 
 # Repetitive calculations (to speed up calculations).
 m_r20a = array([
@@ -343,9 +344,6 @@ def r2eff_ns_mmq_2site_sq_dq_zq(M0=None, F_vector=array([1, 0], float64), R20A=N
     M0[0] = pA
     M0[1] = pB
 
-    # Extract shape of experiment.
-    NS, NM, NO = num_points.shape
-
     # Populate the m1 and m2 matrices (only once per function call for speed).
     m1_mat = rmmq_2site_rankN(R20A=R20A, R20B=R20B, dw=dw, k_AB=k_AB, k_BA=k_BA, tcp=tcp)
     m2_mat = rmmq_2site_rankN(R20A=R20A, R20B=R20B, dw=-dw, k_AB=k_AB, k_BA=k_BA, tcp=tcp)
@@ -359,28 +357,17 @@ def r2eff_ns_mmq_2site_sq_dq_zq(M0=None, F_vector=array([1, 0], float64), R20A=N
     evol_block_mat = einsum('...ij, ...jk', A_neg_mat, evol_block_mat)
     evol_block_mat = einsum('...ij, ...jk', A_pos_mat, evol_block_mat)
 
-    # Loop over spins.
-    for si in range(NS):
-        # Loop over the spectrometer frequencies.
-        for mi in range(NM):
-            # Loop over offsets:
-            for oi in range(NO):
-                # Extract number of points.
-                num_points_i = num_points[si, mi, oi]
+    # The full evolution, for all dispersion points at once.
+    evol_mat = matrix_power_rank_NE_NS_NM_NO_ND_x_x(evol_block_mat, power)
 
-                # Loop over the time points, back calculating the R2eff values.
-                for i in range(num_points_i):
-                    # Extract data from array.
-                    power_i = int(power[si, mi, oi, i])
-                    evol_block_i = evol_block_mat[si, mi, oi, i]
+    # The next lines calculate the R2eff using a two-point approximation, i.e. assuming that the decay is mono-exponential.
+    Mx = einsum('i, ...ij, j', F_vector, evol_mat, M0).real
 
-                    # The full evolution.
-                    evol = matrix_power(evol_block_i, power_i)
+    # The dispersion points to calculate, and those with an invalid magnetization.
+    mask_points = arange(back_calc.shape[-1]) < num_points[..., newaxis]
+    mask_invalid = mask_points & ((Mx <= 0.0) | isnan(Mx))
+    mask_valid = mask_points & ~mask_invalid
 
-                    # The next lines calculate the R2eff using a two-point approximation, i.e. assuming that the decay is mono-exponential.
-                    Mx = dot(F_vector, dot(evol, M0))
-                    Mx = Mx.real
-                    if Mx <= 0.0 or isNaN(Mx):
-                        back_calc[si, mi, oi, i] = 1e99
-                    else:
-                        back_calc[si, mi, oi, i] = -inv_tcpmg[si, mi, oi, i] * log(Mx / pA)
+    # The R2eff values.
+    back_calc[mask_valid] = -inv_tcpmg[mask_valid] * log(Mx[mask_valid] / pA)
+    back_calc[mask_invalid] = 1e99
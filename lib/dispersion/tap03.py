@@ -184,3 +184,115 @@ def r1rho_TAP03(r1rho_prime=None, omega=None, offset=None, pA=None, dw=None, kex
     if not isfinite(sum(back_calc)):
         # Replaces nan, inf, etc. with fill value.
         fix_invalid(back_calc, copy=False, fill_value=1e100)
+
+
+def dr1rho_TAP03(r1rho_prime=None, omega=None, offset=None, pA=None, dw=None, kex=None, R1=0.0, spin_lock_fields=None, spin_lock_fields2=None):
+    r"""Calculate the partial derivatives of the R1rho values for the TAP03 model.
+
+    The R1rho equation is::
+
+        R1rho = R1.cos^2(theta) + R1rho'.sin^2(theta) + sin^2(hat_theta).Rex ,
+
+    where Rex = phi_ex.kex / (gamma.denom).  The R1 and R1rho' derivatives are cos^2(theta) and sin^2(theta), and the dw, pA and kex derivatives are propagated through phi_ex, sigma, gamma, the effective fields, sin^2(theta), sin^2(hat_theta) and the denominator.  The points replaced by the R1rho function by 1e100 for a negative gamma have zero derivatives.
+
+
+    @keyword r1rho_prime:       The R1rho_prime parameter value (R1rho with no exchange).
+    @type r1rho_prime:          numpy float array of rank [NE][NS][NM][NO][ND]
+    @keyword omega:             The chemical shift for the spin in rad/s.
+    @type omega:                numpy float array of rank [NE][NS][NM][NO][ND]
+    @keyword offset:            The spin-lock offsets for the data.
+    @type offset:               numpy float array of rank [NE][NS][NM][NO][ND]
+    @keyword pA:                The population of state A.
+    @type pA:                   float
+    @keyword dw:                The chemical exchange difference between states A and B in rad/s.
+    @type dw:                   numpy float array of rank [NE][NS][NM][NO][ND]
+    @keyword kex:               The kex parameter value (the exchange rate in rad/s).
+    @type kex:                  float
+    @keyword R1:                The R1 relaxation rate.
+    @type R1:                   numpy float array of rank [NE][NS][NM][NO][ND]
+    @keyword spin_lock_fields:  The R1rho spin-lock field strengths (in rad.s^-1).
+    @type spin_lock_fields:     numpy float array of rank [NE][NS][NM][NO][ND]
+    @keyword spin_lock_fields2: The R1rho spin-lock field strengths squared (in rad^2.s^-2).  This is for speed.
+    @type spin_lock_fields2:    numpy float array of rank [NE][NS][NM][NO][ND]
+    @return:                    The partial derivatives of the R1rho values with respect to R1, r1rho_prime, dw, pA and kex.
+    @rtype:                     tuple of numpy float arrays of rank [NE][NS][NM][NO][ND]
+    """
+
+    # Parameter conversions.
+    pB = 1.0 - pA
+    kex2 = kex**2
+
+    # The offsets of the spin-lock from A, B and the population average.
+    da = omega - offset
+    db = da + dw
+    d = da + pB*dw
+
+    # The gamma factor.
+    phi_ex = pA * pB * dw**2
+    sigma = pB*da + pA*db
+    sigma2 = sigma**2
+    gamma_numer = sigma2 - kex2 + spin_lock_fields2
+    gamma_denom = sigma2 + kex2 + spin_lock_fields2
+    gamma = 1.0 + phi_ex * gamma_numer / gamma_denom**2
+    mask_gamma_neg = gamma < 0.0
+    gamma[mask_gamma_neg] = 0.0
+
+    # The effective fields.
+    waeff2 = gamma*spin_lock_fields2 + da**2
+    wbeff2 = gamma*spin_lock_fields2 + db**2
+    weff2 = gamma*spin_lock_fields2 + d**2
+
+    # The rotating frame flip angles.
+    sin_theta2 = sin(arctan2(spin_lock_fields, d))**2
+    hat_sin_theta2 = sin(arctan2(sqrt(gamma)*spin_lock_fields, d))**2
+
+    # The exchange contribution.
+    numer = phi_ex * kex
+    denom = waeff2*wbeff2/weff2 + kex2 - 2.0*hat_sin_theta2*phi_ex + (1.0 - gamma)*spin_lock_fields2
+    rex = hat_sin_theta2 * numer / denom / gamma
+
+    # The derivatives of d, db, phi_ex, sigma and kex with respect to dw, pA and kex.
+    dd = [pB, -dw, 0.0]
+    ddb = [1.0, 0.0, 0.0]
+    dphi_ex = [2.0 * pA * pB * dw, (pB - pA) * dw**2, 0.0]
+    dsigma = [pA, dw, 0.0]
+    dkex = [0.0, 0.0, 1.0]
+
+    # The partial derivatives.
+    derivs = [1.0 - sin_theta2, sin_theta2]
+    for i in range(3):
+        # The gamma derivative.
+        dgamma_numer = 2.0 * (sigma * dsigma[i] - kex * dkex[i])
+        dgamma_denom = 2.0 * (sigma * dsigma[i] + kex * dkex[i])
+        dgamma = (dphi_ex[i] * gamma_numer + phi_ex * dgamma_numer - 2.0 * phi_ex * gamma_numer * dgamma_denom / gamma_denom) / gamma_denom**2
+
+        # The effective field derivatives.
+        dwaeff2 = dgamma * spin_lock_fields2
+        dwbeff2 = dgamma * spin_lock_fields2 + 2.0 * db * ddb[i]
+        dweff2 = dgamma * spin_lock_fields2 + 2.0 * d * dd[i]
+
+        # The flip angle derivatives (sin^2(theta) = omega_1^2 / (omega_1^2 + d^2) and sin^2(hat_theta) = gamma.omega_1^2 / weff^2).
+        dsin_theta2 = -2.0 * sin_theta2 * d * dd[i] / (spin_lock_fields2 + d**2)
+        dhat_sin_theta2 = (dgamma * spin_lock_fields2 - hat_sin_theta2 * dweff2) / weff2
+
+        # The denominator derivative.
+        ddenom = (dwaeff2 * wbeff2 + waeff2 * dwbeff2 - waeff2 * wbeff2 * dweff2 / weff2) / weff2 + 2.0 * kex * dkex[i] - 2.0 * (dhat_sin_theta2 * phi_ex + hat_sin_theta2 * dphi_ex[i]) - dgamma * spin_lock_fields2
+
+        # The exchange contribution derivative.
+        drex = (dhat_sin_theta2 * numer + hat_sin_theta2 * (dphi_ex[i] * kex + phi_ex * dkex[i])) / denom / gamma - rex * (ddenom / denom + dgamma / gamma)
+
+        # The R1rho derivative.
+        deriv = (r1rho_prime - R1) * dsin_theta2 + drex
+
+        # The invalid points.
+        deriv[mask_gamma_neg] = 0.0
+
+        # Catch errors, replacing nan and inf values with zero.
+        if not isfinite(sum(deriv)):
+            fix_invalid(deriv, copy=False, fill_value=0.0)
+
+        # Store.
+        derivs.append(deriv)
+
+    # Return the partial derivatives.
+    return tuple(derivs)
@@ -165,3 +165,84 @@ def r1rho_TP02(r1rho_prime=None, omega=None, offset=None, pA=None, dw=None, kex=
     if not isfinite(sum(back_calc)):
         # Replaces nan, inf, etc. with fill value.
         fix_invalid(back_calc, copy=False, fill_value=1e100)
+
+
+def dr1rho_TP02(r1rho_prime=None, omega=None, offset=None, pA=None, dw=None, kex=None, R1=0.0, spin_lock_fields=None, spin_lock_fields2=None):
+    r"""Calculate the partial derivatives of the R1rho values for the TP02 model.
+
+    With sin^2(theta) = omega_1^2 / weff^2 and Rex = pA.pB.delta_omega^2.kex / (waeff^2.wbeff^2/weff^2 + kex^2), the R1rho equation is::
+
+        R1rho = R1.cos^2(theta) + R1rho'.sin^2(theta) + sin^2(theta).Rex .
+
+    The R1 and R1rho' derivatives are cos^2(theta) and sin^2(theta), and the dw, pA and kex derivatives are propagated through weff^2, wbeff^2, the Rex numerator and denominator, and sin^2(theta).
+
+
+    @keyword r1rho_prime:       The R1rho_prime parameter value (R1rho with no exchange).
+    @type r1rho_prime:          numpy float array of rank [NE][NS][NM][NO][ND]
+    @keyword omega:             The chemical shift for the spin in rad/s.
+    @type omega:                numpy float array of rank [NE][NS][NM][NO][ND]
+    @keyword offset:            The spin-lock offsets for the data.
+    @type offset:               numpy float array of rank [NE][NS][NM][NO][ND]
+    @keyword pA:                The population of state A.
+    @type pA:                   float
+    @keyword dw:                The chemical exchange difference between states A and B in rad/s.
+    @type dw:                   numpy float array of rank [NE][NS][NM][NO][ND]
+    @keyword kex:               The kex parameter value (the exchange rate in rad/s).
+    @type kex:                  float
+    @keyword R1:                The R1 relaxation rate.
+    @type R1:                   numpy float array of rank [NE][NS][NM][NO][ND]
+    @keyword spin_lock_fields:  The R1rho spin-lock field strengths (in rad.s^-1).
+    @type spin_lock_fields:     numpy float array of rank [NE][NS][NM][NO][ND]
+    @keyword spin_lock_fields2: The R1rho spin-lock field strengths squared (in rad^2.s^-2).  This is for speed.
+    @type spin_lock_fields2:    numpy float array of rank [NE][NS][NM][NO][ND]
+    @return:                    The partial derivatives of the R1rho values with respect to R1, r1rho_prime, dw, pA and kex.
+    @rtype:                     tuple of numpy float arrays of rank [NE][NS][NM][NO][ND]
+    """
+
+    # Parameter conversions.
+    pB = 1.0 - pA
+
+    # The offsets of the spin-lock from A, B and the population average.
+    da = omega - offset
+    db = da + dw
+    d = da + pB*dw
+
+    # The effective fields.
+    waeff2 = spin_lock_fields2 + da**2
+    wbeff2 = spin_lock_fields2 + db**2
+    weff2 = spin_lock_fields2 + d**2
+
+    # The exchange contribution.
+    sin_theta2 = sin(arctan2(spin_lock_fields, d))**2
+    numer = pA * pB * dw**2 * kex
+    denom = waeff2 * wbeff2 / weff2 + kex**2
+
+    # The derivatives of d, db, the numerator and kex with respect to dw, pA and kex.
+    dd = [pB, -dw, 0.0]
+    ddb = [1.0, 0.0, 0.0]
+    dnumer = [2.0 * pA * pB * dw * kex, (pB - pA) * dw**2 * kex, pA * pB * dw**2]
+    dkex = [0.0, 0.0, 1.0]
+
+    # The partial derivatives.
+    derivs = [1.0 - sin_theta2, sin_theta2]
+    for i in range(3):
+        # The effective field and sin^2(theta) derivatives.
+        dweff2 = 2.0 * d * dd[i]
+        dwbeff2 = 2.0 * db * ddb[i]
+        dsin_theta2 = -sin_theta2 * dweff2 / weff2
+
+        # The denominator derivative.
+        ddenom = waeff2 * (dwbeff2 - wbeff2 * dweff2 / weff2) / weff2 + 2.0 * kex * dkex[i]
+
+        # The R1rho derivative.
+        deriv = (r1rho_prime - R1 + numer / denom) * dsin_theta2 + sin_theta2 * (dnumer[i] - numer * ddenom / denom) / denom
+
+        # Catch errors, replacing nan and inf values with zero.
+        if not isfinite(sum(deriv)):
+            fix_invalid(deriv, copy=False, fill_value=0.0)
+
+        # Store.
+        derivs.append(deriv)
+
+    # Return the partial derivatives.
+    return tuple(derivs)
@@ -67,7 +67,7 @@ More information on the TSMFK01 model can be found in the:
 """
 
 # Python module imports.
-from numpy import fabs, min, sin, isfinite, sum
+from numpy import cos, fabs, min, ndarray, ones, sin, isfinite, sum, where, zeros
 from numpy.ma import fix_invalid, masked_where
 
 
@@ -83,8 +83,8 @@ def r2eff_TSMFK01(r20a=None, dw=None, dw_orig=None, k_AB=None, tcp=None, back_ca
     @type dw:               numpy float array of rank [NE][NS][NM][NO][ND]
     @keyword dw_orig:       The chemical exchange difference between states A and B in ppm. This is only for faster checking of zero value, which result in no exchange.
     @type dw_orig:          numpy float array of rank-1
-    @keyword k_AB:          The k_AB parameter value (the forward exchange rate in rad/s).
-    @type k_AB:             float
+    @keyword k_AB:          The k_AB parameter value (the forward exchange rate in rad/s).  For a grid search, this and all other parameters can have an additional leading grid point axis of length NG.
+    @type k_AB:             float or numpy float array of rank [NG][1][1][1][1][1]
     @keyword tcp:           The tau_CPMG times (1 / 4.nu1).
     @type tcp:              numpy float array of rank [NE][NS][NM][NO][ND]
     @keyword back_calc:     The array for holding the back calculated R2eff values.  Each element corresponds to one of the CPMG nu1 frequencies.
@@ -95,8 +95,11 @@ def r2eff_TSMFK01(r20a=None, dw=None, dw_orig=None, k_AB=None, tcp=None, back_ca
     t_dw_zero = False
 
     # Catch parameter values that will result in no exchange, returning flat R2eff = R20 lines (when kex = 0.0, k_AB = 0.0).
-    # Test if k_AB is zero.
-    if k_AB == 0.0:
+    # Test if k_AB is zero.  For the grid search, the affected grid points are replaced at the end.
+    grid = isinstance(k_AB, ndarray)
+    if grid:
+        mask_no_ex = (k_AB == 0.0).ravel()
+    elif k_AB == 0.0:
         back_calc[:] = r20a
         return
 
@@ -113,7 +116,15 @@ def r2eff_TSMFK01(r20a=None, dw=None, dw_orig=None, k_AB=None, tcp=None, back_ca
 
     # Catch zeros (to avoid pointless mathematical operations).
     # This will result in no exchange, returning flat lines.
-    if min(fabs(numer)) == 0.0:
+    if grid:
+        # Calculate R2eff, avoiding the division by zero for the grid points to be replaced.
+        mask_numer = (numer == 0.0).reshape(len(numer), -1).any(axis=1)
+        denom[mask_numer] = 1.0
+        back_calc[:] = r20a + k_AB - k_AB * numer / denom
+
+        # Calculate R2eff for forward.
+        back_calc[mask_numer] = (r20a + k_AB)[mask_numer]
+    elif min(fabs(numer)) == 0.0:
         # Calculate R2eff for forward.
         back_calc[:] = r20a + k_AB
     else:
@@ -125,8 +136,116 @@ def r2eff_TSMFK01(r20a=None, dw=None, dw_orig=None, k_AB=None, tcp=None, back_ca
     if t_dw_zero:
         back_calc[mask_dw_zero.mask] = r20a[mask_dw_zero.mask]
 
+    # The grid points without exchange.
+    if grid:
+        back_calc[mask_no_ex] = r20a[mask_no_ex]
+
     # Catch errors, taking a sum over array is the fastest way to check for
     # +/- inf (infinity) and nan (not a number).
     if not isfinite(sum(back_calc)):
         # Replaces nan, inf, etc. with fill value.
         fix_invalid(back_calc, copy=False, fill_value=1e100)
+
+
+def dr2eff_TSMFK01(r20a=None, dw=None, k_AB=None, tcp=None):
+    r"""Calculate the partial derivatives of the R2eff values for the TSMFK01 model.
+
+    The partial derivatives are::
+
+        dR2eff         sin(x)
+        ------  =  1 - ------ ,
+        dk_AB            x
+
+        dR2eff                         x.cos(x) - sin(x)
+        ------  =  - k_AB . tau_CP . ----------------- ,
+         ddw                                x^2
+
+    where x = delta_omega * tau_CP.  As in the R2eff function, a zero value of sin(x) for any point (including the no exchange case of x = 0) gives the derivatives of the flat R2eff = R20A + k_AB line for all points.
+
+
+    @keyword r20a:          The R20 parameter value of state A (R2 with no exchange).
+    @type r20a:             numpy float array of rank [NE][NS][NM][NO][ND]
+    @keyword dw:            The chemical exchange difference between states A and B in rad/s.
+    @type dw:               numpy float array of rank [NE][NS][NM][NO][ND]
+    @keyword k_AB:          The k_AB parameter value (the forward exchange rate in rad/s).
+    @type k_AB:             float
+    @keyword tcp:           The tau_CPMG times (1 / 4.nu1).
+    @type tcp:              numpy float array of rank [NE][NS][NM][NO][ND]
+    @return:                The partial derivatives of the R2eff values with respect to r20a, dw and k_AB.
+    @rtype:                 tuple of numpy float arrays of rank [NE][NS][NM][NO][ND]
+    """
+
+    # The R20A derivative.
+    dr20a = ones(r20a.shape)
+
+    # The sin(x) and cos(x) factors.
+    x = dw * tcp
+    sin_x = sin(x)
+    cos_x = cos(x)
+
+    # A zero numerator results in R2eff = R20A + k_AB for all points in the R2eff function.
+    if min(fabs(sin_x)) == 0.0:
+        return dr20a, zeros(r20a.shape), ones(r20a.shape)
+
+    # The partial derivatives.
+    dk_AB = 1.0 - sin_x / x
+    ddw = -k_AB * tcp * (x*cos_x - sin_x) / x**2
+
+    # Catch errors, replacing nan and inf values with zero.
+    for deriv in [ddw, dk_AB]:
+        if not isfinite(sum(deriv)):
+            fix_invalid(deriv, copy=False, fill_value=0.0)
+
+    # Return the partial derivatives.
+    return dr20a, ddw, dk_AB
+
+
+def d2r2eff_TSMFK01(r20a=None, dw=None, k_AB=None, tcp=None):
+    r"""Calculate the non-zero second partial derivatives of the R2eff values for the TSMFK01 model.
+
+    As R2eff is linear in R20A and k_AB, the only non-zero second partial derivatives are::
+
+          d2R2eff                 x.cos(x) - sin(x)
+        -----------  = - tau_CP . ----------------- ,
+        ddw.dk_AB                        x^2
+
+        d2R2eff                          /   sin(x)   2.cos(x)   2.sin(x) \ 
+        -------  = - k_AB . tau_CP^2 . | - ------ - -------- + -------- | ,
+         ddw^2                          \     x         x^2        x^3    /
+
+    where x = delta_omega * tau_CP.  As in the R2eff function, a zero value of sin(x) for any point (including the no exchange case of x = 0) gives the flat R2eff = R20A + k_AB line with zero second partial derivatives.
+
+
+    @keyword r20a:          The R20 parameter value of state A (R2 with no exchange).
+    @type r20a:             numpy float array of rank [NE][NS][NM][NO][ND]
+    @keyword dw:            The chemical exchange difference between states A and B in rad/s.
+    @type dw:               numpy float array of rank [NE][NS][NM][NO][ND]
+    @keyword k_AB:          The k_AB parameter value (the forward exchange rate in rad/s).
+    @type k_AB:             float
+    @keyword tcp:           The tau_CPMG times (1 / 4.nu1).
+    @type tcp:              numpy float array of rank [NE][NS][NM][NO][ND]
+    @return:                The second partial derivatives of the R2eff values with respect to dw twice, and to dw and k_AB.
+    @rtype:                 tuple of numpy float arrays of rank [NE][NS][NM][NO][ND]
+    """
+
+    # The sin(x) and cos(x) factors.
+    x = dw * tcp
+    sin_x = sin(x)
+    cos_x = cos(x)
+
+    # A zero numerator results in R2eff = R20A + k_AB for all points in the R2eff function.
+    if min(fabs(sin_x)) == 0.0:
+        return zeros(r20a.shape), zeros(r20a.shape)
+
+    # The second partial derivatives.
+    ddw_dk_AB = -tcp * (x*cos_x - sin_x) / x**2
+    ddw2 = -k_AB * tcp**2 * (-sin_x/x - 2.0*cos_x/x**2 + 2.0*sin_x/x**3)
+
+    # Catch errors, replacing nan and inf values with zero.
+    for deriv in [ddw2, ddw_dk_AB]:
+        if not isfinite(sum(deriv)):
+            fix_invalid(deriv, copy=False, fill_value=0.0)
+
+    # Return the second partial derivatives.
+    return ddw2, ddw_dk_AB
+
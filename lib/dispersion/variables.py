@@ -457,6 +457,22 @@ MODEL_LIST_DW_MIX_QUADRUPLE = [MODEL_NS_MMQ_3SITE, MODEL_NS_MMQ_3SITE_LINEAR]
 # The models which currently support R1 fitting via target function switching.
 MODEL_LIST_FIT_R1 = [MODEL_NOREX, MODEL_DPL94, MODEL_TP02, MODEL_TAP03, MODEL_MP05, MODEL_NS_R1RHO_2SITE]
 
+# The models with analytic gradients of the target function.
+MODEL_LIST_GRADIENT = [MODEL_LM63, MODEL_CR72, MODEL_CR72_FULL, MODEL_TSMFK01, MODEL_B14, MODEL_B14_FULL, MODEL_M61, MODEL_DPL94, MODEL_TP02, MODEL_TAP03]
+"""Models with analytic gradients, allowing for the gradient based optimisation algorithms such as BFGS."""
+
+# The models with analytic Hessians of the target function.
+MODEL_LIST_HESSIAN = [MODEL_LM63, MODEL_TSMFK01, MODEL_M61, MODEL_DPL94]
+"""Models with analytic gradients and Hessians, allowing for the Newton optimisation algorithm."""
+
+# The models which are linear in the R20 parameters.
+MODEL_LIST_R20_PROFILE = [MODEL_NOREX, MODEL_LM63, MODEL_LM63_3SITE, MODEL_CR72, MODEL_IT99, MODEL_TSMFK01, MODEL_B14, MODEL_M61, MODEL_M61B, MODEL_DPL94, MODEL_TP02, MODEL_TAP03, MODEL_MP05]
+"""Models whose back-calculated R2eff or R1rho values are linear in the R20, R20A or R1rho' parameters, allowing these parameters to be profiled out of the optimisation."""
+
+# The models with vectorised target functions.
+MODEL_LIST_VECTORISED = [MODEL_LM63, MODEL_CR72, MODEL_CR72_FULL, MODEL_TSMFK01, MODEL_B14, MODEL_B14_FULL]
+"""Models whose target functions can evaluate blocks of parameter vectors simultaneously, for the grid search and the lock-step optimisation of the Monte Carlo simulations."""
+
 
 # The defined models, which is used for nesting.
 MODEL_NEST_CPMG = MODEL_CR72
@@ -24,7 +24,7 @@
 
 # Python module imports.
 from math import cos, pi, sin
-from numpy import add, divide, dot, eye, float64, multiply, sinc, swapaxes, tensordot
+from numpy import add, divide, dot, einsum, eye, float64, multiply, newaxis, nonzero, sinc, swapaxes, tensordot
 try:
     from scipy.integrate import dblquad
 except ImportError:
@@ -32,7 +32,7 @@ except ImportError:
 
 # relax module imports.
 from lib.compat import norm
-from lib.frame_order.matrix_ops import rotate_daeg
+from lib.frame_order.matrix_ops import pcs_sum_adaptive_qr_int, pcs_sum_states_qr_int, rotate_daeg
 
 
 def compile_1st_matrix_double_rotor(matrix, R_eigen, smax1, smax2):
@@ -119,12 +119,12 @@ def compile_2nd_matrix_double_rotor(matrix, Rx2_eigen, smax1, smax2):
     return rotate_daeg(matrix, Rx2_eigen)
 
 
-def pcs_numeric_qr_int_double_rotor(points=None, max_points=None, sigma_max=None, sigma_max_2=None, c=None, full_in_ref_frame=None, r_pivot_atom=None, r_pivot_atom_rev=None, r_ln_pivot=None, r_inter_pivot=None, A=None, R_eigen=None, RT_eigen=None, Ri_prime=None, Ri2_prime=None, pcs_theta=None, pcs_theta_err=None, missing_pcs=None):
+def pcs_numeric_qr_int_double_rotor(points=None, max_points=None, sigma_max=None, sigma_max_2=None, c=None, full_in_ref_frame=None, r_pivot_atom=None, r_pivot_atom_rev=None, r_ln_pivot=None, r_inter_pivot=None, A=None, R_eigen=None, RT_eigen=None, Ri_prime=None, Ri2_prime=None, pcs_theta=None, pcs_theta_err=None, missing_pcs=None, tol=None):
     """The averaged PCS value via numerical integration for the double rotor frame order model.
 
     @keyword points:            The Sobol points in the torsion-tilt angle space.
     @type points:               numpy rank-2, 3D array
-    @keyword max_points:        The maximum number of Sobol' points to use.  Once this number is reached, the loop over the Sobol' torsion-tilt angles is terminated.
+    @keyword max_points:        The maximum number of Sobol' points to use.  Only the first max_points Sobol' points within the distribution will be used.
     @type max_points:           int
     @keyword sigma_max:         The maximum opening angle for the first rotor.
     @type sigma_max:            float
@@ -158,57 +158,42 @@ def pcs_numeric_qr_int_double_rotor(points=None, max_points=None, sigma_max=None
     @type pcs_theta_err:        numpy rank-2 array
     @keyword missing_pcs:       A structure used to indicate which PCS values are missing.
     @type missing_pcs:          numpy rank-2 array
+    @keyword tol:               The PCS error tolerance, in ppm, for the adaptive numerical integration.  The number of Sobol' points used is increased until the integration error estimate for all spins is below this tolerance, up to the maximum number of points.  If None, the maximum number of points will be used.
+    @type tol:                  None or float
     """
 
     # Clear the data structures.
     pcs_theta[:] = 0.0
     pcs_theta_err[:] = 0.0
 
-    # Fast frame shift.
-    Ri = dot(R_eigen, tensordot(Ri_prime, RT_eigen, axes=1))
-    Ri = swapaxes(Ri, 0, 1)
-    Ri2 = dot(R_eigen, tensordot(Ri2_prime, RT_eigen, axes=1))
-    Ri2 = swapaxes(Ri2, 0, 1)
-
     # Unpack the points.
     sigma, sigma2 = points
 
-    # Loop over the samples.
-    num = 0
-    for i in range(len(points[0])):
-        # The maximum number of points has been reached (well, surpassed by one so exit the loop before it is used).
-        if num == max_points:
-            break
-
-        # Outside of the distribution, so skip the point.
-        if abs(sigma[i]) > sigma_max:
-            continue
-        if abs(sigma2[i]) > sigma_max_2:
-            continue
-
-        # Calculate the PCSs for this state.
-        pcs_pivot_motion_double_rotor_qr_int(full_in_ref_frame=full_in_ref_frame, r_pivot_atom=r_pivot_atom, r_pivot_atom_rev=r_pivot_atom_rev, r_ln_pivot=r_ln_pivot, r_inter_pivot=r_inter_pivot, A=A, Ri=Ri[i], Ri2=Ri2[i], pcs_theta=pcs_theta, pcs_theta_err=pcs_theta_err, missing_pcs=missing_pcs)
-
-        # Increment the number of points.
-        num += 1
+    # The indices of the Sobol' points within the distribution, truncated to the maximum number of points.
+    indices = nonzero((abs(sigma) <= sigma_max) & (abs(sigma2) <= sigma_max_2))[0][:max_points]
 
     # Default to the rigid state if no points lie in the distribution.
-    if num == 0:
-        # Fast identity frame shift.
-        Ri_prime = eye(3, dtype=float64)
-        Ri = dot(R_eigen, tensordot(Ri_prime, RT_eigen, axes=1))
-        Ri = swapaxes(Ri, 0, 1)
+    if not len(indices):
+        Ri_prime = eye(3, dtype=float64)[newaxis]
+        Ri2_prime = Ri_prime
 
-        # Calculate the PCSs for this state.
-        pcs_pivot_motion_double_rotor_qr_int(full_in_ref_frame=full_in_ref_frame, r_pivot_atom=r_pivot_atom, r_pivot_atom_rev=r_pivot_atom_rev, r_ln_pivot=r_ln_pivot, r_inter_pivot=r_inter_pivot, A=A, Ri=Ri, Ri2=Ri, pcs_theta=pcs_theta, pcs_theta_err=pcs_theta_err, missing_pcs=missing_pcs)
+    # The pre-calculated rotations for the points within the distribution.
+    else:
+        Ri_prime = Ri_prime[indices]
+        Ri2_prime = Ri2_prime[indices]
 
-        # Multiply the constant.
-        multiply(c, pcs_theta, pcs_theta)
+    # Fast frame shift.
+    Ri = dot(R_eigen, tensordot(Ri_prime, RT_eigen, axes=1))
+    Ri = swapaxes(Ri, 0, 1)
+    Ri2 = dot(R_eigen, tensordot(Ri2_prime, RT_eigen, axes=1))
+    Ri2 = swapaxes(Ri2, 0, 1)
+
+    # Calculate the PCSs summed over all states, adaptively increasing the number of states if a tolerance is given.
+    num = pcs_sum_adaptive_qr_int(func=lambda start, end: pcs_pivot_motion_double_rotor_qr_int(full_in_ref_frame=full_in_ref_frame, r_pivot_atom=r_pivot_atom, r_pivot_atom_rev=r_pivot_atom_rev, r_ln_pivot=r_ln_pivot, r_inter_pivot=r_inter_pivot, A=A, Ri=Ri[start:end], Ri2=Ri2[start:end], pcs_theta=pcs_theta, pcs_theta_err=pcs_theta_err, missing_pcs=missing_pcs), num=len(Ri), c=c, tol=tol, pcs_theta=pcs_theta)
 
     # Average the PCS.
-    else:
-        multiply(c, pcs_theta, pcs_theta)
-        divide(pcs_theta, float(num), pcs_theta)
+    multiply(c, pcs_theta, pcs_theta)
+    divide(pcs_theta, float(num), pcs_theta)
 
 
 def pcs_numeric_quad_int_double_rotor(sigma_max=None, sigma_max_2=None, c=None, r_pivot_atom=None, r_ln_pivot=None, r_inter_pivot=None, A=None, R_eigen=None, RT_eigen=None, Ri_prime=None, Ri2_prime=None):
@@ -263,7 +248,7 @@ def pcs_numeric_quad_int_double_rotor(sigma_max=None, sigma_max_2=None, c=None,
 
 
 def pcs_pivot_motion_double_rotor_qr_int(full_in_ref_frame=None, r_pivot_atom=None, r_pivot_atom_rev=None, r_ln_pivot=None, r_inter_pivot=None, A=None, Ri=None, Ri2=None, pcs_theta=None, pcs_theta_err=None, missing_pcs=None):
-    """Calculate the PCS value after a pivoted motion for the double rotor model.
+    """Calculate the PCS value after a pivoted motion for the double rotor model, summed over all states.
 
     @keyword full_in_ref_frame: An array of flags specifying if the tensor in the reference frame is the full or reduced tensor.
     @type full_in_ref_frame:    numpy rank-1 array
@@ -277,10 +262,10 @@ def pcs_pivot_motion_double_rotor_qr_int(full_in_ref_frame=None, r_pivot_atom=No
     @type r_inter_pivot:        numpy rank-1, 3D array
     @keyword A:                 The full alignment tensor of the non-moving domain.
     @type A:                    numpy rank-2, 3D array
-    @keyword Ri:                The frame-shifted, pre-calculated rotation matrix for state i for the 1st mode of motion.
-    @type Ri:                   numpy rank-2, 3D array
-    @keyword Ri2:               The frame-shifted, pre-calculated rotation matrix for state i for the 2nd mode of motion.
-    @type Ri2:                  numpy rank-2, 3D array
+    @keyword Ri:                The frame-shifted, pre-calculated rotation matrices for all states i for the 1st mode of motion.
+    @type Ri:                   numpy rank-3, array of 3D arrays
+    @keyword Ri2:               The frame-shifted, pre-calculated rotation matrices for all states i for the 2nd mode of motion.
+    @type Ri2:                  numpy rank-3, array of 3D arrays
     @keyword pcs_theta:         The storage structure for the back-calculated PCS values.
     @type pcs_theta:            numpy rank-2 array
     @keyword pcs_theta_err:     The storage structure for the back-calculated PCS errors.
@@ -289,47 +274,28 @@ def pcs_pivot_motion_double_rotor_qr_int(full_in_ref_frame=None, r_pivot_atom=No
     @type missing_pcs:          numpy rank-2 array
     """
 
-    # Rotate the first pivot to atomic position vectors.
-    rot_vect = dot(r_pivot_atom, Ri)
+    # Rotate the first pivot to atomic position vectors, for all states.
+    rot_vect = einsum('ja,kab->kjb', r_pivot_atom, Ri)
 
     # Add the inter-pivot vector to obtain the 2nd pivot to atomic position vectors.
     add(r_inter_pivot, rot_vect, rot_vect)
 
     # Rotate the 2nd pivot to atomic position vectors.
-    rot_vect = dot(rot_vect, Ri2)
+    rot_vect = einsum('kja,kab->kjb', rot_vect, Ri2)
 
     # Add the lanthanide to pivot vector.
     add(rot_vect, r_ln_pivot, rot_vect)
 
-    # The vector length (to the 5th power).
-    length = 1.0 / norm(rot_vect, axis=1)**5
-
-    # The reverse vectors and lengths.
+    # The reverse vectors.
+    rot_vect_rev = None
     if min(full_in_ref_frame) == 0:
-        rot_vect_rev = dot(r_pivot_atom_rev, Ri)
+        rot_vect_rev = einsum('ja,kab->kjb', r_pivot_atom_rev, Ri)
         add(r_inter_pivot, rot_vect_rev, rot_vect_rev)
-        rot_vect_rev = dot(rot_vect_rev, Ri2)
+        rot_vect_rev = einsum('kja,kab->kjb', rot_vect_rev, Ri2)
         add(rot_vect_rev, r_ln_pivot, rot_vect_rev)
-        length_rev = 1.0 / norm(rot_vect_rev, axis=1)**5
-
-    # Loop over the atoms.
-    for j in range(len(r_pivot_atom[:, 0])):
-        # Loop over the alignments.
-        for i in range(len(pcs_theta)):
-            # Skip missing data.
-            if missing_pcs[i, j]:
-                continue
-
-            # The projection.
-            if full_in_ref_frame[i]:
-                proj = dot(rot_vect[j], dot(A[i], rot_vect[j]))
-                length_i = length[j]
-            else:
-                proj = dot(rot_vect_rev[j], dot(A[i], rot_vect_rev[j]))
-                length_i = length_rev[j]
-
-            # The PCS.
-            pcs_theta[i, j] += proj * length_i
+
+    # Sum the PCSs over all states.
+    pcs_sum_states_qr_int(full_in_ref_frame=full_in_ref_frame, rot_vect=rot_vect, rot_vect_rev=rot_vect_rev, A=A, pcs_theta=pcs_theta, missing_pcs=missing_pcs)
 
 
 def pcs_pivot_motion_double_rotor_quad_int(sigma_i, sigma2_i, r_pivot_atom, r_ln_pivot, r_inter_pivot, A, R_eigen, RT_eigen, Ri_prime, Ri2_prime):
@@ -24,14 +24,14 @@
 
 # Python module imports.
 from math import cos, pi
-from numpy import divide, dot, eye, float64, multiply, sinc, swapaxes, tensordot
+from numpy import divide, dot, eye, float64, multiply, newaxis, nonzero, sinc, swapaxes, tensordot
 try:
     from scipy.integrate import tplquad
 except ImportError:
     pass
 
 # relax module imports.
-from lib.frame_order.matrix_ops import pcs_pivot_motion_full_qr_int, pcs_pivot_motion_full_quad_int, rotate_daeg
+from lib.frame_order.matrix_ops import pcs_pivot_motion_full_qr_int, pcs_pivot_motion_full_quad_int, pcs_sum_adaptive_qr_int, rotate_daeg
 
 
 def compile_1st_matrix_iso_cone(matrix, R_eigen, cone_theta, sigma_max):
@@ -117,12 +117,12 @@ def compile_2nd_matrix_iso_cone(matrix, Rx2_eigen, cone_theta, sigma_max):
     return rotate_daeg(matrix, Rx2_eigen)
 
 
-def pcs_numeric_qr_int_iso_cone(points=None, max_points=None, theta_max=None, sigma_max=None, c=None, full_in_ref_frame=None, r_pivot_atom=None, r_pivot_atom_rev=None, r_ln_pivot=None, A=None, R_eigen=None, RT_eigen=None, Ri_prime=None, pcs_theta=None, pcs_theta_err=None, missing_pcs=None):
+def pcs_numeric_qr_int_iso_cone(points=None, max_points=None, theta_max=None, sigma_max=None, c=None, full_in_ref_frame=None, r_pivot_atom=None, r_pivot_atom_rev=None, r_ln_pivot=None, A=None, R_eigen=None, RT_eigen=None, Ri_prime=None, pcs_theta=None, pcs_theta_err=None, missing_pcs=None, tol=None):
     """Determine the averaged PCS value via numerical integration.
 
     @keyword points:            The Sobol points in the torsion-tilt angle space.
     @type points:               numpy rank-2, 3D array
-    @keyword max_points:        The maximum number of Sobol' points to use.  Once this number is reached, the loop over the Sobol' torsion-tilt angles is terminated.
+    @keyword max_points:        The maximum number of Sobol' points to use.  Only the first max_points Sobol' points within the distribution will be used.
     @type max_points:           int
     @keyword theta_max:         The half cone angle.
     @type theta_max:            float
@@ -152,55 +152,38 @@ def pcs_numeric_qr_int_iso_cone(points=None, max_points=None, theta_max=None, si
     @type pcs_theta_err:        numpy rank-2 array
     @keyword missing_pcs:       A structure used to indicate which PCS values are missing.
     @type missing_pcs:          numpy rank-2 array
+    @keyword tol:               The PCS error tolerance, in ppm, for the adaptive numerical integration.  The number of Sobol' points used is increased until the integration error estimate for all spins is below this tolerance, up to the maximum number of points.  If None, the maximum number of points will be used.
+    @type tol:                  None or float
     """
 
     # Clear the data structures.
     pcs_theta[:] = 0.0
     pcs_theta_err[:] = 0.0
 
-    # Fast frame shift.
-    Ri = dot(R_eigen, tensordot(Ri_prime, RT_eigen, axes=1))
-    Ri = swapaxes(Ri, 0, 1)
-
     # Unpack the points.
     theta, phi, sigma = points
 
-    # Loop over the samples.
-    num = 0
-    for i in range(len(points[0])):
-        # The maximum number of points has been reached (well, surpassed by one so exit the loop before it is used).
-        if num == max_points:
-            break
-
-        # Outside of the distribution, so skip the point.
-        if theta[i] > theta_max:
-            continue
-        if abs(sigma[i]) > sigma_max:
-            continue
-
-        # Calculate the PCSs for this state.
-        pcs_pivot_motion_full_qr_int(full_in_ref_frame=full_in_ref_frame, r_pivot_atom=r_pivot_atom, r_pivot_atom_rev=r_pivot_atom_rev, r_ln_pivot=r_ln_pivot, A=A, Ri=Ri[i], pcs_theta=pcs_theta, pcs_theta_err=pcs_theta_err, missing_pcs=missing_pcs)
-
-        # Increment the number of points.
-        num += 1
+    # The indices of the Sobol' points within the distribution, truncated to the maximum number of points.
+    indices = nonzero((theta <= theta_max) & (abs(sigma) <= sigma_max))[0][:max_points]
 
     # Default to the rigid state if no points lie in the distribution.
-    if num == 0:
-        # Fast identity frame shift.
-        Ri_prime = eye(3, dtype=float64)
-        Ri = dot(R_eigen, tensordot(Ri_prime, RT_eigen, axes=1))
-        Ri = swapaxes(Ri, 0, 1)
+    if not len(indices):
+        Ri_prime = eye(3, dtype=float64)[newaxis]
 
-        # Calculate the PCSs for this state.
-        pcs_pivot_motion_full_qr_int(full_in_ref_frame=full_in_ref_frame, r_pivot_atom=r_pivot_atom, r_pivot_atom_rev=r_pivot_atom_rev, r_ln_pivot=r_ln_pivot, A=A, Ri=Ri, pcs_theta=pcs_theta, pcs_theta_err=pcs_theta_err, missing_pcs=missing_pcs)
+    # The pre-calculated rotations for the points within the distribution.
+    else:
+        Ri_prime = Ri_prime[indices]
+
+    # Fast frame shift.
+    Ri = dot(R_eigen, tensordot(Ri_prime, RT_eigen, axes=1))
+    Ri = swapaxes(Ri, 0, 1)
 
-        # Multiply the constant.
-        multiply(c, pcs_theta, pcs_theta)
+    # Calculate the PCSs summed over all states, adaptively increasing the number of states if a tolerance is given.
+    num = pcs_sum_adaptive_qr_int(func=lambda start, end: pcs_pivot_motion_full_qr_int(full_in_ref_frame=full_in_ref_frame, r_pivot_atom=r_pivot_atom, r_pivot_atom_rev=r_pivot_atom_rev, r_ln_pivot=r_ln_pivot, A=A, Ri=Ri[start:end], pcs_theta=pcs_theta, pcs_theta_err=pcs_theta_err, missing_pcs=missing_pcs), num=len(Ri), c=c, tol=tol, pcs_theta=pcs_theta)
 
     # Average the PCS.
-    else:
-        multiply(c, pcs_theta, pcs_theta)
-        divide(pcs_theta, float(num), pcs_theta)
+    multiply(c, pcs_theta, pcs_theta)
+    divide(pcs_theta, float(num), pcs_theta)
 
 
 def pcs_numeric_quad_int_iso_cone(theta_max=None, sigma_max=None, c=None, r_pivot_atom=None, r_ln_pivot=None, A=None, R_eigen=None, RT_eigen=None, Ri_prime=None):
@@ -24,7 +24,7 @@
 
 # Python module imports.
 from math import cos, sin
-from numpy import dot, transpose
+from numpy import dot, einsum, newaxis, transpose, where
 from numpy.linalg import norm
 
 # relax module imports.
@@ -32,6 +32,10 @@ from lib.compat import norm
 from lib.linear_algebra.kronecker_product import transpose_23
 
 
+# The maximum number of elements of the [N][J][3] rotated vector arrays of the quasi-random numerical integration, used to cap the memory usage.
+QR_INT_CHUNK_SIZE = 2**21
+
+
 def daeg_to_rotational_superoperator(daeg, Rsuper):
     """Convert the frame order matrix (daeg) to the rotational superoperator.
 
@@ -91,7 +95,7 @@ def daeg_to_rotational_superoperator(daeg, Rsuper):
 
 
 def pcs_pivot_motion_full_qr_int(full_in_ref_frame=None, r_pivot_atom=None, r_pivot_atom_rev=None, r_ln_pivot=None, A=None, Ri=None, pcs_theta=None, pcs_theta_err=None, missing_pcs=None):
-    """Calculate the PCS value after a pivoted motion for the isotropic cone model.
+    """Calculate the PCS value after a pivoted motion for the isotropic cone model, summed over all states.
 
     @keyword full_in_ref_frame: An array of flags specifying if the tensor in the reference frame is the full or reduced tensor.
     @type full_in_ref_frame:    numpy rank-1 array
@@ -103,8 +107,8 @@ def pcs_pivot_motion_full_qr_int(full_in_ref_frame=None, r_pivot_atom=None, r_pi
     @type r_ln_pivot:           numpy rank-2, 3D array
     @keyword A:                 The full alignment tensor of the non-moving domain.
     @type A:                    numpy rank-2, 3D array
-    @keyword Ri:                The frame-shifted, pre-calculated rotation matrix for state i.
-    @type Ri:                   numpy rank-2, 3D array
+    @keyword Ri:                The frame-shifted, pre-calculated rotation matrices for all states i.
+    @type Ri:                   numpy rank-3, array of 3D arrays
     @keyword pcs_theta:         The storage structure for the back-calculated PCS values.
     @type pcs_theta:            numpy rank-2 array
     @keyword pcs_theta_err:     The storage structure for the back-calculated PCS errors.
@@ -113,35 +117,16 @@ def pcs_pivot_motion_full_qr_int(full_in_ref_frame=None, r_pivot_atom=None, r_pi
     @type missing_pcs:          numpy rank-2 array
     """
 
-    # Pre-calculate all the new vectors.
-    rot_vect = dot(r_pivot_atom, Ri) + r_ln_pivot
+    # Pre-calculate all the new vectors for all states.
+    rot_vect = einsum('ja,kab->kjb', r_pivot_atom, Ri) + r_ln_pivot
 
-    # The vector length (to the 5th power).
-    length = 1.0 / norm(rot_vect, axis=1)**5
-
-    # The reverse vectors and lengths.
+    # The reverse vectors.
+    rot_vect_rev = None
     if min(full_in_ref_frame) == 0:
-        rot_vect_rev = dot(r_pivot_atom_rev, Ri) + r_ln_pivot
-        length_rev = 1.0 / norm(rot_vect_rev, axis=1)**5
-
-    # Loop over the atoms.
-    for j in range(len(r_pivot_atom[:, 0])):
-        # Loop over the alignments.
-        for i in range(len(pcs_theta)):
-            # Skip missing data.
-            if missing_pcs[i, j]:
-                continue
+        rot_vect_rev = einsum('ja,kab->kjb', r_pivot_atom_rev, Ri) + r_ln_pivot
 
-            # The projection.
-            if full_in_ref_frame[i]:
-                proj = dot(rot_vect[j], dot(A[i], rot_vect[j]))
-                length_i = length[j]
-            else:
-                proj = dot(rot_vect_rev[j], dot(A[i], rot_vect_rev[j]))
-                length_i = length_rev[j]
-
-            # The PCS.
-            pcs_theta[i, j] += proj * length_i
+    # Sum the PCSs over all states.
+    pcs_sum_states_qr_int(full_in_ref_frame=full_in_ref_frame, rot_vect=rot_vect, rot_vect_rev=rot_vect_rev, A=A, pcs_theta=pcs_theta, missing_pcs=missing_pcs)
 
 
 def pcs_pivot_motion_full_quad_int(theta_i, phi_i, sigma_i, r_pivot_atom, r_ln_pivot, A, R_eigen, RT_eigen, Ri_prime):
@@ -208,7 +193,7 @@ def pcs_pivot_motion_full_quad_int(theta_i, phi_i, sigma_i, r_pivot_atom, r_ln_p
 
 
 def pcs_pivot_motion_torsionless_qr_int(full_in_ref_frame=None, r_pivot_atom=None, r_pivot_atom_rev=None, r_ln_pivot=None, A=None, Ri=None, pcs_theta=None, pcs_theta_err=None, missing_pcs=None):
-    """Calculate the PCS value after a pivoted motion for the isotropic cone model.
+    """Calculate the PCS value after a pivoted motion for the isotropic cone model, summed over all states.
 
     @keyword full_in_ref_frame: An array of flags specifying if the tensor in the reference frame is the full or reduced tensor.
     @type full_in_ref_frame:    numpy rank-1 array
@@ -220,8 +205,8 @@ def pcs_pivot_motion_torsionless_qr_int(full_in_ref_frame=None, r_pivot_atom=Non
     @type r_ln_pivot:           numpy rank-2, 3D array
     @keyword A:                 The full alignment tensor of the non-moving domain.
     @type A:                    numpy rank-2, 3D array
-    @keyword Ri:                The frame-shifted, pre-calculated rotation matrix for state i.
-    @type Ri:                   numpy rank-2, 3D array
+    @keyword Ri:                The frame-shifted, pre-calculated rotation matrices for all states i.
+    @type Ri:                   numpy rank-3, array of 3D arrays
     @keyword pcs_theta:         The storage structure for the back-calculated PCS values.
     @type pcs_theta:            numpy rank-2 array
     @keyword pcs_theta_err:     The storage structure for the back-calculated PCS errors.
@@ -230,35 +215,16 @@ def pcs_pivot_motion_torsionless_qr_int(full_in_ref_frame=None, r_pivot_atom=Non
     @type missing_pcs:          numpy rank-2 array
     """
 
-    # Pre-calculate all the new vectors.
-    rot_vect = dot(r_pivot_atom, Ri) + r_ln_pivot
-
-    # The vector length (to the 5th power).
-    length = 1.0 / norm(rot_vect, axis=1)**5
+    # Pre-calculate all the new vectors for all states.
+    rot_vect = einsum('ja,kab->kjb', r_pivot_atom, Ri) + r_ln_pivot
 
-    # The reverse vectors and lengths.
+    # The reverse vectors.
+    rot_vect_rev = None
     if min(full_in_ref_frame) == 0:
-        rot_vect_rev = dot(r_pivot_atom_rev, Ri) + r_ln_pivot
-        length_rev = 1.0 / norm(rot_vect_rev, axis=1)**5
-
-    # Loop over the atoms.
-    for j in range(len(r_pivot_atom[:, 0])):
-        # Loop over the alignments.
-        for i in range(len(pcs_theta)):
-            # Skip missing data.
-            if missing_pcs[i, j]:
-                continue
-
-            # The projection.
-            if full_in_ref_frame[i]:
-                proj = dot(rot_vect[j], dot(A[i], rot_vect[j]))
-                length_i = length[j]
-            else:
-                proj = dot(rot_vect_rev[j], dot(A[i], rot_vect_rev[j]))
-                length_i = length_rev[j]
+        rot_vect_rev = einsum('ja,kab->kjb', r_pivot_atom_rev, Ri) + r_ln_pivot
 
-            # The PCS.
-            pcs_theta[i, j] += proj * length_i
+    # Sum the PCSs over all states.
+    pcs_sum_states_qr_int(full_in_ref_frame=full_in_ref_frame, rot_vect=rot_vect, rot_vect_rev=rot_vect_rev, A=A, pcs_theta=pcs_theta, missing_pcs=missing_pcs)
 
 
 def pcs_pivot_motion_torsionless_quad_int(theta_i, phi_i, r_pivot_atom, r_ln_pivot, A, R_eigen, RT_eigen, Ri_prime):
@@ -320,6 +286,122 @@ def pcs_pivot_motion_torsionless_quad_int(theta_i, phi_i, r_pivot_atom, r_ln_piv
     return pcs
 
 
+def pcs_sum_adaptive_qr_int(func=None, num=None, c=None, tol=None, pcs_theta=None, start=16, chunk=None):
+    """Sum the PCS values over the states, with the number of states adaptively increased until the integration error estimate is below the tolerance.
+
+    The states are summed in blocks which double the total number of states used.  After each block, the error of the averaged PCS for each spin and alignment is estimated as the change in the average caused by the doubling.  Once all errors are below the tolerance, or all states have been used, the summation is terminated.  Each block is summed in chunks of states via pcs_sum_chunks_qr_int(), so that the [N][J][3] rotated vector arrays for N states and J atoms are capped at QR_INT_CHUNK_SIZE elements.
+
+
+    @keyword func:      The function for adding the PCS sum for the states with indices from the start up to, but not including, the end index to the pcs_theta structure.  This is called as func(start, end).
+    @type func:         function
+    @keyword num:       The total number of states available.
+    @type num:          int
+    @keyword c:         The PCS constants (without the interatomic distance and in Angstrom units).
+    @type c:            numpy rank-2 array
+    @keyword tol:       The PCS error tolerance, in ppm.  If None, all states will be used.
+    @type tol:          None or float
+    @keyword pcs_theta: The storage structure for the back-calculated PCS values.  The sum is added to this structure.
+    @type pcs_theta:    numpy rank-2 array
+    @keyword start:     The number of states in the first block.
+    @type start:        int
+    @keyword chunk:     The maximum number of states per call of func.  If None, this is set from QR_INT_CHUNK_SIZE and the number of atoms.
+    @type chunk:        None or int
+    @return:            The number of states used.
+    @rtype:             int
+    """
+
+    # The number of states per chunk.
+    if chunk == None:
+        chunk = max(1, QR_INT_CHUNK_SIZE // (3 * pcs_theta.shape[1]))
+
+    # No error control, so use all states.
+    if tol == None or num <= start:
+        pcs_sum_chunks_qr_int(func=func, start=0, end=num, chunk=chunk)
+        return num
+
+    # The first block.
+    end = start
+    pcs_sum_chunks_qr_int(func=func, start=0, end=end, chunk=chunk)
+
+    # Double the number of states until convergence.
+    while end < num:
+        # The current average.
+        prev = pcs_theta / end
+
+        # The next block.
+        new_end = min(2*end, num)
+        pcs_sum_chunks_qr_int(func=func, start=end, end=new_end, chunk=chunk)
+        end = new_end
+
+        # The error estimate for each spin and alignment (in ppm).
+        err = abs(c * (pcs_theta / end - prev)) * 1e6
+
+        # Convergence.
+        if err.max() < tol:
+            break
+
+    # Return the number of states used.
+    return end
+
+
+def pcs_sum_chunks_qr_int(func=None, start=None, end=None, chunk=None):
+    """Sum the PCS values over a block of states, one chunk of states at a time.
+
+    @keyword func:      The function for adding the PCS sum for the states with indices from the start up to, but not including, the end index to the PCS structure.  This is called as func(start, end).
+    @type func:         function
+    @keyword start:     The index of the first state of the block.
+    @type start:        int
+    @keyword end:       The index of the state after the last state of the block.
+    @type end:          int
+    @keyword chunk:     The maximum number of states per call of func.
+    @type chunk:        int
+    """
+
+    # Loop over the chunks.
+    for i in range(start, end, chunk):
+        func(i, min(i+chunk, end))
+
+
+def pcs_sum_states_qr_int(full_in_ref_frame=None, rot_vect=None, rot_vect_rev=None, A=None, pcs_theta=None, missing_pcs=None):
+    """Sum the PCS values over all states for the quasi-random numerical integration.
+
+    For each atom j, the state average of the 1/r**5 weighted outer products of the rotated vectors is first collapsed into a single 3D matrix, so that the projection onto each alignment tensor is performed once rather than once per state.
+
+
+    @keyword full_in_ref_frame: An array of flags specifying if the tensor in the reference frame is the full or reduced tensor.
+    @type full_in_ref_frame:    numpy rank-1 array
+    @keyword rot_vect:          The lanthanide to atom vectors for all states and atoms.
+    @type rot_vect:             numpy rank-3 array
+    @keyword rot_vect_rev:      The reversed lanthanide to atom vectors for all states and atoms.  This is only needed when the reduced tensor is in the reference frame.
+    @type rot_vect_rev:         None or numpy rank-3 array
+    @keyword A:                 The full alignment tensors of the non-moving domain.
+    @type A:                    numpy rank-3 array
+    @keyword pcs_theta:         The storage structure for the back-calculated PCS values.  The sum is added to this structure.
+    @type pcs_theta:            numpy rank-2 array
+    @keyword missing_pcs:       A structure used to indicate which PCS values are missing.
+    @type missing_pcs:          numpy rank-2 array
+    """
+
+    # The vector length (to the 5th power).
+    length = 1.0 / norm(rot_vect, axis=2)**5
+
+    # The length weighted outer products summed over the states, and projected onto the alignment tensors.
+    proj = einsum('kj,kja,kjb->jab', length, rot_vect, rot_vect)
+    pcs = einsum('iab,jab->ij', A, proj)
+
+    # The reverse vectors for the reduced tensors in the reference frame.
+    if rot_vect_rev is not None:
+        length_rev = 1.0 / norm(rot_vect_rev, axis=2)**5
+        proj_rev = einsum('kj,kja,kjb->jab', length_rev, rot_vect_rev, rot_vect_rev)
+        pcs = where(full_in_ref_frame[:, newaxis], pcs, einsum('iab,jab->ij', A, proj_rev))
+
+    # Skip missing data.
+    pcs[missing_pcs != 0] = 0.0
+
+    # The PCS.
+    pcs_theta += pcs
+
+
 def reduce_alignment_tensor(D, A, red_tensor):
     """Calculate the reduction in the alignment tensor caused by the Frame Order matrix.
 
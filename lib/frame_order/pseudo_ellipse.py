@@ -24,7 +24,7 @@
 
 # Python module imports.
 from math import cos, pi, sin, sqrt
-from numpy import divide, dot, eye, float64, multiply, sinc, swapaxes, tensordot
+from numpy import divide, dot, eye, float64, multiply, newaxis, nonzero, sinc, swapaxes, tensordot
 from numpy import cos as np_cos
 from numpy import sin as np_sin
 from numpy import sqrt as np_sqrt
@@ -35,7 +35,7 @@ except ImportError:
 
 # relax module imports.
 from lib.geometry.pec import pec
-from lib.frame_order.matrix_ops import pcs_pivot_motion_full_qr_int, pcs_pivot_motion_full_quad_int, rotate_daeg
+from lib.frame_order.matrix_ops import pcs_pivot_motion_full_qr_int, pcs_pivot_motion_full_quad_int, pcs_sum_adaptive_qr_int, rotate_daeg
 
 
 def compile_1st_matrix_pseudo_ellipse(matrix, R_eigen, theta_x, theta_y, sigma_max):
@@ -599,12 +599,12 @@ def part_int_daeg2_pseudo_ellipse_88(phi, x, y):
     return cos(tmax)**3
 
 
-def pcs_numeric_qr_int_pseudo_ellipse(points=None, max_points=None, theta_x=None, theta_y=None, sigma_max=None, c=None, full_in_ref_frame=None, r_pivot_atom=None, r_pivot_atom_rev=None, r_ln_pivot=None, A=None, R_eigen=None, RT_eigen=None, Ri_prime=None, pcs_theta=None, pcs_theta_err=None, missing_pcs=None):
+def pcs_numeric_qr_int_pseudo_ellipse(points=None, max_points=None, theta_x=None, theta_y=None, sigma_max=None, c=None, full_in_ref_frame=None, r_pivot_atom=None, r_pivot_atom_rev=None, r_ln_pivot=None, A=None, R_eigen=None, RT_eigen=None, Ri_prime=None, pcs_theta=None, pcs_theta_err=None, missing_pcs=None, tol=None):
     """Determine the averaged PCS value via numerical integration.
 
     @keyword points:            The Sobol points in the torsion-tilt angle space.
     @type points:               numpy rank-2, 3D array
-    @keyword max_points:        The maximum number of Sobol' points to use.  Once this number is reached, the loop over the Sobol' torsion-tilt angles is terminated.
+    @keyword max_points:        The maximum number of Sobol' points to use.  Only the first max_points Sobol' points within the distribution will be used.
     @type max_points:           int
     @keyword theta_x:           The x-axis half cone angle.
     @type theta_x:              float
@@ -636,64 +636,42 @@ def pcs_numeric_qr_int_pseudo_ellipse(points=None, max_points=None, theta_x=None
     @type pcs_theta_err:        numpy rank-2 array
     @keyword missing_pcs:       A structure used to indicate which PCS values are missing.
     @type missing_pcs:          numpy rank-2 array
+    @keyword tol:               The PCS error tolerance, in ppm, for the adaptive numerical integration.  The number of Sobol' points used is increased until the integration error estimate for all spins is below this tolerance, up to the maximum number of points.  If None, the maximum number of points will be used.
+    @type tol:                  None or float
     """
 
     # Clear the data structures.
     pcs_theta[:] = 0.0
     pcs_theta_err[:] = 0.0
 
-    # Fast frame shift.
-    Ri = dot(R_eigen, tensordot(Ri_prime, RT_eigen, axes=1))
-    Ri = swapaxes(Ri, 0, 1)
-
     # Unpack the points.
     theta, phi, sigma = points
 
-    # Calculate theta_max.
-    theta_max = tmax_pseudo_ellipse_array(phi, theta_x, theta_y)
-
-    # Loop over the samples.
-    num = 0
-    for i in range(len(points[0])):
-        # The maximum number of points has been reached (well, surpassed by one so exit the loop before it is used).
-        if num == max_points:
-            break
-
-        # Check the torsion angle first, for speed.
-        if abs(sigma[i]) > sigma_max:
-            continue
-
-        # As theta_x <= theta_y, check if theta is outside of the isotropic cone defined by theta_y to minimise calculations for speed.
-        if theta[i] > theta_y:
-            continue
-
-        # Outside of the distribution, so skip the point.
-        if theta[i] > theta_max[i]:
-            continue
+    # The indices of the Sobol' points within the distribution.  As theta_x <= theta_y, points outside of the isotropic cone defined by theta_y are removed first, together with the torsion angle check, to minimise the theta_max calculations for speed.
+    indices = nonzero((abs(sigma) <= sigma_max) & (theta <= theta_y))[0]
+    theta_max = tmax_pseudo_ellipse_array(phi[indices], theta_x, theta_y)
 
-        # Calculate the PCSs for this state.
-        pcs_pivot_motion_full_qr_int(full_in_ref_frame=full_in_ref_frame, r_pivot_atom=r_pivot_atom, r_pivot_atom_rev=r_pivot_atom_rev, r_ln_pivot=r_ln_pivot, A=A, Ri=Ri[i], pcs_theta=pcs_theta, pcs_theta_err=pcs_theta_err, missing_pcs=missing_pcs)
-
-        # Increment the number of points.
-        num += 1
+    # Truncate to the maximum number of points.
+    indices = indices[theta[indices] <= theta_max][:max_points]
 
     # Default to the rigid state if no points lie in the distribution.
-    if num == 0:
-        # Fast identity frame shift.
-        Ri_prime = eye(3, dtype=float64)
-        Ri = dot(R_eigen, tensordot(Ri_prime, RT_eigen, axes=1))
-        Ri = swapaxes(Ri, 0, 1)
+    if not len(indices):
+        Ri_prime = eye(3, dtype=float64)[newaxis]
 
-        # Calculate the PCSs for this state.
-        pcs_pivot_motion_full_qr_int(full_in_ref_frame=full_in_ref_frame, r_pivot_atom=r_pivot_atom, r_pivot_atom_rev=r_pivot_atom_rev, r_ln_pivot=r_ln_pivot, A=A, Ri=Ri, pcs_theta=pcs_theta, pcs_theta_err=pcs_theta_err, missing_pcs=missing_pcs)
+    # The pre-calculated rotations for the points within the distribution.
+    else:
+        Ri_prime = Ri_prime[indices]
 
-        # Multiply the constant.
-        multiply(c, pcs_theta, pcs_theta)
+    # Fast frame shift.
+    Ri = dot(R_eigen, tensordot(Ri_prime, RT_eigen, axes=1))
+    Ri = swapaxes(Ri, 0, 1)
+
+    # Calculate the PCSs summed over all states, adaptively increasing the number of states if a tolerance is given.
+    num = pcs_sum_adaptive_qr_int(func=lambda start, end: pcs_pivot_motion_full_qr_int(full_in_ref_frame=full_in_ref_frame, r_pivot_atom=r_pivot_atom, r_pivot_atom_rev=r_pivot_atom_rev, r_ln_pivot=r_ln_pivot, A=A, Ri=Ri[start:end], pcs_theta=pcs_theta, pcs_theta_err=pcs_theta_err, missing_pcs=missing_pcs), num=len(Ri), c=c, tol=tol, pcs_theta=pcs_theta)
 
     # Average the PCS.
-    else:
-        multiply(c, pcs_theta, pcs_theta)
-        divide(pcs_theta, float(num), pcs_theta)
+    multiply(c, pcs_theta, pcs_theta)
+    divide(pcs_theta, float(num), pcs_theta)
 
 
 def pcs_numeric_quad_int_pseudo_ellipse(theta_x=None, theta_y=None, sigma_max=None, c=None, r_pivot_atom=None, r_ln_pivot=None, A=None, R_eigen=None, RT_eigen=None, Ri_prime=None):
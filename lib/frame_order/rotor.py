@@ -24,7 +24,7 @@
 
 # Python module imports.
 from math import cos, pi, sin
-from numpy import divide, dot, eye, float64, multiply, sinc, swapaxes, tensordot
+from numpy import divide, dot, einsum, eye, float64, multiply, newaxis, nonzero, sinc, swapaxes, tensordot
 try:
     from scipy.integrate import quad
 except ImportError:
@@ -32,7 +32,7 @@ except ImportError:
 
 # relax module imports.
 from lib.compat import norm
-from lib.frame_order.matrix_ops import rotate_daeg
+from lib.frame_order.matrix_ops import pcs_sum_adaptive_qr_int, pcs_sum_states_qr_int, rotate_daeg
 
 
 def compile_1st_matrix_rotor(matrix, R_eigen, sigma_max):
@@ -103,12 +103,12 @@ def compile_2nd_matrix_rotor(matrix, Rx2_eigen, smax):
     return rotate_daeg(matrix, Rx2_eigen)
 
 
-def pcs_numeric_qr_int_rotor(points=None, max_points=None, sigma_max=None, c=None, full_in_ref_frame=None, r_pivot_atom=None, r_pivot_atom_rev=None, r_ln_pivot=None, A=None, R_eigen=None, RT_eigen=None, Ri_prime=None, pcs_theta=None, pcs_theta_err=None, missing_pcs=None):
+def pcs_numeric_qr_int_rotor(points=None, max_points=None, sigma_max=None, c=None, full_in_ref_frame=None, r_pivot_atom=None, r_pivot_atom_rev=None, r_ln_pivot=None, A=None, R_eigen=None, RT_eigen=None, Ri_prime=None, pcs_theta=None, pcs_theta_err=None, missing_pcs=None, tol=None):
     """Determine the averaged PCS value via numerical integration.
 
     @keyword points:            The Sobol points in the torsion-tilt angle space.
     @type points:               numpy rank-2, 3D array
-    @keyword max_points:        The maximum number of Sobol' points to use.  Once this number is reached, the loop over the Sobol' torsion-tilt angles is terminated.
+    @keyword max_points:        The maximum number of Sobol' points to use.  Only the first max_points Sobol' points within the distribution will be used.
     @type max_points:           int
     @keyword sigma_max:         The maximum rotor angle.
     @type sigma_max:            float
@@ -136,53 +136,38 @@ def pcs_numeric_qr_int_rotor(points=None, max_points=None, sigma_max=None, c=Non
     @type pcs_theta_err:        numpy rank-2 array
     @keyword missing_pcs:       A structure used to indicate which PCS values are missing.
     @type missing_pcs:          numpy rank-2 array
+    @keyword tol:               The PCS error tolerance, in ppm, for the adaptive numerical integration.  The number of Sobol' points used is increased until the integration error estimate for all spins is below this tolerance, up to the maximum number of points.  If None, the maximum number of points will be used.
+    @type tol:                  None or float
     """
 
     # Clear the data structures.
     pcs_theta[:] = 0.0
     pcs_theta_err[:] = 0.0
 
-    # Fast frame shift.
-    Ri = dot(R_eigen, tensordot(Ri_prime, RT_eigen, axes=1))
-    Ri = swapaxes(Ri, 0, 1)
-
-    # Unpack the points (in this case, just an alias).
+    # Unpack the points.
     sigma = points[0]
 
-    # Loop over the samples.
-    num = 0
-    for i in range(len(points[0])):
-        # The maximum number of points has been reached (well, surpassed by one so exit the loop before it is used).
-        if num == max_points:
-            break
-
-        # Outside of the distribution, so skip the point.
-        if abs(sigma[i]) > sigma_max:
-            continue
-
-        # Calculate the PCSs for this state.
-        pcs_pivot_motion_rotor_qr_int(full_in_ref_frame=full_in_ref_frame, r_pivot_atom=r_pivot_atom, r_pivot_atom_rev=r_pivot_atom_rev, r_ln_pivot=r_ln_pivot, A=A, Ri=Ri[i], pcs_theta=pcs_theta, pcs_theta_err=pcs_theta_err, missing_pcs=missing_pcs)
-
-        # Increment the number of points.
-        num += 1
+    # The indices of the Sobol' points within the distribution, truncated to the maximum number of points.
+    indices = nonzero(abs(sigma) <= sigma_max)[0][:max_points]
 
     # Default to the rigid state if no points lie in the distribution.
-    if num == 0:
-        # Fast identity frame shift.
-        Ri_prime = eye(3, dtype=float64)
-        Ri = dot(R_eigen, tensordot(Ri_prime, RT_eigen, axes=1))
-        Ri = swapaxes(Ri, 0, 1)
+    if not len(indices):
+        Ri_prime = eye(3, dtype=float64)[newaxis]
+
+    # The pre-calculated rotations for the points within the distribution.
+    else:
+        Ri_prime = Ri_prime[indices]
 
-        # Calculate the PCSs for this state.
-        pcs_pivot_motion_rotor_qr_int(full_in_ref_frame=full_in_ref_frame, r_pivot_atom=r_pivot_atom, r_pivot_atom_rev=r_pivot_atom_rev, r_ln_pivot=r_ln_pivot, A=A, Ri=Ri, pcs_theta=pcs_theta, pcs_theta_err=pcs_theta_err, missing_pcs=missing_pcs)
+    # Fast frame shift.
+    Ri = dot(R_eigen, tensordot(Ri_prime, RT_eigen, axes=1))
+    Ri = swapaxes(Ri, 0, 1)
 
-        # Multiply the constant.
-        multiply(c, pcs_theta, pcs_theta)
+    # Calculate the PCSs summed over all states, adaptively increasing the number of states if a tolerance is given.
+    num = pcs_sum_adaptive_qr_int(func=lambda start, end: pcs_pivot_motion_rotor_qr_int(full_in_ref_frame=full_in_ref_frame, r_pivot_atom=r_pivot_atom, r_pivot_atom_rev=r_pivot_atom_rev, r_ln_pivot=r_ln_pivot, A=A, Ri=Ri[start:end], pcs_theta=pcs_theta, pcs_theta_err=pcs_theta_err, missing_pcs=missing_pcs), num=len(Ri), c=c, tol=tol, pcs_theta=pcs_theta)
 
     # Average the PCS.
-    else:
-        multiply(c, pcs_theta, pcs_theta)
-        divide(pcs_theta, float(num), pcs_theta)
+    multiply(c, pcs_theta, pcs_theta)
+    divide(pcs_theta, float(num), pcs_theta)
 
 
 def pcs_numeric_quad_int_rotor(sigma_max=None, c=None, r_pivot_atom=None, r_ln_pivot=None, A=None, R_eigen=None, RT_eigen=None, Ri_prime=None):
@@ -226,7 +211,7 @@ def pcs_numeric_quad_int_rotor(sigma_max=None, c=None, r_pivot_atom=None, r_ln_p
 
 
 def pcs_pivot_motion_rotor_qr_int(full_in_ref_frame=None, r_pivot_atom=None, r_pivot_atom_rev=None, r_ln_pivot=None, A=None, Ri=None, pcs_theta=None, pcs_theta_err=None, missing_pcs=None):
-    """Calculate the PCS value after a pivoted motion for the rotor model.
+    """Calculate the PCS value after a pivoted motion for the rotor model, summed over all states.
 
     @keyword full_in_ref_frame: An array of flags specifying if the tensor in the reference frame is the full or reduced tensor.
     @type full_in_ref_frame:    numpy rank-1 array
@@ -238,8 +223,8 @@ def pcs_pivot_motion_rotor_qr_int(full_in_ref_frame=None, r_pivot_atom=None, r_p
     @type r_ln_pivot:           numpy rank-2, 3D array
     @keyword A:                 The full alignment tensor of the non-moving domain.
     @type A:                    numpy rank-2, 3D array
-    @keyword Ri:                The frame-shifted, pre-calculated rotation matrix for state i.
-    @type Ri:                   numpy rank-2, 3D array
+    @keyword Ri:                The frame-shifted, pre-calculated rotation matrices for all states i.
+    @type Ri:                   numpy rank-3, array of 3D arrays
     @keyword pcs_theta:         The storage structure for the back-calculated PCS values.
     @type pcs_theta:            numpy rank-2 array
     @keyword pcs_theta_err:     The storage structure for the back-calculated PCS errors.
@@ -248,35 +233,16 @@ def pcs_pivot_motion_rotor_qr_int(full_in_ref_frame=None, r_pivot_atom=None, r_p
     @type missing_pcs:          numpy rank-2 array
     """
 
-    # Pre-calculate all the new vectors.
-    rot_vect = dot(r_pivot_atom, Ri) + r_ln_pivot
+    # Pre-calculate all the new vectors for all states.
+    rot_vect = einsum('ja,kab->kjb', r_pivot_atom, Ri) + r_ln_pivot
 
-    # The vector length (to the 5th power).
-    length = 1.0 / norm(rot_vect, axis=1)**5
-
-    # The reverse vectors and lengths.
+    # The reverse vectors.
+    rot_vect_rev = None
     if min(full_in_ref_frame) == 0:
-        rot_vect_rev = dot(r_pivot_atom_rev, Ri) + r_ln_pivot
-        length_rev = 1.0 / norm(rot_vect_rev, axis=1)**5
-
-    # Loop over the atoms.
-    for j in range(len(r_pivot_atom[:, 0])):
-        # Loop over the alignments.
-        for i in range(len(pcs_theta)):
-            # Skip missing data.
-            if missing_pcs[i, j]:
-                continue
-
-            # The projection.
-            if full_in_ref_frame[i]:
-                proj = dot(rot_vect[j], dot(A[i], rot_vect[j]))
-                length_i = length[j]
-            else:
-                proj = dot(rot_vect_rev[j], dot(A[i], rot_vect_rev[j]))
-                length_i = length_rev[j]
-
-            # The PCS.
-            pcs_theta[i, j] += proj * length_i
+        rot_vect_rev = einsum('ja,kab->kjb', r_pivot_atom_rev, Ri) + r_ln_pivot
+
+    # Sum the PCSs over all states.
+    pcs_sum_states_qr_int(full_in_ref_frame=full_in_ref_frame, rot_vect=rot_vect, rot_vect_rev=rot_vect_rev, A=A, pcs_theta=pcs_theta, missing_pcs=missing_pcs)
 
 
 def pcs_pivot_motion_rotor_quad_int(sigma_i, r_pivot_atom, r_ln_pivot, A, R_eigen, RT_eigen, Ri_prime):
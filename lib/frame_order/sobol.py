@@ -0,0 +1,228 @@
+###############################################################################
+#                                                                             #
+# Copyright (C) 2015 Edward d'Auvergne                                        #
+#                                                                             #
+# This file is part of the program relax (http://www.nmr-relax.com).          #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+# Module docstring.
+"""Generation and caching of the Sobol' quasi-random points and rotation matrices for the frame order numerical PCS integration.
+
+The torsion-tilt angles and the pre-calculated rotation matrices are identical for all target function instances with the same model, dimensions and total number of points.  These can therefore be stored on disk as numpy .npy files and opened as read-only memory maps, allowing the data to be reused between relax sessions and shared between all processes on the same machine via the operating system page cache.
+"""
+
+# Python module imports.
+from numpy import arccos, cos, float32, load, pi, save, sin, zeros
+from os import close, makedirs, remove, rename, sep
+from os.path import exists, isdir
+from tempfile import mkstemp
+
+# relax module imports.
+from extern.sobol.sobol_lib import i4_sobol_generate
+
+
+# The names of the cached data structures.
+SOBOL_DATA_NAMES = ['sobol_angles', 'Ri_prime', 'Ri2_prime']
+
+
+def sobol_cache_file(cache_dir=None, model=None, dims=None, total_num=None, name=None):
+    """Return the file name of one of the cached Sobol' data structures.
+
+    @keyword cache_dir: The directory for the cache files.
+    @type cache_dir:    str
+    @keyword model:     The frame order model.
+    @type model:        str
+    @keyword dims:      The list of parameters.
+    @type dims:         list of str
+    @keyword total_num: The total number of points.
+    @type total_num:    int
+    @keyword name:      The name of the data structure, one of SOBOL_DATA_NAMES.
+    @type name:         str
+    @return:            The full path of the .npy file.
+    @rtype:             str
+    """
+
+    # Build the key from the model, dimensions and number of points.
+    key = "sobol_%s_%s_%i_%s.npy" % (model.replace(' ', '_'), '_'.join(dims), total_num, name)
+
+    # Return the file path.
+    return cache_dir + sep + key
+
+
+def sobol_data_generate(dims=None, total_num=None):
+    """Generate the Sobol' torsion-tilt angles and pre-calculated rotation matrices.
+
+    The algorithm for the Sobol' sequence is that modified by Antonov and Saleev, using the external sobol_lib module.
+
+
+    @keyword dims:      The list of parameters.
+    @type dims:         list of str
+    @keyword total_num: The total number of points.
+    @type total_num:    int
+    @return:            The torsion-tilt angles, the rotation matrices, and the second rotation matrices for the double motion models.
+    @rtype:             numpy rank-2 float32 array, numpy rank-3 float32 array, numpy rank-3 float32 array
+    """
+
+    # Initialise.
+    m = len(dims)
+    sobol_angles = zeros((m, total_num), float32)
+    Ri_prime = zeros((total_num, 3, 3), float32)
+    Ri2_prime = zeros((total_num, 3, 3), float32)
+
+    # The Sobol' points.
+    points = i4_sobol_generate(m, total_num, 1000)
+
+    # Convert the points to angles.
+    angles = {}
+    for j in range(m):
+        # The tilt angle - the angle of rotation about the x-y plane rotation axis.
+        if dims[j] == 'theta':
+            angles[dims[j]] = arccos(2.0*points[j] - 1.0)
+
+        # The angle defining the x-y plane rotation axis.
+        elif dims[j] == 'phi':
+            angles[dims[j]] = 2.0 * pi * points[j]
+
+        # The 1st torsion angle - the angle of rotation about the z' axis (or y' for the double motion models), and the 2nd torsion angle - the angle of rotation about the x' axis.
+        elif dims[j] in ['sigma', 'sigma2']:
+            angles[dims[j]] = 2.0 * pi * (points[j] - 0.5)
+
+        # Store the angles.
+        sobol_angles[j] = angles[dims[j]]
+
+    # Pre-calculate the rotation matrices for the double motion models.
+    if 'sigma2' in dims:
+        # The 1st rotation about the y-axis.
+        c_sigma = cos(angles['sigma'])
+        s_sigma = sin(angles['sigma'])
+        Ri_prime[:, 0, 0] =  c_sigma
+        Ri_prime[:, 0, 2] =  s_sigma
+        Ri_prime[:, 1, 1] = 1.0
+        Ri_prime[:, 2, 0] = -s_sigma
+        Ri_prime[:, 2, 2] =  c_sigma
+
+        # The 2nd rotation about the x-axis.
+        c_sigma2 = cos(angles['sigma2'])
+        s_sigma2 = sin(angles['sigma2'])
+        Ri2_prime[:, 0, 0] = 1.0
+        Ri2_prime[:, 1, 1] =  c_sigma2
+        Ri2_prime[:, 1, 2] = -s_sigma2
+        Ri2_prime[:, 2, 1] =  s_sigma2
+        Ri2_prime[:, 2, 2] =  c_sigma2
+
+    # Pre-calculate the rotation matrix for the full tilt-torsion, via the zyz Euler angles alpha = sigma - phi, beta = theta and gamma = phi (as in lib.geometry.rotations.tilt_torsion_to_R()).
+    elif 'theta' in dims and 'phi' in dims and 'sigma' in dims:
+        sin_a = sin(angles['sigma'] - angles['phi'])
+        cos_a = cos(angles['sigma'] - angles['phi'])
+        sin_b = sin(angles['theta'])
+        cos_b = cos(angles['theta'])
+        sin_g = sin(angles['phi'])
+        cos_g = cos(angles['phi'])
+        Ri_prime[:, 0, 0] = -sin_a * sin_g  +  cos_a * cos_b * cos_g
+        Ri_prime[:, 1, 0] =  sin_a * cos_g  +  cos_a * cos_b * sin_g
+        Ri_prime[:, 2, 0] = -cos_a * sin_b
+        Ri_prime[:, 0, 1] = -cos_a * sin_g  -  sin_a * cos_b * cos_g
+        Ri_prime[:, 1, 1] =  cos_a * cos_g  -  sin_a * cos_b * sin_g
+        Ri_prime[:, 2, 1] =  sin_a * sin_b
+        Ri_prime[:, 0, 2] =  sin_b * cos_g
+        Ri_prime[:, 1, 2] =  sin_b * sin_g
+        Ri_prime[:, 2, 2] =  cos_b
+
+    # Pre-calculate the rotation matrix for the torsionless models.
+    elif 'sigma' not in dims:
+        c_theta = cos(angles['theta'])
+        s_theta = sin(angles['theta'])
+        c_phi = cos(angles['phi'])
+        s_phi = sin(angles['phi'])
+        c_phi_c_theta = c_phi * c_theta
+        s_phi_c_theta = s_phi * c_theta
+        Ri_prime[:, 0, 0] =  c_phi_c_theta*c_phi + s_phi**2
+        Ri_prime[:, 0, 1] =  c_phi_c_theta*s_phi - c_phi*s_phi
+        Ri_prime[:, 0, 2] =  c_phi*s_theta
+        Ri_prime[:, 1, 0] =  s_phi_c_theta*c_phi - c_phi*s_phi
+        Ri_prime[:, 1, 1] =  s_phi_c_theta*s_phi + c_phi**2
+        Ri_prime[:, 1, 2] =  s_phi*s_theta
+        Ri_prime[:, 2, 0] = -s_theta*c_phi
+        Ri_prime[:, 2, 1] = -s_theta*s_phi
+        Ri_prime[:, 2, 2] =  c_theta
+
+    # Pre-calculate the rotation matrix for the rotor models.
+    else:
+        c_sigma = cos(angles['sigma'])
+        s_sigma = sin(angles['sigma'])
+        Ri_prime[:, 0, 0] =  c_sigma
+        Ri_prime[:, 0, 1] = -s_sigma
+        Ri_prime[:, 1, 0] =  s_sigma
+        Ri_prime[:, 1, 1] =  c_sigma
+        Ri_prime[:, 2, 2] = 1.0
+
+    # Return the data.
+    return sobol_angles, Ri_prime, Ri2_prime
+
+
+def sobol_data_load(cache_dir=None, model=None, dims=None, total_num=None):
+    """Return the Sobol' torsion-tilt angles and rotation matrices, using the on-disk cache if a directory is given.
+
+    If all cache files exist, these are opened as read-only memory maps.  Otherwise the data is generated and, if a cache directory is given, saved to the cache before being memory mapped.  Each file is first written to a temporary file in the cache directory and then renamed, so that concurrent processes never see a partially written file.
+
+
+    @keyword cache_dir: The directory for the cache files.  If None, the data will be generated in memory without caching.
+    @type cache_dir:    None or str
+    @keyword model:     The frame order model.
+    @type model:        str
+    @keyword dims:      The list of parameters.
+    @type dims:         list of str
+    @keyword total_num: The total number of points.
+    @type total_num:    int
+    @return:            The torsion-tilt angles, the rotation matrices, and the second rotation matrices for the double motion models.
+    @rtype:             numpy rank-2 float32 array, numpy rank-3 float32 array, numpy rank-3 float32 array
+    """
+
+    # No caching.
+    if cache_dir == None:
+        return sobol_data_generate(dims=dims, total_num=total_num)
+
+    # The cache files.
+    files = [sobol_cache_file(cache_dir=cache_dir, model=model, dims=dims, total_num=total_num, name=name) for name in SOBOL_DATA_NAMES]
+
+    # Generate and store the data if not already cached.
+    if not all([exists(file_name) for file_name in files]):
+        # Create the cache directory.
+        if not isdir(cache_dir):
+            try:
+                makedirs(cache_dir)
+            except OSError:
+                # Another process may have created the directory in the meantime.
+                if not isdir(cache_dir):
+                    raise
+
+        # Generate the data.
+        data = sobol_data_generate(dims=dims, total_num=total_num)
+
+        # Save each structure to a temporary file and move it into place.
+        for file_name, struct in zip(files, data):
+            fd, temp_name = mkstemp(suffix='.npy', dir=cache_dir)
+            close(fd)
+            save(temp_name, struct)
+            try:
+                rename(temp_name, file_name)
+            except OSError:
+                # The file has been created by another process (for MS Windows, where renaming to an existing file fails).
+                remove(temp_name)
+
+    # Return the read-only memory mapped data.
+    return tuple([load(file_name, mmap_mode='r') for file_name in files])
@@ -26,7 +26,7 @@
 1 Introduction
 ==============
 
-This package is an abstraction of specific multi-processor implementations or fabrics such as MPI via mpi4py.  It is designed to be extended for use on other fabrics such as grid computing via SSH tunnelling, threading, etc.  It also has a uni-processor mode as the default fabric.
+This package is an abstraction of specific multi-processor implementations or fabrics such as MPI via mpi4py or the local multi-core fabric via the Python multiprocessing module.  It is designed to be extended for use on other fabrics such as grid computing via SSH tunnelling, threading, etc.  It also has a uni-processor mode as the default fabric.
 
 
 2 API
@@ -118,15 +118,20 @@ This appears to be an OpenMPI problem with late 2.6 Linux kernels.
 """
 
 
-__all__ = ['memo',
+__all__ = ['journal',
+           'local_processor',
+           'memo',
            'misc',
+           'mpi_buffers',
            'mpi4py_processor',
            'multi_processor_base',
            'processor',
            'processor_io',
            'result_commands',
            'result_queue',
+           'shared_arrays',
            'slave_commands',
+           'trace',
            'uni_processor']
 
 # Python module imports.
@@ -214,6 +219,27 @@ def fetch_data(name=None):
     return processor_box.processor.fetch_data(name=name)
 
 
+def fetch_shared_array(handle=None):
+    """API function for obtaining an array from the Processor instance's shared array registry.
+
+    This can be run on the master or slaves, and converts the handle returned by share_array() back into the array.  Objects which are not handles are returned unmodified.
+
+
+    @attention:     For the local multi-processor fabric, the slave attaches to the POSIX shared memory segment on first access.  No other inter-processor communications are performed.
+
+    @keyword handle:    The shared array handle.
+    @type handle:       multi.shared_arrays.Shared_array instance or anything
+    @return:            The read-only array.
+    @rtype:             numpy array or anything
+    """
+
+    # Load the Processor_box.
+    processor_box = Processor_box()
+
+    # Forward the call to the processor instance.
+    return processor_box.processor.fetch_shared_array(handle)
+
+
 def fetch_data_store():
     """API function for obtaining the data store object from the Processor instance.
 
@@ -233,6 +259,65 @@ def fetch_data_store():
     return processor_box.processor.data_store
 
 
+def set_journal(file_name=None, checkpoint_freq=1):
+    """API function for activating the on-disk job journal, so that the processor queues can be resumed after restarting a killed calculation.
+
+    @keyword file_name:         The name of the journal file.  If None, the journal will be deactivated.
+    @type file_name:            None or str
+    @keyword checkpoint_freq:   The number of completed slave commands to accumulate before writing them to the journal file.
+    @type checkpoint_freq:      int
+    """
+
+    # Load the Processor_box.
+    processor_box = Processor_box()
+
+    # Forward the call to the processor instance.
+    processor_box.processor.set_journal(file_name=file_name, checkpoint_freq=checkpoint_freq)
+
+
+def set_trace(file_name=None, active=True):
+    """API function for activating the timing instrumentation of the processor queues.
+
+    @keyword file_name: The name of the Chrome trace JSON file.  If None, only the summary tables printed at the end of each queue will be produced.
+    @type file_name:    None or str
+    @keyword active:    A flag which if False will deactivate the instrumentation.
+    @type active:       bool
+    """
+
+    # Load the Processor_box.
+    processor_box = Processor_box()
+
+    # Forward the call to the processor instance.
+    processor_box.processor.set_trace(file_name=file_name, active=active)
+
+
+def share_array(name=None, value=None, reuse=False, temporary=False):
+    """API function for placing a large, read-only numpy array into the shared array registry of all processors.
+
+    The array is distributed to the slaves once, using the most efficient mechanism of the processor fabric, and the returned small handle should then be stored in the slave commands in place of the array.
+
+
+    @attention:     Inter-processor communications are performed.
+
+    @keyword name:      The name of the array.  Sharing a new array under the same name replaces the old one.
+    @type name:         str
+    @keyword value:     The array to share.
+    @type value:        numpy array
+    @keyword reuse:     A flag which if True will return the handle of the array already shared under the same name, without distributing the data again, if the two arrays are identical.
+    @type reuse:        bool
+    @keyword temporary: A flag which if True will cause the array to be released on all processors at the end of the next execution of the processor queue.
+    @type temporary:    bool
+    @return:            The shared array handle.
+    @rtype:             multi.shared_arrays.Shared_array instance
+    """
+
+    # Load the Processor_box.
+    processor_box = Processor_box()
+
+    # Forward the call to the processor instance.
+    return processor_box.processor.share_array(name=name, value=value, reuse=reuse, temporary=temporary)
+
+
 def send_data_to_slaves(name=None, value=None):
     """API function for sending data from the master to all slaves processors.
 
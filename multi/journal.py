@@ -0,0 +1,301 @@
+###############################################################################
+#                                                                             #
+# Copyright (C) 2015 Edward d'Auvergne                                        #
+#                                                                             #
+# This file is part of the program relax (http://www.nmr-relax.com).          #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+# Module docstring.
+"""The on-disk job journal for checkpointed and resumable processor queues.
+
+The results of all slave commands are only stored in the relax data store once the Result_command.run() method has been executed on the master.  If a long calculation is killed, all of the results of the queue are lost.  The Queue_journal class records the result commands of each completed slave command in an append-only file, keyed by a deterministic hash of the slave command.  When the calculation is restarted with the same journal file, Processor.run_queue() replays the journalled results on the master rather than sending the finished commands to the slaves, so that only the outstanding commands are executed.
+
+Only slave commands with a memo are journalled, as the commands without a memo, such as the Slave_storage_command, modify the state of the slaves and must always be executed.
+"""
+
+# Python module imports.
+from hashlib import sha1
+from io import BytesIO
+from os import fsync
+from os.path import exists
+from pickle import HIGHEST_PROTOCOL, Pickler, UnpicklingError, dump, load
+import sys
+
+# multi module imports.
+from multi.shared_arrays import Shared_array
+
+
+class Hash_pickler(Pickler):
+    """Pickler for creating the deterministic command hashes.
+
+    The shared array handles are replaced by the hash of the shared array contents, as the handles contain session specific information such as the POSIX shared memory segment name.
+    """
+
+    def __init__(self, file, processor=None):
+        """Set up the pickler.
+
+        @param file:        The file object to pickle into.
+        @type file:         file object
+        @keyword processor: The processor instance holding the shared array registry.
+        @type processor:    Processor instance
+        """
+
+        # Initialise the base class (protocol 2 for identical hashes in Python 2 and 3).
+        Pickler.__init__(self, file, 2)
+
+        # Store the processor.
+        self.processor = processor
+
+
+    def persistent_id(self, obj):
+        """Replace the shared array handles by the hash of the array contents.
+
+        @param obj: The object being pickled.
+        @type obj:  anything
+        @return:    The content hash or None for normal pickling.
+        @rtype:     str or None
+        """
+
+        # Normal pickling.
+        if not isinstance(obj, Shared_array):
+            return None
+
+        # Hash the array.
+        array = self.processor.fetch_shared_array(obj)
+        return "%s:%s" % (obj.name, array_hash(array))
+
+
+
+class Queue_journal(object):
+    """The append-only journal of the completed slave commands."""
+
+    def __init__(self, file_name=None, checkpoint_freq=1):
+        """Set up the journal, loading all previously completed commands from the file.
+
+        @keyword file_name:         The name of the journal file.  This will be created if it does not exist.
+        @type file_name:            str
+        @keyword checkpoint_freq:   The number of completed slave commands to accumulate before writing them to the journal file.
+        @type checkpoint_freq:      int
+        """
+
+        # Store the arguments.
+        self.file_name = file_name
+        self.checkpoint_freq = max(checkpoint_freq, 1)
+
+        # The completed commands, with the command hashes as keys and the lists of result commands as values.
+        self.results = {}
+
+        # The hashes of the queued commands with the current memo IDs as keys, and the results received so far.
+        self.keys = {}
+        self.pending = {}
+
+        # The completed commands not yet written to the file.
+        self.buffer = []
+
+        # Load the previous journal.
+        self._load()
+
+
+    def _load(self):
+        """Read all of the records of the journal file.
+
+        A truncated final record, for example due to the calculation being killed during a write, is discarded.
+        """
+
+        # No journal yet.
+        if not exists(self.file_name):
+            return
+
+        # Read the records until the end of the file.
+        file = open(self.file_name, 'rb+')
+        offset = 0
+        while True:
+            try:
+                key, results = load(file)
+            except (EOFError, UnpicklingError, ValueError, AttributeError, ImportError, IndexError):
+                break
+            self.results[key] = results
+            offset = file.tell()
+
+        # Remove any truncated record so that new records can be appended.
+        file.seek(0, 2)
+        if file.tell() != offset:
+            file.truncate(offset)
+        file.close()
+
+
+    def add_result(self, result):
+        """Store a result command of a queued slave command on the master.
+
+        @param result:  The result command, after its run() method has been executed.
+        @type result:   Result_command instance
+        """
+
+        # Not journalled.
+        if result.memo_id not in self.keys:
+            return
+
+        # Store the result.
+        self.pending[result.memo_id].append(result)
+
+
+    def checkpoint(self):
+        """Append all completed slave commands to the journal file, flushing to disk."""
+
+        # Nothing to do.
+        if not len(self.buffer):
+            return
+
+        # Append the records.
+        file = open(self.file_name, 'ab')
+        for record in self.buffer:
+            dump(record, file, HIGHEST_PROTOCOL)
+        file.flush()
+        fsync(file.fileno())
+        file.close()
+
+        # Reset.
+        self.buffer = []
+
+
+    def complete(self, memo_ids=None):
+        """Mark the slave commands as completed once all of their results have been processed.
+
+        @keyword memo_ids:  The memo IDs of the completed slave commands.
+        @type memo_ids:     list of int
+        """
+
+        # Loop over the commands.
+        for memo_id in memo_ids:
+            # Not journalled, or already completed.
+            if memo_id not in self.keys:
+                continue
+
+            # Move the results to the journal.
+            key = self.keys.pop(memo_id)
+            results = self.pending.pop(memo_id)
+            self.results[key] = results
+            self.buffer.append((key, results))
+
+        # Write to disk.
+        if len(self.buffer) >= self.checkpoint_freq:
+            self.checkpoint()
+
+
+    def filter_queue(self, processor, queue):
+        """Replay the results of all journalled commands, returning the queue of outstanding commands.
+
+        @param processor:   The processor instance.
+        @type processor:    Processor instance
+        @param queue:       The command queue.
+        @type queue:        list of Slave_command instances
+        @return:            The commands which have not yet been completed.
+        @rtype:             list of Slave_command instances
+        """
+
+        # The memo IDs of the queue, to skip memos shared between commands.
+        counts = {}
+        for command in queue:
+            memo_id = getattr(command, 'memo_id', None)
+            counts[memo_id] = counts.get(memo_id, 0) + 1
+
+        # Loop over the commands.
+        outstanding = []
+        replayed = 0
+        for command in queue:
+            # Commands without their own memo are not journalled.
+            memo_id = getattr(command, 'memo_id', None)
+            if memo_id == None or counts[memo_id] > 1:
+                outstanding.append(command)
+                continue
+
+            # The command hash.
+            key = command_hash(command, processor=processor)
+
+            # Replay the results on the master, using the memo of the current command.
+            if key in self.results:
+                for result in self.results[key]:
+                    result.memo_id = memo_id
+                    processor.process_result(result)
+                replayed += 1
+                continue
+
+            # Journal the outstanding command.
+            self.keys[memo_id] = key
+            self.pending[memo_id] = []
+            outstanding.append(command)
+
+        # Printout.
+        if replayed:
+            sys.stdout.write("Job journal:  replayed the results of %i completed commands from '%s', %i commands outstanding.\n" % (replayed, self.file_name, len(outstanding)))
+
+        # Return the remaining commands.
+        return outstanding
+
+
+    def finish(self):
+        """Write any remaining completed commands and clear the queue specific structures."""
+
+        # Final checkpoint.
+        self.checkpoint()
+
+        # Clear the queue structures.
+        self.keys = {}
+        self.pending = {}
+
+
+
+def array_hash(array):
+    """Return the hash of the contents, shape and type of the numpy array.
+
+    @param array:   The array.
+    @type array:    numpy array
+    @return:        The hex digest.
+    @rtype:         str
+    """
+
+    # The hash.
+    digest = sha1(("%s %s" % (array.shape, array.dtype.str)).encode())
+    digest.update(array.tobytes() if hasattr(array, 'tobytes') else array.tostring())
+
+    # Return the digest.
+    return digest.hexdigest()
+
+
+def command_hash(command, processor=None):
+    """Return the deterministic hash of the slave command.
+
+    The hash is created from the class name and the pickled attributes of the command, excluding the session specific memo ID.
+
+
+    @param command:     The slave command.
+    @type command:      Slave_command instance
+    @keyword processor: The processor instance holding the shared array registry.
+    @type processor:    Processor instance
+    @return:            The hex digest.
+    @rtype:             str
+    """
+
+    # The sorted attributes, without the memo ID.
+    state = [(name, value) for name, value in sorted(command.__dict__.items()) if name != 'memo_id']
+
+    # Pickle.
+    file = BytesIO()
+    Hash_pickler(file, processor=processor).dump((command.__class__.__module__, command.__class__.__name__, state))
+
+    # Return the hash.
+    return sha1(file.getvalue()).hexdigest()
@@ -0,0 +1,374 @@
+###############################################################################
+#                                                                             #
+# Copyright (C) 2015 Edward d'Auvergne                                        #
+#                                                                             #
+# This file is part of the program relax (http://www.nmr-relax.com).          #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+# Module docstring.
+"""The local multi-core processor fabric via the Python multiprocessing module.
+
+This fabric requires no MPI installation.  The master process spawns one slave process per requested processor on the local machine, and the slave and result commands are transferred between the master and slaves via multiprocessing queues.  The slave command, result command and memo objects used by the mpi4py fabric are used unchanged.
+"""
+
+# Python module imports.
+import multiprocessing
+import os
+import platform
+import sys
+
+# multi module imports.
+from multi import Processor_box
+from multi.misc import Verbosity; verbosity = Verbosity()
+from multi.shared_arrays import attach_shm_array, close_shm, create_shm_array, shared_memory
+from multi.slave_commands import Exit_command, Slave_release_shared_array_command, Slave_shared_array_command
+from multi.multi_processor_base import Multi_processor
+
+
+def _slave_main(rank, processor_size, command_queue, result_queue, verbosity_level):
+    """The main function executed by each slave process.
+
+    This is a module level function so that it can be used with both the 'fork' and 'spawn' process start methods.
+
+
+    @param rank:            The rank of the slave processor.
+    @type rank:             int
+    @param processor_size:  The number of slave processors.
+    @type processor_size:   int
+    @param command_queue:   The queue from which this slave receives its commands.
+    @type command_queue:    multiprocessing.Queue instance
+    @param result_queue:    The queue, shared by all slaves, for returning results to the master.
+    @type result_queue:     multiprocessing.Queue instance
+    @param verbosity_level: The verbosity level of the master.
+    @type verbosity_level:  int
+    """
+
+    # Restore the verbosity level (required for the 'spawn' start method).
+    verbosity.set(verbosity_level)
+
+    # Set up the slave processor.
+    processor = Local_processor(processor_size=processor_size, callback=None, rank=rank, command_queue=command_queue, result_queue=result_queue)
+
+    # Replace the processor of the master inherited via 'fork' (or the empty box for 'spawn'), so that the API functions use the slave.
+    Processor_box().processor = processor
+
+    # Execute the slave main loop until the Exit_command is received.
+    processor.run()
+
+
+
+class Local_processor(Multi_processor):
+    """The local multi-core processor class."""
+
+    def __init__(self, processor_size, callback, rank=0, command_queue=None, result_queue=None):
+        """Initialise the local multi-core processor.
+
+        @param processor_size:  The requested number of slave processors.  A value of -1 will cause one slave to be created for each CPU core.
+        @type processor_size:   int
+        @param callback:        The application callback object.
+        @type callback:         multi.Application_callback instance
+        @keyword rank:          The rank of the processor.  This is 0 for the master, and is only set for the slaves by the _slave_main() function.
+        @type rank:             int
+        @keyword command_queue: The command queue of the slave.  This is only used by the slaves.
+        @type command_queue:    multiprocessing.Queue instance
+        @keyword result_queue:  The result queue shared by all slaves.  This is only used by the slaves.
+        @type result_queue:     multiprocessing.Queue instance
+        """
+
+        # Default to the number of CPU cores.
+        if processor_size == -1:
+            processor_size = multiprocessing.cpu_count()
+
+        # Sanity check.
+        if processor_size < 1:
+            raise Exception("The local multi-processor requires at least 1 slave processor, %s were requested." % processor_size)
+
+        # Store the arguments (the rank is required by the base class initialisation).
+        self._rank = rank
+        self._command_queue = command_queue
+        self._result_queue = result_queue
+
+        super(Local_processor, self).__init__(processor_size=processor_size, callback=callback)
+
+        # Master only structures (the command queues are indexed by the slave rank, index 0 is unused).
+        self._command_queues = None
+        self._slaves = []
+
+        # The POSIX shared memory segments of the shared array registry, with the array names as keys.
+        self._shm_segments = {}
+
+        # Initialise a flag for determining if we are in the run() method or not.
+        self.in_main_loop = False
+
+
+    def _attach_shared_array(self, handle):
+        """Attach a slave to the POSIX shared memory segment of the shared array.
+
+        @param handle:  The shared array handle.
+        @type handle:   Shared_array instance
+        @return:        The read-only array.
+        @rtype:         numpy array
+        """
+
+        # Attach to the segment.
+        shm, array = attach_shm_array(handle=handle)
+        self._shm_segments[handle.name] = shm
+
+        # Return the array.
+        return array
+
+
+    def _distribute_shared_array(self, handle, value):
+        """Copy the array into a POSIX shared memory segment for the slaves to attach to.
+
+        If POSIX shared memory is not available (Python versions prior to 3.8), the array is instead sent once to each slave via the command queues.
+
+
+        @param handle:  The shared array handle.  The name of the shared memory segment is added to this handle.
+        @type handle:   Shared_array instance
+        @param value:   The array to share.
+        @type value:    numpy array
+        @return:        The array to store in the registry of the master.
+        @rtype:         numpy array
+        """
+
+        # Fallback to pushing the data to all slaves.
+        if shared_memory == None:
+            for rank in range(1, self.processor_size()+1):
+                self.master_queue_command(Slave_shared_array_command(handle=handle, value=value), rank)
+            self._ditch_all_results()
+            return value
+
+        # Create the segment, which is owned by the master.
+        shm, array = create_shm_array(value=value)
+        self._shm_segments[handle.name] = shm
+        handle.shm_name = shm.name
+
+        # Return the read-only shared memory view.
+        return array
+
+
+    def _ditch_all_results(self):
+        """Receive and discard the final results of all slaves."""
+
+        # Loop over the slaves.
+        for i in range(self.processor_size()):
+            while True:
+                result = self._result_queue.get()
+                if result.completed:
+                    break
+
+
+    def _release_slave_shared_arrays(self, names):
+        """Remove the arrays from the shared array registries of all slaves, closing their POSIX shared memory segments.
+
+        @param names:   The names of the arrays.
+        @type names:    list of str
+        """
+
+        # No slaves.
+        if not len(self._slaves):
+            return
+
+        # Send the command to all slaves.
+        for rank in range(1, self.processor_size()+1):
+            self.master_queue_command(Slave_release_shared_array_command(names=names), rank)
+
+        # Dump all results.
+        self._ditch_all_results()
+
+
+    def _start_slaves(self):
+        """Create the command and result queues, and start all of the slave processes."""
+
+        # The multiprocessing context (the 'fork' start method is preferred as the slaves then inherit the loaded modules).
+        context = multiprocessing
+        if hasattr(multiprocessing, 'get_context'):
+            if 'fork' in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context('fork')
+            else:
+                context = multiprocessing.get_context('spawn')
+
+        # The queues.
+        self._result_queue = context.Queue()
+        self._command_queues = [None]
+        for i in range(self.processor_size()):
+            self._command_queues.append(context.Queue())
+
+        # Start the slaves.
+        for rank in range(1, self.processor_size()+1):
+            slave = context.Process(target=_slave_main, args=(rank, self.processor_size(), self._command_queues[rank], self._result_queue, verbosity.level()))
+            slave.daemon = True
+            slave.start()
+            self._slaves.append(slave)
+
+
+    def _stop_slaves(self):
+        """Send the exit command to all slaves and wait for the slave processes to terminate."""
+
+        # No slaves.
+        if not len(self._slaves):
+            return
+
+        # Send the exit command to all slaves.
+        for rank in range(1, self.processor_size()+1):
+            self._command_queues[rank].put(Exit_command())
+
+        # Dump all results.
+        self._ditch_all_results()
+
+        # Wait for the slave processes to terminate.
+        for slave in self._slaves:
+            slave.join()
+        self._slaves = []
+
+
+    def abort(self):
+        """Terminate all slave processes and the master, similar to MPI.COMM_WORLD.Abort().
+
+        As this can be called from the result processing thread where sys.exit() has no effect, the master process is terminated via os._exit().
+        """
+
+        # Kill the slaves.
+        for slave in self._slaves:
+            if slave.is_alive():
+                slave.terminate()
+        self._slaves = []
+
+        # Flush the IO streams and exit.
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(1)
+
+
+    def assert_on_master(self):
+        """Make sure that this is the master processor and not a slave.
+
+        @raises Exception:  If not on the master processor.
+        """
+
+        # Check if this processor is a slave, and if so throw an exception.
+        if self.on_slave():
+            msg = 'running on slave when expected master with rank == 0, rank was %d'% self.rank()
+            raise Exception(msg)
+
+
+    def exit(self, status=0):
+        """Exit the local multi-core processor with the given status.
+
+        @keyword status:    The program exit status.
+        @type status:       int
+        """
+
+        # Execution on the slave.
+        if self.on_slave():
+            # Catch sys.exit being called on an executing slave.
+            if self.in_main_loop:
+                raise Exception('sys.exit unexpectedly called on slave!')
+
+        # Execution on the master.
+        else:
+            # Destroy all shared memory segments.
+            for name in list(self.shared_arrays.keys()):
+                self.release_shared_array(name)
+
+            # Slave clean up.
+            self._stop_slaves()
+
+            # Exit the program with the given status.
+            sys.exit(status)
+
+
+    def get_intro_string(self):
+        """Return the string to append to the end of the relax introduction string.
+
+        @return:    The string describing this Processor fabric.
+        @rtype:     str
+        """
+
+        # Return the string.
+        return "Local multi-core processor via the Python multiprocessing module with %i slave processors & 1 master." % self.processor_size()
+
+
+    def get_name(self):
+        return '%s-pid%s' % (platform.node(), os.getpid())
+
+
+    def master_queue_command(self, command, dest):
+        """Master to slave processor data transfer - send the slave command to the slave.
+
+        @param command: The slave command to send.
+        @type command:  Slave_command instance or list of Slave_command instances
+        @param dest:    The destination processor's rank.
+        @type dest:     int
+        """
+
+        # Place the command on the slave's own queue.
+        self._command_queues[dest].put(command)
+
+
+    def master_receive_result(self):
+        """Slave to master processor data transfer - receive the result command from the slave.
+
+        This is invoked by the master processor.
+
+        @return:        The result command sent by the slave.
+        @rtype:         Result_command instance
+        """
+
+        # Catch and return the result command.
+        return self._result_queue.get()
+
+
+    def rank(self):
+        return self._rank
+
+
+    def release_shared_array(self, name):
+        """Remove the array from the shared array registry, closing its POSIX shared memory segment.
+
+        The segment is only destroyed on the master, as this is the owner.
+
+
+        @param name:    The name of the array.
+        @type name:     str
+        """
+
+        # Remove the registry entry.
+        super(Local_processor, self).release_shared_array(name)
+
+        # Close the segment.
+        if name in self._shm_segments:
+            close_shm(shm=self._shm_segments.pop(name), unlink=self.on_master())
+
+
+    def return_result_command(self, result_object):
+        self._result_queue.put(result_object)
+
+
+    def run(self):
+        # Spawn the slave processes from the master.
+        if self.on_master():
+            self._start_slaves()
+
+        self.in_main_loop = True
+        super(Local_processor, self).run()
+        self.in_main_loop = False
+
+
+    def slave_receive_commands(self):
+        return self._command_queue.get()
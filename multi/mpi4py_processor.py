@@ -32,11 +32,15 @@ try:
     from mpi4py import MPI
 except ImportError:
     MPI = None
+from numpy import ascontiguousarray, empty
 import os
 import sys
+from time import time
 
 # relax module imports.
-from multi.slave_commands import Exit_command
+from multi.misc import Verbosity; verbosity = Verbosity()
+from multi.mpi_buffers import Comm_stats, empty_arrays, pack_object, unpack_object
+from multi.slave_commands import Exit_command, Slave_release_shared_array_command, Slave_shared_array_command
 from multi.multi_processor_base import Multi_processor, Too_few_slaves_exception
 
 
@@ -64,22 +68,121 @@ class Mpi4py_processor(Multi_processor):
         # Initialise a flag for determining if we are in the run() method or not.
         self.in_main_loop = False
 
+        # The per-message communication statistics.
+        self.comm_stats = Comm_stats()
+
 
     def _broadcast_command(self, command):
         for i in range(1, MPI.COMM_WORLD.size):
             if i != 0:
-                MPI.COMM_WORLD.send(obj=command, dest=i)
+                self._send(command, dest=i)
+
+
+    def _distribute_shared_array(self, handle, value):
+        """Send the array to all slaves via a single MPI broadcast.
+
+        @param handle:  The shared array handle.
+        @type handle:   Shared_array instance
+        @param value:   The array to share.
+        @type value:    numpy array
+        @return:        The array to store in the registry of the master.
+        @rtype:         numpy array
+        """
+
+        # A contiguous copy of the data, as the buffer is sent directly.
+        value = ascontiguousarray(value).copy()
+        value.flags.writeable = False
+
+        # Tell the slaves to enter the broadcast.
+        self._broadcast_command(Slave_shared_array_command(handle=handle))
+
+        # The broadcast.
+        MPI.COMM_WORLD.Bcast(value, root=0)
+
+        # Dump all results.
+        self._ditch_all_results()
+
+        # Return the array.
+        return value
 
 
     def _ditch_all_results(self):
         for i in range(1, MPI.COMM_WORLD.size):
             if i != 0:
                 while True:
-                    result = MPI.COMM_WORLD.recv(source=i)
+                    result = self._recv(source=i)
                     if result.completed:
                         break
 
 
+    def _recv(self, source=None):
+        """Receive a command or result, with the large numpy arrays transferred via their buffers.
+
+        The small pickled header is received first, followed by each array via the buffer-based MPI Recv() from the same source.
+
+
+        @keyword source:    The rank of the source processor, or MPI.ANY_SOURCE.
+        @type source:       int
+        @return:            The command or result.
+        @rtype:             Slave_command or Result_command instance
+        """
+
+        # Receive the header.
+        status = MPI.Status()
+        header = MPI.COMM_WORLD.recv(source=source, status=status)
+        start = time()
+
+        # Receive the arrays from the sender of the header.
+        arrays = empty_arrays(header)
+        for array in arrays:
+            MPI.COMM_WORLD.Recv(array, source=status.Get_source())
+
+        # Reconstruct the object.
+        obj = unpack_object(header, arrays=arrays)
+
+        # Statistics.
+        self.comm_stats.add(direction='recv', name=obj.__class__.__name__, header_bytes=len(header[0]), buffer_bytes=sum([array.nbytes for array in arrays]), time=time()-start)
+
+        # Return the object.
+        return obj
+
+
+    def _release_slave_shared_arrays(self, names):
+        """Remove the arrays from the shared array registries of all slaves.
+
+        @param names:   The names of the arrays.
+        @type names:    list of str
+        """
+
+        # Tell the slaves to release the arrays.
+        self._broadcast_command(Slave_release_shared_array_command(names=names))
+
+        # Dump all results.
+        self._ditch_all_results()
+
+
+    def _send(self, obj, dest=None):
+        """Send a command or result, with the large numpy arrays transferred via their buffers.
+
+        @param obj:     The command or result.
+        @type obj:      Slave_command or Result_command instance
+        @keyword dest:  The rank of the destination processor.
+        @type dest:     int
+        """
+
+        # Extract the arrays.
+        start = time()
+        header, arrays = pack_object(obj)
+
+        # Send the small pickled header, then the array buffers.
+        MPI.COMM_WORLD.send(obj=header, dest=dest)
+        for array in arrays:
+            MPI.COMM_WORLD.Send(array, dest=dest)
+
+        # Statistics.
+        self.comm_stats.add(direction='send', name=obj.__class__.__name__, header_bytes=len(header[0]), buffer_bytes=sum([array.nbytes for array in arrays]), time=time()-start)
+
+
     def abort(self):
         MPI.COMM_WORLD.Abort()
 
@@ -130,6 +233,11 @@ class Mpi4py_processor(Multi_processor):
                 # Dump all results.
                 self._ditch_all_results()
 
+                # Print out the communication statistics of the master.
+                if verbosity.level() > 1:
+                    sys.stdout.write("\nMPI communication statistics of the master:\n")
+                    sys.stdout.write(self.comm_stats.format())
+
             # Exit the program with the given status.
             sys.exit(status)
 
@@ -168,8 +276,8 @@ class Mpi4py_processor(Multi_processor):
         @type dest:     int
         """
 
-        # Use a basic MPI send call to transfer the result command.
-        MPI.COMM_WORLD.send(obj=command, dest=dest)
+        # Send the command, with the numpy arrays transferred via their buffers.
+        self._send(command, dest=dest)
 
 
     def master_receive_result(self):
@@ -182,15 +290,33 @@ class Mpi4py_processor(Multi_processor):
         """
 
         # Catch and return the result command.
-        return MPI.COMM_WORLD.recv(source=MPI.ANY_SOURCE)
+        return self._recv(source=MPI.ANY_SOURCE)
 
 
     def rank(self):
         return MPI.COMM_WORLD.rank
 
 
+    def receive_shared_array(self, handle, value=None):
+        """Receive the array broadcast from the master and store it in the registry of the slave.
+
+        @param handle:  The shared array handle.
+        @type handle:   Shared_array instance
+        @keyword value: The array, which is None as the data is broadcast.
+        @type value:    None or numpy array
+        """
+
+        # Receive the broadcast.
+        if value is None:
+            value = empty(handle.shape, dtype=handle.dtype)
+            MPI.COMM_WORLD.Bcast(value, root=0)
+
+        # Store the array.
+        super(Mpi4py_processor, self).receive_shared_array(handle, value=value)
+
+
     def return_result_command(self, result_object):
-        MPI.COMM_WORLD.send(obj=result_object, dest=0)
+        self._send(result_object, dest=0)
 
 
     def run(self):
@@ -200,4 +326,4 @@ class Mpi4py_processor(Multi_processor):
 
 
     def slave_receive_commands(self):
-        return MPI.COMM_WORLD.recv(source=0)
+        return self._recv(source=0)
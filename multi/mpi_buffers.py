@@ -0,0 +1,217 @@
+###############################################################################
+#                                                                             #
+# Copyright (C) 2015 Edward d'Auvergne                                        #
+#                                                                             #
+# This file is part of the program relax (http://www.nmr-relax.com).          #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+# Module docstring.
+"""Buffer based transfer of the numpy arrays within commands and results, and communication statistics.
+
+Pickling large numpy arrays for the mpi4py lower-case send() and recv() functions is slow and requires multiple copies of the data.  Instead, the commands and results are pickled with all large numpy arrays replaced by persistent IDs.  The resultant small header is sent with the pickle-based API, and the arrays themselves are transferred directly from their memory buffers via the upper-case Send() and Recv() functions.
+"""
+
+# Python module imports.
+from io import BytesIO
+from numpy import ascontiguousarray, dtype, empty, ndarray
+from pickle import HIGHEST_PROTOCOL, Pickler, Unpickler
+
+
+# The minimum size, in bytes, of the numpy arrays to transfer via their buffers.
+BUFFER_THRESHOLD = 1024
+
+
+class Array_pickler(Pickler):
+    """Pickler which extracts the large numpy arrays from the object."""
+
+    def __init__(self, file, threshold=BUFFER_THRESHOLD):
+        """Set up the pickler.
+
+        @param file:        The file object to pickle into.
+        @type file:         file object
+        @keyword threshold: The minimum array size, in bytes, for extraction.
+        @type threshold:    int
+        """
+
+        # Initialise the base class.
+        Pickler.__init__(self, file, HIGHEST_PROTOCOL)
+
+        # Initialise the structures.
+        self.threshold = threshold
+        self.arrays = []
+
+
+    def persistent_id(self, obj):
+        """Replace the large numpy arrays with their index in the extracted array list.
+
+        @param obj: The object being pickled.
+        @type obj:  anything
+        @return:    The array index or None for normal pickling.
+        @rtype:     int or None
+        """
+
+        # Normal pickling.
+        if not isinstance(obj, ndarray) or obj.dtype.hasobject or obj.nbytes < self.threshold:
+            return None
+
+        # Extract the array.
+        self.arrays.append(ascontiguousarray(obj))
+        return len(self.arrays) - 1
+
+
+
+class Array_unpickler(Unpickler):
+    """Unpickler which reinserts the numpy arrays received via their buffers."""
+
+    def __init__(self, file, arrays=None):
+        """Set up the unpickler.
+
+        @param file:        The file object to unpickle from.
+        @type file:         file object
+        @keyword arrays:    The received numpy arrays.
+        @type arrays:       list of numpy arrays
+        """
+
+        # Initialise the base class.
+        Unpickler.__init__(self, file)
+
+        # Store the arrays.
+        self.arrays = arrays
+
+
+    def persistent_load(self, pid):
+        """Return the numpy array for the persistent ID.
+
+        @param pid: The array index.
+        @type pid:  int
+        @return:    The array.
+        @rtype:     numpy array
+        """
+
+        # Return the array.
+        return self.arrays[pid]
+
+
+
+class Comm_stats(object):
+    """Per-message size and latency statistics of the inter-processor communications."""
+
+    def __init__(self):
+        """Initialise the statistics."""
+
+        # The statistics, with the direction and message class name as keys and the message count, header bytes, buffer bytes, total time and maximum time as values.
+        self.stats = {}
+
+
+    def add(self, direction=None, name=None, header_bytes=0, buffer_bytes=0, time=0.0):
+        """Record the statistics of a single message.
+
+        @keyword direction:     The direction of the message, e.g. 'send' or 'recv'.
+        @type direction:        str
+        @keyword name:          The class name of the command or result.
+        @type name:             str
+        @keyword header_bytes:  The size of the pickled header.
+        @type header_bytes:     int
+        @keyword buffer_bytes:  The total size of the numpy arrays transferred via their buffers.
+        @type buffer_bytes:     int
+        @keyword time:          The time taken for the transfer, in seconds.
+        @type time:             float
+        """
+
+        # Initialise the entry.
+        key = (direction, name)
+        if key not in self.stats:
+            self.stats[key] = [0, 0, 0, 0.0, 0.0]
+
+        # Update.
+        entry = self.stats[key]
+        entry[0] += 1
+        entry[1] += header_bytes
+        entry[2] += buffer_bytes
+        entry[3] += time
+        entry[4] = max(entry[4], time)
+
+
+    def format(self):
+        """Format the statistics as a table.
+
+        @return:    The table.
+        @rtype:     str
+        """
+
+        # The header.
+        lines = ["%-6s %-35s %10s %15s %15s %12s %12s" % ("Dir", "Message", "Count", "Header (B)", "Buffers (B)", "Mean (ms)", "Max (ms)")]
+
+        # The rows.
+        for key in sorted(self.stats.keys()):
+            count, header_bytes, buffer_bytes, total, maximum = self.stats[key]
+            lines.append("%-6s %-35s %10i %15i %15i %12.3f %12.3f" % (key[0], key[1], count, header_bytes, buffer_bytes, 1000.0*total/count, 1000.0*maximum))
+
+        # Return the table.
+        return "\n".join(lines) + "\n"
+
+
+
+def empty_arrays(header):
+    """Allocate the numpy arrays for receiving the buffers described in the header.
+
+    @param header:  The header created by pack_object().
+    @type header:   tuple of bytes and list of tuples
+    @return:        The uninitialised arrays.
+    @rtype:         list of numpy arrays
+    """
+
+    # Allocate.
+    return [empty(shape, dtype=dtype(type)) for shape, type in header[1]]
+
+
+def pack_object(obj, threshold=BUFFER_THRESHOLD):
+    """Pickle the object with all large numpy arrays extracted.
+
+    @param obj:         The command or result object.
+    @type obj:          anything
+    @keyword threshold: The minimum array size, in bytes, for extraction.
+    @type threshold:    int
+    @return:            The header, consisting of the pickled object and the shapes and data types of the extracted arrays, and the list of extracted arrays.
+    @rtype:             tuple of bytes and list of tuples, list of numpy arrays
+    """
+
+    # Pickle.
+    file = BytesIO()
+    pickler = Array_pickler(file, threshold=threshold)
+    pickler.dump(obj)
+
+    # The array descriptions.
+    desc = [(array.shape, array.dtype.str) for array in pickler.arrays]
+
+    # Return the header and arrays.
+    return (file.getvalue(), desc), pickler.arrays
+
+
+def unpack_object(header, arrays=None):
+    """Unpickle the object, reinserting the numpy arrays.
+
+    @param header:      The header created by pack_object().
+    @type header:       tuple of bytes and list of tuples
+    @keyword arrays:    The received numpy arrays.
+    @type arrays:       list of numpy arrays
+    @return:            The command or result object.
+    @rtype:             anything
+    """
+
+    # Unpickle.
+    return Array_unpickler(BytesIO(header[0]), arrays=arrays).load()
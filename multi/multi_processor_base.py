@@ -87,6 +87,33 @@ class Multi_processor(Processor):
         return result
 
 
+    def cost_sort_queue(self, queue):
+        """Sort the queue for the dynamic scheduler so that the most expensive commands are dispatched first.
+
+        As the commands are popped off the end of the queue by run_command_queue(), the queue is sorted by increasing cost.
+
+
+        @param queue:   The command queue.
+        @type queue:    list of Slave_command instances
+        @return:        The sorted command queue.
+        @rtype:         list of Slave_command instances
+        """
+
+        # The cost estimates (commands not derived from Slave_command have unit cost).
+        costs = []
+        for command in queue:
+            if hasattr(command, 'cost'):
+                costs.append(command.cost())
+            else:
+                costs.append(1.0)
+
+        # Sort the queue, preserving the original order for equal costs.
+        indices = sorted(range(len(queue)), key=lambda i: (costs[i], -i))
+
+        # Return the new queue.
+        return [queue[i] for i in indices]
+
+
     # FIXME move to lower level
     def on_master(self):
         if self.rank() == 0:
@@ -121,6 +148,13 @@ class Multi_processor(Processor):
                 if result.memo_id != None and result.completed:
                     del self.memo_map[result.memo_id]
 
+                # Record the results in the job journal, the batched results being the end of the slave commands.
+                if self.journal != None:
+                    if isinstance(result, Batched_result_command):
+                        self.journal.complete(memo_ids=[command.memo_id for command in result.result_commands])
+                    else:
+                        self.journal.add_result(result)
+
             elif isinstance(result, Result_string):
                 #FIXME can't cope with multiple lines
                 sys.stdout.write(result.string)
@@ -98,6 +98,7 @@ The following are yet to be implemented:
 #TODO: check exceptions on master.
 
 # Python module imports.
+from numpy import array_equal
 import time, datetime, math, sys
 
 # multi module imports.
@@ -105,7 +106,10 @@ from multi.misc import Capturing_exception, raise_unimplemented, Verbosity; verb
 from multi.result_queue import Threaded_result_queue
 from multi.processor_io import Redirect_text
 from multi.result_commands import Batched_result_command, Null_result_command, Result_exception
+from multi.journal import Queue_journal
+from multi.shared_arrays import Shared_array
 from multi.slave_commands import Slave_storage_command
+from multi.trace import Trace_recorder, command_name
 
 
 class Data_store:
@@ -158,6 +162,9 @@ class Processor(object):
         self.grainyness = 1
         """The number of sub jobs to queue for each processor if we have more jobs than processors."""
 
+        self.dynamic_scheduling = True
+        """Flag which if True causes individual commands to be dispatched on demand to idle slaves, most expensive first, rather than as grainyness sized chunks."""
+
 #        # CHECKME: am I implemented?, should I be an application callback function
 #        self.pre_queue_command = None
 #        """ command to call before the queue is run"""
@@ -179,6 +186,116 @@ class Processor(object):
         self.threaded_result_processing = True
         """Flag for the handling of result processing via self.run_command_queue()."""
 
+        self.trace = None
+        """The timing instrumentation of the processor queues (a multi.trace.Trace_recorder instance)."""
+
+        self._trace_dispatch = {}
+        """The dispatch times and names of the commands running on each slave, for the tracing."""
+
+        self.journal = None
+        """The on-disk job journal for resuming the processor queue (a multi.journal.Queue_journal instance)."""
+
+        self.shared_arrays = {}
+        """The shared array registry, with the array names as keys and the unique key of the array version and the array itself as values."""
+
+        self._shared_array_count = 0
+        """The number of arrays placed into the shared array registry, used for creating unique keys."""
+
+        self._shared_array_handles = {}
+        """The handles of the arrays shared by the master, with the array names as keys."""
+
+        self._temporary_shared_arrays = []
+        """The names of the shared arrays to release on the master and slaves at the end of the next run_queue() call."""
+
+
+    def _attach_shared_array(self, handle):
+        """Obtain a shared array which is not yet in the local registry - designed for overriding.
+
+        This is called on the slaves by fetch_shared_array() for arrays which have not been received yet.  Processor fabrics which distribute the arrays lazily, for example via POSIX shared memory, should override this method.
+
+
+        @param handle:      The shared array handle.
+        @type handle:       Shared_array instance
+        @return:            The read-only array.
+        @rtype:             numpy array
+        @raises Exception:  As the array has not been distributed to this processor.
+        """
+
+        # The default is that arrays are always pushed to the slaves.
+        raise Exception("The shared array '%s' is not available on the processor of rank %s." % (handle.name, self.rank()))
+
+
+    def _complete_command(self, result):
+        """Register the completion of the command or chunk of commands running on a slave.
+
+        @param result:  The final result command returned by the slave.
+        @type result:   Result_command instance
+        """
+
+        # The slave statistics.
+        end = time.time()
+        self.slave_stats.complete(result.rank)
+
+        # Tracing.
+        if self.trace != None and result.rank in self._trace_dispatch:
+            # The slave busy time.
+            start, name = self._trace_dispatch.pop(result.rank)
+            self.trace.span(name=name, cat='slave', track=result.rank, start=start, end=end)
+
+            # The individual command times, shifted to end at the receipt of the result.
+            for command_name, command_start, command_end in getattr(result, 'timings', None) or []:
+                self.trace.span(name=command_name, cat='command', track=result.rank, start=end+command_start, end=end+command_end)
+
+
+    def _dispatch_command(self, command=None, dest=None):
+        """Send the command or chunk of commands to the slave, recording the statistics.
+
+        @keyword command:   The command or list of commands.
+        @type command:      Slave_command instance or list of Slave_command instances
+        @keyword dest:      The rank of the slave.
+        @type dest:         int
+        """
+
+        # Send the command.
+        start = time.time()
+        self.master_queue_command(command=command, dest=dest)
+        self.slave_stats.dispatch(dest, command)
+
+        # Tracing.
+        if self.trace != None:
+            name = command_name(command)
+            self.trace.span(name=name, cat='send', track=0, start=start, end=time.time(), args={'dest': dest})
+            self._trace_dispatch[dest] = (start, name)
+
+
+    def _distribute_shared_array(self, handle, value):
+        """Distribute a newly shared array to all slaves - designed for overriding.
+
+        The default is to do nothing, as the master and slave are the same process for the uni-processor fabric.
+
+
+        @param handle:  The shared array handle.  The fabric specific information can be added to this handle.
+        @type handle:   Shared_array instance
+        @param value:   The array to share.
+        @type value:    numpy array
+        @return:        The array to store in the registry of the master.
+        @rtype:         numpy array
+        """
+
+        # Nothing to do.
+        return value
+
+
+    def _release_slave_shared_arrays(self, names):
+        """Remove the arrays from the shared array registries of all slaves - designed for overriding.
+
+        The default is to do nothing, as the master and slave are the same process for the uni-processor fabric.
+
+
+        @param names:   The names of the arrays.
+        @type names:    list of str
+        """
+
 
     def abort(self):
         """Shutdown the multi processor in exceptional conditions - designed for overriding.
@@ -253,6 +370,32 @@ class Processor(object):
         return obj
 
 
+    def fetch_shared_array(self, handle):
+        """Fetch the array for the given shared array handle from the shared array registry.
+
+        This can be run on the master or slave processors.  If the object is not a Shared_array handle, it is returned unchanged so that slave commands can accept both handles and normal data.
+
+
+        @param handle:  The shared array handle.
+        @type handle:   Shared_array instance or anything
+        @return:        The read-only shared array, or the unmodified object.
+        @rtype:         numpy array or anything
+        """
+
+        # Not a handle.
+        if not isinstance(handle, Shared_array):
+            return handle
+
+        # The array is not in the registry or is from an old version, so obtain it.
+        entry = self.shared_arrays.get(handle.name)
+        if entry == None or entry[0] != handle.key:
+            self.release_shared_array(handle.name)
+            self.shared_arrays[handle.name] = (handle.key, self._attach_shared_array(handle))
+
+        # Return the array.
+        return self.shared_arrays[handle.name][1]
+
+
     def get_intro_string(self):
         """Get a string describing the multi processor - designed for overriding.
 
@@ -463,6 +606,65 @@ class Processor(object):
         return int(math.ceil(math.log10(self.processor_size())))
 
 
+    def receive_shared_array(self, handle, value=None):
+        """Store a shared array pushed from the master in the registry of the slave.
+
+        This is called by the Slave_shared_array_command on the slaves.
+
+
+        @param handle:  The shared array handle.
+        @type handle:   Shared_array instance
+        @keyword value: The array.
+        @type value:    numpy array
+        """
+
+        # Replace any old version.
+        self.release_shared_array(handle.name)
+
+        # Make the array read-only, to match the other fabrics, and store it.
+        value.flags.writeable = False
+        self.shared_arrays[handle.name] = (handle.key, value)
+
+
+    def release_shared_array(self, name):
+        """Remove the array from the shared array registry.
+
+        Processor fabrics with special resources for the shared arrays should extend this method to release them.
+
+
+        @param name:    The name of the array.
+        @type name:     str
+        """
+
+        # Remove the entry.
+        if name in self.shared_arrays:
+            del self.shared_arrays[name]
+        if name in self._shared_array_handles:
+            del self._shared_array_handles[name]
+
+
+    def release_shared_arrays(self, names):
+        """Remove the arrays from the shared array registries of the master and all slaves.
+
+        @param names:   The names of the arrays.
+        @type names:    list of str
+        """
+
+        # This must be the master processor!
+        self.assert_on_master()
+
+        # Nothing to do.
+        if not len(names):
+            return
+
+        # The master.
+        for name in names:
+            self.release_shared_array(name)
+
+        # The slaves.
+        self._release_slave_shared_arrays(names)
+
+
     def return_object(self, result):
         """Return a result to the master processor from a slave - an abstract method.
 
@@ -529,19 +731,29 @@ class Processor(object):
                     self.stdio_capture()
 
                     # Execute each command, one by one.
+                    timings = []
                     for i, command in enumerate(commands):
                         # Set the completed flag if this is the last command.
                         completed = (i == len(commands)-1)
 
                         # Execute the calculation.
+                        start = time.time()
                         command.run(self, completed)
+                        timings.append([command.__class__.__name__, start, time.time()])
 
                     # Restore the IO.
                     self.stdio_restore()
 
                     # Process the batched results.
                     if self.batched_returns:
-                        self.return_object(Batched_result_command(processor=self, result_commands=self.result_list, io_data=self.io_data))
+                        # The command timings relative to the end of the batch, as the slave and master clocks may differ.
+                        end = time.time()
+                        for timing in timings:
+                            timing[1] -= end
+                            timing[2] -= end
+
+                        # Return the results.
+                        self.return_object(Batched_result_command(processor=self, result_commands=self.result_list, io_data=self.io_data, timings=timings))
                         self.result_list = None
 
                 # Capture and process all slave exceptions.
@@ -586,6 +798,9 @@ class Processor(object):
         running_set = set()
         idle_set = set([i for i in range(1, self.processor_size()+1)])
 
+        # Initialise the slave utilisation statistics.
+        self.slave_stats = Slave_statistics(self.processor_size())
+
         if self.threaded_result_processing:
             result_queue = Threaded_result_queue(self)
         else:
@@ -597,7 +812,7 @@ class Processor(object):
                 if len(queue) != 0:
                     command = queue.pop()
                     dest = idle_set.pop()
-                    self.master_queue_command(command=command, dest=dest)
+                    self._dispatch_command(command=command, dest=dest)
                     running_set.add(dest)
                 else:
                     break
@@ -605,7 +820,10 @@ class Processor(object):
             # Loop until the queue of calculations is depleted.
             while len(running_set) != 0:
                 # Get the result.
+                start = time.time()
                 result = self.master_receive_result()
+                if self.trace != None:
+                    self.trace.span(name='Wait for result', cat='wait', track=0, start=start, end=time.time())
 
                 # Debugging printout.
                 if verbosity.level():
@@ -616,6 +834,14 @@ class Processor(object):
                 if result.completed:
                     idle_set.add(result.rank)
                     running_set.remove(result.rank)
+                    self._complete_command(result)
+
+                    # Dynamic scheduling, so feed the idle slave straight away.
+                    if len(queue) != 0 and self.dynamic_scheduling:
+                        command = queue.pop()
+                        dest = idle_set.pop()
+                        self._dispatch_command(command=command, dest=dest)
+                        running_set.add(dest)
 
                 # Add to the result queue for instant or threaded processing.
                 result_queue.put(result)
@@ -624,6 +850,9 @@ class Processor(object):
         if self.threaded_result_processing:
             result_queue.run_all()
 
+        # The end of the run.
+        self.slave_stats.finish()
+
 
     def run_queue(self):
         """Run the processor queue - an abstract method.
@@ -632,13 +861,35 @@ class Processor(object):
         thread to block until the command has completed.
         """
 
+        # Replay the results of the already completed commands from the job journal.
+        if self.journal != None:
+            self.command_queue[:] = self.journal.filter_queue(self, self.command_queue)
+
         #FIXME: need a finally here to cleanup exceptions states
-        lqueue = self.chunk_queue(self.command_queue)
-        self.run_command_queue(lqueue)
+        try:
+            if self.dynamic_scheduling:
+                lqueue = self.cost_sort_queue(self.command_queue)
+            else:
+                lqueue = self.chunk_queue(self.command_queue)
+            self.run_command_queue(lqueue)
+
+        # Write out all completed commands to the journal and release the temporary shared arrays, even if a failure occurs.
+        finally:
+            if self.journal != None:
+                self.journal.finish()
+            self.release_shared_arrays(self._temporary_shared_arrays)
+            self._temporary_shared_arrays = []
 
         del self.command_queue[:]
         self.memo_map.clear()
 
+        # Print out the slave utilisation statistics.
+        self.slave_stats.print_table()
+
+        # The timing summary and trace.
+        if self.trace != None:
+            self.trace.finish_queue()
+
 
     def send_data_to_slaves(self, name=None, value=None):
         """Transfer the given data from the master to all slaves.
@@ -667,6 +918,121 @@ class Processor(object):
         self.run_queue()
 
 
+    def set_dynamic_scheduling(self, flag=True):
+        """Select between the dynamic and static scheduling of the processor queue.
+
+        For the dynamic scheduling, the queue is sorted by the cost estimates of the commands and the commands are sent individually to the idle slaves, most expensive first.  For the static scheduling, the queue is split into grainyness sized chunks of commands which are sent to the slaves in the original queue order.
+
+
+        @keyword flag:  A flag which if True will activate the dynamic scheduling, and if False the static scheduling.
+        @type flag:     bool
+        """
+
+        # This must be the master processor!
+        self.assert_on_master()
+
+        # Store the flag.
+        self.dynamic_scheduling = flag
+
+
+    def set_journal(self, file_name=None, checkpoint_freq=1):
+        """Activate or deactivate the on-disk job journal for the processor queue.
+
+        If active, the results of all completed slave commands are recorded in the journal file.  When run_queue() is executed again with the same journal file, for example after restarting a killed calculation, the journalled results are replayed on the master and only the outstanding commands are sent to the slaves.
+
+
+        @keyword file_name:         The name of the journal file.  If None, the journal will be deactivated.
+        @type file_name:            None or str
+        @keyword checkpoint_freq:   The number of completed slave commands to accumulate before writing them to the journal file.
+        @type checkpoint_freq:      int
+        """
+
+        # This must be the master processor!
+        self.assert_on_master()
+
+        # Write out any remaining results of the old journal.
+        if self.journal != None:
+            self.journal.finish()
+
+        # Deactivate.
+        if file_name == None:
+            self.journal = None
+
+        # Set up the journal.
+        else:
+            self.journal = Queue_journal(file_name=file_name, checkpoint_freq=checkpoint_freq)
+
+
+    def set_trace(self, file_name=None, active=True):
+        """Activate or deactivate the timing instrumentation of the processor queues.
+
+        If active, the timings of the command dispatch, the slave commands and the result processing are recorded, a summary table is printed at the end of each run_queue() call, and all events are written to the Chrome trace JSON file.
+
+
+        @keyword file_name: The name of the Chrome trace JSON file.  If None, only the summary tables will be printed.
+        @type file_name:    None or str
+        @keyword active:    A flag which if False will deactivate the instrumentation.
+        @type active:       bool
+        """
+
+        # This must be the master processor!
+        self.assert_on_master()
+
+        # Deactivate.
+        if not active:
+            self.trace = None
+
+        # Set up the recorder.
+        else:
+            self.trace = Trace_recorder(file_name=file_name)
+
+
+    def share_array(self, name=None, value=None, reuse=False, temporary=False):
+        """Place the array into the shared array registry and distribute it to all slaves.
+
+        The array will be sent to the slaves only once, using the most efficient mechanism of the processor fabric.  Any array previously shared under the same name is replaced.
+
+
+        @keyword name:      The name of the array.
+        @type name:         str
+        @keyword value:     The array to share.
+        @type value:        numpy array
+        @keyword reuse:     A flag which if True will cause the handle of the array already shared under the same name to be returned, without distributing the array again, if the two arrays are identical.
+        @type reuse:        bool
+        @keyword temporary: A flag which if True will cause the array to be released on the master and all slaves at the end of the next run_queue() call.
+        @type temporary:    bool
+        @return:            The handle for the array, to be stored in the slave commands instead of the array itself.
+        @rtype:             Shared_array instance
+        """
+
+        # This must be the master processor!
+        self.assert_on_master()
+
+        # Reuse the identical array.
+        if reuse and name in self._shared_array_handles:
+            old = self.shared_arrays[name][1]
+            if old.dtype == value.dtype and array_equal(old, value):
+                return self._shared_array_handles[name]
+
+        # Release the old version.
+        self.release_shared_array(name)
+
+        # The handle, with a unique key for this version of the array.
+        self._shared_array_count += 1
+        handle = Shared_array(name=name, key="%s-%i" % (name, self._shared_array_count), shape=value.shape, dtype=value.dtype.str)
+
+        # Distribute the data and store the array and handle for the master.
+        self.shared_arrays[name] = (handle.key, self._distribute_shared_array(handle, value))
+        self._shared_array_handles[name] = handle
+
+        # Release the array at the end of the next queue execution.
+        if temporary and name not in self._temporary_shared_arrays:
+            self._temporary_shared_arrays.append(name)
+
+        # Return the handle.
+        return handle
+
+
     def stdio_capture(self):
         """Enable capture of the STDOUT and STDERR.
         
@@ -694,3 +1060,90 @@ class Processor(object):
         # Restore the original streams.
         sys.stdout = self.orig_stdout
         sys.stderr = self.orig_stderr
+
+
+
+class Slave_statistics(object):
+    """Per-slave utilisation statistics collected on the master by Processor.run_command_queue()."""
+
+    def __init__(self, processor_size):
+        """Set up the statistics for all slaves.
+
+        @param processor_size:  The number of slave processors.
+        @type processor_size:   int
+        """
+
+        # The slave ranks.
+        self.ranks = list(range(1, processor_size+1))
+
+        # The statistics, indexed by slave rank.
+        self.commands = {}
+        self.busy_time = {}
+        self._dispatch_time = {}
+        for rank in self.ranks:
+            self.commands[rank] = 0
+            self.busy_time[rank] = 0.0
+
+        # The wall clock times.
+        self.start_time = time.time()
+        self.end_time = None
+
+
+    def complete(self, rank):
+        """Register the completion of the commands running on the given slave.
+
+        @param rank:    The rank of the slave.
+        @type rank:     int
+        """
+
+        # Skip unknown dispatches.
+        if rank not in self._dispatch_time:
+            return
+
+        # Add the busy time.
+        self.busy_time[rank] += time.time() - self._dispatch_time.pop(rank)
+
+
+    def dispatch(self, rank, command):
+        """Register the dispatch of a command or a chunk of commands to the given slave.
+
+        @param rank:    The rank of the slave.
+        @type rank:     int
+        @param command: The command or list of commands sent to the slave.
+        @type command:  Slave_command instance or list of Slave_command instances
+        """
+
+        # Count the commands.
+        if isinstance(command, list):
+            self.commands[rank] += len(command)
+        else:
+            self.commands[rank] += 1
+
+        # The dispatch time.
+        self._dispatch_time[rank] = time.time()
+
+
+    def finish(self):
+        """Register the end of the queue execution."""
+
+        self.end_time = time.time()
+
+
+    def print_table(self):
+        """Print out a table of the per-slave command counts, busy times and utilisation."""
+
+        # The total run time.
+        end_time = self.end_time
+        if end_time is None:
+            end_time = time.time()
+        wall_time = end_time - self.start_time
+
+        # The table.
+        sys.stdout.write("\nSlave utilisation statistics:\n")
+        sys.stdout.write("%-10s %10s %15s %15s\n" % ("Rank", "Commands", "Busy time (s)", "Utilisation"))
+        for rank in self.ranks:
+            util = 0.0
+            if wall_time > 0.0:
+                util = self.busy_time[rank] / wall_time
+            sys.stdout.write("%-10i %10i %15.3f %14.1f%%\n" % (rank, self.commands[rank], self.busy_time[rank], util*100.0))
+        sys.stdout.write("%-10s %10i %15.3f\n\n" % ("Wall time", sum(self.commands.values()), wall_time))
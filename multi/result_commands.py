@@ -68,13 +68,16 @@ class Result_command(Result):
 
 
 class Batched_result_command(Result_command):
-    def __init__(self, processor, result_commands, io_data=None, completed=True):
+    def __init__(self, processor, result_commands, io_data=None, timings=None, completed=True):
         super(Batched_result_command, self).__init__(processor=processor, completed=completed)
         self.result_commands = result_commands
 
         # Store the IO data to print out via the run() method called by the master.
         self.io_data = io_data
 
+        # The execution times of the slave commands, as a list of the command name and the start and end times relative to the end of the batch.
+        self.timings = timings
+
 
     def run(self, processor, batched_memo):
         """The results command to be run by the master.
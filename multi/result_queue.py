@@ -26,11 +26,13 @@
 # Python module imports.
 import sys
 import threading
+from time import time
 import traceback
 
 # multi module imports.
 from multi.misc import raise_unimplemented
 from multi.result_commands import Result_command, Result_exception
+from multi.trace import RESULT_TRACK
 
 # relax module imports (for Python 3 compatibility - the compat module could be bundled with this package if separate).
 from lib.compat import queue
@@ -49,6 +51,30 @@ class Result_queue(object):
         self.processor = processor
 
 
+    def process_result(self, job, put_time=None):
+        """Process the result on the master, recording the timings if tracing is active.
+
+        @param job:         The result command.
+        @type job:          Result_command instance
+        @keyword put_time:  The time at which the result was placed into the queue.
+        @type put_time:     None or float
+        """
+
+        # No tracing.
+        trace = getattr(self.processor, 'trace', None)
+        if trace == None:
+            self.processor.process_result(job)
+            return
+
+        # Process and time the result.
+        start = time()
+        self.processor.process_result(job)
+        args = None
+        if put_time != None:
+            args = {'queue latency (ms)': (start - put_time) * 1000.0}
+        trace.span(name=job.__class__.__name__, cat='result', track=RESULT_TRACK, start=start, end=time(), args=args)
+
+
     def put(self, job):
         if isinstance(job, Result_exception) :
             self.processor.process_result(job)
@@ -63,7 +89,7 @@ class Immediate_result_queue(Result_queue):
     def put(self, job):
         super(Immediate_result_queue, self).put(job)
         try:
-            self.processor.process_result(job)
+            self.process_result(job)
         except:
             traceback.print_exc(file=sys.stdout)
             # FIXME: this doesn't work because this isn't the main thread so sys.exit fails...
@@ -90,21 +116,21 @@ class Threaded_result_queue(Result_queue):
 
     def put(self, job):
         super(Threaded_result_queue, self).put(job)
-        self.queue.put_nowait(job)
+        self.queue.put_nowait((job, time()))
 
 
     def run_all(self):
-        self.queue.put_nowait(RESULT_QUEUE_EXIT_COMMAND)
+        self.queue.put_nowait((RESULT_QUEUE_EXIT_COMMAND, None))
         self.thread1.join()
 
 
     def workerThread(self):
             try:
                 while True:
-                    job = self.queue.get()
+                    job, put_time = self.queue.get()
                     if job == RESULT_QUEUE_EXIT_COMMAND:
                         break
-                    self.processor.process_result(job)
+                    self.process_result(job, put_time=put_time)
             except:
                 traceback.print_exc(file=sys.stdout)
                 # FIXME: this doesn't work because this isn't the main thread so sys.exit fails...
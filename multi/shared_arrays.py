@@ -0,0 +1,151 @@
+###############################################################################
+#                                                                             #
+# Copyright (C) 2015 Edward d'Auvergne                                        #
+#                                                                             #
+# This file is part of the program relax (http://www.nmr-relax.com).          #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+# Module docstring.
+"""The shared array registry for the zero-copy transfer of large read-only numpy arrays to the slaves.
+
+Rather than embedding large arrays into each slave command, where they are pickled and transferred for every single command, the arrays can be placed into the shared array registry of the processor on the master via multi.share_array().  This returns a small Shared_array handle which is stored in the slave commands instead.  On the slave, the handle is converted back into the array via multi.fetch_shared_array().  How the data reaches the slaves depends on the processor fabric:
+
+    - Uni-processor:  The master and slave are the same process, so the original array is simply returned.
+    - Local multi-core:  The array is copied once into a POSIX shared memory segment, and the slaves attach to this segment on first use.
+    - MPI via mpi4py:  The array is sent once to all slaves via a single MPI broadcast.
+
+The arrays returned on the slaves are read-only, and must be copied before any modification.
+"""
+
+# Python module imports.
+from numpy import dtype, ndarray
+try:
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:
+    resource_tracker = None
+    shared_memory = None
+
+
+def attach_shm_array(handle=None):
+    """Attach to the POSIX shared memory segment of the shared array handle on a slave.
+
+    @keyword handle:    The shared array handle.
+    @type handle:       Shared_array instance
+    @return:            The shared memory segment and the read-only array view of it.
+    @rtype:             multiprocessing.shared_memory.SharedMemory instance, numpy array
+    """
+
+    # Attach to the segment, without registering it with the resource tracker as the master owns the segment (Python 3.13 and higher).
+    try:
+        shm = shared_memory.SharedMemory(name=handle.shm_name, track=False)
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=handle.shm_name)
+
+        # Older Python versions register the segment on attachment, so undo this to avoid the segment being destroyed or reported as leaked when the slave exits.
+        try:
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        except Exception:
+            pass
+
+    # The read-only array view.
+    array = ndarray(handle.shape, dtype=dtype(handle.dtype), buffer=shm.buf)
+    array.flags.writeable = False
+
+    # Return the segment and array.
+    return shm, array
+
+
+def close_shm(shm=None, unlink=False):
+    """Close and optionally destroy a POSIX shared memory segment.
+
+    @keyword shm:       The shared memory segment.
+    @type shm:          multiprocessing.shared_memory.SharedMemory instance
+    @keyword unlink:    A flag which if True will cause the segment to be destroyed.  This should only be set by the owner, the master.
+    @type unlink:       bool
+    """
+
+    # Close the local mapping (this fails if arrays viewing the segment still exist, in which case the mapping will be released once these are garbage collected).
+    try:
+        shm.close()
+    except BufferError:
+        pass
+
+    # Destroy the segment.
+    if unlink:
+        try:
+            shm.unlink()
+        except OSError:
+            pass
+
+
+def create_shm_array(value=None):
+    """Copy the array into a new POSIX shared memory segment on the master.
+
+    @keyword value: The array to share.
+    @type value:    numpy array
+    @return:        The shared memory segment and the read-only array view of it.
+    @rtype:         multiprocessing.shared_memory.SharedMemory instance, numpy array
+    """
+
+    # Create the segment (zero sized segments are not allowed).
+    shm = shared_memory.SharedMemory(create=True, size=max(value.nbytes, 1))
+
+    # Copy the data.
+    array = ndarray(value.shape, dtype=value.dtype, buffer=shm.buf)
+    array[...] = value
+    array.flags.writeable = False
+
+    # Return the segment and array.
+    return shm, array
+
+
+
+class Shared_array(object):
+    """A small, picklable handle to an array in the shared array registry of the processor."""
+
+    def __init__(self, name=None, key=None, shape=None, dtype=None, shm_name=None):
+        """Set up the handle.
+
+        @keyword name:      The name of the array in the registry.
+        @type name:         str
+        @keyword key:       The unique key for this version of the array, as the same name can be reused for new data.
+        @type key:          str
+        @keyword shape:     The shape of the array.
+        @type shape:        tuple of int
+        @keyword dtype:     The numpy data type string of the array.
+        @type dtype:        str
+        @keyword shm_name:  The name of the POSIX shared memory segment, if used by the processor fabric.
+        @type shm_name:     None or str
+        """
+
+        # Store the arguments.
+        self.name = name
+        self.key = key
+        self.shape = shape
+        self.dtype = dtype
+        self.shm_name = shm_name
+
+
+    def __repr__(self):
+        """The string representation of the handle.
+
+        @return:    The representation.
+        @rtype:     str
+        """
+
+        # Return the string.
+        return "Shared_array(name=%s, key=%s, shape=%s, dtype=%s)" % (repr(self.name), repr(self.key), repr(self.shape), repr(self.dtype))
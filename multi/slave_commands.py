@@ -46,6 +46,20 @@ class Slave_command(object):
         self.memo_id = None
 
 
+    def cost(self):
+        """Estimate the relative computational cost of the command - designed for overriding.
+
+        This is called on the master by the dynamic scheduler to dispatch the most expensive commands first.  The value is only used for ordering, so it need not have any units.  Useful hints include the number of spins, the number of data points, the model type, or the number of grid points.
+
+
+        @return:    The relative cost of the command.
+        @rtype:     float
+        """
+
+        # All commands are equal by default.
+        return 1.0
+
+
     def run(self, processor, completed):
         """Run the slave command on the slave processor
         
@@ -101,6 +115,81 @@ class Exit_command(Slave_command):
 
 
 
+class Slave_release_shared_array_command(Slave_command):
+    """Special command for removing arrays from the shared array registry of the slaves."""
+
+    def __init__(self, names=None):
+        """Set up the command.
+
+        @keyword names: The names of the arrays.
+        @type names:    list of str
+        """
+
+        # Initialise the base class.
+        super(Slave_command, self).__init__()
+
+        # Store the arguments.
+        self.names = names
+
+
+    def run(self, processor, completed):
+        """Remove the arrays from the shared array registry of the slave.
+
+        @param processor:   The slave processor the command is running on.  Results from the command are returned via calls to processor.return_object.
+        @type processor:    Processor instance
+        @param completed:   The flag used in batching result returns to indicate that the sequence of batched result commands has completed.  This value should be returned via the last result object retuned by this method or methods it calls. All other Result_commands should be initialised with completed=False.  This is an optimisation to prevent the sending an extra batched result queue completion result command being sent, it may be an over early optimisation.
+        @type completed:    bool
+        """
+
+        # First return no result.
+        processor.return_object(processor.NULL_RESULT)
+
+        # Release the arrays.
+        for name in self.names:
+            processor.release_shared_array(name)
+
+
+
+class Slave_shared_array_command(Slave_command):
+    """Special command for pushing an array of the shared array registry to the slaves."""
+
+    def __init__(self, handle=None, value=None):
+        """Set up the command.
+
+        @keyword handle:    The shared array handle.
+        @type handle:       Shared_array instance
+        @keyword value:     The array.  If None, the processor fabric is expected to transfer the data itself (e.g. via an MPI broadcast).
+        @type value:        None or numpy array
+        """
+
+        # Initialise the base class.
+        super(Slave_command, self).__init__()
+
+        # Store the arguments.
+        self.handle = handle
+        self.value = value
+
+
+    def run(self, processor, completed):
+        """Store the array in the shared array registry of the slave.
+
+        @param processor:   The slave processor the command is running on.  Results from the command are returned via calls to processor.return_object.
+        @type processor:    Processor instance
+        @param completed:   The flag used in batching result returns to indicate that the sequence of batched result commands has completed.  This value should be returned via the last result object retuned by this method or methods it calls. All other Result_commands should be initialised with completed=False.  This is an optimisation to prevent the sending an extra batched result queue completion result command being sent, it may be an over early optimisation.
+        @type completed:    bool
+        """
+
+        # First return no result.
+        processor.return_object(processor.NULL_RESULT)
+
+        # Store the array.
+        processor.receive_shared_array(handle=self.handle, value=self.value)
+
+        # Remove the data in transit.
+        self.value = None
+
+
+
 class Slave_storage_command(Slave_command):
     """Special command for sending data for storage on the slaves."""
 
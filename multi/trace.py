@@ -0,0 +1,184 @@
+###############################################################################
+#                                                                             #
+# Copyright (C) 2015 Edward d'Auvergne                                        #
+#                                                                             #
+# This file is part of the program relax (http://www.nmr-relax.com).          #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+# Module docstring.
+"""Timing instrumentation of the processor queues, with export as a Chrome trace.
+
+When activated via Processor.set_trace(), the master records the following events as time spans:
+
+    - 'send':  The serialisation and sending of each command or chunk of commands to a slave.
+    - 'wait':  The time the master spends waiting for the next result from the slaves.
+    - 'slave':  The busy time of each slave, from the dispatch of a command or chunk of commands until the completion result is received.
+    - 'command':  The execution time of each individual slave command, as timed on the slave itself.
+    - 'result':  The processing of each result command on the master, including the latency of the threaded result queue.
+
+The events are written in the Chrome trace event JSON format, which can be opened in the chrome://tracing page of the Chrome and Chromium web browsers or in the Perfetto UI (https://ui.perfetto.dev).  Each processor rank is shown as a separate track, with the master as rank 0.  A summary table is printed at the end of each Processor.run_queue() call.
+"""
+
+# Python module imports.
+from json import dump
+import sys
+from time import time
+
+
+# The track ID for the result processing on the master (as the slave ranks start at 1).
+RESULT_TRACK = -1
+
+
+class Trace_recorder(object):
+    """The recorder of the timing events."""
+
+    def __init__(self, file_name=None):
+        """Set up the recorder.
+
+        @keyword file_name: The name of the Chrome trace JSON file to write.  If None, only the summary tables will be printed.
+        @type file_name:    None or str
+        """
+
+        # Store the argument.
+        self.file_name = file_name
+
+        # The time origin of the trace.
+        self.origin = time()
+
+        # The events, and the index of the first event of the current queue.
+        self.events = []
+        self.queue_start = 0
+
+        # The number of queues.
+        self.queue_count = 0
+
+
+    def finish_queue(self):
+        """Print the summary for the current queue and write the trace file."""
+
+        # Print the summary.
+        self.queue_count += 1
+        sys.stdout.write(self.format_summary(self.events[self.queue_start:], title="Timing summary of processor queue %i:" % self.queue_count))
+        self.queue_start = len(self.events)
+
+        # Write the trace.
+        if self.file_name != None:
+            self.write()
+
+
+    def format_summary(self, events, title=None):
+        """Format a table of the total, mean and maximum times for each event category and name.
+
+        @param events:  The trace events to summarise.
+        @type events:   list of dict
+        @keyword title: The title of the table.
+        @type title:    str
+        @return:        The table.
+        @rtype:         str
+        """
+
+        # Collect the statistics, with the category and name as keys and the count, total time and maximum time as values.
+        stats = {}
+        for event in events:
+            key = (event['cat'], event['name'])
+            if key not in stats:
+                stats[key] = [0, 0.0, 0.0]
+            stats[key][0] += 1
+            stats[key][1] += event['dur']
+            stats[key][2] = max(stats[key][2], event['dur'])
+
+        # The table.
+        lines = ["", title]
+        lines.append("%-10s %-40s %10s %15s %12s %12s" % ("Category", "Name", "Count", "Total (s)", "Mean (ms)", "Max (ms)"))
+        for key in sorted(stats.keys()):
+            count, total, maximum = stats[key]
+            lines.append("%-10s %-40s %10i %15.3f %12.3f %12.3f" % (key[0], key[1], count, total*1e-6, total*1e-3/count, maximum*1e-3))
+
+        # Return the table.
+        return "\n".join(lines) + "\n\n"
+
+
+    def span(self, name=None, cat=None, track=0, start=None, end=None, args=None):
+        """Record an event spanning the given time interval.
+
+        @keyword name:  The name of the event, normally the class name of the command or result.
+        @type name:     str
+        @keyword cat:   The event category.
+        @type cat:      str
+        @keyword track: The track for the event, normally the processor rank.
+        @type track:    int
+        @keyword start: The start time, as returned by time.time().
+        @type start:    float
+        @keyword end:   The end time, as returned by time.time().
+        @type end:      float
+        @keyword args:  Additional information to display for the event.
+        @type args:     None or dict
+        """
+
+        # The Chrome trace complete event, with the times in microseconds.
+        event = {
+            'name': name,
+            'cat': cat,
+            'ph': 'X',
+            'pid': 0,
+            'tid': track,
+            'ts': (start - self.origin) * 1e6,
+            'dur': max(end - start, 0.0) * 1e6
+        }
+        if args:
+            event['args'] = args
+
+        # Store the event.
+        self.events.append(event)
+
+
+    def write(self):
+        """Write all events to the Chrome trace JSON file."""
+
+        # The track names.
+        tracks = []
+        for track in sorted(set([event['tid'] for event in self.events])):
+            if track == 0:
+                label = "Master"
+            elif track == RESULT_TRACK:
+                label = "Result processing"
+            else:
+                label = "Slave %s" % track
+            tracks.append({'name': 'thread_name', 'ph': 'M', 'pid': 0, 'tid': track, 'args': {'name': label}})
+
+        # Write the file.
+        file = open(self.file_name, 'w')
+        dump({'traceEvents': tracks + self.events, 'displayTimeUnit': 'ms'}, file)
+        file.close()
+
+
+
+def command_name(command):
+    """Return the name of a command or chunk of commands for the trace events.
+
+    @param command: The command or list of commands.
+    @type command:  Slave_command instance or list of Slave_command instances
+    @return:        The name.
+    @rtype:         str
+    """
+
+    # A chunk of commands.
+    if isinstance(command, list):
+        return "Chunk of %i commands" % len(command)
+
+    # A single command.
+    return command.__class__.__name__
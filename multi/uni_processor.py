@@ -26,6 +26,7 @@
 
 # Python module imports.
 import sys, os
+from time import time
 
 # multi module imports.
 from multi.misc import Result_string
@@ -133,6 +134,32 @@ class Uni_processor(Processor):
         """Dummy function for preventing the printing of the run time."""
 
 
+    def process_result(self, result):
+        """Process the result command on the master.
+
+        @param result:  The result command.
+        @type result:   Result_command or Result_string instance
+        """
+
+        if isinstance(result, Result_command):
+            memo = None
+            if result.memo_id != None:
+                memo = self.memo_map[result.memo_id]
+            result.run(self, memo)
+            if result.memo_id != None and result.completed:
+                del self.memo_map[result.memo_id]
+
+            # Record the result in the job journal.
+            if self.journal != None:
+                self.journal.add_result(result)
+
+        elif isinstance(result, Result_string):
+            sys.stdout.write(result.string)
+        else:
+            message = 'Unexpected result type \n%s \nvalue%s' %(result.__class__.__name__, result)
+            raise Exception(message)
+
+
     def processor_size(self):
         """Return 1 as this is the uni-processor.
 
@@ -159,34 +186,48 @@ class Uni_processor(Processor):
             #FIXME: clear command queue
             #       and finalise mpi (or restart it if we can!
             raise result
-        elif isinstance(result, Result_command):
-            memo = None
-            if result.memo_id != None:
-                memo = self.memo_map[result.memo_id]
-            result.run(self, memo)
-            if result.memo_id != None and result.completed:
-                del self.memo_map[result.memo_id]
-
-        elif isinstance(result, Result_string):
-            sys.stdout.write(result.string)
         else:
-            message = 'Unexpected result type \n%s \nvalue%s' %(result.__class__.__name__, result)
-            raise Exception(message)
+            self.process_result(result)
 
 
     def run_queue(self):
         """Safely run each command in the queue, cleaning up after failures."""
 
+        # Replay the results of the already completed commands from the job journal.
+        if self.journal != None:
+            self.command_queue[:] = self.journal.filter_queue(self, self.command_queue)
+
         # Run each command in the queue.
         try:
             last_command = len(self.command_queue)-1
             for i, command  in enumerate(self.command_queue):
                 completed = (i == last_command)
 
+                start = time()
                 command.run(self, completed)
 
+                # Tracing (the results are processed within the command execution).
+                if self.trace != None:
+                    self.trace.span(name=command.__class__.__name__, cat='command', track=0, start=start, end=time())
+
+                # The command is complete, so record it in the job journal.
+                if self.journal != None:
+                    self.journal.complete(memo_ids=[command.memo_id])
+
         # Clear the queue, even if a failure occurs.
         finally:
+            # Write out all completed commands to the journal.
+            if self.journal != None:
+                self.journal.finish()
+
+            # The timing summary and trace.
+            if self.trace != None:
+                self.trace.finish_queue()
+
             #TODO: add cheques for empty queues and maps if now warn
             del self.command_queue[:]
             self.memo_map.clear()
+
+            # Release the temporary shared arrays.
+            self.release_shared_arrays(self._temporary_shared_arrays)
+            self._temporary_shared_arrays = []
@@ -25,15 +25,148 @@
 
 # Python module imports.
 from numpy import diag, ndarray, sqrt
-from random import gauss
+from random import Random, gauss
 
 # relax module imports.
+from data_store import Relax_data_store; ds = Relax_data_store()
+from data_store.align_tensor import AlignTensorData
 from lib import statistics
+from lib.compat import builtins
 from lib.errors import RelaxError
+from multi import Memo, Processor_box, Result_command, Slave_command
+from multi.uni_processor import Uni_processor
+from pipe_control import pipes
 from pipe_control.pipes import check_pipe
 from specific_analyses.api import return_api
 
 
+# The number of blocks of Monte Carlo simulations to create per slave processor, for load balancing.
+MC_BLOCKS_PER_SLAVE = 4
+
+
+def _sim_containers(pipe):
+    """Generator method for looping over all data containers which can hold Monte Carlo simulation results.
+
+    @param pipe:    The data pipe.
+    @type pipe:     PipeContainer instance
+    @return:        The unique container key and the container.
+    @rtype:         tuple of (str or tuple) and data container
+    """
+
+    # The data pipe itself.
+    yield 'pipe', pipe
+
+    # The spin containers.
+    for i in range(len(pipe.mol)):
+        for j in range(len(pipe.mol[i].res)):
+            for k in range(len(pipe.mol[i].res[j].spin)):
+                yield ('spin', i, j, k), pipe.mol[i].res[j].spin[k]
+
+    # The interatomic data containers.
+    if hasattr(pipe, 'interatomic'):
+        for i in range(len(pipe.interatomic)):
+            yield ('interatom', i), pipe.interatomic[i]
+
+    # The alignment tensors.
+    if hasattr(pipe, 'align_tensors'):
+        for i in range(len(pipe.align_tensors)):
+            yield ('align_tensor', i), pipe.align_tensors[i]
+
+
+def _sim_extract(pipe, sim_indices):
+    """Extract the values of all '*_sim' lists and '*_sim_bc' dictionaries of the data pipe for the given simulations.
+
+    @param pipe:        The data pipe.
+    @type pipe:         PipeContainer instance
+    @param sim_indices: The indices of the Monte Carlo simulations to extract.
+    @type sim_indices:  list of int
+    @return:            The simulation values, as a dictionary of container keys and dictionaries of the '*_sim' names and lists of values for the simulations (or dictionaries of such lists for the '*_sim_bc' back-calculated data).
+    @rtype:             dict of dict of list or dict
+    """
+
+    # Loop over the containers.
+    sim_data = {}
+    for key, container in _sim_containers(pipe):
+        for name, value in list(vars(container).items()):
+            # The back-calculated simulation data, as dictionaries of simulation lists (for example the alignment ID keyed PCS and RDC values).
+            if name.endswith('_sim_bc') and isinstance(value, dict):
+                values = {}
+                for id in value:
+                    if isinstance(value[id], list) and len(value[id]) == pipe.sim_number:
+                        values[id] = [value[id][i] for i in sim_indices]
+                if len(values):
+                    if key not in sim_data:
+                        sim_data[key] = {}
+                    sim_data[key][name] = values
+                continue
+
+            # Only the simulation lists.
+            if not name.endswith('_sim') or not isinstance(value, list) or len(value) != pipe.sim_number:
+                continue
+
+            # Only the modifiable alignment tensor parameters, as all others are updated from these.
+            if isinstance(container, AlignTensorData) and name not in container._mod_attr:
+                continue
+
+            # Store the values.
+            if key not in sim_data:
+                sim_data[key] = {}
+            sim_data[key][name] = [value[i] for i in sim_indices]
+
+    # Return the data.
+    return sim_data
+
+
+def _sim_merge(pipe, sim_indices, sim_data):
+    """Merge the simulation values from _sim_extract() back into the '*_sim' lists and '*_sim_bc' dictionaries of the data pipe.
+
+    @param pipe:        The data pipe.
+    @type pipe:         PipeContainer instance
+    @param sim_indices: The indices of the Monte Carlo simulations.
+    @type sim_indices:  list of int
+    @param sim_data:    The simulation values from the _sim_extract() function.
+    @type sim_data:     dict of dict of list or dict
+    """
+
+    # Loop over the containers.
+    for key, container in _sim_containers(pipe):
+        # No data.
+        if key not in sim_data:
+            continue
+
+        # Loop over the simulation structures.
+        for name in sim_data[key]:
+            values = sim_data[key][name]
+
+            # The read-only alignment tensors, set via the tensor method so that all dependent simulation values are updated.
+            if isinstance(container, AlignTensorData):
+                for i in range(len(sim_indices)):
+                    if values[i] != None:
+                        container.set(param=name[:-4], value=values[i], category='sim', sim_index=sim_indices[i])
+                continue
+
+            # The back-calculated simulation data.
+            if isinstance(values, dict):
+                if not isinstance(getattr(container, name, None), dict):
+                    setattr(container, name, {})
+                sim_dict = getattr(container, name)
+                for id in values:
+                    if not isinstance(sim_dict.get(id), list) or len(sim_dict[id]) != pipe.sim_number:
+                        sim_dict[id] = [None]*pipe.sim_number
+                    for i in range(len(sim_indices)):
+                        sim_dict[id][sim_indices[i]] = values[id][i]
+                continue
+
+            # Initialise the list if needed.
+            if not isinstance(getattr(container, name, None), list) or len(getattr(container, name)) != pipe.sim_number:
+                setattr(container, name, [None]*pipe.sim_number)
+
+            # Store the values.
+            sim_obj = getattr(container, name)
+            for i in range(len(sim_indices)):
+                sim_obj[sim_indices[i]] = values[i]
+
+
 def covariance_matrix(epsrel=0.0, verbosity=2):
     """Estimate model parameter errors via the covariance matrix technique.
 
@@ -73,7 +206,7 @@ def covariance_matrix(epsrel=0.0, verbosity=2):
             index = index + 1
 
 
-def monte_carlo_create_data(method=None, distribution=None, fixed_error=None):
+def monte_carlo_create_data(method=None, distribution=None, fixed_error=None, seed=None):
     """Function for creating simulation data.
 
     @keyword method:        The type of Monte Carlo simulation to perform.
@@ -82,6 +215,8 @@ def monte_carlo_create_data(method=None, distribution=None, fixed_error=None):
     @type distribution:     str
     @keyword fixed_error:   If distribution is set to 'fixed', use this value as the standard deviation for the gauss distribution.
     @type fixed_error:      float
+    @keyword seed:          The optional random number generator seed.  If supplied, each simulation will be randomised using its own independent random number stream derived from this seed, so that the simulation data is reproducible.
+    @type seed:             None or int
     """
 
     # Test if the current data pipe exists.
@@ -112,6 +247,12 @@ def monte_carlo_create_data(method=None, distribution=None, fixed_error=None):
     # The specific analysis API object.
     api = return_api()
 
+    # The Gaussian random number generators for each simulation.
+    if seed == None:
+        sim_gauss = [gauss] * cdp.sim_number
+    else:
+        sim_gauss = [Random("%s-%i" % (seed, j)).gauss for j in range(cdp.sim_number)]
+
     # Loop over the models.
     for data_index in api.base_data_loop():
         # Create the Monte Carlo data.
@@ -148,10 +289,10 @@ def monte_carlo_create_data(method=None, distribution=None, fixed_error=None):
 
                     # Gaussian randomisation.
                     if distribution == 'fixed':
-                        random[j].append(gauss(data[k], float(fixed_error)))
+                        random[j].append(sim_gauss[j](data[k], float(fixed_error)))
 
                     else:
-                        random[j].append(gauss(data[k], error[k]))
+                        random[j].append(sim_gauss[j](data[k], error[k]))
 
         # Dictionary type data.
         if isinstance(data, dict):
@@ -169,7 +310,7 @@ def monte_carlo_create_data(method=None, distribution=None, fixed_error=None):
                     # If errors are drawn from the reduced chi2 distribution.
                     if distribution == 'red_chi2':
                         # Gaussian randomisation, centered at 0, with width of reduced chi2 distribution.
-                        g_error = gauss(0.0, error_red_chi2[id])
+                        g_error = sim_gauss[j](0.0, error_red_chi2[id])
 
                         # We need to scale the gauss error, before adding to datapoint.
                         new_point = data[id] + g_error * error[id]
@@ -177,12 +318,12 @@ def monte_carlo_create_data(method=None, distribution=None, fixed_error=None):
                     # If errors are drawn from fixed distribution.
                     elif distribution == 'fixed':
                         # Gaussian randomisation, centered at data point, with width of fixed error.
-                        new_point = gauss(data[id], float(fixed_error))
+                        new_point = sim_gauss[j](data[id], float(fixed_error))
 
                     # If errors are drawn from measured values.
                     else:
                         # Gaussian randomisation, centered at data point, with width of measured error.
-                        new_point = gauss(data[id], error[id])
+                        new_point = sim_gauss[j](data[id], error[id])
 
                     # Assign datapoint the new value.
                     random[j][id] = new_point
@@ -298,6 +439,50 @@ def monte_carlo_initial_values():
     api.sim_init_values()
 
 
+def monte_carlo_minimise_blocks(min_algor=None, min_options=None, func_tol=None, grad_tol=None, max_iterations=None, constraints=False, scaling_matrix=None, verbosity=0):
+    """Queue the optimisation of the Monte Carlo simulations as independent blocks of simulations on the slave processors.
+
+    Each block is sent to a slave together with a copy of the current data pipe.  The slave optimises the simulations of the block and returns the contents of all '*_sim' lists for these simulations, which are then merged back into the data pipe on the master.  The simulation data must have already been created, and the minimisation statistics reset.  The commands are executed by the next call to the processor's run_queue() method.
+
+
+    @keyword min_algor:         The minimisation algorithm to use.
+    @type min_algor:            str
+    @keyword min_options:       An array of options to be used by the minimisation algorithm.
+    @type min_options:          array of str
+    @keyword func_tol:          The function tolerance which, when reached, terminates optimisation.  Setting this to None turns of the check.
+    @type func_tol:             None or float
+    @keyword grad_tol:          The gradient tolerance which, when reached, terminates optimisation.  Setting this to None turns of the check.
+    @type grad_tol:             None or float
+    @keyword max_iterations:    The maximum number of iterations for the algorithm.
+    @type max_iterations:       int
+    @keyword constraints:       If True, constraints are used during optimisation.
+    @type constraints:          bool
+    @keyword scaling_matrix:    The per-model list of diagonal and square scaling matrices.
+    @type scaling_matrix:       list of numpy rank-2, float64 array or list of None
+    @keyword verbosity:         The amount of information to print.  The higher the value, the greater the verbosity.
+    @type verbosity:            int
+    """
+
+    # Test if simulations have been set up.
+    if not hasattr(cdp, 'sim_state'):
+        raise RelaxError("Monte Carlo simulations have not been set up.")
+
+    # The processor.
+    processor = Processor_box().processor
+
+    # Split the simulations into blocks.
+    block_num = min(cdp.sim_number, MC_BLOCKS_PER_SLAVE * processor.processor_size())
+    blocks = []
+    for i in range(block_num):
+        blocks.append(list(range(i, cdp.sim_number, block_num)))
+
+    # Queue the blocks.
+    for sim_indices in blocks:
+        command = MC_sim_block_command(pipe_name=pipes.cdp_name(), pipe=cdp, sim_indices=sim_indices, min_algor=min_algor, min_options=min_options, func_tol=func_tol, grad_tol=grad_tol, max_iterations=max_iterations, constraints=constraints, scaling_matrix=scaling_matrix, verbosity=verbosity)
+        memo = MC_sim_block_memo(pipe_name=pipes.cdp_name(), sim_indices=sim_indices)
+        processor.add_to_queue(command, memo)
+
+
 def monte_carlo_off():
     """Turn simulations off."""
 
@@ -384,3 +569,153 @@ def monte_carlo_setup(number=None, all_select_sim=None):
 
     # Select all simulations.
     monte_carlo_select_all_sims(number=number, all_select_sim=all_select_sim)
+
+
+
+class MC_sim_block_command(Slave_command):
+    """Command class for the optimisation of a block of Monte Carlo simulations on the slave processor."""
+
+    def __init__(self, pipe_name=None, pipe=None, sim_indices=None, min_algor=None, min_options=None, func_tol=None, grad_tol=None, max_iterations=None, constraints=False, scaling_matrix=None, verbosity=0):
+        """Store all the master data to be sent to the slave processor.
+
+        @keyword pipe_name:         The name of the data pipe.
+        @type pipe_name:            str
+        @keyword pipe:              The data pipe.  This is copied to the slave.
+        @type pipe:                 PipeContainer instance
+        @keyword sim_indices:       The indices of the Monte Carlo simulations to optimise.
+        @type sim_indices:          list of int
+        @keyword min_algor:         The minimisation algorithm to use.
+        @type min_algor:            str
+        @keyword min_options:       An array of options to be used by the minimisation algorithm.
+        @type min_options:          array of str
+        @keyword func_tol:          The function tolerance which, when reached, terminates optimisation.  Setting this to None turns of the check.
+        @type func_tol:             None or float
+        @keyword grad_tol:          The gradient tolerance which, when reached, terminates optimisation.  Setting this to None turns of the check.
+        @type grad_tol:             None or float
+        @keyword max_iterations:    The maximum number of iterations for the algorithm.
+        @type max_iterations:       int
+        @keyword constraints:       If True, constraints are used during optimisation.
+        @type constraints:          bool
+        @keyword scaling_matrix:    The per-model list of diagonal and square scaling matrices.
+        @type scaling_matrix:       list of numpy rank-2, float64 array or list of None
+        @keyword verbosity:         The amount of information to print.  The higher the value, the greater the verbosity.
+        @type verbosity:            int
+        """
+
+        # Execute the base class __init__() method.
+        super(MC_sim_block_command, self).__init__()
+
+        # Store the arguments.
+        self.pipe_name = pipe_name
+        self.pipe = pipe
+        self.sim_indices = sim_indices
+        self.min_algor = min_algor
+        self.min_options = min_options
+        self.func_tol = func_tol
+        self.grad_tol = grad_tol
+        self.max_iterations = max_iterations
+        self.constraints = constraints
+        self.scaling_matrix = scaling_matrix
+        self.verbosity = verbosity
+
+
+    def cost(self):
+        """Estimate the relative computational cost of the block for the dynamic scheduler.
+
+        @return:    The number of simulations in the block.
+        @rtype:     float
+        """
+
+        return float(len(self.sim_indices))
+
+
+    def run(self, processor, completed):
+        """Optimise the block of simulations on the slave."""
+
+        # Install the data pipe on the slave.
+        ds[self.pipe_name] = self.pipe
+        pipes.switch(self.pipe_name)
+
+        # Any commands queued by the analysis are executed directly on this slave via a uni-processor.
+        processor_box = Processor_box()
+        orig_processor = processor_box.processor
+        processor_box.processor = Uni_processor(processor_size=1, callback=None)
+
+        # Optimise each simulation.
+        try:
+            api = return_api()
+            for i in self.sim_indices:
+                api.minimise(min_algor=self.min_algor, min_options=self.min_options, func_tol=self.func_tol, grad_tol=self.grad_tol, max_iterations=self.max_iterations, constraints=self.constraints, scaling_matrix=self.scaling_matrix, verbosity=self.verbosity, sim_index=i)
+                processor_box.processor.run_queue()
+
+            # Extract the results.
+            sim_data = _sim_extract(cdp, self.sim_indices)
+
+        # Restore the processor and remove the data pipe.
+        finally:
+            processor_box.processor = orig_processor
+            del ds[self.pipe_name]
+            ds.current_pipe = None
+            builtins.cdp = None
+
+        # Return the results.
+        processor.return_object(MC_sim_block_result_command(processor=processor, memo_id=self.memo_id, sim_data=sim_data, completed=False))
+
+
+
+class MC_sim_block_memo(Memo):
+    """The memo class for the Monte Carlo simulation blocks."""
+
+    def __init__(self, pipe_name=None, sim_indices=None):
+        """Store the data required on the master for merging the results.
+
+        @keyword pipe_name:     The name of the data pipe.
+        @type pipe_name:        str
+        @keyword sim_indices:   The indices of the Monte Carlo simulations of the block.
+        @type sim_indices:      list of int
+        """
+
+        # Execute the base class __init__() method.
+        super(MC_sim_block_memo, self).__init__()
+
+        # Store the arguments.
+        self.pipe_name = pipe_name
+        self.sim_indices = sim_indices
+
+
+
+class MC_sim_block_result_command(Result_command):
+    """Class for merging the results of a block of Monte Carlo simulations on the master."""
+
+    def __init__(self, processor=None, memo_id=None, sim_data=None, completed=True):
+        """Set up this class object on the slave, placing the simulation results here.
+
+        @keyword processor: The processor object.
+        @type processor:    multi.processor.Processor instance
+        @keyword memo_id:   The memo identification string.
+        @type memo_id:      str
+        @keyword sim_data:  The simulation results from the _sim_extract() function.
+        @type sim_data:     dict of dict of list
+        @keyword completed: A flag which if True signals that the optimisation successfully completed.
+        @type completed:    bool
+        """
+
+        # Execute the base class __init__() method.
+        super(MC_sim_block_result_command, self).__init__(processor=processor, completed=completed)
+
+        # Store the arguments.
+        self.memo_id = memo_id
+        self.sim_data = sim_data
+
+
+    def run(self, processor, memo):
+        """Merge the results into the data pipe on the master.
+
+        @param processor:   The processor object.
+        @type processor:    multi.processor.Processor instance
+        @param memo:        The Monte Carlo simulation block memo.
+        @type memo:         MC_sim_block_memo instance
+        """
+
+        # Merge the results.
+        _sim_merge(pipes.get_pipe(memo.pipe_name), memo.sim_indices, self.sim_data)
@@ -32,6 +32,7 @@ from lib.errors import RelaxError, RelaxIntListIntError, RelaxLenError
 from lib.float import isNaN
 from lib.io import write_data
 from multi import Processor_box
+from pipe_control.error_analysis import monte_carlo_minimise_blocks
 from pipe_control.mol_res_spin import return_spin, spin_loop
 from pipe_control import pipes
 from pipe_control.pipes import check_pipe
@@ -496,6 +497,24 @@ def minimise(min_algor=None, line_search=None, hessian_mod=None, hessian_type=No
         # Optimise.
         api.minimise(min_algor=min_algor, min_options=min_options, func_tol=func_tol, grad_tol=grad_tol, max_iterations=max_iter, constraints=constraints, scaling_matrix=scaling_matrix, verbosity=verbosity, sim_index=sim_index)
 
+    # Monte Carlo simulation minimisation with the simulations of each model optimised together.
+    elif hasattr(cdp, 'sim_state') and cdp.sim_state == 1 and api.sim_batch_optimisation(min_algor=min_algor, min_options=min_options):
+        # Reset the minimisation statistics.
+        for i in range(cdp.sim_number):
+            reset_min_stats(sim_index=i, verbosity=verbosity)
+
+        # Optimise.
+        api.minimise_sims(min_algor=min_algor, min_options=min_options, func_tol=func_tol, grad_tol=grad_tol, max_iterations=max_iter, constraints=constraints, scaling_matrix=scaling_matrix, verbosity=verbosity-1, sim_indices=list(range(cdp.sim_number)))
+
+    # Monte Carlo simulation minimisation as independent blocks of simulations on the slave processors.
+    elif hasattr(cdp, 'sim_state') and cdp.sim_state == 1 and processor.processor_size() > 1 and api.sim_block_optimisation():
+        # Reset the minimisation statistics.
+        for i in range(cdp.sim_number):
+            reset_min_stats(sim_index=i, verbosity=verbosity)
+
+        # Queue the simulation blocks.
+        monte_carlo_minimise_blocks(min_algor=min_algor, min_options=min_options, func_tol=func_tol, grad_tol=grad_tol, max_iterations=max_iter, constraints=constraints, scaling_matrix=scaling_matrix, verbosity=verbosity-1)
+
     # Monte Carlo simulation minimisation.
     elif hasattr(cdp, 'sim_state') and cdp.sim_state == 1:
         for i in range(cdp.sim_number):
@@ -89,6 +89,9 @@ def start(mode=None, profile_flag=False):
         relax.tee_file = None
         relax.multiprocessor_type = 'uni'
         relax.n_processors = 1
+        relax.journal = None
+        relax.trace = None
+        relax.static_scheduling = False
 
     # Process the command line arguments.
     else:
@@ -104,6 +107,18 @@ def start(mode=None, profile_flag=False):
         verbosity = 1
     processor = load_multiprocessor(relax.multiprocessor_type, callbacks, processor_size=relax.n_processors, verbosity=verbosity)
 
+    # Activate the job journal on the master.
+    if relax.journal and processor.on_master():
+        processor.set_journal(file_name=relax.journal, checkpoint_freq=relax.checkpoint_freq)
+
+    # Activate the timing instrumentation on the master.
+    if relax.trace and processor.on_master():
+        processor.set_trace(file_name=relax.trace)
+
+    # Switch to the static scheduling of the processor queues on the master.
+    if relax.static_scheduling and processor.on_master():
+        processor.set_dynamic_scheduling(False)
+
     # Place the processor fabric intro string into the info box.
     info = Info_box()
     info.multi_processor_string = processor.get_intro_string()
@@ -289,8 +304,12 @@ class Relax:
 
         # Recognised command line arguments for the multiprocessor.
         group = parser.add_argument_group('Multi-processor arguments', description="The arguments allowing relax to run in multi-processor environments.")
-        group.add_argument('-m', '--multi', action='store', type=str, dest='multiprocessor', default='uni', help='set multi processor method to one of \'uni\' or \'mpi4py\'')
+        group.add_argument('-m', '--multi', action='store', type=str, dest='multiprocessor', default='uni', help='set multi processor method to one of \'uni\', \'local\' or \'mpi4py\'')
         group.add_argument('-n', '--processors', action='store', type=int, dest='n_processors', default=-1, help='set number of processors (may be ignored)')
+        group.add_argument('--journal', action='store', type=str, dest='journal', help='record the completed calculations of the processor queues in the job journal JOURNAL_FILE, and skip the calculations already recorded in the file when restarting relax', metavar='JOURNAL_FILE')
+        group.add_argument('--trace', action='store', type=str, dest='trace', help='record the timings of the processor queues, printing a summary at the end of each queue and writing all events to TRACE_FILE in the Chrome trace JSON format', metavar='TRACE_FILE')
+        group.add_argument('--checkpoint-freq', action='store', type=int, dest='checkpoint_freq', default=1, help='the number of completed calculations to accumulate before writing to the job journal (default 1)', metavar='N')
+        group.add_argument('--static-scheduling', action='store_true', dest='static_scheduling', default=0, help='send the processor queues to the slaves as fixed chunks of calculations in the queue order, rather than sending the most expensive calculations first to the slaves as they become idle')
 
         # Recognised command line arguments for IO redirection.
         group = parser.add_argument_group('IO redirection arguments', description="The arguments for sending relax output into a file.")
@@ -403,11 +422,23 @@ class Relax:
                     parser.error("The script file '%s' does not exist." % self.script_file)
 
         # Set the multi-processor type and number.
-        if args.multiprocessor not in ['uni', 'mpi4py']:
+        if args.multiprocessor not in ['uni', 'local', 'mpi4py']:
             parser.error("The processor type '%s' is not supported.\n" % args.multiprocessor)
         self.multiprocessor_type = args.multiprocessor
         self.n_processors = args.n_processors
 
+        # The queue timing trace.
+        self.trace = args.trace
+
+        # The static scheduling of the processor queues.
+        self.static_scheduling = args.static_scheduling
+
+        # The job journal.
+        self.journal = args.journal
+        self.checkpoint_freq = args.checkpoint_freq
+        if self.checkpoint_freq < 1:
+            parser.error("The checkpoint frequency must be a positive integer.")
+
         # Checks for the multiprocessor mode.
         if self.multiprocessor_type == 'mpi4py' and not dep_check.mpi4py_module:
             parser.error(dep_check.mpi4py_message)
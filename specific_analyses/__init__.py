@@ -30,6 +30,7 @@ __all__ = [
     'api_common',
     'consistency_tests',
     'frame_order',
+    'grid_split',
     'hybrid',
     'jw_mapping',
     'model_free',
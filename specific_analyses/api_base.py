@@ -23,8 +23,13 @@
 # Module docstring.
 """The module defining the analysis specific API."""
 
+# Python module imports.
+from minfx.grid import grid, grid_split
+
 # relax module imports.
 from lib.errors import RelaxImplementError
+from multi import Processor_box
+from specific_analyses.grid_split import Grid_split_command, Grid_split_memo, reduce_grid_results
 
 
 class API_base(object):
@@ -347,6 +352,59 @@ class API_base(object):
         raise RelaxImplementError('grid_search')
 
 
+    def grid_search_split(self, func=None, lower=None, upper=None, inc=None, A=None, b=None, verbosity=1):
+        """Perform a grid search of the target function on the master, split across all slave processors.
+
+        This is a generic facility for the analyses which perform their grid search directly on the master.  The grid is divided into one subdivision per slave processor, with the points violating the linear constraints A.x >= b eliminated, and each subdivision is sent to the slaves as a separate job.  The best point of all subdivisions is then returned.  For the uni-processor fabric, the normal minfx grid search is performed instead.
+
+
+        @keyword func:      The target function.  If a bound method, the target function class instance must be picklable so that it can be sent to the slaves.
+        @type func:         callable
+        @keyword lower:     The lower bounds of the grid search.
+        @type lower:        list of float
+        @keyword upper:     The upper bounds of the grid search.
+        @type upper:        list of float
+        @keyword inc:       The number of increments for each dimension of the grid search.
+        @type inc:          list of int
+        @keyword A:         The linear constraint matrix.
+        @type A:            None or numpy rank-2 float64 array
+        @keyword b:         The linear constraint scalar vector.
+        @type b:            None or numpy rank-1 float64 array
+        @keyword verbosity: The amount of information to print.  The higher the value, the greater the verbosity.
+        @type verbosity:    int
+        @return:            The parameter vector and function value of the best grid point, the number of function calls, and the warning, as for the minfx grid() function.
+        @rtype:             tuple of numpy rank-1 float64 array, float, int, None or str
+        """
+
+        # Get the Processor box singleton (it contains the Processor instance) and alias the Processor.
+        processor_box = Processor_box()
+        processor = processor_box.processor
+
+        # Uni-processor operation.
+        if processor.processor_size() == 1:
+            return grid(func=func, args=(), num_incs=inc, lower=lower, upper=upper, A=A, b=b, verbosity=verbosity)
+
+        # Printout.
+        if verbosity:
+            print("Parallelised grid search.")
+
+        # Loop over each grid subdivision, with all points violating constraints being eliminated.
+        results = []
+        for index, subdivision in enumerate(grid_split(divisions=processor.processor_size(), lower=lower, upper=upper, inc=inc, A=A, b=b, verbosity=verbosity)):
+            # Skip empty subdivisions.
+            if not len(subdivision):
+                continue
+
+            # Add the slave command and the memo of the subdivision, sharing the result list, to the processor queue.
+            processor.add_to_queue(Grid_split_command(func=func, points=subdivision, verbosity=verbosity), Grid_split_memo(index=index, results=results))
+
+        # Execute the queued elements.
+        processor.run_queue()
+
+        # Return the best point.
+        return reduce_grid_results(results)
+
+
     def has_errors(self):
         """Test if errors exist for the current data pipe.
 
@@ -419,6 +477,33 @@ class API_base(object):
         raise RelaxImplementError('minimise')
 
 
+    def minimise_sims(self, min_algor=None, min_options=None, func_tol=None, grad_tol=None, max_iterations=None, constraints=False, scaling_matrix=None, verbosity=0, sim_indices=None):
+        """Minimisation of all Monte Carlo simulations together, for the analyses supporting the batched optimisation of the simulations.
+
+        @keyword min_algor:         The minimisation algorithm to use.
+        @type min_algor:            str
+        @keyword min_options:       An array of options to be used by the minimisation algorithm.
+        @type min_options:          array of str
+        @keyword func_tol:          The function tolerance which, when reached, terminates optimisation.  Setting this to None turns of the check.
+        @type func_tol:             None or float
+        @keyword grad_tol:          The gradient tolerance which, when reached, terminates optimisation.  Setting this to None turns of the check.
+        @type grad_tol:             None or float
+        @keyword max_iterations:    The maximum number of iterations for the algorithm.
+        @type max_iterations:       int
+        @keyword constraints:       If True, constraints are used during optimisation.
+        @type constraints:          bool
+        @keyword scaling_matrix:    The per-model list of diagonal and square scaling matrices.
+        @type scaling_matrix:       list of numpy rank-2, float64 array or list of None
+        @keyword verbosity:         The amount of information to print.  The higher the value, the greater the verbosity.
+        @type verbosity:            int
+        @keyword sim_indices:       The indices of the simulations to optimise.
+        @type sim_indices:          list of int
+        """
+
+        # Not implemented.
+        raise RelaxImplementError('minimise_sims')
+
+
     def model_desc(self, model_info=None):
         """Return a description of the model.
 
@@ -749,6 +834,35 @@ class API_base(object):
         raise RelaxImplementError('set_update')
 
 
+    def sim_batch_optimisation(self, min_algor=None, min_options=None):
+        """Determine if all Monte Carlo simulations can be optimised together via the minimise_sims() method.
+
+        @keyword min_algor:     The minimisation algorithm to use.
+        @type min_algor:        str
+        @keyword min_options:   An array of options to be used by the minimisation algorithm.
+        @type min_options:      array of str
+        @return:                True if batched optimisation of the simulations is supported for the algorithm, False otherwise.
+        @rtype:                 bool
+        """
+
+        # Not supported by default.
+        return False
+
+
+    def sim_block_optimisation(self):
+        """Determine if the Monte Carlo simulations can be optimised as independent blocks of simulations on the slave processors.
+
+        For this, all of the simulation results must be stored in the '*_sim' lists or '*_sim_bc' dictionaries of the data pipe, spin, interatomic and alignment tensor data containers.
+
+
+        @return:    True if block optimisation of the simulations is supported, False otherwise.
+        @rtype:     bool
+        """
+
+        # Not supported by default.
+        return False
+
+
     def sim_init_values(self):
         """Initialise the Monte Carlo parameter values."""
 
@@ -42,7 +42,7 @@ from specific_analyses.api_base import API_base
 from specific_analyses.api_common import API_common
 from specific_analyses.frame_order.checks import check_pivot
 from specific_analyses.frame_order.data import domain_moving
-from specific_analyses.frame_order.optimisation import Frame_order_grid_command, Frame_order_memo, Frame_order_minimise_command, count_sobol_points, grid_row, store_bc_data, target_fn_data_setup
+from specific_analyses.frame_order.optimisation import Frame_order_grid_command, Frame_order_memo, Frame_order_minimise_command, count_sobol_points, grid_row, share_target_fn_data, store_bc_data, target_fn_data_setup
 from specific_analyses.frame_order.parameter_object import Frame_order_params
 from specific_analyses.frame_order.parameters import assemble_param_vector, linear_constraints, param_num, update_model
 from target_functions import frame_order
@@ -135,13 +135,17 @@ class Frame_order(API_base, API_common):
         # The numeric integration information.
         if not hasattr(cdp, 'quad_int'):
             cdp.quad_int = False
-        sobol_max_points, sobol_oversample = None, None
+        sobol_max_points, sobol_oversample, sobol_tol, sobol_cache_dir = None, None, None, None
         if hasattr(cdp, 'sobol_max_points'):
             sobol_max_points = cdp.sobol_max_points
             sobol_oversample = cdp.sobol_oversample
+        if hasattr(cdp, 'sobol_tol'):
+            sobol_tol = cdp.sobol_tol
+        if hasattr(cdp, 'sobol_cache_dir'):
+            sobol_cache_dir = cdp.sobol_cache_dir
 
         # Set up the optimisation target function class.
-        target_fn = frame_order.Frame_order(model=cdp.model, init_params=param_vector, full_tensors=full_tensors, full_in_ref_frame=full_in_ref_frame, rdcs=rdcs, rdc_errors=rdc_err, rdc_weights=rdc_weight, rdc_vect=rdc_vect, dip_const=rdc_const, pcs=pcs, pcs_errors=pcs_err, pcs_weights=pcs_weight, atomic_pos=atomic_pos, temp=temp, frq=frq, paramag_centre=paramag_centre, com=com, ave_pos_pivot=ave_pos_pivot, pivot=pivot, pivot_opt=pivot_opt, sobol_max_points=sobol_max_points, sobol_oversample=sobol_oversample, quad_int=cdp.quad_int)
+        target_fn = frame_order.Frame_order(model=cdp.model, init_params=param_vector, full_tensors=full_tensors, full_in_ref_frame=full_in_ref_frame, rdcs=rdcs, rdc_errors=rdc_err, rdc_weights=rdc_weight, rdc_vect=rdc_vect, dip_const=rdc_const, pcs=pcs, pcs_errors=pcs_err, pcs_weights=pcs_weight, atomic_pos=atomic_pos, temp=temp, frq=frq, paramag_centre=paramag_centre, com=com, ave_pos_pivot=ave_pos_pivot, pivot=pivot, pivot_opt=pivot_opt, sobol_max_points=sobol_max_points, sobol_oversample=sobol_oversample, sobol_tol=sobol_tol, sobol_cache_dir=sobol_cache_dir, quad_int=cdp.quad_int)
 
         # Make a single function call.  This will cause back calculation and the data will be stored in the class instance.
         chi2 = target_fn.func(param_vector)
@@ -466,14 +470,21 @@ class Frame_order(API_base, API_common):
         # The numeric integration information.
         if not hasattr(cdp, 'quad_int'):
             cdp.quad_int = False
-        sobol_max_points, sobol_oversample = None, None
+        sobol_max_points, sobol_oversample, sobol_tol, sobol_cache_dir = None, None, None, None
         if hasattr(cdp, 'sobol_max_points'):
             sobol_max_points = cdp.sobol_max_points
             sobol_oversample = cdp.sobol_oversample
+        if hasattr(cdp, 'sobol_tol'):
+            sobol_tol = cdp.sobol_tol
+        if hasattr(cdp, 'sobol_cache_dir'):
+            sobol_cache_dir = cdp.sobol_cache_dir
 
         # Set up the data structures for the target function.
         param_vector, full_tensors, full_in_ref_frame, rdcs, rdc_err, rdc_weight, rdc_vect, rdc_const, pcs, pcs_err, pcs_weight, atomic_pos, temp, frq, paramag_centre, com, ave_pos_pivot, pivot, pivot_opt = target_fn_data_setup(sim_index=sim_index, verbosity=verbosity)
 
+        # Place the large data structures into the shared array registry so that these are sent to the slaves only once.
+        full_tensors, rdcs, rdc_err, rdc_weight, rdc_vect, rdc_const, pcs, pcs_err, pcs_weight, atomic_pos = share_target_fn_data(data=[full_tensors, rdcs, rdc_err, rdc_weight, rdc_vect, rdc_const, pcs, pcs_err, pcs_weight, atomic_pos], sim_index=sim_index)
+
         # Get the Processor box singleton (it contains the Processor instance) and alias the Processor.
         processor_box = Processor_box() 
         processor = processor_box.processor
@@ -493,7 +504,7 @@ class Frame_order(API_base, API_common):
             memo = Frame_order_memo(sim_index=sim_index, scaling_matrix=scaling_matrix[0])
 
             # Set up the command object to send to the slave and execute.
-            command = Frame_order_grid_command(points=subdivision, scaling_matrix=scaling_matrix[0], sim_index=sim_index, model=cdp.model, param_vector=param_vector, full_tensors=full_tensors, full_in_ref_frame=full_in_ref_frame, rdcs=rdcs, rdc_err=rdc_err, rdc_weight=rdc_weight, rdc_vect=rdc_vect, rdc_const=rdc_const, pcs=pcs, pcs_err=pcs_err, pcs_weight=pcs_weight, atomic_pos=atomic_pos, temp=temp, frq=frq, paramag_centre=paramag_centre, com=com, ave_pos_pivot=ave_pos_pivot, pivot=pivot, pivot_opt=pivot_opt, sobol_max_points=sobol_max_points, sobol_oversample=sobol_oversample, verbosity=verbosity, quad_int=cdp.quad_int)
+            command = Frame_order_grid_command(points=subdivision, scaling_matrix=scaling_matrix[0], sim_index=sim_index, model=cdp.model, param_vector=param_vector, full_tensors=full_tensors, full_in_ref_frame=full_in_ref_frame, rdcs=rdcs, rdc_err=rdc_err, rdc_weight=rdc_weight, rdc_vect=rdc_vect, rdc_const=rdc_const, pcs=pcs, pcs_err=pcs_err, pcs_weight=pcs_weight, atomic_pos=atomic_pos, temp=temp, frq=frq, paramag_centre=paramag_centre, com=com, ave_pos_pivot=ave_pos_pivot, pivot=pivot, pivot_opt=pivot_opt, sobol_max_points=sobol_max_points, sobol_oversample=sobol_oversample, sobol_tol=sobol_tol, sobol_cache_dir=sobol_cache_dir, verbosity=verbosity, quad_int=cdp.quad_int)
 
             # Add the slave command and memo to the processor queue.
             processor.add_to_queue(command, memo)
@@ -579,10 +590,17 @@ class Frame_order(API_base, API_common):
         # The numeric integration information.
         if not hasattr(cdp, 'quad_int'):
             cdp.quad_int = False
-        sobol_max_points, sobol_oversample = None, None
+        sobol_max_points, sobol_oversample, sobol_tol, sobol_cache_dir = None, None, None, None
         if hasattr(cdp, 'sobol_max_points'):
             sobol_max_points = cdp.sobol_max_points
             sobol_oversample = cdp.sobol_oversample
+        if hasattr(cdp, 'sobol_tol'):
+            sobol_tol = cdp.sobol_tol
+        if hasattr(cdp, 'sobol_cache_dir'):
+            sobol_cache_dir = cdp.sobol_cache_dir
+
+        # Place the large data structures into the shared array registry so that these are sent to the slaves only once.
+        full_tensors, rdcs, rdc_err, rdc_weight, rdc_vect, rdc_const, pcs, pcs_err, pcs_weight, atomic_pos = share_target_fn_data(data=[full_tensors, rdcs, rdc_err, rdc_weight, rdc_vect, rdc_const, pcs, pcs_err, pcs_weight, atomic_pos], sim_index=sim_index)
 
         # Get the Processor box singleton (it contains the Processor instance) and alias the Processor.
         processor_box = Processor_box() 
@@ -592,7 +610,7 @@ class Frame_order(API_base, API_common):
         memo = Frame_order_memo(sim_index=sim_index, scaling_matrix=scaling_matrix[0])
 
         # Set up the command object to send to the slave and execute.
-        command = Frame_order_minimise_command(min_algor=min_algor, min_options=min_options, func_tol=func_tol, grad_tol=grad_tol, max_iterations=max_iterations, scaling_matrix=scaling_matrix[0], constraints=constraints, sim_index=sim_index, model=cdp.model, param_vector=param_vector, full_tensors=full_tensors, full_in_ref_frame=full_in_ref_frame, rdcs=rdcs, rdc_err=rdc_err, rdc_weight=rdc_weight, rdc_vect=rdc_vect, rdc_const=rdc_const, pcs=pcs, pcs_err=pcs_err, pcs_weight=pcs_weight, atomic_pos=atomic_pos, temp=temp, frq=frq, paramag_centre=paramag_centre, com=com, ave_pos_pivot=ave_pos_pivot, pivot=pivot, pivot_opt=pivot_opt, sobol_max_points=sobol_max_points, sobol_oversample=sobol_oversample, verbosity=verbosity, quad_int=cdp.quad_int)
+        command = Frame_order_minimise_command(min_algor=min_algor, min_options=min_options, func_tol=func_tol, grad_tol=grad_tol, max_iterations=max_iterations, scaling_matrix=scaling_matrix[0], constraints=constraints, sim_index=sim_index, model=cdp.model, param_vector=param_vector, full_tensors=full_tensors, full_in_ref_frame=full_in_ref_frame, rdcs=rdcs, rdc_err=rdc_err, rdc_weight=rdc_weight, rdc_vect=rdc_vect, rdc_const=rdc_const, pcs=pcs, pcs_err=pcs_err, pcs_weight=pcs_weight, atomic_pos=atomic_pos, temp=temp, frq=frq, paramag_centre=paramag_centre, com=com, ave_pos_pivot=ave_pos_pivot, pivot=pivot, pivot_opt=pivot_opt, sobol_max_points=sobol_max_points, sobol_oversample=sobol_oversample, sobol_tol=sobol_tol, sobol_cache_dir=sobol_cache_dir, verbosity=verbosity, quad_int=cdp.quad_int)
 
         # Add the slave command and memo to the processor queue.
         processor.add_to_queue(command, memo)
@@ -41,7 +41,7 @@ from lib.geometry.angles import wrap_angles
 from lib.periodic_table import periodic_table
 from lib.physical_constants import dipolar_constant
 from lib.warnings import RelaxWarning
-from multi import Memo, Result_command, Slave_command
+from multi import Memo, Result_command, Slave_command, fetch_shared_array, share_array
 from pipe_control.interatomic import interatomic_loop
 from pipe_control.mol_res_spin import return_spin, spin_loop
 from pipe_control.structure.mass import pipe_centre_of_mass
@@ -51,6 +51,13 @@ from specific_analyses.frame_order.parameters import assemble_param_vector, line
 from target_functions.frame_order import Frame_order, sobol_data
 
 
+# The names of the target function data structures which are placed into the shared array registry.
+SHARED_DATA_NAMES = ['full_tensors', 'rdcs', 'rdc_err', 'rdc_weight', 'rdc_vect', 'rdc_const', 'pcs', 'pcs_err', 'pcs_weight', 'atomic_pos']
+
+# The target function data structures which differ between the Monte Carlo simulations.
+SHARED_SIM_DATA_NAMES = ['rdcs', 'pcs']
+
+
 def count_sobol_points(target_fn=None, verbosity=1):
     """Count the number of Sobol' points for the current parameter values of the model.
 
@@ -89,13 +96,17 @@ def count_sobol_points(target_fn=None, verbosity=1):
         # The numeric integration information.
         if not hasattr(cdp, 'quad_int'):
             cdp.quad_int = False
-        sobol_max_points, sobol_oversample = None, None
+        sobol_max_points, sobol_oversample, sobol_tol, sobol_cache_dir = None, None, None, None
         if hasattr(cdp, 'sobol_max_points'):
             sobol_max_points = cdp.sobol_max_points
             sobol_oversample = cdp.sobol_oversample
+        if hasattr(cdp, 'sobol_tol'):
+            sobol_tol = cdp.sobol_tol
+        if hasattr(cdp, 'sobol_cache_dir'):
+            sobol_cache_dir = cdp.sobol_cache_dir
 
         # Set up the optimisation target function class.
-        target_fn = Frame_order(model=cdp.model, init_params=param_vector, full_tensors=full_tensors, full_in_ref_frame=full_in_ref_frame, rdcs=rdcs, rdc_errors=rdc_err, rdc_weights=rdc_weight, rdc_vect=rdc_vect, dip_const=rdc_const, pcs=pcs, pcs_errors=pcs_err, pcs_weights=pcs_weight, atomic_pos=atomic_pos, temp=temp, frq=frq, paramag_centre=paramag_centre, scaling_matrix=None, com=com, ave_pos_pivot=ave_pos_pivot, pivot=pivot, pivot_opt=pivot_opt, sobol_max_points=sobol_max_points, sobol_oversample=sobol_oversample, quad_int=cdp.quad_int)
+        target_fn = Frame_order(model=cdp.model, init_params=param_vector, full_tensors=full_tensors, full_in_ref_frame=full_in_ref_frame, rdcs=rdcs, rdc_errors=rdc_err, rdc_weights=rdc_weight, rdc_vect=rdc_vect, dip_const=rdc_const, pcs=pcs, pcs_errors=pcs_err, pcs_weights=pcs_weight, atomic_pos=atomic_pos, temp=temp, frq=frq, paramag_centre=paramag_centre, scaling_matrix=None, com=com, ave_pos_pivot=ave_pos_pivot, pivot=pivot, pivot_opt=pivot_opt, sobol_max_points=sobol_max_points, sobol_oversample=sobol_oversample, sobol_tol=sobol_tol, sobol_cache_dir=sobol_cache_dir, quad_int=cdp.quad_int)
 
     # The Sobol' sequence dimensions.
     if cdp.model in [MODEL_ISO_CONE, MODEL_ISO_CONE_FREE_ROTOR, MODEL_PSEUDO_ELLIPSE, MODEL_PSEUDO_ELLIPSE_FREE_ROTOR]:
@@ -686,6 +697,42 @@ def opt_uses_rdc(align_id):
     return True
 
 
+def share_target_fn_data(data=None, sim_index=None):
+    """Place the large target function data structures into the shared array registry of the processor.
+
+    The arrays are sent to the slaves only once, and the returned handles are small enough to be included in every slave command.  The arrays are converted back on the slaves via multi.fetch_shared_array().
+
+    For the Monte Carlo simulations, only the RDC and PCS values differ between simulations.  All other arrays are shared once and reused by all simulations.  As all simulations are queued before execution, the RDC and PCS arrays of each simulation are shared under different names, and are released on the master and slaves once the processor queue has been executed.
+
+
+    @keyword data:      The full_tensors, rdcs, rdc_err, rdc_weight, rdc_vect, rdc_const, pcs, pcs_err, pcs_weight and atomic_pos data structures, as returned by target_fn_data_setup().
+    @type data:         list of numpy arrays or None
+    @keyword sim_index: The index of the simulation.
+    @type sim_index:    None or int
+    @return:            The same list with all numpy arrays replaced by the shared array handles.
+    @rtype:             list of multi.shared_arrays.Shared_array instances or None
+    """
+
+    # Loop over the data structures.
+    handles = []
+    for name, value in zip(SHARED_DATA_NAMES, data):
+        # Only share numpy arrays.
+        if isinstance(value, ndarray):
+            # The simulation specific data.
+            if sim_index != None and name in SHARED_SIM_DATA_NAMES:
+                value = share_array(name="frame_order.sim_%i.%s" % (sim_index, name), value=value, temporary=True)
+
+            # The data common to all simulations.
+            else:
+                value = share_array(name="frame_order.%s" % name, value=value, reuse=True)
+
+        # Store the handle or original object.
+        handles.append(value)
+
+    # Return the handles.
+    return handles
+
+
 def store_bc_data(A_5D_bc=None, pcs_theta=None, rdc_theta=None):
     """Store the back-calculated data.
 
@@ -939,7 +986,7 @@ def unpack_opt_results(param_vector=None, func=None, iter_count=None, f_count=No
 class Frame_order_grid_command(Slave_command):
     """Command class for relaxation dispersion optimisation on the slave processor."""
 
-    def __init__(self, points=None, scaling_matrix=None, sim_index=None, model=None, param_vector=None, full_tensors=None, full_in_ref_frame=None, rdcs=None, rdc_err=None, rdc_weight=None, rdc_vect=None, rdc_const=None, pcs=None, pcs_err=None, pcs_weight=None, atomic_pos=None, temp=None, frq=None, paramag_centre=None, com=None, ave_pos_pivot=None, pivot=None, pivot_opt=None, sobol_max_points=None, sobol_oversample=None, verbosity=None, quad_int=False):
+    def __init__(self, points=None, scaling_matrix=None, sim_index=None, model=None, param_vector=None, full_tensors=None, full_in_ref_frame=None, rdcs=None, rdc_err=None, rdc_weight=None, rdc_vect=None, rdc_const=None, pcs=None, pcs_err=None, pcs_weight=None, atomic_pos=None, temp=None, frq=None, paramag_centre=None, com=None, ave_pos_pivot=None, pivot=None, pivot_opt=None, sobol_max_points=None, sobol_oversample=None, sobol_tol=None, sobol_cache_dir=None, verbosity=None, quad_int=False):
         """Initialise the base class, storing all the master data to be sent to the slave processor.
 
         This method is run on the master processor whereas the run() method is run on the slave processor.
@@ -994,6 +1041,10 @@ class Frame_order_grid_command(Slave_command):
         @type sobol_max_points:     int
         @keyword sobol_oversample:  The oversampling factor Ov used for the total number of points N * Ov * 10**M, where N is the maximum number of Sobol' points and M is the number of dimensions or torsion-tilt angles for the system.
         @type sobol_oversample:     int
+        @keyword sobol_tol:         The PCS error tolerance, in ppm, for the adaptive numerical PCS integration.  If None, the maximum number of Sobol' points will always be used.
+        @type sobol_tol:            None or float
+        @keyword sobol_cache_dir:   The directory for the on-disk cache of the Sobol' points and rotation matrices.  If None, no cache will be used.
+        @type sobol_cache_dir:      None or str
         @keyword verbosity:         The verbosity level.  This is used by the result command returned to the master for printouts.
         @type verbosity:            int
         @keyword quad_int:          A flag which if True will perform high precision numerical integration via the scipy.integrate quad(), dblquad() and tplquad() integration methods rather than the rough quasi-random numerical integration.
@@ -1025,15 +1076,28 @@ class Frame_order_grid_command(Slave_command):
         self.pivot_opt = pivot_opt
         self.sobol_max_points = sobol_max_points
         self.sobol_oversample = sobol_oversample
+        self.sobol_tol = sobol_tol
+        self.sobol_cache_dir = sobol_cache_dir
         self.verbosity = verbosity
         self.quad_int = quad_int
 
 
+    def cost(self):
+        """Estimate the relative computational cost of the grid search for the dynamic scheduler.
+
+        @return:    The relative cost, taken as the number of grid points in this subdivision.
+        @rtype:     float
+        """
+
+        # The number of points.
+        return float(len(self.points))
+
+
     def run(self, processor, completed):
         """Set up and perform the optimisation."""
 
         # Set up the optimisation target function class.
-        target_fn = Frame_order(model=self.model, init_params=self.param_vector, full_tensors=self.full_tensors, full_in_ref_frame=self.full_in_ref_frame, rdcs=self.rdcs, rdc_errors=self.rdc_err, rdc_weights=self.rdc_weight, rdc_vect=self.rdc_vect, dip_const=self.rdc_const, pcs=self.pcs, pcs_errors=self.pcs_err, pcs_weights=self.pcs_weight, atomic_pos=self.atomic_pos, temp=self.temp, frq=self.frq, paramag_centre=self.paramag_centre, scaling_matrix=self.scaling_matrix, com=self.com, ave_pos_pivot=self.ave_pos_pivot, pivot=self.pivot, pivot_opt=self.pivot_opt, sobol_max_points=self.sobol_max_points, sobol_oversample=self.sobol_oversample, quad_int=self.quad_int)
+        target_fn = Frame_order(model=self.model, init_params=self.param_vector, full_tensors=fetch_shared_array(self.full_tensors), full_in_ref_frame=self.full_in_ref_frame, rdcs=fetch_shared_array(self.rdcs), rdc_errors=fetch_shared_array(self.rdc_err), rdc_weights=fetch_shared_array(self.rdc_weight), rdc_vect=fetch_shared_array(self.rdc_vect), dip_const=fetch_shared_array(self.rdc_const), pcs=fetch_shared_array(self.pcs), pcs_errors=fetch_shared_array(self.pcs_err), pcs_weights=fetch_shared_array(self.pcs_weight), atomic_pos=fetch_shared_array(self.atomic_pos), temp=self.temp, frq=self.frq, paramag_centre=self.paramag_centre, scaling_matrix=self.scaling_matrix, com=self.com, ave_pos_pivot=self.ave_pos_pivot, pivot=self.pivot, pivot_opt=self.pivot_opt, sobol_max_points=self.sobol_max_points, sobol_oversample=self.sobol_oversample, sobol_tol=self.sobol_tol, sobol_cache_dir=self.sobol_cache_dir, quad_int=self.quad_int)
 
         # Grid search.
         results = grid_point_array(func=target_fn.func, args=(), points=self.points, verbosity=self.verbosity)
@@ -1078,7 +1142,7 @@ class Frame_order_memo(Memo):
 class Frame_order_minimise_command(Slave_command):
     """Command class for relaxation dispersion optimisation on the slave processor."""
 
-    def __init__(self, min_algor=None, min_options=None, func_tol=None, grad_tol=None, max_iterations=None, scaling_matrix=None, constraints=False, sim_index=None, model=None, param_vector=None, full_tensors=None, full_in_ref_frame=None, rdcs=None, rdc_err=None, rdc_weight=None, rdc_vect=None, rdc_const=None, pcs=None, pcs_err=None, pcs_weight=None, atomic_pos=None, temp=None, frq=None, paramag_centre=None, com=None, ave_pos_pivot=None, pivot=None, pivot_opt=None, sobol_max_points=None, sobol_oversample=None, verbosity=None, quad_int=False):
+    def __init__(self, min_algor=None, min_options=None, func_tol=None, grad_tol=None, max_iterations=None, scaling_matrix=None, constraints=False, sim_index=None, model=None, param_vector=None, full_tensors=None, full_in_ref_frame=None, rdcs=None, rdc_err=None, rdc_weight=None, rdc_vect=None, rdc_const=None, pcs=None, pcs_err=None, pcs_weight=None, atomic_pos=None, temp=None, frq=None, paramag_centre=None, com=None, ave_pos_pivot=None, pivot=None, pivot_opt=None, sobol_max_points=None, sobol_oversample=None, sobol_tol=None, sobol_cache_dir=None, verbosity=None, quad_int=False):
         """Initialise the base class, storing all the master data to be sent to the slave processor.
 
         This method is run on the master processor whereas the run() method is run on the slave processor.
@@ -1141,6 +1205,10 @@ class Frame_order_minimise_command(Slave_command):
         @type sobol_max_points:     int
         @keyword sobol_oversample:  The oversampling factor Ov used for the total number of points N * Ov * 10**M, where N is the maximum number of Sobol' points and M is the number of dimensions or torsion-tilt angles for the system.
         @type sobol_oversample:     int
+        @keyword sobol_tol:         The PCS error tolerance, in ppm, for the adaptive numerical PCS integration.  If None, the maximum number of Sobol' points will always be used.
+        @type sobol_tol:            None or float
+        @keyword sobol_cache_dir:   The directory for the on-disk cache of the Sobol' points and rotation matrices.  If None, no cache will be used.
+        @type sobol_cache_dir:      None or str
         @keyword scaling_matrix:    The diagonal, square scaling matrix.
         @type scaling_matrix:       numpy diagonal matrix
         @keyword quad_int:          A flag which if True will perform high precision numerical integration via the scipy.integrate quad(), dblquad() and tplquad() integration methods rather than the rough quasi-random numerical integration.
@@ -1176,11 +1244,13 @@ class Frame_order_minimise_command(Slave_command):
         self.pivot_opt = pivot_opt
         self.sobol_max_points = sobol_max_points
         self.sobol_oversample = sobol_oversample
+        self.sobol_tol = sobol_tol
+        self.sobol_cache_dir = sobol_cache_dir
         self.verbosity = verbosity
         self.quad_int = quad_int
 
         # Feedback on the number of integration points used (target function setup required).  This must be run here on the master and not in run() on the slave.
-        target_fn = Frame_order(model=self.model, init_params=self.param_vector, full_tensors=self.full_tensors, full_in_ref_frame=self.full_in_ref_frame, rdcs=self.rdcs, rdc_errors=self.rdc_err, rdc_weights=self.rdc_weight, rdc_vect=self.rdc_vect, dip_const=self.rdc_const, pcs=self.pcs, pcs_errors=self.pcs_err, pcs_weights=self.pcs_weight, atomic_pos=self.atomic_pos, temp=self.temp, frq=self.frq, paramag_centre=self.paramag_centre, scaling_matrix=self.scaling_matrix, com=self.com, ave_pos_pivot=self.ave_pos_pivot, pivot=self.pivot, pivot_opt=self.pivot_opt, sobol_max_points=self.sobol_max_points, sobol_oversample=self.sobol_oversample, quad_int=self.quad_int)
+        target_fn = Frame_order(model=self.model, init_params=self.param_vector, full_tensors=fetch_shared_array(self.full_tensors), full_in_ref_frame=self.full_in_ref_frame, rdcs=fetch_shared_array(self.rdcs), rdc_errors=fetch_shared_array(self.rdc_err), rdc_weights=fetch_shared_array(self.rdc_weight), rdc_vect=fetch_shared_array(self.rdc_vect), dip_const=fetch_shared_array(self.rdc_const), pcs=fetch_shared_array(self.pcs), pcs_errors=fetch_shared_array(self.pcs_err), pcs_weights=fetch_shared_array(self.pcs_weight), atomic_pos=fetch_shared_array(self.atomic_pos), temp=self.temp, frq=self.frq, paramag_centre=self.paramag_centre, scaling_matrix=self.scaling_matrix, com=self.com, ave_pos_pivot=self.ave_pos_pivot, pivot=self.pivot, pivot_opt=self.pivot_opt, sobol_max_points=self.sobol_max_points, sobol_oversample=self.sobol_oversample, sobol_tol=self.sobol_tol, sobol_cache_dir=self.sobol_cache_dir, quad_int=self.quad_int)
         if not self.quad_int:
             count_sobol_points(target_fn=target_fn, verbosity=self.verbosity)
 
@@ -1205,7 +1275,7 @@ class Frame_order_minimise_command(Slave_command):
         """Set up and perform the optimisation."""
 
         # Set up the optimisation target function class.
-        target_fn = Frame_order(model=self.model, init_params=self.param_vector, full_tensors=self.full_tensors, full_in_ref_frame=self.full_in_ref_frame, rdcs=self.rdcs, rdc_errors=self.rdc_err, rdc_weights=self.rdc_weight, rdc_vect=self.rdc_vect, dip_const=self.rdc_const, pcs=self.pcs, pcs_errors=self.pcs_err, pcs_weights=self.pcs_weight, atomic_pos=self.atomic_pos, temp=self.temp, frq=self.frq, paramag_centre=self.paramag_centre, scaling_matrix=self.scaling_matrix, com=self.com, ave_pos_pivot=self.ave_pos_pivot, pivot=self.pivot, pivot_opt=self.pivot_opt, sobol_max_points=self.sobol_max_points, sobol_oversample=self.sobol_oversample, quad_int=self.quad_int)
+        target_fn = Frame_order(model=self.model, init_params=self.param_vector, full_tensors=fetch_shared_array(self.full_tensors), full_in_ref_frame=self.full_in_ref_frame, rdcs=fetch_shared_array(self.rdcs), rdc_errors=fetch_shared_array(self.rdc_err), rdc_weights=fetch_shared_array(self.rdc_weight), rdc_vect=fetch_shared_array(self.rdc_vect), dip_const=fetch_shared_array(self.rdc_const), pcs=fetch_shared_array(self.pcs), pcs_errors=fetch_shared_array(self.pcs_err), pcs_weights=fetch_shared_array(self.pcs_weight), atomic_pos=fetch_shared_array(self.atomic_pos), temp=self.temp, frq=self.frq, paramag_centre=self.paramag_centre, scaling_matrix=self.scaling_matrix, com=self.com, ave_pos_pivot=self.ave_pos_pivot, pivot=self.pivot, pivot_opt=self.pivot_opt, sobol_max_points=self.sobol_max_points, sobol_oversample=self.sobol_oversample, sobol_tol=self.sobol_tol, sobol_cache_dir=self.sobol_cache_dir, quad_int=self.quad_int)
 
         # Minimisation.
         results = generic_minimise(func=target_fn.func, args=(), x0=self.param_vector, min_algor=self.min_algor, min_options=self.min_options, func_tol=self.func_tol, grad_tol=self.grad_tol, maxiter=self.max_iterations, A=self.A, b=self.b, full_output=True, print_flag=self.verbosity)
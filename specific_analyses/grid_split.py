@@ -0,0 +1,181 @@
+###############################################################################
+#                                                                             #
+# Copyright (C) 2015 Edward d'Auvergne                                        #
+#                                                                             #
+# This file is part of the program relax (http://www.nmr-relax.com).          #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+# Module docstring.
+"""The generic multi-processor grid search, splitting the grid into subdivisions for the slaves and keeping the best point.
+
+This is used by the API_base.grid_search_split() method, and is available to all analyses which perform their grid search directly on the master via a target function.
+"""
+
+# Python module imports.
+from minfx.grid import grid_point_array
+
+# relax module imports.
+from lib.errors import RelaxError
+from multi import Memo, Result_command, Slave_command
+
+
+class Grid_split_command(Slave_command):
+    """Command class for the grid search of one grid subdivision on a slave."""
+
+    def __init__(self, func=None, points=None, verbosity=0):
+        """Set up the command.
+
+        @keyword func:      The target function.  If a bound method, the target function class instance will be transferred to the slave.
+        @type func:         callable
+        @keyword points:    The grid points of the subdivision.
+        @type points:       numpy rank-2 float64 array
+        @keyword verbosity: The amount of information to print.
+        @type verbosity:    int
+        """
+
+        # Execute the base class __init__() method.
+        super(Grid_split_command, self).__init__()
+
+        # Store the arguments.
+        self.func = func
+        self.points = points
+        self.verbosity = verbosity
+
+
+    def cost(self):
+        """Estimate the relative computational cost of the grid search for the dynamic scheduler.
+
+        @return:    The relative cost, taken as the number of grid points in this subdivision.
+        @rtype:     float
+        """
+
+        # The number of points.
+        return float(len(self.points))
+
+
+    def run(self, processor, completed):
+        """Perform the grid search of the subdivision.
+
+        @param processor:   The slave processor the command is running on.  Results from the command are returned via calls to processor.return_object.
+        @type processor:    Processor instance
+        @param completed:   The flag used in batching result returns to indicate that the sequence of batched result commands has completed.
+        @type completed:    bool
+        """
+
+        # The grid search.
+        results = grid_point_array(func=self.func, args=(), points=self.points, verbosity=self.verbosity)
+
+        # Return the results to the master.
+        processor.return_object(Grid_split_result_command(processor=processor, memo_id=self.memo_id, results=results, completed=False))
+
+
+
+class Grid_split_memo(Memo):
+    """The memo of one grid subdivision, for collecting the results of all subdivisions on the master.
+
+    Each subdivision requires its own memo, as the memo is removed from the processor once the results of its command have been received.
+    """
+
+    def __init__(self, index=None, results=None):
+        """Store the subdivision index and the result list shared by all subdivisions.
+
+        @keyword index:     The index of the subdivision in the full grid, used to order the results on the master.
+        @type index:        int
+        @keyword results:   The list of subdivision index and result pairs shared by the memos of all subdivisions.
+        @type results:      list of tuples of int and tuples of numpy rank-1 array, float, int, None or str
+        """
+
+        # Execute the base class __init__() method.
+        super(Grid_split_memo, self).__init__()
+
+        # Store the arguments.
+        self.index = index
+        self.results = results
+
+
+
+class Grid_split_result_command(Result_command):
+    """Class for returning the grid search results of one subdivision to the master."""
+
+    def __init__(self, processor=None, memo_id=None, results=None, completed=True):
+        """Set up the result command on the slave.
+
+        @keyword processor: The slave processor.
+        @type processor:    Processor instance
+        @keyword memo_id:   The ID of the memo.
+        @type memo_id:      int
+        @keyword results:   The grid search results, consisting of the parameter vector, function value, number of function calls and warning.
+        @type results:      tuple of numpy rank-1 array, float, int, None or str
+        @keyword completed: The flag indicating the end of the batched results.
+        @type completed:    bool
+        """
+
+        # Execute the base class __init__() method.
+        super(Grid_split_result_command, self).__init__(processor=processor, completed=completed)
+
+        # Store the arguments.
+        self.memo_id = memo_id
+        self.results = results
+
+
+    def run(self, processor, memo):
+        """Store the results in the memo on the master.
+
+        @param processor:   The master processor.
+        @type processor:    Processor instance
+        @param memo:        The grid split memo of the subdivision.
+        @type memo:         Grid_split_memo instance
+        """
+
+        # Store the results together with the subdivision index, as the completion order is arbitrary.
+        memo.results.append((memo.index, self.results))
+
+
+
+def reduce_grid_results(results):
+    """Combine the grid search results of all subdivisions, keeping the best point.
+
+    The subdivisions are reduced in the order of their indices, i.e. in the order of the points of the full grid, and the first of equal minima is kept.  This is independent of the order in which the slaves complete and matches the result of a grid search of the full grid.
+
+
+    @param results: The list of subdivision index and grid search result pairs, each result consisting of the parameter vector, function value, number of function calls and warning.
+    @type results:  list of tuples of int and tuples of numpy rank-1 array, float, int, None or str
+    @raises RelaxError: If no grid points remain, for example when all points violate the linear constraints.
+    @return:        The parameter vector and function value of the best point, the total number of function calls, and the warning of the best subdivision.
+    @rtype:         tuple of numpy rank-1 array, float, int, None or str
+    """
+
+    # No grid points.
+    if not len(results):
+        raise RelaxError("No grid points remain for the grid search, all points may violate the linear constraints.")
+
+    # Sort by subdivision index.
+    results = [result for index, result in sorted(results, key=lambda x: x[0])]
+
+    # The best subdivision, keeping the first of equal minima.
+    best = 0
+    for i in range(1, len(results)):
+        if results[i][1] < results[best][1]:
+            best = i
+
+    # The total number of function calls.
+    iter_count = 0
+    for result in results:
+        iter_count += result[2]
+
+    # Return the combined results.
+    return results[best][0], results[best][1], iter_count, results[best][3]
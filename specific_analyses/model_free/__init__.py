@@ -29,6 +29,7 @@ __all__ = [
     'back_compat',
     'bmrb',
     'data',
+    'grid_batch',
     'macro_base',
     'model',
     'molmol',
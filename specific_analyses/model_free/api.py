@@ -29,7 +29,7 @@ import dep_check
 if dep_check.bmrblib_module:
     import bmrblib
 from copy import deepcopy
-from math import pi
+from math import ceil, pi
 from minfx.grid import grid_split
 from numpy import array, dot, float64, int32, zeros
 from numpy.linalg import inv
@@ -61,10 +61,11 @@ from specific_analyses.model_free.data import compare_objects
 from specific_analyses.model_free.molmol import Molmol
 from specific_analyses.model_free.model import determine_model_type
 from specific_analyses.model_free.parameters import are_mf_params_set, assemble_param_names, assemble_param_vector, linear_constraints
-from specific_analyses.model_free.optimisation import MF_grid_command, MF_memo, MF_minimise_command, minimise_data_setup, relax_data_opt_structs
+from specific_analyses.model_free.optimisation import MF_grid_batch_command, MF_grid_batch_memo, MF_grid_command, MF_memo, MF_minimise_command, minimise_data_setup, relax_data_opt_structs
 from specific_analyses.model_free.parameter_object import Model_free_params
 from specific_analyses.model_free.pymol import Pymol
 from target_functions.mf import Mf
+from target_functions.mf_vectorised import RI_TYPES
 
 
 class Model_free(API_base, API_common):
@@ -1260,6 +1261,10 @@ class Model_free(API_base, API_common):
         processor_box = Processor_box() 
         processor = processor_box.processor
 
+        # The batches of spins sharing the same model for the vectorised grid search.
+        batches = {}
+        batch_keys = []
+
         # Loop over the models.
         for index in self.model_loop():
             # Get the spin container if required.
@@ -1387,6 +1392,23 @@ class Model_free(API_base, API_common):
                 # Exit this method.
                 return
 
+            # Vectorised grid search for the single spin models, batching together all spins with the same model and grid.
+            if search('^[Gg]rid', min_algor) and (data_store.model_type == 'mf' or data_store.model_type == 'local_tm') and num_params and set(data_store.ri_types[0]).issubset(RI_TYPES):
+                # The batch key.
+                scaling = None
+                if data_store.scaling_matrix is not None:
+                    scaling = data_store.scaling_matrix.tolist()
+                key = repr([spin.equation, spin.params, opt_params.lower, opt_params.upper, opt_params.inc, scaling])
+
+                # Store the spin data.
+                if key not in batches:
+                    batches[key] = []
+                    batch_keys.append(key)
+                batches[key].append([spin, deepcopy(data_store), deepcopy(opt_params)])
+
+                # Queued later.
+                continue
+
             # Normal grid search (command initialisation).
             if search('^[Gg]rid', min_algor):
                 command = MF_grid_command()
@@ -1402,6 +1424,22 @@ class Model_free(API_base, API_common):
             memo = MF_memo(model_free=self, model_type=data_store.model_type, spin=spin, sim_index=sim_index, scaling_matrix=data_store.scaling_matrix)
             processor.add_to_queue(command, memo)
 
+        # Queue the vectorised grid searches, splitting each batch over the slave processors.
+        for key in batch_keys:
+            batch = batches[key]
+            size = int(ceil(len(batch) / float(processor.processor_size())))
+            for start in range(0, len(batch), size):
+                # Pass in the data and optimisation parameters of all spins.
+                command = MF_grid_batch_command()
+                spins = []
+                for spin, data, params in batch[start:start+size]:
+                    command.store_data(data, params)
+                    spins.append(spin)
+
+                # Set up the model-free memo and add it to the processor queue.
+                memo = MF_grid_batch_memo(model_free=self, model_type=data_store.model_type, spins=spins, sim_index=sim_index, scaling_matrix=batch[start][1].scaling_matrix)
+                processor.add_to_queue(command, memo)
+
         # Execute the queued elements.
         processor.run_queue()
 
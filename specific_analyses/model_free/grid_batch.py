@@ -0,0 +1,234 @@
+###############################################################################
+#                                                                             #
+# Copyright (C) 2015 Edward d'Auvergne                                        #
+#                                                                             #
+# This file is part of the program relax (http://www.nmr-relax.com).          #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+# Module docstring.
+"""The vectorised model-free grid search for a batch of spins sharing the same model.
+
+The standard grid search of the 'mf' and 'local_tm' model types calls the Mf.func_mf() or Mf.func_local_tm() target functions once per grid point and spin.  Here the chi-squared values of all grid points and all spins of the batch are instead calculated as numpy arrays with the dimensions {spin, relaxation data, grid point}, using the generic spectral density and relaxation rate functions of the target_functions.mf_vectorised module.  The grid points are processed in chunks to limit the memory usage.
+"""
+
+# Python module imports.
+from math import pi
+from numpy import arange, argmin, dot, float64, inf, int32, isnan, ones, sum, where, zeros
+
+# relax module imports.
+from target_functions.mf_vectorised import R2, RI_TYPES, calc_dip_const, calc_jw, calc_ri
+
+
+# The maximum number of elements of the largest intermediate array, {spin, grid point, frequency, 5 frequencies, ti}, per chunk.
+CHUNK_SIZE = 2**22
+
+
+class MF_grid_batch:
+    def __init__(self, models=None, chunk_size=CHUNK_SIZE):
+        """Set up the structure-of-arrays data for all spins of the batch.
+
+        @keyword models:        The model-free target functions of the 'mf' or 'local_tm' model types for each spin, all for the same model-free model and with the same parameter scaling.
+        @type models:           list of Mf instances
+        @keyword chunk_size:    The maximum number of elements of the largest intermediate array.
+        @type chunk_size:       int
+        """
+
+        # Store the arguments.
+        self.chunk_size = chunk_size
+
+        # The model set up, taken from the first spin.
+        mf = models[0]
+        data = mf.data[0]
+        self.model_type = mf.model_type
+        self.scaling_matrix = mf.scaling_matrix
+        self.num_spins = len(models)
+
+        # The parameter indices, identical for all spins.
+        self.ext2 = data.equations == 'mf_ext2'
+        self.s2_i = data.s2_i
+        if data.equations == 'mf_orig':
+            self.s2f_i, self.s2s_i, self.tf_i, self.ts_i = None, None, None, data.te_i
+        else:
+            self.s2f_i, self.s2s_i, self.tf_i, self.ts_i = data.s2f_i, data.s2s_i, data.tf_i, data.ts_i
+        self.rex_i = data.rex_i
+        self.r_i = data.r_i
+        self.csa_i = data.csa_i
+
+        # The dimensions.
+        num_frq = max([model.data[0].num_frq for model in models])
+        num_ri = max([model.data[0].num_ri for model in models])
+        if self.model_type == 'local_tm':
+            self.num_indices = 1
+        else:
+            self.num_indices = mf.diff_data.num_indices
+
+        # The diffusion tensor weights of each spin and the global correlation times, for the fixed diffusion tensor.
+        self.ci = ones((self.num_spins, self.num_indices), float64)
+        self.ti = None
+        if self.model_type == 'mf':
+            for i in range(self.num_spins):
+                data, diff_data = models[i].data[0], models[i].diff_data
+                if diff_data.calc_di:
+                    diff_data.calc_di(data, diff_data)
+                diff_data.calc_ci(data, diff_data)
+                diff_data.calc_ti(data, diff_data)
+                self.ci[i] = data.ci
+            self.ti = data.ti * 1.0
+
+        # The per-spin data structures, padded to the maximum number of frequencies and relaxation data.
+        self.frq_list = zeros((self.num_spins, num_frq, 5), float64)
+        self.ri_types = zeros((self.num_spins, num_ri), int32)
+        self.remap_table = zeros((self.num_spins, num_ri), int32)
+        self.relax_data = zeros((self.num_spins, num_ri), float64)
+        self.inv_var = zeros((self.num_spins, num_ri), float64)
+        self.csa_const_fixed = zeros((self.num_spins, num_ri), float64)
+        self.rex_const_fixed = zeros((self.num_spins, num_ri), float64)
+        self.dip_const_fixed = zeros(self.num_spins, float64)
+        self.g_ratio = zeros(self.num_spins, float64)
+        self.r = zeros(self.num_spins, float64)
+        self.csa = zeros(self.num_spins, float64)
+        for i in range(self.num_spins):
+            data = models[i].data[0]
+            self.frq_list[i, :data.num_frq] = data.frq_list
+            self.dip_const_fixed[i] = data.dip_const_fixed
+            self.g_ratio[i] = data.g_ratio
+            if data.bond_length != None:
+                self.r[i] = data.bond_length
+            if data.csa != None:
+                self.csa[i] = data.csa
+            for j in range(data.num_ri):
+                self.ri_types[i, j] = RI_TYPES[data.ri_labels[j]]
+                self.remap_table[i, j] = data.remap_table[j]
+                self.relax_data[i, j] = data.relax_data[j]
+                self.inv_var[i, j] = 1.0 / data.errors[j]**2
+                self.csa_const_fixed[i, j] = data.csa_const_fixed[data.remap_table[j]]
+                if self.ri_types[i, j] == R2:
+                    self.rex_const_fixed[i, j] = (2.0 * pi * data.frq[data.remap_table[j]])**2
+
+        # The spin index for fancy indexing of the spectral densities.
+        self.spin_index = arange(self.num_spins)[:, None]
+
+
+    def chi2(self, points):
+        """Calculate the chi-squared values of all spins for the grid points.
+
+        @param points:  The scaled grid points, with the dimensions {grid point, parameter}.
+        @type points:   numpy rank-2 array
+        @return:        The chi-squared values, with the dimensions {spin, grid point}.
+        @rtype:         numpy rank-2 array
+        """
+
+        # Scaling.
+        params = points
+        if self.scaling_matrix is not None:
+            params = dot(points, self.scaling_matrix)
+
+        # The model-free parameters, with the dimensions {1, grid point, 1, 1, 1}.
+        s2 = self.column(params, self.s2_i, 1.0)
+        s2f = self.column(params, self.s2f_i, 1.0)
+        if self.ext2:
+            s2 = s2f * self.column(params, self.s2s_i, 1.0)
+        tf = self.column(params, self.tf_i, 0.0)
+        ts = self.column(params, self.ts_i, 0.0)
+
+        # The correlation times, the local tm being the first parameter.
+        if self.model_type == 'local_tm':
+            ti = params[None, :, 0, None, None, None]
+        else:
+            ti = self.ti
+
+        # The spectral densities, with the dimensions {spin, grid point, frequency, 5 frequencies}.
+        jw = calc_jw(self.frq_list[:, None, :, :, None], self.ci[:, None, None, None, :], ti, s2, s2f, tf, ts)
+
+        # The spectral densities at the frequency of each relaxation data point, with the dimensions {spin, relaxation data, grid point, 5 frequencies}.
+        jw = jw[self.spin_index, :, self.remap_table]
+
+        # The dipolar, CSA and Rex constants, with the dimensions {spin, relaxation data, grid point}.
+        r = self.r[:, None, None]
+        if self.r_i != None:
+            r = params[None, None, :, self.r_i]
+        csa = self.csa[:, None, None]
+        if self.csa_i != None:
+            csa = params[None, None, :, self.csa_i]
+        dip_const = calc_dip_const(self.dip_const_fixed[:, None, None], r)
+        csa_const = self.csa_const_fixed[:, :, None] * csa**2
+        rex_const = 0.0
+        if self.rex_i != None:
+            rex_const = self.rex_const_fixed[:, :, None] * params[None, None, :, self.rex_i]
+
+        # The back-calculated relaxation data.
+        ri = calc_ri(jw, self.ri_types[:, :, None], dip_const, csa_const, rex_const, self.g_ratio[:, None, None])
+
+        # The chi-squared values (the padding has zero weight).
+        return sum(self.inv_var[:, :, None] * (self.relax_data[:, :, None] - ri)**2, axis=1)
+
+
+    def column(self, params, index, default):
+        """Return the parameter values of all grid points, broadcastable for the spectral density calculation.
+
+        @param params:  The unscaled grid points.
+        @type params:   numpy rank-2 array
+        @param index:   The index of the parameter, or None if the parameter is not part of the model.
+        @type index:    None or int
+        @param default: The value for when the parameter is not part of the model.
+        @type default:  float
+        @return:        The parameter values, with the dimensions {1, grid point, 1, 1, 1}, or the default value.
+        @rtype:         numpy rank-5 array or float
+        """
+
+        # The default.
+        if index == None:
+            return default
+
+        # The values.
+        return params[None, :, index, None, None, None]
+
+
+    def search(self, points):
+        """Find the grid point with the lowest chi-squared value for each spin.
+
+        As for the minfx grid search, the first of equal minima is selected.
+
+
+        @param points:  The scaled grid points, with the dimensions {grid point, parameter}.
+        @type points:   numpy rank-2 array
+        @return:        The index of the best grid point and its chi-squared value for each spin.
+        @rtype:         numpy rank-1 int array, numpy rank-1 float64 array
+        """
+
+        # The number of grid points per chunk.
+        chunk = max(1, self.chunk_size // (self.num_spins * self.frq_list.shape[1] * 5 * self.num_indices))
+
+        # Loop over the chunks.
+        best_index = zeros(self.num_spins, int32)
+        best_chi2 = inf * ones(self.num_spins, float64)
+        for start in range(0, len(points), chunk):
+            # The chi-squared values, with NaN values never being selected.
+            chi2 = self.chi2(points[start:start+chunk])
+            chi2[isnan(chi2)] = inf
+
+            # The best point of the chunk.
+            index = argmin(chi2, axis=1)
+            value = chi2[arange(self.num_spins), index]
+
+            # Update the best points.
+            better = value < best_chi2
+            best_index = where(better, start + index, best_index)
+            best_chi2 = where(better, value, best_chi2)
+
+        # Return the best points.
+        return best_index, best_chi2
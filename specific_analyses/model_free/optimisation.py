@@ -27,8 +27,8 @@
 
 # Python module imports.
 from minfx.generic import generic_minimise
-from minfx.grid import grid, grid_point_array
-from numpy import array, dot, float64
+from minfx.grid import grid, grid_point_array, grid_split
+from numpy import array, dot, float64, vstack
 import sys
 
 # relax module imports.
@@ -41,6 +41,7 @@ from multi import Memo, Result_command, Slave_command
 from pipe_control import pipes
 from pipe_control.interatomic import return_interatom_list
 from pipe_control.mol_res_spin import return_spin, return_spin_from_index
+from specific_analyses.model_free.grid_batch import MF_grid_batch
 from specific_analyses.model_free.parameters import assemble_param_vector, disassemble_param_vector
 from target_functions.mf import Mf
 
@@ -533,6 +534,17 @@ class MF_minimise_command(Slave_command):
         super(MF_minimise_command, self).__init__()
 
 
+    def cost(self):
+        """Estimate the relative computational cost of the optimisation for the dynamic scheduler.
+
+        @return:    The relative cost, proportional to the number of spins and parameters.
+        @rtype:     float
+        """
+
+        # The number of spins times the number of parameters.
+        return float(self.data.num_spins * max(len(self.opt_params.param_vector), 1))
+
+
     def optimise(self):
         """Model-free optimisation.
 
@@ -551,7 +563,7 @@ class MF_minimise_command(Slave_command):
         """Setup and perform the model-free optimisation."""
 
         # Initialise the function to minimise.
-        self.mf = Mf(init_params=self.opt_params.param_vector, model_type=self.data.model_type, diff_type=self.data.diff_type, diff_params=self.data.diff_params, scaling_matrix=self.data.scaling_matrix, num_spins=self.data.num_spins, equations=self.data.equations, param_types=self.data.param_types, param_values=self.data.param_values, relax_data=self.data.ri_data, errors=self.data.ri_data_err, bond_length=self.data.r, csa=self.data.csa, num_frq=self.data.num_frq, frq=self.data.frq, num_ri=self.data.num_ri, remap_table=self.data.remap_table, noe_r1_table=self.data.noe_r1_table, ri_labels=self.data.ri_types, gx=self.data.gx, gh=self.data.gh, h_bar=self.data.h_bar, mu0=self.data.mu0, num_params=self.data.num_params, vectors=self.data.xh_unit_vectors)
+        self.mf = self.target_function(self.data, self.opt_params)
 
         # Printout.
         if self.opt_params.verbosity >= 1 and (self.data.model_type == 'mf' or self.data.model_type == 'local_tm'):
@@ -563,6 +575,11 @@ class MF_minimise_command(Slave_command):
         # Disassemble the results list.
         param_vector, func, iter, fc, gc, hc, warning = results
 
+        # Report the reuse of the diffusion tensor geometry.
+        if self.opt_params.verbosity >= 2:
+            memo = self.mf.diff_data.memo
+            print("Diffusion tensor geometry reuse:  %i of %i calculations skipped (%.1f%%)." % (memo.hits, memo.calls, 100.0*memo.reuse_rate()))
+
         processor.return_object(MF_result_command(processor, self.memo_id, param_vector, func, iter, fc, gc, hc, warning, completed=False))
 
 
@@ -580,6 +597,21 @@ class MF_minimise_command(Slave_command):
         self.opt_params = opt_params
 
 
+    def target_function(self, data, opt_params):
+        """Initialise the model-free target function.
+
+        @param data:        The data used to initialise the model-free target function class.
+        @type data:         class instance
+        @param opt_params:  The parameters and data required for optimisation using minfx.
+        @type opt_params:   class instance
+        @return:            The target function class instance.
+        @rtype:             Mf instance
+        """
+
+        # Initialise and return the target function.
+        return Mf(init_params=opt_params.param_vector, model_type=data.model_type, diff_type=data.diff_type, diff_params=data.diff_params, scaling_matrix=data.scaling_matrix, num_spins=data.num_spins, equations=data.equations, param_types=data.param_types, param_values=data.param_values, relax_data=data.ri_data, errors=data.ri_data_err, bond_length=data.r, csa=data.csa, num_frq=data.num_frq, frq=data.frq, num_ri=data.num_ri, remap_table=data.remap_table, noe_r1_table=data.noe_r1_table, ri_labels=data.ri_types, gx=data.gx, gh=data.gh, h_bar=data.h_bar, mu0=data.mu0, num_params=data.num_params, vectors=data.xh_unit_vectors)
+
+
 
 class MF_grid_command(MF_minimise_command):
     """Command class for the model-free grid search."""
@@ -591,6 +623,25 @@ class MF_grid_command(MF_minimise_command):
         super(MF_grid_command, self).__init__()
 
 
+    def cost(self):
+        """Estimate the relative computational cost of the grid search for the dynamic scheduler.
+
+        @return:    The relative cost, proportional to the number of spins and the number of grid points.
+        @rtype:     float
+        """
+
+        # The number of grid points.
+        if hasattr(self.opt_params, 'subdivision'):
+            points = len(self.opt_params.subdivision)
+        else:
+            points = 1
+            for x in self.opt_params.inc:
+                points *= x
+
+        # Return the estimate.
+        return float(self.data.num_spins * points)
+
+
     def optimise(self):
         """Model-free grid search.
 
@@ -648,3 +699,148 @@ class MF_result_command(Result_command):
 
         # Disassemble the results.
         disassemble_result(param_vector=self.param_vector, func=self.func, iter=self.iter, fc=self.fc, gc=self.gc, hc=self.hc, warning=self.warning, spin=memo.spin, sim_index=memo.sim_index, model_type=memo.model_type, scaling_matrix=memo.scaling_matrix)
+
+
+
+class MF_grid_batch_command(MF_minimise_command):
+    """Command class for the vectorised model-free grid search of a batch of spins sharing the same model."""
+
+    def __init__(self):
+        """Initialise all the data."""
+
+        # Execute the base class __init__() method.
+        super(MF_grid_batch_command, self).__init__()
+
+        # The data and optimisation parameters of each spin.
+        self.data = []
+        self.opt_params = []
+
+
+    def cost(self):
+        """Estimate the relative computational cost of the grid search for the dynamic scheduler.
+
+        @return:    The relative cost, proportional to the number of spins and the number of grid points.
+        @rtype:     float
+        """
+
+        # The number of grid points.
+        points = 1
+        for x in self.opt_params[0].inc:
+            points *= x
+
+        # Return the estimate.
+        return float(len(self.data) * points)
+
+
+    def optimise(self):
+        """Vectorised model-free grid search of all spins.
+
+        @return:    The optimisation results for each spin consisting of the parameter vector, function value, iteration count, function count, gradient count, Hessian count, and warnings.
+        @rtype:     list of tuples of numpy array, float, int, int, int, int, str
+        """
+
+        # The grid points, identical for all spins of the batch.
+        opt_params = self.opt_params[0]
+        points = vstack(list(grid_split(divisions=1, lower=opt_params.lower, upper=opt_params.upper, inc=opt_params.inc, A=opt_params.A, b=opt_params.b, verbosity=0)))
+
+        # The grid search.
+        batch = MF_grid_batch(models=self.mf)
+        index, chi2 = batch.search(points)
+
+        # Package the results.
+        results = []
+        for i in range(len(self.mf)):
+            results.append((points[index[i]] * 1.0, chi2[i], len(points), len(points), 0.0, 0.0, None))
+
+        # Return the results.
+        return results
+
+
+    def run(self, processor, completed):
+        """Setup and perform the vectorised model-free grid search."""
+
+        # Initialise the target functions of all spins.
+        self.mf = []
+        for i in range(len(self.data)):
+            self.mf.append(self.target_function(self.data[i], self.opt_params[i]))
+
+        # Printout.
+        if self.opt_params[0].verbosity >= 1:
+            subsection(file=sys.stdout, text="Vectorised grid search:  %i spins with the parameters %s" % (len(self.data), self.data[0].param_types[0]), prespace=2, postspace=1)
+
+        # Perform the grid search.
+        results = self.optimise()
+
+        # Return the results.
+        processor.return_object(MF_grid_batch_result_command(processor, self.memo_id, results, completed=False))
+
+
+    def store_data(self, data, opt_params):
+        """Add the data required for the model-free grid search of one spin of the batch.
+
+        @param data:        The data used to initialise the model-free target function class.
+        @type data:         class instance
+        @param opt_params:  The parameters and data required for optimisation using minfx.
+        @type opt_params:   class instance
+        """
+
+        # Store the data.
+        self.data.append(data)
+        self.opt_params.append(opt_params)
+
+
+
+class MF_grid_batch_memo(MF_memo):
+    """The model-free memo class for the vectorised grid search of a batch of spins."""
+
+    def __init__(self, model_free=None, model_type=None, spins=None, sim_index=None, scaling_matrix=None):
+        """Initialise the model-free memo class.
+
+        @keyword model_free:        The model-free class instance.
+        @type model_free:           specific_analyses.model_free.Model_free instance
+        @keyword model_type:        The model-free model type.
+        @type model_type:           str
+        @keyword spins:             The spin data containers of the batch.
+        @type spins:                list of SpinContainer instances
+        @keyword sim_index:         The optional MC simulation index.
+        @type sim_index:            int
+        @keyword scaling_matrix:    The diagonal, square scaling matrix.
+        @type scaling_matrix:       numpy diagonal matrix
+        """
+
+        # Execute the base class __init__() method.
+        super(MF_grid_batch_memo, self).__init__(model_free=model_free, model_type=model_type, spin=None, sim_index=sim_index, scaling_matrix=scaling_matrix)
+
+        # Store the spins.
+        self.spins = spins
+
+
+
+class MF_grid_batch_result_command(Result_command):
+    """Class for processing the model-free results of the vectorised grid search of a batch of spins."""
+
+    def __init__(self, processor, memo_id, results, completed):
+        """Set up the class, placing the grid search results here."""
+
+        # Execute the base class __init__() method.
+        super(MF_grid_batch_result_command, self).__init__(processor=processor, completed=completed)
+
+        # Store the arguments.
+        self.memo_id = memo_id
+        self.results = results
+
+
+    def run(self, processor, memo):
+        """Disassemble the model-free grid search results of all spins.
+
+        @param processor:   Unused!
+        @type processor:    None
+        @param memo:        The model-free batch memo.
+        @type memo:         MF_grid_batch_memo instance
+        """
+
+        # Loop over the spins.
+        for i in range(len(memo.spins)):
+            # Disassemble the results.
+            param_vector, func, iter, fc, gc, hc, warning = self.results[i]
+            disassemble_result(param_vector=param_vector, func=func, iter=iter, fc=fc, gc=gc, hc=hc, warning=warning, spin=memo.spins[i], sim_index=memo.sim_index, model_type=memo.model_type, scaling_matrix=memo.scaling_matrix)
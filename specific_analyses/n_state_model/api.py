@@ -25,7 +25,6 @@
 # Python module imports.
 from copy import deepcopy
 from minfx.generic import generic_minimise
-from minfx.grid import grid
 from numpy import dot, float64, zeros
 from re import search
 from warnings import warn
@@ -503,8 +502,8 @@ class N_state_model(API_base, API_common):
 
         # Grid search.
         if search('^[Gg]rid', min_algor):
-            # The search.
-            results = grid(func=model.func, args=(), num_incs=inc[0], lower=lower[0], upper=upper[0], A=A, b=b, verbosity=verbosity)
+            # The search, split across all slave processors.
+            results = self.grid_search_split(func=model.func, lower=lower[0], upper=upper[0], inc=inc[0], A=A, b=b, verbosity=verbosity)
 
             # Unpack the results.
             param_vector, func, iter_count, warning = results
@@ -790,6 +789,17 @@ class N_state_model(API_base, API_common):
                     setattr(spin, param[i], value[i])
 
 
+    def sim_block_optimisation(self):
+        """Allow the Monte Carlo simulations to be optimised as independent blocks on the slave processors.
+
+        @return:    True, as all simulation results are stored in the data pipe, spin, interatomic and alignment tensor containers.
+        @rtype:     bool
+        """
+
+        # Supported.
+        return True
+
+
     def sim_init_values(self):
         """Initialise the Monte Carlo parameter values."""
 
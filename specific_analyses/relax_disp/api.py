@@ -38,7 +38,7 @@ from types import MethodType
 
 # relax module imports.
 from lib.arg_check import is_list, is_str_list
-from lib.dispersion.variables import EXP_TYPE_CPMG_PROTON_MQ, EXP_TYPE_CPMG_PROTON_SQ, MODEL_LIST_MMQ, MODEL_R2EFF, PARAMS_R20
+from lib.dispersion.variables import EXP_TYPE_CPMG_PROTON_MQ, EXP_TYPE_CPMG_PROTON_SQ, MODEL_LIST_GRADIENT, MODEL_LIST_HESSIAN, MODEL_LIST_MMQ, MODEL_LIST_VECTORISED, MODEL_R2EFF, PARAMS_R20
 from lib.errors import RelaxError, RelaxImplementError
 from lib.text.sectioning import subsection
 from multi import Processor_box
@@ -52,7 +52,7 @@ from specific_analyses.api_base import API_base
 from specific_analyses.api_common import API_common
 from specific_analyses.relax_disp.checks import check_model_type
 from specific_analyses.relax_disp.data import average_intensity, calc_rotating_frame_params, find_intensity_keys, generate_r20_key, has_exponential_exp_type, has_proton_mmq_cpmg, loop_cluster, loop_exp_frq, loop_exp_frq_offset_point, loop_time, pack_back_calc_r2eff, return_param_key_from_data, spin_ids_to_containers
-from specific_analyses.relax_disp.optimisation import Disp_memo, Disp_minimise_command, back_calc_peak_intensities, back_calc_r2eff, calculate_r2eff, minimise_r2eff
+from specific_analyses.relax_disp.optimisation import Disp_memo, Disp_minimise_command, Disp_sims_command, Disp_sims_memo, back_calc_peak_intensities, back_calc_r2eff, calculate_r2eff, minimise_r2eff
 from specific_analyses.relax_disp.parameter_object import Relax_disp_params
 from specific_analyses.relax_disp.parameters import get_param_names, get_value, loop_parameters, param_conversion, param_index_to_param_info, param_num, r1_setup
 
@@ -744,12 +744,23 @@ class Relax_disp(API_base, API_common):
 
             # If the Jacobian and Hessian matrix have not been specified for fitting, 'simplex' should be used.
             else:
+                # The dispersion models of all selected spins.
+                models = [spin.model for spin in spin_loop(skip_desel=True) if hasattr(spin, 'model')]
+
                 if match('^[Gg]rid$', algor):
                     allow = True
 
                 elif match('^[Ss]implex$', algor):
                     allow = True
 
+                # Quasi-Newton BFGS minimisation, for the models with analytic gradients.
+                elif match('^[Bb][Ff][Gg][Ss]$', algor):
+                    allow = len(models) > 0 and all([model in MODEL_LIST_GRADIENT for model in models])
+
+                # Newton minimisation, for the models with analytic Hessians.
+                elif match('^[Nn]ewton$', algor):
+                    allow = len(models) > 0 and all([model in MODEL_LIST_HESSIAN for model in models])
+
         # Do not allow, if no model has been specified.
         else:
             model_type = 'None'
@@ -827,6 +838,82 @@ class Relax_disp(API_base, API_common):
             processor.add_to_queue(command, memo)
 
 
+    def minimise_sims(self, min_algor=None, min_options=None, func_tol=None, grad_tol=None, max_iterations=None, constraints=False, scaling_matrix=None, verbosity=0, sim_indices=None):
+        """Optimisation of all Monte Carlo simulations, with the simulations of the vectorised models optimised in lock-step.
+
+        The clusters of the models of the MODEL_LIST_VECTORISED list are optimised by a single slave command, in which the simplex algorithm steps all simulations in lock-step with the linear constraints enforced as hard boundaries.  The clusters of all other models are optimised one simulation at a time.
+
+
+        @keyword min_algor:         The minimisation algorithm to use.
+        @type min_algor:            str
+        @keyword min_options:       An array of options to be used by the minimisation algorithm.
+        @type min_options:          array of str
+        @keyword func_tol:          The function tolerance which, when reached, terminates optimisation.  Setting this to None turns of the check.
+        @type func_tol:             None or float
+        @keyword grad_tol:          The gradient tolerance which, when reached, terminates optimisation.  Setting this to None turns of the check.
+        @type grad_tol:             None or float
+        @keyword max_iterations:    The maximum number of iterations for the algorithm.
+        @type max_iterations:       int
+        @keyword constraints:       If True, constraints are used during optimisation.
+        @type constraints:          bool
+        @keyword scaling_matrix:    The per-model list of diagonal and square scaling matrices.
+        @type scaling_matrix:       list of numpy rank-2, float64 array or list of None
+        @keyword verbosity:         The amount of information to print.  The higher the value, the greater the verbosity.
+        @type verbosity:            int
+        @keyword sim_indices:       The indices of the simulations to optimise.
+        @type sim_indices:          list of int
+        """
+
+        # Data checks.
+        check_mol_res_spin_data()
+        check_model_type()
+
+        # Initialise some empty data pipe structures so that the target function set up does not fail.
+        if not hasattr(cdp, 'cpmg_frqs_list'):
+            cdp.cpmg_frqs_list = []
+        if not hasattr(cdp, 'spin_lock_nu1_list'):
+            cdp.spin_lock_nu1_list = []
+
+        # Get the Processor box singleton (it contains the Processor instance) and alias the Processor.
+        processor_box = Processor_box() 
+        processor = processor_box.processor
+
+        # Number of spectrometer fields.
+        fields = [None]
+        if hasattr(cdp, 'spectrometer_frq'):
+            fields = cdp.spectrometer_frq_list
+
+        # Loop over the spin blocks.
+        model_index = -1
+        for spin_ids in self.model_loop():
+            # Increment the model index.
+            model_index += 1
+
+            # The spin containers.
+            spins = spin_ids_to_containers(spin_ids)
+
+            # Skip deselected clusters.
+            skip = True
+            for spin in spins:
+                if spin.select:
+                    skip = False
+            if skip:
+                continue
+
+            # Lock-step optimisation of all simulations.
+            if spins[0].model in MODEL_LIST_VECTORISED:
+                command = Disp_sims_command(spins=spins, spin_ids=spin_ids, sim_indices=sim_indices, scaling_matrix=scaling_matrix[model_index], func_tol=func_tol, max_iterations=max_iterations, constraints=constraints, verbosity=verbosity, fields=fields, param_names=get_param_names(spins=spins, full=True))
+                memo = Disp_sims_memo(spins=spins, spin_ids=spin_ids, sim_indices=sim_indices, scaling_matrix=scaling_matrix[model_index], verbosity=verbosity)
+                processor.add_to_queue(command, memo)
+                continue
+
+            # Optimisation of each simulation.
+            for sim_index in sim_indices:
+                command = Disp_minimise_command(spins=spins, spin_ids=spin_ids, sim_index=sim_index, scaling_matrix=scaling_matrix[model_index], min_algor=min_algor, min_options=min_options, func_tol=func_tol, grad_tol=grad_tol, max_iterations=max_iterations, constraints=constraints, verbosity=verbosity, fields=fields, param_names=get_param_names(spins=spins, full=True))
+                memo = Disp_memo(spins=spins, spin_ids=spin_ids, sim_index=sim_index, scaling_matrix=scaling_matrix[model_index], verbosity=verbosity)
+                processor.add_to_queue(command, memo)
+
+
     def model_desc(self, model_info=None):
         """Return a description of the model.
 
@@ -1337,6 +1424,38 @@ class Relax_disp(API_base, API_common):
             spin.select_sim = deepcopy(select_sim)
 
 
+    def sim_batch_optimisation(self, min_algor=None, min_options=None):
+        """Determine if the Monte Carlo simulations can be optimised together via the minimise_sims() method.
+
+        This is the case for the simplex algorithm when at least one selected spin uses a model of the MODEL_LIST_VECTORISED list.
+
+
+        @keyword min_algor:     The minimisation algorithm to use.
+        @type min_algor:        str
+        @keyword min_options:   An array of options to be used by the minimisation algorithm.
+        @type min_options:      array of str
+        @return:                True if batched optimisation of the simulations is supported, False otherwise.
+        @rtype:                 bool
+        """
+
+        # The R2eff model is not supported.
+        if not hasattr(cdp, 'model_type') or cdp.model_type == MODEL_R2EFF:
+            return False
+
+        # The simplex algorithm, possibly within the constraint algorithm.
+        algor = min_algor
+        if min_algor == 'Log barrier':
+            algor = min_options[0]
+        if not match('^[Ss]implex$', algor):
+            return False
+
+        # The vectorised models.
+        for spin in spin_loop(skip_desel=True):
+            if hasattr(spin, 'model') and spin.model in MODEL_LIST_VECTORISED:
+                return True
+        return False
+
+
     def sim_init_values(self):
         """Initialise the Monte Carlo parameter values."""
 
@@ -23,7 +23,8 @@
 """Target functions for relaxation exponential curve fitting with both minfx and scipy.optimize.leastsq."""
 
 # Python module imports.
-from copy import deepcopy
+from copy import copy, deepcopy
+from multiprocessing.pool import ThreadPool
 from numpy import array, asarray, diag, exp, log, ones, sqrt, sum, transpose, zeros
 from minfx.generic import generic_minimise
 import sys
@@ -489,7 +490,7 @@ class Exp:
         return jacobian_matrix_exp_chi2
 
 
-def estimate_r2eff(method='minfx', min_algor='simplex', c_code=True, constraints=False, chi2_jacobian=False, spin_id=None, ftol=1e-15, xtol=1e-15, maxfev=10000000, factor=100.0, verbosity=1):
+def estimate_r2eff(method='minfx', min_algor='simplex', c_code=True, constraints=False, chi2_jacobian=False, spin_id=None, ftol=1e-15, xtol=1e-15, maxfev=10000000, factor=100.0, threads=1, verbosity=1):
     """Estimate r2eff and errors by exponential curve fitting with scipy.optimize.leastsq or minfx.
 
     THIS IS ONLY FOR TESTING.
@@ -506,6 +507,8 @@ def estimate_r2eff(method='minfx', min_algor='simplex', c_code=True, constraints
     Initial guess for the starting parameter x0 = [r2eff_est, i0_est], is by converting the exponential curve to a linear problem.
     Then solving initial guess by linear least squares of: ln(Intensity[j]) = ln(i0) - time[j]* r2eff.
 
+    For the minfx method, the exponential curves can be fitted concurrently in a pool of threads.  Each curve is fitted with its own copy of the Exp settings and, with the C code, its own re-entrant relax_fit fitter object which releases the GIL during the function evaluations.  The scipy.optimize.leastsq method always fits the curves one at a time.
+
 
     @keyword method:            The method to minimise and estimate errors.  Options are: 'minfx' or 'scipy.optimize.leastsq'.
     @type method:               string
@@ -527,6 +530,8 @@ def estimate_r2eff(method='minfx', min_algor='simplex', c_code=True, constraints
     @type maxfev:               int
     @keyword factor:            The initial step bound, parsed to leastsq.  It determines the initial step bound (''factor * || diag * x||'').  Should be in the interval (0.1, 100).
     @type factor:               float
+    @keyword threads:           The number of threads for fitting the exponential curves with the minfx method.
+    @type threads:              int
     @keyword verbosity:         The amount of information to print.  The higher the value, the greater the verbosity.
     @type verbosity:            int
     """
@@ -556,21 +561,16 @@ def estimate_r2eff(method='minfx', min_algor='simplex', c_code=True, constraints
                 precalc = False
                 break
 
-    # Loop over the spins.
+    # The minfx settings.
+    if method == 'minfx':
+        E.set_settings_minfx(min_algor=min_algor, c_code=c_code, chi2_jacobian=chi2_jacobian, constraints=constraints)
+
+    # Collect the exponential curves of all spins and dispersion points.
+    curves = []
     for cur_spin, mol_name, resi, resn, cur_spin_id in spin_loop(selection=spin_id, full_info=True, return_id=True, skip_desel=True):
         # Generate spin string.
         spin_string = generate_spin_string(spin=cur_spin, mol_name=mol_name, res_num=resi, res_name=resn)
 
-        # Print information.
-        if E.verbosity >= 1:
-            # Individual spin block section.
-            top = 2
-            if E.verbosity >= 2:
-                top += 2
-            subsection(file=sys.stdout, text="Fitting with %s to: %s"%(method, spin_string), prespace=top)
-            if method == 'minfx':
-                subsection(file=sys.stdout, text="min_algor='%s', c_code=%s, constraints=%s, chi2_jacobian?=%s"%(min_algor, c_code, constraints, chi2_jacobian), prespace=0)
-
         # Loop over each spectrometer frequency and dispersion point.
         for exp_type, frq, offset, point, ei, mi, oi, di in loop_exp_frq_offset_point(return_indices=True):
             # The parameter key.
@@ -585,77 +585,118 @@ def estimate_r2eff(method='minfx', min_algor='simplex', c_code=True, constraints
                 errors.append(average_intensity(spin=cur_spin, exp_type=exp_type, frq=frq, offset=offset, point=point, time=time, error=True))
                 times.append(time)
 
-            # Convert to numpy array.
-            values = asarray(values)
-            errors = asarray(errors)
-            times = asarray(times)
+            # Store the curve, converting to numpy arrays.
+            curves.append([cur_spin, spin_string, exp_type, frq, offset, point, param_key, asarray(values), asarray(errors), asarray(times)])
 
-            # Initialise data.
-            E.setup_data(values=values, errors=errors, times=times)
+    # Fit the curves concurrently in a pool of threads.
+    if threads > 1 and method == 'minfx' and len(curves) > 1:
+        pool = ThreadPool(min(threads, len(curves)))
+        try:
+            results_list = pool.map(lambda curve: minimise_curve(E=E, method=method, values=curve[7], errors=curve[8], times=curve[9]), curves)
+        finally:
+            pool.close()
+            pool.join()
 
-            # Get the result based on method.
-            if method == 'scipy.optimize.leastsq':
-                # Acquire results.
-                results = minimise_leastsq(E=E)
+    # Fit the curves one at a time.
+    else:
+        results_list = [minimise_curve(E=E, method=method, values=curve[7], errors=curve[8], times=curve[9]) for curve in curves]
 
-            elif method == 'minfx':
-                # Set settings.
-                E.set_settings_minfx(min_algor=min_algor, c_code=c_code, chi2_jacobian=chi2_jacobian, constraints=constraints)
+    # Loop over the curves and their results.
+    prev_spin = None
+    for curve, results in zip(curves, results_list):
+        # Unpack the curve.
+        cur_spin, spin_string, exp_type, frq, offset, point, param_key, values, errors, times = curve
 
-                # Acquire results.
-                results = minimise_minfx(E=E)
-            else:
-                raise RelaxError("Method for minimisation not known. Try setting: method='scipy.optimize.leastsq'.")
+        # Print information for each new spin.
+        if E.verbosity >= 1 and cur_spin is not prev_spin:
+            # Individual spin block section.
+            top = 2
+            if E.verbosity >= 2:
+                top += 2
+            subsection(file=sys.stdout, text="Fitting with %s to: %s"%(method, spin_string), prespace=top)
+            if method == 'minfx':
+                subsection(file=sys.stdout, text="min_algor='%s', c_code=%s, constraints=%s, chi2_jacobian?=%s"%(min_algor, c_code, constraints, chi2_jacobian), prespace=0)
+        prev_spin = cur_spin
 
-            # Unpack results
-            param_vector, param_vector_error, chi2, iter_count, f_count, g_count, h_count, warning = results
+        # Unpack results
+        param_vector, param_vector_error, chi2, iter_count, f_count, g_count, h_count, warning = results
 
-            # Extract values.
-            r2eff = param_vector[0]
-            i0 = param_vector[1]
-            r2eff_err = param_vector_error[0]
-            i0_err = param_vector_error[1]
+        # Extract values.
+        r2eff = param_vector[0]
+        i0 = param_vector[1]
+        r2eff_err = param_vector_error[0]
+        i0_err = param_vector_error[1]
 
-            # Disassemble the parameter vector.
-            disassemble_param_vector(param_vector=param_vector, spins=[cur_spin], key=param_key)
+        # Disassemble the parameter vector.
+        disassemble_param_vector(param_vector=param_vector, spins=[cur_spin], key=param_key)
 
-            # Errors.
-            if not hasattr(cur_spin, 'r2eff_err'):
-                setattr(cur_spin, 'r2eff_err', deepcopy(getattr(cur_spin, 'r2eff')))
-            if not hasattr(cur_spin, 'i0_err'):
-                setattr(cur_spin, 'i0_err', deepcopy(getattr(cur_spin, 'i0')))
+        # Errors.
+        if not hasattr(cur_spin, 'r2eff_err'):
+            setattr(cur_spin, 'r2eff_err', deepcopy(getattr(cur_spin, 'r2eff')))
+        if not hasattr(cur_spin, 'i0_err'):
+            setattr(cur_spin, 'i0_err', deepcopy(getattr(cur_spin, 'i0')))
 
-            # Set error.
-            cur_spin.r2eff_err[param_key] = r2eff_err
-            cur_spin.i0_err[param_key] = i0_err
+        # Set error.
+        cur_spin.r2eff_err[param_key] = r2eff_err
+        cur_spin.i0_err[param_key] = i0_err
 
-            # Chi-squared statistic.
-            cur_spin.chi2 = chi2
+        # Chi-squared statistic.
+        cur_spin.chi2 = chi2
 
-            # Iterations.
-            cur_spin.f_count = f_count
+        # Iterations.
+        cur_spin.f_count = f_count
 
-            # Warning.
-            cur_spin.warning = warning
+        # Warning.
+        cur_spin.warning = warning
 
-            # Print information.
-            print_strings = []
-            if E.verbosity >= 1:
-                # Add print strings.
-                point_info = "%s at %3.1f MHz, for offset=%3.3f ppm and dispersion point %-5.1f, with %i time points." % (exp_type, frq/1E6, offset, point, len(times))
-                print_strings.append(point_info)
+        # Print information.
+        print_strings = []
+        if E.verbosity >= 1:
+            # Add print strings.
+            point_info = "%s at %3.1f MHz, for offset=%3.3f ppm and dispersion point %-5.1f, with %i time points." % (exp_type, frq/1E6, offset, point, len(times))
+            print_strings.append(point_info)
 
-                par_info = "r2eff=%3.3f r2eff_err=%3.4f, i0=%6.1f, i0_err=%3.4f, chi2=%3.3f.\n" % ( r2eff, r2eff_err, i0, i0_err, chi2)
-                print_strings.append(par_info)
+            par_info = "r2eff=%3.3f r2eff_err=%3.4f, i0=%6.1f, i0_err=%3.4f, chi2=%3.3f.\n" % ( r2eff, r2eff_err, i0, i0_err, chi2)
+            print_strings.append(par_info)
 
-                if E.verbosity >= 2:
-                    time_info = ', '.join(map(str, times))
-                    print_strings.append('For time array: '+time_info+'.\n\n')
+            if E.verbosity >= 2:
+                time_info = ', '.join(map(str, times))
+                print_strings.append('For time array: '+time_info+'.\n\n')
+
+        # Print info
+        if len(print_strings) > 0:
+            for print_string in print_strings:
+                print(print_string),
+
+
+def minimise_curve(E=None, method=None, values=None, errors=None, times=None):
+    """Fit a single exponential curve, using a copy of the Exp class so that curves can be fitted concurrently.
+
+    @keyword E:         The Exponential function class, containing the settings.
+    @type E:            Exp instance
+    @keyword method:    The method to minimise and estimate errors.  Options are: 'minfx' or 'scipy.optimize.leastsq'.
+    @type method:       str
+    @keyword values:    The measured intensity values per time point.
+    @type values:       numpy array
+    @keyword errors:    The standard deviation of the measured intensity values per time point.
+    @type errors:       numpy array
+    @keyword times:     The time points.
+    @type times:        numpy array
+    @return:            Packed list with optimised parameter, estimated parameter error, chi2, iter_count, f_count, g_count, h_count, warning
+    @rtype:             list
+    """
 
-            # Print info
-            if len(print_strings) > 0:
-                for print_string in print_strings:
-                    print(print_string),
+    # The settings and data for this curve.
+    E_curve = copy(E)
+    E_curve.setup_data(values=values, errors=errors, times=times)
+
+    # Get the result based on method.
+    if method == 'scipy.optimize.leastsq':
+        return minimise_leastsq(E=E_curve)
+    elif method == 'minfx':
+        return minimise_minfx(E=E_curve)
+    else:
+        raise RelaxError("Method for minimisation not known. Try setting: method='scipy.optimize.leastsq'.")
 
 
 def minimise_leastsq(E=None):
@@ -26,7 +26,7 @@
 # Python module imports.
 from minfx.generic import generic_minimise
 from minfx.grid import grid
-from numpy import dot, float64, int32, ones, zeros
+from numpy import arange, argmin, array, dot, float64, inf, int32, nonzero, ones, prod, unravel_index, zeros
 from numpy.linalg import inv
 from operator import mul
 from re import match, search
@@ -36,14 +36,14 @@ from warnings import warn
 # relax module imports.
 from dep_check import C_module_exp_fn
 from lib.dispersion.two_point import calc_two_point_r2eff, calc_two_point_r2eff_err
-from lib.dispersion.variables import EXP_TYPE_LIST_CPMG, MODEL_CR72, MODEL_CR72_FULL, MODEL_LM63, MODEL_M61, MODEL_MP05, MODEL_TAP03, MODEL_TP02
+from lib.dispersion.variables import EXP_TYPE_LIST_CPMG, MODEL_CR72, MODEL_CR72_FULL, MODEL_LIST_NUMERIC, MODEL_LM63, MODEL_M61, MODEL_MP05, MODEL_TAP03, MODEL_TP02
 from lib.errors import RelaxError
 from lib.text.sectioning import subsection
 from lib.warnings import RelaxWarning
 from multi import Memo, Result_command, Slave_command
 from pipe_control.mol_res_spin import generate_spin_string, spin_loop
 from specific_analyses.relax_disp.checks import check_disp_points, check_exp_type, check_exp_type_fixed_time
-from specific_analyses.relax_disp.data import average_intensity, count_spins, find_intensity_keys, has_exponential_exp_type, has_proton_mmq_cpmg, is_r1_optimised, loop_exp, loop_exp_frq_offset_point, loop_exp_frq_offset_point_time, loop_frq, loop_offset, loop_time, pack_back_calc_r2eff, return_cpmg_frqs, return_offset_data, return_param_key_from_data, return_r1_data, return_r2eff_arrays, return_spin_lock_nu1
+from specific_analyses.relax_disp.data import average_intensity, count_spins, find_intensity_keys, has_exponential_exp_type, has_proton_mmq_cpmg, is_r1_optimised, is_r20_profiled, loop_exp, loop_exp_frq_offset_point, loop_exp_frq_offset_point_time, loop_frq, loop_offset, loop_time, pack_back_calc_r2eff, return_cpmg_frqs, return_offset_data, return_param_key_from_data, return_r1_data, return_r2eff_arrays, return_spin_lock_nu1
 from specific_analyses.relax_disp.parameters import assemble_param_vector, disassemble_param_vector, linear_constraints, param_conversion, param_num, r1_setup
 from target_functions.relax_disp import Dispersion
 from target_functions.relax_fit_wrapper import Relax_fit_opt
@@ -310,6 +310,84 @@ def calculate_r2eff():
                 spin.r2eff_err[param_key] = calc_two_point_r2eff_err(relax_time=time, I_ref=ref_intensity, I=intensity, I_ref_err=ref_intensity_err, I_err=intensity_err)
 
 
+def grid_search(model=None, inc=None, lower=None, upper=None, A=None, b=None, verbosity=0):
+    """Vectorised grid search for the relaxation dispersion models.
+
+    The grid points are generated in the same order as the minfx grid search, with the first parameter incremented first, and those which do not satisfy the linear constraints A.x >= b are skipped.  The chi-squared values are calculated for blocks of grid points via the Dispersion.func_grid() target function, the block size capping the memory usage.
+
+
+    @keyword model:     The initialised dispersion target function class.
+    @type model:        target_functions.relax_disp.Dispersion instance
+    @keyword inc:       The number of increments for each dimension of the grid search.
+    @type inc:          list of int
+    @keyword lower:     The lower bounds of the grid search.
+    @type lower:        list of float
+    @keyword upper:     The upper bounds of the grid search.
+    @type upper:        list of float
+    @keyword A:         The linear constraint matrix.
+    @type A:            None or numpy rank-2 float array
+    @keyword b:         The linear constraint scalar vector.
+    @type b:            None or numpy rank-1 float array
+    @keyword verbosity: The amount of information to print.  The higher the value, the greater the verbosity.
+    @type verbosity:    int
+    @return:            The parameter vector of the grid point with the lowest chi-squared value, the chi-squared value, the number of function calls, and the warning.
+    @rtype:             tuple of numpy rank-1 float array, float, int, None or str
+    """
+
+    # The grid rows, using the midpoint for a single increment.
+    rows = []
+    for i in range(len(inc)):
+        if inc[i] == 1:
+            rows.append(array([(lower[i] + upper[i]) / 2.0], float64))
+        else:
+            rows.append(lower[i] + arange(inc[i], dtype=float64) * (upper[i] - lower[i]) / (inc[i] - 1.0))
+
+    # Initialise.
+    total = int(prod(inc))
+    block = model.grid_chunk
+    min_params = array([row[0] for row in rows], float64)
+    f_min = None
+    f_count = 0
+
+    # Loop over the blocks of grid points.
+    for start in range(0, total, block):
+        # The grid points of the block.
+        indices = unravel_index(arange(start, min(start+block, total)), inc, order='F')
+        points = zeros((len(indices[0]), len(inc)), float64)
+        for i in range(len(inc)):
+            points[:, i] = rows[i][indices[i]]
+
+        # Skip the points which violate the linear constraints.
+        if A is not None:
+            points = points[((dot(points, A.T) - b) >= 0.0).all(axis=1)]
+            if not len(points):
+                continue
+
+        # The chi-squared values.
+        chi2 = model.func_grid(points)
+        f_count += len(points)
+
+        # The new minimum.
+        index = argmin(chi2)
+        if f_min is None or chi2[index] < f_min:
+            f_min = chi2[index]
+            min_params = points[index]
+
+    # No valid grid points.
+    if f_min is None:
+        return min_params, 1e300, 0, "No grid points satisfy the linear constraints."
+
+    # Printout.
+    if verbosity >= 2:
+        print("Grid search:  %i of %i grid points evaluated, minimum chi-squared value of %s." % (f_count, total, f_min))
+
+    # Recalculate the best grid point to store its back-calculated data.
+    model.func(min_params)
+
+    # Return the results in the minfx grid() format.
+    return min_params, float(f_min), f_count, None
+
+
 def minimise_r2eff(spins=None, spin_ids=None, min_algor=None, min_options=None, func_tol=None, grad_tol=None, max_iterations=None, constraints=False, scaling_matrix=None, verbosity=0, sim_index=None, lower=None, upper=None, inc=None):
     """Optimise the R2eff model by fitting the 2-parameter exponential curves.
 
@@ -499,6 +577,84 @@ def minimise_r2eff(spins=None, spin_ids=None, min_algor=None, min_options=None,
                 spins[si].warning = warning
 
 
+def r20_bounds_separable(A=None, num=None):
+    """Determine if the linear constraints on the R20 parameters are simple bounds.
+
+    The R20 parameters can only be profiled out of the optimisation if each linear constraint involving an R20 parameter involves that one parameter and no other.
+
+
+    @keyword A:     The linear constraint matrix.
+    @type A:        None or numpy rank-2 float array
+    @keyword num:   The number of R20 parameters.
+    @type num:      int
+    @return:        True if all linear constraints on the R20 parameters are simple bounds, False otherwise.
+    @rtype:         bool
+    """
+
+    # No constraints.
+    if A is None:
+        return True
+
+    # Loop over the constraints.
+    for i in range(len(A)):
+        # A constraint involving an R20 parameter together with any other parameter.
+        if len(nonzero(A[i, :num])[0]) and len(nonzero(A[i])[0]) != 1:
+            return False
+
+    # Simple bounds.
+    return True
+
+
+def r20_profile_constraints(A=None, b=None, num=None):
+    """Split the linear constraints into the bounds of the profiled R20 parameters and the constraints of the remaining parameters.
+
+    The R20 parameters come first in the parameter vector and are only subject to simple bounds, which are applied when solving for their optimal values.
+
+
+    @keyword A:     The linear constraint matrix.
+    @type A:        None or numpy rank-2 float array
+    @keyword b:     The linear constraint scalar vector.
+    @type b:        None or numpy rank-1 float array
+    @keyword num:   The number of R20 parameters.
+    @type num:      int
+    @return:        The linear constraint matrix and scalar vector for the remaining parameters, and the lower and upper bounds of the R20 parameters.
+    @rtype:         numpy rank-2 float array or None, numpy rank-1 float array or None, numpy rank-1 float array or None, numpy rank-1 float array or None
+    """
+
+    # No constraints.
+    if A is None:
+        return None, None, None, None
+
+    # The constraints on the R20 parameters must be simple bounds.
+    if not r20_bounds_separable(A=A, num=num):
+        raise RelaxError("The linear constraints on the R20 parameters are not simple bounds, so these parameters cannot be profiled out of the optimisation.")
+
+    # Loop over the constraints.
+    lower = -inf * ones(num, float64)
+    upper = inf * ones(num, float64)
+    rows = []
+    for i in range(len(A)):
+        # The constraints of the remaining parameters.
+        indices = nonzero(A[i, :num])[0]
+        if not len(indices):
+            rows.append(i)
+            continue
+
+        # The bounds of the R20 parameter.
+        j = indices[0]
+        if A[i, j] > 0.0:
+            lower[j] = max(lower[j], b[i] / A[i, j])
+        else:
+            upper[j] = min(upper[j], b[i] / A[i, j])
+
+    # No constraints are left.
+    if not len(rows):
+        return None, None, lower, upper
+
+    # Return the constraints and bounds.
+    return A[rows, num:], b[rows], lower, upper
+
+
 
 class Disp_memo(Memo):
     """The relaxation dispersion memo class."""
@@ -622,12 +778,38 @@ class Disp_minimise_command(Slave_command):
         # Parameter number.
         self.param_num = param_num(spins=spins)
 
+        # The variable projection flag for the R20 parameters.
+        self.r20_profile = is_r20_profiled(model=spins[0].model)
+
         # The dispersion data.
         self.dispersion_points = cdp.dispersion_points
         self.cpmg_frqs = return_cpmg_frqs(ref_flag=False)
         self.spin_lock_nu1 = return_spin_lock_nu1(ref_flag=False)
 
 
+    def cost(self):
+        """Estimate the relative computational cost of the optimisation for the dynamic scheduler.
+
+        @return:    The relative cost, proportional to the number of spins, fields and dispersion points, increased for the numeric models and multiplied by the grid size for a grid search.
+        @rtype:     float
+        """
+
+        # The basic data size.
+        cost = float(count_spins(self.spins) * len(self.fields) * self.dispersion_points)
+
+        # The numeric models are far more expensive.
+        if self.spins[0].model in MODEL_LIST_NUMERIC:
+            cost *= 100.0
+
+        # The grid search size.
+        if search('^[Gg]rid', self.min_algor):
+            for x in self.inc:
+                cost *= x
+
+        # Return the estimate.
+        return cost
+
+
     def run(self, processor, completed):
         """Set up and perform the optimisation."""
 
@@ -647,11 +829,27 @@ class Disp_minimise_command(Slave_command):
                 print("Unconstrained grid search size: %s (constraints may decrease this size).\n" % result)
 
         # Initialise the function to minimise.
-        model = Dispersion(model=self.spins[0].model, num_params=self.param_num, num_spins=count_spins(self.spins), num_frq=len(self.fields), exp_types=self.exp_types, values=self.values, errors=self.errors, missing=self.missing, frqs=self.frqs, frqs_H=self.frqs_H, cpmg_frqs=self.cpmg_frqs, spin_lock_nu1=self.spin_lock_nu1, chemical_shifts=self.chemical_shifts, offset=self.offsets, tilt_angles=self.tilt_angles, r1=self.r1, relax_times=self.relax_times, scaling_matrix=self.scaling_matrix, r1_fit=self.r1_fit)
+        model = self.target_function()
+
+        # The variable projection of the R20 parameters, for all minimisation algorithms except for the grid search and Newton.
+        r20_profile = self.r20_profile and not search('^[Gg]rid', self.min_algor) and not match('^[Nn]ewton', self.min_algor)
+
+        # Fall back to optimising all parameters together if the R20 constraints are not simple bounds.
+        if r20_profile and not r20_bounds_separable(A=self.A, num=model.end_index[0]):
+            r20_profile = False
+            if self.verbosity >= 1:
+                print("The linear constraints on the R20 parameters are not simple bounds, the R20 parameters will not be profiled out of the optimisation.\n")
+
+        # Split the constraints.
+        if r20_profile:
+            num = model.end_index[0]
+            A, b, model.r20_lower, model.r20_upper = r20_profile_constraints(A=self.A, b=self.b, num=num)
+            if self.verbosity >= 1:
+                print("Variable projection of the %i R20 parameters, optimising the remaining %i parameters.\n" % (num, len(self.param_vector) - num))
 
         # Grid search.
         if search('^[Gg]rid', self.min_algor):
-            results = grid(func=model.func, args=(), num_incs=self.inc, lower=self.lower, upper=self.upper, A=self.A, b=self.b, verbosity=self.verbosity)
+            results = grid_search(model=model, inc=self.inc, lower=self.lower, upper=self.upper, A=self.A, b=self.b, verbosity=self.verbosity)
 
             # Unpack the results.
             param_vector, chi2, iter_count, warning = results
@@ -659,9 +857,22 @@ class Disp_minimise_command(Slave_command):
             g_count = 0.0
             h_count = 0.0
 
+        # Minimisation with the R20 parameters profiled out.
+        elif r20_profile:
+            dfunc = None
+            if model.dfunc != None:
+                dfunc = model.dfunc_r20_profile
+            results = generic_minimise(func=model.func_r20_profile, dfunc=dfunc, d2func=None, args=(), x0=self.param_vector[num:], min_algor=self.min_algor, min_options=self.min_options, func_tol=self.func_tol, grad_tol=self.grad_tol, maxiter=self.max_iterations, A=A, b=b, full_output=True, print_flag=self.verbosity)
+
+            # Unpack the results, reconstructing the full parameter vector.
+            if results == None:
+                return
+            param_vector, chi2, iter_count, f_count, g_count, h_count, warning = results
+            param_vector = model.r20_profile_params(param_vector)
+
         # Minimisation.
         else:
-            results = generic_minimise(func=model.func, args=(), x0=self.param_vector, min_algor=self.min_algor, min_options=self.min_options, func_tol=self.func_tol, grad_tol=self.grad_tol, maxiter=self.max_iterations, A=self.A, b=self.b, full_output=True, print_flag=self.verbosity)
+            results = generic_minimise(func=model.func, dfunc=model.dfunc, d2func=model.d2func, args=(), x0=self.param_vector, min_algor=self.min_algor, min_options=self.min_options, func_tol=self.func_tol, grad_tol=self.grad_tol, maxiter=self.max_iterations, A=self.A, b=self.b, full_output=True, print_flag=self.verbosity)
 
             # Unpack the results.
             if results == None:
@@ -678,6 +889,17 @@ class Disp_minimise_command(Slave_command):
         processor.return_object(Disp_result_command(processor=processor, memo_id=self.memo_id, param_vector=param_vector, chi2=chi2, iter_count=iter_count, f_count=f_count, g_count=g_count, h_count=h_count, warning=warning, missing=self.missing, back_calc=model.get_back_calc(), completed=False))
 
 
+    def target_function(self):
+        """Initialise the target function class for the cluster.
+
+        @return:    The target function class instance.
+        @rtype:     target_functions.relax_disp.Dispersion instance
+        """
+
+        # Initialise and return the function to minimise.
+        return Dispersion(model=self.spins[0].model, num_params=self.param_num, num_spins=count_spins(self.spins), num_frq=len(self.fields), exp_types=self.exp_types, values=self.values, errors=self.errors, missing=self.missing, frqs=self.frqs, frqs_H=self.frqs_H, cpmg_frqs=self.cpmg_frqs, spin_lock_nu1=self.spin_lock_nu1, chemical_shifts=self.chemical_shifts, offset=self.offsets, tilt_angles=self.tilt_angles, r1=self.r1, relax_times=self.relax_times, scaling_matrix=self.scaling_matrix, r1_fit=self.r1_fit)
+
+
 
 class Disp_result_command(Result_command):
     """Class for processing the dispersion optimisation results.
@@ -819,3 +1041,181 @@ class Disp_result_command(Result_command):
 
                 # Increment the spin index.
                 si += 1
+
+
+
+class Disp_sims_command(Disp_minimise_command):
+    """Command class for the lock-step optimisation of all Monte Carlo simulations of a cluster on the slave processor."""
+
+    def __init__(self, spins=None, spin_ids=None, sim_indices=None, scaling_matrix=None, func_tol=None, max_iterations=None, constraints=False, verbosity=0, fields=None, param_names=None):
+        """Initialise the base class, storing all the master data to be sent to the slave processor.
+
+        This method is run on the master processor whereas the run() method is run on the slave processor.
+
+
+        @keyword spins:             The list of spin data container for the cluster.
+        @type spins:                list of SpinContainer instances
+        @keyword spin_ids:          The list of spin ID strings corresponding to the spins argument.
+        @type spin_ids:             list of str
+        @keyword sim_indices:       The indices of the simulations to optimise.
+        @type sim_indices:          list of int
+        @keyword scaling_matrix:    The diagonal, square scaling matrix.
+        @type scaling_matrix:       numpy diagonal matrix
+        @keyword func_tol:          The function tolerance which, when reached, terminates optimisation of the simulation.
+        @type func_tol:             float
+        @keyword max_iterations:    The maximum number of iterations for the algorithm.
+        @type max_iterations:       int
+        @keyword constraints:       If True, constraints are used during optimisation.
+        @type constraints:          bool
+        @keyword verbosity:         The amount of information to print.  The higher the value, the greater the verbosity.
+        @type verbosity:            int
+        @keyword fields:            The list of unique of spectrometer field strengths.
+        @type fields:               int
+        @keyword param_names:       The list of parameter names to use in printouts.
+        @type param_names:          str
+        """
+
+        # Execute the base class __init__() method, set up for the first simulation.
+        super(Disp_sims_command, self).__init__(spins=spins, spin_ids=spin_ids, sim_index=sim_indices[0], scaling_matrix=scaling_matrix, min_algor='simplex', min_options=(), func_tol=func_tol, max_iterations=max_iterations, constraints=constraints, verbosity=verbosity, fields=fields, param_names=param_names)
+
+        # Store the simulation indices.
+        self.sim_indices = sim_indices
+
+        # The R2eff/R1rho data of all simulations.
+        self.sim_values = [self.values]
+        for sim_index in sim_indices[1:]:
+            self.sim_values.append(return_r2eff_arrays(spins=spins, spin_ids=spin_ids, fields=fields, field_count=len(fields), sim_index=sim_index)[0])
+
+
+    def cost(self):
+        """Estimate the relative computational cost of the optimisation for the dynamic scheduler.
+
+        @return:    The relative cost, proportional to the data size and the number of simulations.
+        @rtype:     float
+        """
+
+        # The cost of a single simulation multiplied by the simulation number.
+        return super(Disp_sims_command, self).cost() * len(self.sim_indices)
+
+
+    def run(self, processor, completed):
+        """Set up and perform the optimisation of all simulations."""
+
+        # Print out.
+        if self.verbosity >= 1:
+            subsection(file=sys.stdout, text="Fitting the %i Monte Carlo simulations of the spin block %s" % (len(self.sim_indices), self.spin_ids), prespace=2)
+
+        # Initialise the function to minimise.
+        model = self.target_function()
+
+        # The R2eff/R1rho data of all simulations.
+        values = array([model.pack_values(sim_values) for sim_values in self.sim_values])
+
+        # Lock-step optimisation.
+        param_vectors, chi2, iter_count, f_count, warning = model.minimise_sims(self.param_vector, values, A=self.A, b=self.b, func_tol=self.func_tol, max_iterations=self.max_iterations)
+
+        # Create the result command object to send back to the master.
+        processor.return_object(Disp_sims_result_command(processor=processor, memo_id=self.memo_id, param_vectors=param_vectors, chi2=chi2, iter_count=iter_count, f_count=f_count, warning=warning, completed=False))
+
+
+
+class Disp_sims_memo(Disp_memo):
+    """The relaxation dispersion memo class for the lock-step optimisation of the Monte Carlo simulations."""
+
+    def __init__(self, spins=None, spin_ids=None, sim_indices=None, scaling_matrix=None, verbosity=None):
+        """Initialise the memo class.
+
+        @keyword spins:             The list of spin data container for the cluster.
+        @type spins:                list of SpinContainer instances
+        @keyword spin_ids:          The spin ID strings for the cluster.
+        @type spin_ids:             list of str
+        @keyword sim_indices:       The indices of the optimised simulations.
+        @type sim_indices:          list of int
+        @keyword scaling_matrix:    The diagonal, square scaling matrix.
+        @type scaling_matrix:       numpy diagonal matrix
+        @keyword verbosity:         The verbosity level.
+        @type verbosity:            int
+        """
+
+        # Execute the base class __init__() method.
+        super(Disp_sims_memo, self).__init__(spins=spins, spin_ids=spin_ids, scaling_matrix=scaling_matrix, verbosity=verbosity)
+
+        # Store the simulation indices.
+        self.sim_indices = sim_indices
+
+
+
+class Disp_sims_result_command(Result_command):
+    """Class for processing the results of the lock-step optimisation of the Monte Carlo simulations."""
+
+    def __init__(self, processor=None, memo_id=None, param_vectors=None, chi2=None, iter_count=None, f_count=None, warning=None, completed=True):
+        """Set up this class object on the slave, placing the minimisation results here.
+
+        @keyword processor:     The processor object.
+        @type processor:        multi.processor.Processor instance
+        @keyword memo_id:       The memo identification string.
+        @type memo_id:          str
+        @keyword param_vectors: The optimised parameter vectors of each simulation.
+        @type param_vectors:    numpy rank-2 array
+        @keyword chi2:          The final target function values.
+        @type chi2:             numpy rank-1 array
+        @keyword iter_count:    The number of optimisation iterations.
+        @type iter_count:       numpy rank-1 int array
+        @keyword f_count:       The total function call counts.
+        @type f_count:          numpy rank-1 int array
+        @keyword warning:       Any optimisation warnings.
+        @type warning:          list of str or None
+        @keyword completed:     A flag which if True signals that the optimisation successfully completed.
+        @type completed:        bool
+        """
+
+        # Execute the base class __init__() method.
+        super(Disp_sims_result_command, self).__init__(processor=processor, completed=completed)
+
+        # Store the arguments (to be sent back to the master).
+        self.memo_id = memo_id
+        self.param_vectors = param_vectors
+        self.chi2 = chi2
+        self.iter_count = iter_count
+        self.f_count = f_count
+        self.warning = warning
+
+
+    def run(self, processor=None, memo=None):
+        """Disassemble the optimisation results of all simulations (on the master).
+
+        @param processor:   Unused!
+        @type processor:    None
+        @param memo:        The dispersion simulation memo.
+        @type memo:         Disp_sims_memo instance
+        """
+
+        # Loop over the simulations.
+        for i in range(len(memo.sim_indices)):
+            sim_index = memo.sim_indices[i]
+
+            # Printout.
+            print("Simulation %s, cluster %s" % (sim_index+1, memo.spin_ids))
+
+            # Scaling.
+            param_vector = self.param_vectors[i]
+            if memo.scaling_matrix is not None:
+                param_vector = dot(memo.scaling_matrix, param_vector)
+
+            # Disassemble the parameter vector.
+            disassemble_param_vector(param_vector=param_vector, spins=memo.spins, sim_index=sim_index)
+            param_conversion(spins=memo.spins, sim_index=sim_index)
+
+            # Monte Carlo minimisation statistics.
+            for spin in memo.spins:
+                # Skip deselected spins.
+                if not spin.select:
+                    continue
+
+                # The statistics.
+                spin.chi2_sim[sim_index] = float(self.chi2[i])
+                spin.iter_sim[sim_index] = int(self.iter_count[i])
+                spin.f_count_sim[sim_index] = int(self.f_count[i])
+                spin.g_count_sim[sim_index] = 0
+                spin.h_count_sim[sim_index] = 0
+                spin.warning_sim[sim_index] = self.warning[i]
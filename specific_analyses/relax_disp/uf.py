@@ -142,6 +142,17 @@ def r1_fit(fit=True):
     cdp.r1_fit = fit
 
 
+def r20_profile(flag=True):
+    """Set the R20 variable projection flag.
+
+    @keyword flag:  The flag which if True will cause the R20 parameters to be profiled out of the optimisation.
+    @type flag:     bool
+    """
+
+    # Simply store the value for later use.
+    cdp.r20_profile = flag
+
+
 def select_model(model=MODEL_R2EFF):
     """Set up the model for the relaxation dispersion analysis.
 
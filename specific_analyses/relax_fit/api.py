@@ -25,8 +25,6 @@
 """The R1 and R2 exponential relaxation curve fitting API object."""
 
 # Python module imports.
-from minfx.generic import generic_minimise
-from minfx.grid import grid
 from numpy import asarray, dot, float64, transpose, zeros
 from numpy.linalg import inv
 from re import match, search
@@ -38,13 +36,14 @@ from dep_check import C_module_exp_fn
 from lib.errors import RelaxError, RelaxNoModelError
 from lib.text.sectioning import subsection
 from lib.warnings import RelaxDeselectWarning
+from multi import Processor_box
 from pipe_control.mol_res_spin import check_mol_res_spin_data, return_spin, spin_loop
 from specific_analyses.api_base import API_base
 from specific_analyses.api_common import API_common
 from specific_analyses.relax_fit.checks import check_model_setup
-from specific_analyses.relax_fit.optimisation import back_calc
+from specific_analyses.relax_fit.optimisation import Relax_fit_memo, Relax_fit_minimise_command, back_calc, minimise_batch
 from specific_analyses.relax_fit.parameter_object import Relax_fit_params
-from specific_analyses.relax_fit.parameters import assemble_param_vector, disassemble_param_vector, linear_constraints
+from specific_analyses.relax_fit.parameters import assemble_param_vector, linear_constraints
 from target_functions.relax_fit_wrapper import Relax_fit_opt
 
 
@@ -300,6 +299,21 @@ class Relax_fit(API_base, API_common):
         # Checks.
         check_mol_res_spin_data()
 
+        # The minimisation algorithm when constraints are present.
+        if constraints and not match('^[Gg]rid', min_algor):
+            algor = min_options[0]
+        else:
+            algor = min_algor
+
+        # Levenberg-Marquardt minimisation of all spins simultaneously (the only algorithm supported by the batched target function).
+        if match('^[Ll][Mm]$', algor) or match('^[Ll]evenb[eu]rg-[Mm]arquardt$', algor):
+            self._minimise_batch(func_tol=func_tol, max_iterations=max_iterations, constraints=constraints, scaling_matrix=scaling_matrix, verbosity=verbosity, sim_index=sim_index)
+            return
+
+        # Get the Processor box singleton (it contains the Processor instance) and alias the Processor.
+        processor_box = Processor_box() 
+        processor = processor_box.processor
+
         # Loop over the sequence.
         model_index = 0
         for spin, spin_id in self.model_loop():
@@ -324,20 +338,6 @@ class Relax_fit(API_base, API_common):
             else:
                 A, b = None, None
 
-            # Print out.
-            if verbosity >= 1:
-                # Individual spin printout.
-                if verbosity >= 2:
-                    print("\n\n")
-
-                string = "Fitting to spin " + repr(spin_id)
-                print("\n\n" + string)
-                print(len(string) * '~')
-
-
-            # Initialise the function to minimise.
-            ######################################
-
             # The peak intensities and times.
             values = []
             errors = []
@@ -364,106 +364,67 @@ class Relax_fit(API_base, API_common):
                 for i in range(len(scaling_matrix[model_index])):
                     scaling_list.append(scaling_matrix[model_index][i, i])
 
-            # Set up the target function.
-            model = Relax_fit_opt(model=spin.model, num_params=len(spin.params), values=values, errors=errors, relax_times=times, scaling_matrix=scaling_list)
-
-
-            # Setup the minimisation algorithm when constraints are present.
-            ################################################################
-
-            if constraints and not match('^[Gg]rid', min_algor):
-                algor = min_options[0]
-            else:
-                algor = min_algor
-
-
-            # Levenberg-Marquardt minimisation.
-            ###################################
-
-            if match('[Ll][Mm]$', algor) or match('[Ll]evenburg-[Mm]arquardt$', algor):
-                # Reconstruct the error data structure.
-                lm_error = zeros(len(spin.relax_times), float64)
-                index = 0
-                for k in range(len(spin.relax_times)):
-                    lm_error[index:index+len(relax_error[k])] = relax_error[k]
-                    index = index + len(relax_error[k])
-
-                min_options = min_options + (self.relax_fit.lm_dri, lm_error)
-
-
-            # Minimisation.
-            ###############
-
-            # Grid search.
+            # The grid search setup.
+            lower_i, upper_i, inc_i = None, None, None
             if search('^[Gg]rid', min_algor):
-                results = grid(func=model.func, args=(), num_incs=inc[model_index], lower=lower[model_index], upper=upper[model_index], A=A, b=b, verbosity=verbosity)
-
-                # Unpack the results.
-                param_vector, chi2, iter_count, warning = results
-                f_count = iter_count
-                g_count = 0.0
-                h_count = 0.0
+                lower_i, upper_i, inc_i = lower[model_index], upper[model_index], inc[model_index]
 
-            # Minimisation.
-            else:
-                results = generic_minimise(func=model.func, dfunc=model.dfunc, d2func=model.d2func, args=(), x0=param_vector, min_algor=min_algor, min_options=min_options, func_tol=func_tol, grad_tol=grad_tol, maxiter=max_iterations, A=A, b=b, full_output=True, print_flag=verbosity)
-
-                # Unpack the results.
-                if results == None:
-                    return
-                param_vector, chi2, iter_count, f_count, g_count, h_count, warning = results
-
-            # Scaling.
-            if scaling_matrix[model_index] is not None:
-                param_vector = dot(scaling_matrix[model_index], param_vector)
+            # Initialise the slave command and memo, and add them to the processor queue.
+            command = Relax_fit_minimise_command(spin_id=spin_id, model=spin.model, num_params=len(spin.params), values=values, errors=errors, relax_times=times, scaling_list=scaling_list, x0=param_vector, min_algor=min_algor, min_options=min_options, func_tol=func_tol, grad_tol=grad_tol, max_iterations=max_iterations, A=A, b=b, verbosity=verbosity, lower=lower_i, upper=upper_i, inc=inc_i)
+            memo = Relax_fit_memo(spin_id=spin_id, sim_index=sim_index, scaling_matrix=scaling_matrix[model_index])
+            processor.add_to_queue(command, memo)
 
-            # Disassemble the parameter vector.
-            disassemble_param_vector(param_vector=param_vector, spin=spin, sim_index=sim_index)
-
-            # Monte Carlo minimisation statistics.
-            if sim_index != None:
-                # Chi-squared statistic.
-                spin.chi2_sim[sim_index] = chi2
-
-                # Iterations.
-                spin.iter_sim[sim_index] = iter_count
+            # Increment the model index.
+            model_index += 1
 
-                # Function evaluations.
-                spin.f_count_sim[sim_index] = f_count
 
-                # Gradient evaluations.
-                spin.g_count_sim[sim_index] = g_count
+    def _minimise_batch(self, func_tol=None, max_iterations=None, constraints=False, scaling_matrix=None, verbosity=0, sim_index=None):
+        """Batched Levenberg-Marquardt optimisation of all spins, distributed over the slave processors.
 
-                # Hessian evaluations.
-                spin.h_count_sim[sim_index] = h_count
+        @keyword func_tol:          The function tolerance which, when reached, terminates optimisation.  Setting this to None turns of the check.
+        @type func_tol:             None or float
+        @keyword max_iterations:    The maximum number of iterations for the algorithm.
+        @type max_iterations:       int
+        @keyword constraints:       If True, constraints are used during optimisation.
+        @type constraints:          bool
+        @keyword scaling_matrix:    The per-model list of diagonal and square scaling matrices.
+        @type scaling_matrix:       list of numpy rank-2, float64 array or list of None
+        @keyword verbosity:         The amount of information to print.  The higher the value, the greater the verbosity.
+        @type verbosity:            int
+        @keyword sim_index:         The index of the simulation to optimise.  This should be None if normal optimisation is desired.
+        @type sim_index:            None or int
+        """
 
-                # Warning.
-                spin.warning_sim[sim_index] = warning
+        # Collect the spins.
+        spins = []
+        spin_ids = []
+        scaling_lists = []
+        model_index = 0
+        for spin, spin_id in self.model_loop():
+            # Skip deselected spins.
+            if not spin.select:
+                continue
 
+            # Skip spins which have no data.
+            if not hasattr(spin, 'peak_intensity'):
+                continue
 
-            # Normal statistics.
+            # The scaling matrix in a diagonalised list form.
+            if scaling_matrix[model_index] is None:
+                scaling_lists.append([1.0] * len(spin.params))
             else:
-                # Chi-squared statistic.
-                spin.chi2 = chi2
-
-                # Iterations.
-                spin.iter = iter_count
-
-                # Function evaluations.
-                spin.f_count = f_count
-
-                # Gradient evaluations.
-                spin.g_count = g_count
+                scaling_lists.append([scaling_matrix[model_index][i, i] for i in range(len(scaling_matrix[model_index]))])
 
-                # Hessian evaluations.
-                spin.h_count = h_count
-
-                # Warning.
-                spin.warning = warning
+            # Store the spin.
+            spins.append(spin)
+            spin_ids.append(spin_id)
 
             # Increment the model index.
             model_index += 1
 
+        # Queue the batches.
+        minimise_batch(spins=spins, spin_ids=spin_ids, scaling_lists=scaling_lists, func_tol=func_tol, max_iterations=max_iterations, constraints=constraints, verbosity=verbosity, sim_index=sim_index)
+
 
     def overfit_deselect(self, data_check=True, verbose=True):
         """Deselect spins which have insufficient data to support minimisation.
@@ -545,6 +506,17 @@ class Relax_fit(API_base, API_common):
         return spin.peak_intensity_err
 
 
+    def sim_block_optimisation(self):
+        """Allow the Monte Carlo simulations to be optimised as independent blocks on the slave processors.
+
+        @return:    True, as all simulation results are stored in the spin containers.
+        @rtype:     bool
+        """
+
+        # Supported.
+        return True
+
+
     def sim_pack_data(self, data_id, sim_data):
         """Pack the Monte Carlo simulation data.
 
@@ -25,8 +25,17 @@
 # Module docstring.
 """The R1 and R2 exponential relaxation curve fitting optimisation functions."""
 
+# Python module imports.
+from minfx.generic import generic_minimise
+from minfx.grid import grid
+from numpy import array, dot, float64, ones, zeros
+from re import search
+
 # relax module imports.
-from specific_analyses.relax_fit.parameters import assemble_param_vector
+from multi import Memo, Processor_box, Result_command, Slave_command
+from pipe_control.mol_res_spin import return_spin
+from specific_analyses.relax_fit.parameters import assemble_param_vector, disassemble_param_vector
+from target_functions.relax_fit_batch import Relax_fit_batch
 from target_functions.relax_fit_wrapper import Relax_fit_opt
 
 
@@ -72,3 +81,486 @@ def back_calc(spin=None, relax_time_id=None):
 
     # Return the correct peak height.
     return results[keys.index(relax_time_id)]
+
+
+def minimise_batch(spins=None, spin_ids=None, scaling_lists=None, func_tol=None, max_iterations=None, constraints=False, verbosity=0, sim_index=None):
+    """Queue the batched Levenberg-Marquardt optimisation of all spins.
+
+    The spins are grouped by curve type, packed into rank-2 value, error and time arrays, and split into one batch per slave processor.  The batches are optimised by the target_functions.relax_fit_batch module on the slaves and the results are stored in the spin containers on the master.  The commands are executed by the next call to the processor's run_queue() method.
+
+
+    @keyword spins:         The list of spin containers to optimise.
+    @type spins:            list of SpinContainer instances
+    @keyword spin_ids:      The corresponding spin ID strings.
+    @type spin_ids:         list of str
+    @keyword scaling_lists: The corresponding diagonalised scaling matrices.
+    @type scaling_lists:    list of list of float
+    @keyword func_tol:      The function tolerance which, when reached, terminates optimisation.
+    @type func_tol:         None or float
+    @keyword max_iterations:    The maximum number of iterations for the algorithm.
+    @type max_iterations:   int
+    @keyword constraints:   If True, the non-negativity constraints are enforced.
+    @type constraints:      bool
+    @keyword verbosity:     The amount of information to print.  The higher the value, the greater the verbosity.
+    @type verbosity:        int
+    @keyword sim_index:     The index of the simulation to optimise.  This should be None if normal optimisation is desired.
+    @type sim_index:        None or int
+    """
+
+    # Get the Processor box singleton (it contains the Processor instance) and alias the Processor.
+    processor_box = Processor_box()
+    processor = processor_box.processor
+
+    # Defaults.
+    if func_tol == None:
+        func_tol = 0.0
+    if max_iterations == None:
+        max_iterations = 10000000
+
+    # The relaxation time keys, common to all spins.
+    keys = sorted(cdp.relax_times.keys())
+
+    # Group the spins by curve type.
+    groups = {}
+    for i in range(len(spins)):
+        if spins[i].model not in groups:
+            groups[spins[i].model] = []
+        groups[spins[i].model].append(i)
+
+    # Loop over the curve types.
+    for model in sorted(groups.keys()):
+        # Split the spins into batches.
+        indices = groups[model]
+        batch_num = min(len(indices), processor.processor_size())
+        for b in range(batch_num):
+            batch = indices[b::batch_num]
+
+            # Pack the data.
+            values = zeros((len(batch), len(keys)), float64)
+            errors = ones((len(batch), len(keys)), float64)
+            times = zeros((len(batch), len(keys)), float64)
+            mask = zeros((len(batch), len(keys)), bool)
+            x0 = []
+            scaling = []
+            for i in range(len(batch)):
+                spin = spins[batch[i]]
+                for j in range(len(keys)):
+                    # Missing data.
+                    if keys[j] not in spin.peak_intensity:
+                        continue
+
+                    # The values.
+                    if sim_index == None:
+                        values[i, j] = spin.peak_intensity[keys[j]]
+                    else:
+                        values[i, j] = spin.peak_intensity_sim[sim_index][keys[j]]
+
+                    # The errors and times.
+                    errors[i, j] = spin.peak_intensity_err[keys[j]]
+                    times[i, j] = cdp.relax_times[keys[j]]
+                    mask[i, j] = True
+
+                # The scaled starting position.
+                scaling.append(scaling_lists[batch[i]])
+                x0.append(assemble_param_vector(spin=spin) / array(scaling_lists[batch[i]]))
+
+            # Queue the batch.
+            command = Relax_fit_batch_command(model=model, values=values, errors=errors, relax_times=times, mask=mask, scaling_matrix=array(scaling), x0=array(x0), func_tol=func_tol, max_iterations=max_iterations, constraints=constraints, verbosity=verbosity)
+            memo = Relax_fit_batch_memo(spin_ids=[spin_ids[i] for i in batch], scaling_matrix=array(scaling), sim_index=sim_index)
+            processor.add_to_queue(command, memo)
+
+
+
+class Relax_fit_batch_command(Slave_command):
+    """Command class for the batched optimisation of the relaxation curves of many spins on the slave processor."""
+
+    def __init__(self, model=None, values=None, errors=None, relax_times=None, mask=None, scaling_matrix=None, x0=None, func_tol=None, max_iterations=None, constraints=False, verbosity=0):
+        """Store all the master data to be sent to the slave processor.
+
+        @keyword model:             The exponential curve type.
+        @type model:                str
+        @keyword values:            The peak intensities.
+        @type values:               numpy rank-2 array (N, M)
+        @keyword errors:            The peak intensity errors.
+        @type errors:               numpy rank-2 array (N, M)
+        @keyword relax_times:       The relaxation times.
+        @type relax_times:          numpy rank-2 array (N, M)
+        @keyword mask:              The data mask, with False for missing points.
+        @type mask:                 numpy rank-2 bool array (N, M)
+        @keyword scaling_matrix:    The per-spin diagonalised scaling matrices.
+        @type scaling_matrix:       numpy rank-2 array (N, P)
+        @keyword x0:                The scaled starting parameter values.
+        @type x0:                   numpy rank-2 array (N, P)
+        @keyword func_tol:          The function tolerance which, when reached, terminates optimisation.
+        @type func_tol:             float
+        @keyword max_iterations:    The maximum number of iterations for the algorithm.
+        @type max_iterations:       int
+        @keyword constraints:       If True, the non-negativity constraints are enforced.
+        @type constraints:          bool
+        @keyword verbosity:         The amount of information to print.  The higher the value, the greater the verbosity.
+        @type verbosity:            int
+        """
+
+        # Execute the base class __init__() method.
+        super(Relax_fit_batch_command, self).__init__()
+
+        # Store the arguments.
+        self.model = model
+        self.values = values
+        self.errors = errors
+        self.relax_times = relax_times
+        self.mask = mask
+        self.scaling_matrix = scaling_matrix
+        self.x0 = x0
+        self.func_tol = func_tol
+        self.max_iterations = max_iterations
+        self.constraints = constraints
+        self.verbosity = verbosity
+
+
+    def cost(self):
+        """Estimate the relative computational cost of the batch for the dynamic scheduler.
+
+        @return:    The number of data points in the batch.
+        @rtype:     float
+        """
+
+        return float(self.values.size)
+
+
+    def run(self, processor, completed):
+        """Optimise the batch of spins on the slave."""
+
+        # Print out.
+        if self.verbosity >= 1:
+            print("Batched Levenberg-Marquardt optimisation of %i spins with the '%s' curve type." % (len(self.values), self.model))
+
+        # Set up the target function and optimise.
+        model = Relax_fit_batch(model=self.model, values=self.values, errors=self.errors, relax_times=self.relax_times, mask=self.mask, scaling_matrix=self.scaling_matrix)
+        results = model.minimise(self.x0, func_tol=self.func_tol, max_iterations=self.max_iterations, constraints=self.constraints)
+
+        # Return the results.
+        processor.return_object(Relax_fit_batch_result_command(processor=processor, memo_id=self.memo_id, results=results, completed=False))
+
+
+
+class Relax_fit_batch_memo(Memo):
+    """The memo class for the batched relaxation curve optimisation."""
+
+    def __init__(self, spin_ids=None, scaling_matrix=None, sim_index=None):
+        """Store the data required on the master for unpacking the results.
+
+        @keyword spin_ids:          The spin ID strings of the batch.
+        @type spin_ids:             list of str
+        @keyword scaling_matrix:    The per-spin diagonalised scaling matrices.
+        @type scaling_matrix:       numpy rank-2 array (N, P)
+        @keyword sim_index:         The index of the simulation, or None for normal optimisation.
+        @type sim_index:            None or int
+        """
+
+        # Execute the base class __init__() method.
+        super(Relax_fit_batch_memo, self).__init__()
+
+        # Store the arguments.
+        self.spin_ids = spin_ids
+        self.scaling_matrix = scaling_matrix
+        self.sim_index = sim_index
+
+
+
+class Relax_fit_batch_result_command(Result_command):
+    """Class for storing the batched relaxation curve optimisation results on the master."""
+
+    def __init__(self, processor=None, memo_id=None, results=None, completed=True):
+        """Set up this class object on the slave, placing the optimisation results here.
+
+        @keyword processor: The processor object.
+        @type processor:    multi.processor.Processor instance
+        @keyword memo_id:   The memo identification string.
+        @type memo_id:      str
+        @keyword results:   The results of the Relax_fit_batch.minimise() method.
+        @type results:      tuple
+        @keyword completed: A flag which if True signals that the optimisation successfully completed.
+        @type completed:    bool
+        """
+
+        # Execute the base class __init__() method.
+        super(Relax_fit_batch_result_command, self).__init__(processor=processor, completed=completed)
+
+        # Store the arguments.
+        self.memo_id = memo_id
+        self.results = results
+
+
+    def run(self, processor, memo):
+        """Store the results in the spin containers on the master.
+
+        @param processor:   The processor object.
+        @type processor:    multi.processor.Processor instance
+        @param memo:        The batched optimisation memo.
+        @type memo:         Relax_fit_batch_memo instance
+        """
+
+        # Unpack the results.
+        param_vectors, chi2, iter_count, f_count, g_count, warning = self.results
+
+        # Loop over the spins.
+        for i in range(len(memo.spin_ids)):
+            spin = return_spin(spin_id=memo.spin_ids[i])
+
+            # Disassemble the unscaled parameter vector.
+            disassemble_param_vector(param_vector=param_vectors[i] * memo.scaling_matrix[i], spin=spin, sim_index=memo.sim_index)
+
+            # Monte Carlo minimisation statistics.
+            if memo.sim_index != None:
+                spin.chi2_sim[memo.sim_index] = float(chi2[i])
+                spin.iter_sim[memo.sim_index] = int(iter_count[i])
+                spin.f_count_sim[memo.sim_index] = int(f_count[i])
+                spin.g_count_sim[memo.sim_index] = int(g_count[i])
+                spin.h_count_sim[memo.sim_index] = 0
+                spin.warning_sim[memo.sim_index] = warning[i]
+
+            # Normal statistics.
+            else:
+                spin.chi2 = float(chi2[i])
+                spin.iter = int(iter_count[i])
+                spin.f_count = int(f_count[i])
+                spin.g_count = int(g_count[i])
+                spin.h_count = 0
+                spin.warning = warning[i]
+
+
+
+class Relax_fit_memo(Memo):
+    """The memo class for the optimisation of the relaxation curve of a single spin."""
+
+    def __init__(self, spin_id=None, sim_index=None, scaling_matrix=None):
+        """Store the data required on the master for unpacking the results.
+
+        @keyword spin_id:           The spin ID string.
+        @type spin_id:              str
+        @keyword sim_index:         The index of the simulation, or None for normal optimisation.
+        @type sim_index:            None or int
+        @keyword scaling_matrix:    The diagonal, square scaling matrix.
+        @type scaling_matrix:       numpy rank-2 array or None
+        """
+
+        # Execute the base class __init__() method.
+        super(Relax_fit_memo, self).__init__()
+
+        # Store the arguments.
+        self.spin_id = spin_id
+        self.sim_index = sim_index
+        self.scaling_matrix = scaling_matrix
+
+
+
+class Relax_fit_minimise_command(Slave_command):
+    """Command class for the optimisation of the relaxation curve of a single spin on the slave processor."""
+
+    def __init__(self, spin_id=None, model=None, num_params=None, values=None, errors=None, relax_times=None, scaling_list=None, x0=None, min_algor=None, min_options=None, func_tol=None, grad_tol=None, max_iterations=None, A=None, b=None, verbosity=0, lower=None, upper=None, inc=None):
+        """Store all the master data to be sent to the slave processor.
+
+        @keyword spin_id:           The spin ID string, used for printouts.
+        @type spin_id:              str
+        @keyword model:             The exponential curve type.
+        @type model:                str
+        @keyword num_params:        The number of model parameters.
+        @type num_params:           int
+        @keyword values:            The peak intensities.
+        @type values:               list of float
+        @keyword errors:            The peak intensity errors.
+        @type errors:               list of float
+        @keyword relax_times:       The relaxation times.
+        @type relax_times:          list of float
+        @keyword scaling_list:      The diagonalised scaling matrix.
+        @type scaling_list:         list of float
+        @keyword x0:                The scaled starting parameter vector.
+        @type x0:                   numpy rank-1 array
+        @keyword min_algor:         The minimisation algorithm to use.
+        @type min_algor:            str
+        @keyword min_options:       An array of options to be used by the minimisation algorithm.
+        @type min_options:          array of str
+        @keyword func_tol:          The function tolerance which, when reached, terminates optimisation.  Setting this to None turns of the check.
+        @type func_tol:             None or float
+        @keyword grad_tol:          The gradient tolerance which, when reached, terminates optimisation.  Setting this to None turns of the check.
+        @type grad_tol:             None or float
+        @keyword max_iterations:    The maximum number of iterations for the algorithm.
+        @type max_iterations:       int
+        @keyword A:                 The linear constraint matrix, or None for no constraints.
+        @type A:                    numpy rank-2 array or None
+        @keyword b:                 The linear constraint scalar vector, or None for no constraints.
+        @type b:                    numpy rank-1 array or None
+        @keyword verbosity:         The amount of information to print.  The higher the value, the greater the verbosity.
+        @type verbosity:            int
+        @keyword lower:             The lower bounds of the grid search.  This is only used when doing a grid search.
+        @type lower:                list of numbers
+        @keyword upper:             The upper bounds of the grid search.  This is only used when doing a grid search.
+        @type upper:                list of numbers
+        @keyword inc:               The increments for each dimension of the grid search.  This is only used when doing a grid search.
+        @type inc:                  list of int
+        """
+
+        # Execute the base class __init__() method.
+        super(Relax_fit_minimise_command, self).__init__()
+
+        # Store the arguments.
+        self.spin_id = spin_id
+        self.model = model
+        self.num_params = num_params
+        self.values = values
+        self.errors = errors
+        self.relax_times = relax_times
+        self.scaling_list = scaling_list
+        self.x0 = x0
+        self.min_algor = min_algor
+        self.min_options = min_options
+        self.func_tol = func_tol
+        self.grad_tol = grad_tol
+        self.max_iterations = max_iterations
+        self.A = A
+        self.b = b
+        self.verbosity = verbosity
+        self.lower = lower
+        self.upper = upper
+        self.inc = inc
+
+
+    def cost(self):
+        """Estimate the relative computational cost of the optimisation for the dynamic scheduler.
+
+        @return:    The number of data points, multiplied by the grid size for a grid search.
+        @rtype:     float
+        """
+
+        # The basic data size.
+        cost = float(len(self.values))
+
+        # The grid search size.
+        if search('^[Gg]rid', self.min_algor):
+            for x in self.inc:
+                cost *= x
+
+        # Return the estimate.
+        return cost
+
+
+    def run(self, processor, completed):
+        """Optimise the relaxation curve of the spin on the slave."""
+
+        # Print out.
+        if self.verbosity >= 1:
+            # Individual spin printout.
+            if self.verbosity >= 2:
+                print("\n\n")
+
+            string = "Fitting to spin " + repr(self.spin_id)
+            print("\n\n" + string)
+            print(len(string) * '~')
+
+        # Set up the target function.
+        model = Relax_fit_opt(model=self.model, num_params=self.num_params, values=self.values, errors=self.errors, relax_times=self.relax_times, scaling_matrix=self.scaling_list)
+
+        # Grid search.
+        if search('^[Gg]rid', self.min_algor):
+            results = grid(func=model.func, args=(), num_incs=self.inc, lower=self.lower, upper=self.upper, A=self.A, b=self.b, verbosity=self.verbosity)
+
+            # Unpack the results.
+            param_vector, chi2, iter_count, warning = results
+            f_count = iter_count
+            g_count = 0.0
+            h_count = 0.0
+
+        # Minimisation.
+        else:
+            results = generic_minimise(func=model.func, dfunc=model.dfunc, d2func=model.d2func, args=(), x0=self.x0, min_algor=self.min_algor, min_options=self.min_options, func_tol=self.func_tol, grad_tol=self.grad_tol, maxiter=self.max_iterations, A=self.A, b=self.b, full_output=True, print_flag=self.verbosity)
+
+            # Unpack the results.
+            if results == None:
+                return
+            param_vector, chi2, iter_count, f_count, g_count, h_count, warning = results
+
+        # Return the results.
+        processor.return_object(Relax_fit_result_command(processor=processor, memo_id=self.memo_id, param_vector=param_vector, chi2=chi2, iter_count=iter_count, f_count=f_count, g_count=g_count, h_count=h_count, warning=warning, completed=False))
+
+
+
+class Relax_fit_result_command(Result_command):
+    """Class for storing the relaxation curve optimisation results of a single spin on the master."""
+
+    def __init__(self, processor=None, memo_id=None, param_vector=None, chi2=None, iter_count=None, f_count=None, g_count=None, h_count=None, warning=None, completed=True):
+        """Set up this class object on the slave, placing the optimisation results here.
+
+        @keyword processor:     The processor object.
+        @type processor:        multi.processor.Processor instance
+        @keyword memo_id:       The memo identification string.
+        @type memo_id:          str
+        @keyword param_vector:  The optimised, scaled parameter vector.
+        @type param_vector:     numpy rank-1 array
+        @keyword chi2:          The final target function value.
+        @type chi2:             float
+        @keyword iter_count:    The number of optimisation iterations.
+        @type iter_count:       int
+        @keyword f_count:       The total function call count.
+        @type f_count:          int
+        @keyword g_count:       The total gradient call count.
+        @type g_count:          int
+        @keyword h_count:       The total Hessian call count.
+        @type h_count:          int
+        @keyword warning:       Any optimisation warnings.
+        @type warning:          str or None
+        @keyword completed:     A flag which if True signals that the optimisation successfully completed.
+        @type completed:        bool
+        """
+
+        # Execute the base class __init__() method.
+        super(Relax_fit_result_command, self).__init__(processor=processor, completed=completed)
+
+        # Store the arguments.
+        self.memo_id = memo_id
+        self.param_vector = param_vector
+        self.chi2 = chi2
+        self.iter_count = iter_count
+        self.f_count = f_count
+        self.g_count = g_count
+        self.h_count = h_count
+        self.warning = warning
+
+
+    def run(self, processor, memo):
+        """Store the results in the spin container on the master.
+
+        @param processor:   The processor object.
+        @type processor:    multi.processor.Processor instance
+        @param memo:        The relaxation curve optimisation memo.
+        @type memo:         Relax_fit_memo instance
+        """
+
+        # The spin container.
+        spin = return_spin(spin_id=memo.spin_id)
+
+        # Scaling.
+        param_vector = self.param_vector
+        if memo.scaling_matrix is not None:
+            param_vector = dot(memo.scaling_matrix, param_vector)
+
+        # Disassemble the parameter vector.
+        disassemble_param_vector(param_vector=param_vector, spin=spin, sim_index=memo.sim_index)
+
+        # Monte Carlo minimisation statistics.
+        if memo.sim_index != None:
+            spin.chi2_sim[memo.sim_index] = self.chi2
+            spin.iter_sim[memo.sim_index] = self.iter_count
+            spin.f_count_sim[memo.sim_index] = self.f_count
+            spin.g_count_sim[memo.sim_index] = self.g_count
+            spin.h_count_sim[memo.sim_index] = self.h_count
+            spin.warning_sim[memo.sim_index] = self.warning
+
+        # Normal statistics.
+        else:
+            spin.chi2 = self.chi2
+            spin.iter = self.iter_count
+            spin.f_count = self.f_count
+            spin.g_count = self.g_count
+            spin.h_count = self.h_count
+            spin.warning = self.warning
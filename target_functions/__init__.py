@@ -30,9 +30,11 @@ __all__ = [
     'frame_order',
     'jw_mapping',
     'mf',
+    'mf_vectorised',
     'n_state_model',
     'potential',
     'relax_disp',
     'relax_fit',
+    'relax_fit_batch',
     'relax_fit_wrapper'
 ]
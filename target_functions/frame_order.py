@@ -24,11 +24,10 @@
 
 # Python module imports.
 from copy import deepcopy
-from math import acos, cos, pi, sin, sqrt
+from math import pi, sqrt
 from numpy import add, array, dot, float32, float64, ones, outer, subtract, transpose, uint8, zeros
 
 # relax module imports.
-from extern.sobol.sobol_lib import i4_sobol_generate
 from lib.alignment.alignment_tensor import to_5D, to_tensor
 from lib.alignment.pcs import pcs_tensor
 from lib.alignment.rdc import rdc_tensor
@@ -46,9 +45,10 @@ from lib.frame_order.pseudo_ellipse import compile_2nd_matrix_pseudo_ellipse, pc
 from lib.frame_order.pseudo_ellipse_free_rotor import compile_2nd_matrix_pseudo_ellipse_free_rotor
 from lib.frame_order.pseudo_ellipse_torsionless import compile_2nd_matrix_pseudo_ellipse_torsionless, pcs_numeric_quad_int_pseudo_ellipse_torsionless, pcs_numeric_qr_int_pseudo_ellipse_torsionless
 from lib.frame_order.rotor import compile_2nd_matrix_rotor, pcs_numeric_quad_int_rotor, pcs_numeric_qr_int_rotor
+from lib.frame_order.sobol import sobol_data_load
 from lib.frame_order.variables import MODEL_DOUBLE_ROTOR, MODEL_FREE_ROTOR, MODEL_ISO_CONE, MODEL_ISO_CONE_FREE_ROTOR, MODEL_ISO_CONE_TORSIONLESS, MODEL_PSEUDO_ELLIPSE, MODEL_PSEUDO_ELLIPSE_FREE_ROTOR, MODEL_PSEUDO_ELLIPSE_TORSIONLESS, MODEL_RIGID, MODEL_ROTOR
 from lib.geometry.coord_transform import spherical_to_cartesian
-from lib.geometry.rotations import euler_to_R_zyz, tilt_torsion_to_R, two_vect_to_R
+from lib.geometry.rotations import euler_to_R_zyz, two_vect_to_R
 from lib.linear_algebra.kronecker_product import kron_prod
 from lib.physical_constants import pcs_constant
 from target_functions.chi2 import chi2
@@ -57,7 +57,7 @@ from target_functions.chi2 import chi2
 class Frame_order:
     """Class containing the target function of the optimisation of Frame Order matrix components."""
 
-    def __init__(self, model=None, init_params=None, full_tensors=None, full_in_ref_frame=None, rdcs=None, rdc_errors=None, rdc_weights=None, rdc_vect=None, dip_const=None, pcs=None, pcs_errors=None, pcs_weights=None, atomic_pos=None, temp=None, frq=None, paramag_centre=zeros(3), scaling_matrix=None, sobol_max_points=200, sobol_oversample=100, com=None, ave_pos_pivot=zeros(3), pivot=None, pivot_opt=False, quad_int=False):
+    def __init__(self, model=None, init_params=None, full_tensors=None, full_in_ref_frame=None, rdcs=None, rdc_errors=None, rdc_weights=None, rdc_vect=None, dip_const=None, pcs=None, pcs_errors=None, pcs_weights=None, atomic_pos=None, temp=None, frq=None, paramag_centre=zeros(3), scaling_matrix=None, sobol_max_points=200, sobol_oversample=100, sobol_tol=None, sobol_cache_dir=None, com=None, ave_pos_pivot=zeros(3), pivot=None, pivot_opt=False, quad_int=False):
         """Set up the target functions for the Frame Order theories.
 
         @keyword model:             The name of the Frame Order model.
@@ -98,6 +98,10 @@ class Frame_order:
         @type sobol_max_points:     int
         @keyword sobol_oversample:  The oversampling factor Ov used for the total number of points N * Ov * 10**M, where N is the maximum number of Sobol' points and M is the number of dimensions or torsion-tilt angles for the system.
         @type sobol_oversample:     int
+        @keyword sobol_tol:         The PCS error tolerance, in ppm, for the adaptive numerical PCS integration.  The number of Sobol' points used will be increased until the integration error estimate for all spins is below this tolerance, with sobol_max_points being the upper limit.  If None, the maximum number of Sobol' points will always be used.
+        @type sobol_tol:            None or float
+        @keyword sobol_cache_dir:   The directory for the on-disk cache of the Sobol' points and rotation matrices.  These are stored as numpy .npy files and are opened as read-only memory maps, so that they are shared between all target function instances and processes.  If None, the data will be regenerated for each new model or number of points.
+        @type sobol_cache_dir:      None or str
         @keyword com:               The centre of mass of the system.  This is used for defining the rotor model systems.
         @type com:                  numpy 3D rank-1 array
         @keyword ave_pos_pivot:     The pivot point to rotate all atoms about to the average domain position.  In most cases this will be the centre of mass of the moving domain.  This pivot is shifted by the translation vector.
@@ -133,6 +137,8 @@ class Frame_order:
         self.total_num_params = len(init_params)
         self.sobol_max_points = sobol_max_points
         self.sobol_oversample = sobol_oversample
+        self.sobol_tol = sobol_tol
+        self.sobol_cache_dir = sobol_cache_dir
         self.com = deepcopy(com)
         self.pivot_opt = pivot_opt
         self.quad_int = quad_int
@@ -205,7 +211,7 @@ class Frame_order:
                     if not isNaN(pcs_errors[i, j]):
                         err = True
             if err:
-                self.pcs_error = pcs_errors
+                self.pcs_error = deepcopy(pcs_errors)
             else:
                 # Missing errors (default to 0.1 ppm errors).
                 self.pcs_error = 0.1 * 1e-6 * ones((self.num_align, self.num_spins), float64)
@@ -218,7 +224,7 @@ class Frame_order:
                     if not isNaN(rdc_errors[i, j]):
                         err = True
             if err:
-                self.rdc_error = rdc_errors
+                self.rdc_error = deepcopy(rdc_errors)
             else:
                 # Missing errors (default to 1 Hz errors).
                 self.rdc_error = ones((self.num_align, self.num_interatom), float64)
@@ -248,11 +254,11 @@ class Frame_order:
                             self.rdc_error[align_index, j] = 1.0
 
                             # Change the weight to one.
-                            rdc_weights[align_index, j] = 1.0
+                            self.rdc_weights[align_index, j] = 1.0
 
                     # The RDC weights.
                     if self.rdc_flag:
-                        self.rdc_error[align_index, j] = self.rdc_error[align_index, j] / sqrt(rdc_weights[align_index, j])
+                        self.rdc_error[align_index, j] = self.rdc_error[align_index, j] / sqrt(self.rdc_weights[align_index, j])
 
                 # Loop over the PCSs.
                 if self.pcs_flag:
@@ -268,11 +274,11 @@ class Frame_order:
                             self.pcs_error[align_index, j] = 1.0
 
                             # Change the weight to one.
-                            pcs_weights[align_index, j] = 1.0
+                            self.pcs_weights[align_index, j] = 1.0
 
                     # The PCS weights.
                     if self.pcs_flag:
-                        self.pcs_error[align_index, j] = self.pcs_error[align_index, j] / sqrt(pcs_weights[align_index, j])
+                        self.pcs_error[align_index, j] = self.pcs_error[align_index, j] / sqrt(self.pcs_weights[align_index, j])
 
         # The paramagnetic centre vectors and distances.
         if self.pcs_flag:
@@ -453,7 +459,7 @@ class Frame_order:
         # PCS via numerical integration.
         if self.pcs_flag:
             # Numerical integration of the PCSs.
-            pcs_numeric_qr_int_double_rotor(points=sobol_data.sobol_angles, max_points=self.sobol_max_points, sigma_max=sigma_max, sigma_max_2=sigma_max_2, c=self.pcs_const, full_in_ref_frame=self.full_in_ref_frame, r_pivot_atom=self.r_pivot_atom, r_pivot_atom_rev=self.r_pivot_atom_rev, r_ln_pivot=self.r_ln_pivot, r_inter_pivot=self.r_inter_pivot, A=self.A_3D, R_eigen=self.R_eigen, RT_eigen=RT_eigen, Ri_prime=sobol_data.Ri_prime, Ri2_prime=sobol_data.Ri2_prime, pcs_theta=self.pcs_theta, pcs_theta_err=self.pcs_theta_err, missing_pcs=self.missing_pcs)
+            pcs_numeric_qr_int_double_rotor(points=sobol_data.sobol_angles, max_points=self.sobol_max_points, sigma_max=sigma_max, sigma_max_2=sigma_max_2, c=self.pcs_const, full_in_ref_frame=self.full_in_ref_frame, r_pivot_atom=self.r_pivot_atom, r_pivot_atom_rev=self.r_pivot_atom_rev, r_ln_pivot=self.r_ln_pivot, r_inter_pivot=self.r_inter_pivot, A=self.A_3D, R_eigen=self.R_eigen, RT_eigen=RT_eigen, Ri_prime=sobol_data.Ri_prime, Ri2_prime=sobol_data.Ri2_prime, pcs_theta=self.pcs_theta, pcs_theta_err=self.pcs_theta_err, missing_pcs=self.missing_pcs, tol=self.sobol_tol)
 
             # Calculate and sum the single alignment chi-squared value (for the PCS).
             for align_index in range(self.num_align):
@@ -623,7 +629,7 @@ class Frame_order:
         # PCS via numerical integration.
         if self.pcs_flag:
             # Numerical integration of the PCSs.
-            pcs_numeric_qr_int_rotor(points=sobol_data.sobol_angles, max_points=self.sobol_max_points, sigma_max=pi, c=self.pcs_const, full_in_ref_frame=self.full_in_ref_frame, r_pivot_atom=self.r_pivot_atom, r_pivot_atom_rev=self.r_pivot_atom_rev, r_ln_pivot=self.r_ln_pivot, A=self.A_3D, R_eigen=self.R_eigen, RT_eigen=RT_eigen, Ri_prime=sobol_data.Ri_prime, pcs_theta=self.pcs_theta, pcs_theta_err=self.pcs_theta_err, missing_pcs=self.missing_pcs)
+            pcs_numeric_qr_int_rotor(points=sobol_data.sobol_angles, max_points=self.sobol_max_points, sigma_max=pi, c=self.pcs_const, full_in_ref_frame=self.full_in_ref_frame, r_pivot_atom=self.r_pivot_atom, r_pivot_atom_rev=self.r_pivot_atom_rev, r_ln_pivot=self.r_ln_pivot, A=self.A_3D, R_eigen=self.R_eigen, RT_eigen=RT_eigen, Ri_prime=sobol_data.Ri_prime, pcs_theta=self.pcs_theta, pcs_theta_err=self.pcs_theta_err, missing_pcs=self.missing_pcs, tol=self.sobol_tol)
 
             # Calculate and sum the single alignment chi-squared value (for the PCS).
             for align_index in range(self.num_align):
@@ -791,7 +797,7 @@ class Frame_order:
         # PCS via numerical integration.
         if self.pcs_flag:
             # Numerical integration of the PCSs.
-            pcs_numeric_qr_int_iso_cone(points=sobol_data.sobol_angles, max_points=self.sobol_max_points, theta_max=cone_theta, sigma_max=sigma_max, c=self.pcs_const, full_in_ref_frame=self.full_in_ref_frame, r_pivot_atom=self.r_pivot_atom, r_pivot_atom_rev=self.r_pivot_atom_rev, r_ln_pivot=self.r_ln_pivot, A=self.A_3D, R_eigen=self.R_eigen, RT_eigen=RT_eigen, Ri_prime=sobol_data.Ri_prime, pcs_theta=self.pcs_theta, pcs_theta_err=self.pcs_theta_err, missing_pcs=self.missing_pcs)
+            pcs_numeric_qr_int_iso_cone(points=sobol_data.sobol_angles, max_points=self.sobol_max_points, theta_max=cone_theta, sigma_max=sigma_max, c=self.pcs_const, full_in_ref_frame=self.full_in_ref_frame, r_pivot_atom=self.r_pivot_atom, r_pivot_atom_rev=self.r_pivot_atom_rev, r_ln_pivot=self.r_ln_pivot, A=self.A_3D, R_eigen=self.R_eigen, RT_eigen=RT_eigen, Ri_prime=sobol_data.Ri_prime, pcs_theta=self.pcs_theta, pcs_theta_err=self.pcs_theta_err, missing_pcs=self.missing_pcs, tol=self.sobol_tol)
 
             # Calculate and sum the single alignment chi-squared value (for the PCS).
             for align_index in range(self.num_align):
@@ -958,7 +964,7 @@ class Frame_order:
         # PCS via numerical integration.
         if self.pcs_flag:
             # Numerical integration of the PCSs.
-            pcs_numeric_qr_int_iso_cone(points=sobol_data.sobol_angles, max_points=self.sobol_max_points, theta_max=theta_max, sigma_max=pi, c=self.pcs_const, full_in_ref_frame=self.full_in_ref_frame, r_pivot_atom=self.r_pivot_atom, r_pivot_atom_rev=self.r_pivot_atom_rev, r_ln_pivot=self.r_ln_pivot, A=self.A_3D, R_eigen=self.R_eigen, RT_eigen=RT_eigen, Ri_prime=sobol_data.Ri_prime, pcs_theta=self.pcs_theta, pcs_theta_err=self.pcs_theta_err, missing_pcs=self.missing_pcs)
+            pcs_numeric_qr_int_iso_cone(points=sobol_data.sobol_angles, max_points=self.sobol_max_points, theta_max=theta_max, sigma_max=pi, c=self.pcs_const, full_in_ref_frame=self.full_in_ref_frame, r_pivot_atom=self.r_pivot_atom, r_pivot_atom_rev=self.r_pivot_atom_rev, r_ln_pivot=self.r_ln_pivot, A=self.A_3D, R_eigen=self.R_eigen, RT_eigen=RT_eigen, Ri_prime=sobol_data.Ri_prime, pcs_theta=self.pcs_theta, pcs_theta_err=self.pcs_theta_err, missing_pcs=self.missing_pcs, tol=self.sobol_tol)
 
             # Calculate and sum the single alignment chi-squared value (for the PCS).
             for align_index in range(self.num_align):
@@ -1125,7 +1131,7 @@ class Frame_order:
         # PCS via numerical integration.
         if self.pcs_flag:
             # Numerical integration of the PCSs.
-            pcs_numeric_qr_int_iso_cone_torsionless(points=sobol_data.sobol_angles, max_points=self.sobol_max_points, theta_max=cone_theta, c=self.pcs_const, full_in_ref_frame=self.full_in_ref_frame, r_pivot_atom=self.r_pivot_atom, r_pivot_atom_rev=self.r_pivot_atom_rev, r_ln_pivot=self.r_ln_pivot, A=self.A_3D, R_eigen=self.R_eigen, RT_eigen=RT_eigen, Ri_prime=sobol_data.Ri_prime, pcs_theta=self.pcs_theta, pcs_theta_err=self.pcs_theta_err, missing_pcs=self.missing_pcs)
+            pcs_numeric_qr_int_iso_cone_torsionless(points=sobol_data.sobol_angles, max_points=self.sobol_max_points, theta_max=cone_theta, c=self.pcs_const, full_in_ref_frame=self.full_in_ref_frame, r_pivot_atom=self.r_pivot_atom, r_pivot_atom_rev=self.r_pivot_atom_rev, r_ln_pivot=self.r_ln_pivot, A=self.A_3D, R_eigen=self.R_eigen, RT_eigen=RT_eigen, Ri_prime=sobol_data.Ri_prime, pcs_theta=self.pcs_theta, pcs_theta_err=self.pcs_theta_err, missing_pcs=self.missing_pcs, tol=self.sobol_tol)
 
             # Calculate and sum the single alignment chi-squared value (for the PCS).
             for align_index in range(self.num_align):
@@ -1289,7 +1295,7 @@ class Frame_order:
         # PCS via numerical integration.
         if self.pcs_flag:
             # Numerical integration of the PCSs.
-            pcs_numeric_qr_int_pseudo_ellipse(points=sobol_data.sobol_angles, max_points=self.sobol_max_points, theta_x=cone_theta_x, theta_y=cone_theta_y, sigma_max=cone_sigma_max, c=self.pcs_const, full_in_ref_frame=self.full_in_ref_frame, r_pivot_atom=self.r_pivot_atom, r_pivot_atom_rev=self.r_pivot_atom_rev, r_ln_pivot=self.r_ln_pivot, A=self.A_3D, R_eigen=self.R_eigen, RT_eigen=RT_eigen, Ri_prime=sobol_data.Ri_prime, pcs_theta=self.pcs_theta, pcs_theta_err=self.pcs_theta_err, missing_pcs=self.missing_pcs)
+            pcs_numeric_qr_int_pseudo_ellipse(points=sobol_data.sobol_angles, max_points=self.sobol_max_points, theta_x=cone_theta_x, theta_y=cone_theta_y, sigma_max=cone_sigma_max, c=self.pcs_const, full_in_ref_frame=self.full_in_ref_frame, r_pivot_atom=self.r_pivot_atom, r_pivot_atom_rev=self.r_pivot_atom_rev, r_ln_pivot=self.r_ln_pivot, A=self.A_3D, R_eigen=self.R_eigen, RT_eigen=RT_eigen, Ri_prime=sobol_data.Ri_prime, pcs_theta=self.pcs_theta, pcs_theta_err=self.pcs_theta_err, missing_pcs=self.missing_pcs, tol=self.sobol_tol)
 
             # Calculate and sum the single alignment chi-squared value (for the PCS).
             for align_index in range(self.num_align):
@@ -1450,7 +1456,7 @@ class Frame_order:
         # PCS via numerical integration.
         if self.pcs_flag:
             # Numerical integration of the PCSs.
-            pcs_numeric_qr_int_pseudo_ellipse(points=sobol_data.sobol_angles, max_points=self.sobol_max_points, theta_x=cone_theta_x, theta_y=cone_theta_y, sigma_max=pi, c=self.pcs_const, full_in_ref_frame=self.full_in_ref_frame, r_pivot_atom=self.r_pivot_atom, r_pivot_atom_rev=self.r_pivot_atom_rev, r_ln_pivot=self.r_ln_pivot, A=self.A_3D, R_eigen=self.R_eigen, RT_eigen=RT_eigen, Ri_prime=sobol_data.Ri_prime, pcs_theta=self.pcs_theta, pcs_theta_err=self.pcs_theta_err, missing_pcs=self.missing_pcs)
+            pcs_numeric_qr_int_pseudo_ellipse(points=sobol_data.sobol_angles, max_points=self.sobol_max_points, theta_x=cone_theta_x, theta_y=cone_theta_y, sigma_max=pi, c=self.pcs_const, full_in_ref_frame=self.full_in_ref_frame, r_pivot_atom=self.r_pivot_atom, r_pivot_atom_rev=self.r_pivot_atom_rev, r_ln_pivot=self.r_ln_pivot, A=self.A_3D, R_eigen=self.R_eigen, RT_eigen=RT_eigen, Ri_prime=sobol_data.Ri_prime, pcs_theta=self.pcs_theta, pcs_theta_err=self.pcs_theta_err, missing_pcs=self.missing_pcs, tol=self.sobol_tol)
 
             # Calculate and sum the single alignment chi-squared value (for the PCS).
             for align_index in range(self.num_align):
@@ -1611,7 +1617,7 @@ class Frame_order:
         # PCS via numerical integration.
         if self.pcs_flag:
             # Numerical integration of the PCSs.
-            pcs_numeric_qr_int_pseudo_ellipse_torsionless(points=sobol_data.sobol_angles, max_points=self.sobol_max_points, theta_x=cone_theta_x, theta_y=cone_theta_y, c=self.pcs_const, full_in_ref_frame=self.full_in_ref_frame, r_pivot_atom=self.r_pivot_atom, r_pivot_atom_rev=self.r_pivot_atom_rev, r_ln_pivot=self.r_ln_pivot, A=self.A_3D, R_eigen=self.R_eigen, RT_eigen=RT_eigen, Ri_prime=sobol_data.Ri_prime, pcs_theta=self.pcs_theta, pcs_theta_err=self.pcs_theta_err, missing_pcs=self.missing_pcs)
+            pcs_numeric_qr_int_pseudo_ellipse_torsionless(points=sobol_data.sobol_angles, max_points=self.sobol_max_points, theta_x=cone_theta_x, theta_y=cone_theta_y, c=self.pcs_const, full_in_ref_frame=self.full_in_ref_frame, r_pivot_atom=self.r_pivot_atom, r_pivot_atom_rev=self.r_pivot_atom_rev, r_ln_pivot=self.r_ln_pivot, A=self.A_3D, R_eigen=self.R_eigen, RT_eigen=RT_eigen, Ri_prime=sobol_data.Ri_prime, pcs_theta=self.pcs_theta, pcs_theta_err=self.pcs_theta_err, missing_pcs=self.missing_pcs, tol=self.sobol_tol)
 
             # Calculate and sum the single alignment chi-squared value (for the PCS).
             for align_index in range(self.num_align):
@@ -1854,7 +1860,7 @@ class Frame_order:
         # PCS via numerical integration.
         if self.pcs_flag:
             # Numerical integration of the PCSs.
-            pcs_numeric_qr_int_rotor(points=sobol_data.sobol_angles, max_points=self.sobol_max_points, sigma_max=sigma_max, c=self.pcs_const, full_in_ref_frame=self.full_in_ref_frame, r_pivot_atom=self.r_pivot_atom, r_pivot_atom_rev=self.r_pivot_atom_rev, r_ln_pivot=self.r_ln_pivot, A=self.A_3D, R_eigen=self.R_eigen, RT_eigen=RT_eigen, Ri_prime=sobol_data.Ri_prime, pcs_theta=self.pcs_theta, pcs_theta_err=self.pcs_theta_err, missing_pcs=self.missing_pcs)
+            pcs_numeric_qr_int_rotor(points=sobol_data.sobol_angles, max_points=self.sobol_max_points, sigma_max=sigma_max, c=self.pcs_const, full_in_ref_frame=self.full_in_ref_frame, r_pivot_atom=self.r_pivot_atom, r_pivot_atom_rev=self.r_pivot_atom_rev, r_ln_pivot=self.r_ln_pivot, A=self.A_3D, R_eigen=self.R_eigen, RT_eigen=RT_eigen, Ri_prime=sobol_data.Ri_prime, pcs_theta=self.pcs_theta, pcs_theta_err=self.pcs_theta_err, missing_pcs=self.missing_pcs, tol=self.sobol_tol)
 
             # Calculate and sum the single alignment chi-squared value (for the PCS).
             for align_index in range(self.num_align):
@@ -1996,7 +2002,7 @@ class Frame_order:
     def create_sobol_data(self, dims=None):
         """Create the Sobol' quasi-random data for numerical integration.
 
-        This uses the external sobol_lib module to create the data.  The algorithm is that modified by Antonov and Saleev.
+        This uses the lib.frame_order.sobol module to create or load the data, using the on-disk cache if the cache directory has been set.
 
 
         @keyword dims:      The list of parameters.
@@ -2020,94 +2026,10 @@ class Frame_order:
         # Printout (useful to see how long this takes!).
         print("Generating the torsion-tilt angle sampling via the Sobol' sequence for numerical PCS integration.")
 
-        # Initialise.
+        # Generate or load the data.
         sobol_data.model = self.model
         sobol_data.total_num = total_num
-        sobol_data.sobol_angles = zeros((m, total_num), float32)
-        sobol_data.Ri_prime = zeros((total_num, 3, 3), float32)
-        sobol_data.Ri2_prime = zeros((total_num, 3, 3), float32)
-
-        # The Sobol' points.
-        points = i4_sobol_generate(m, total_num, 1000)
-
-        # Loop over the points.
-        for i in range(total_num):
-            # Loop over the dimensions, converting the points to angles.
-            theta = None
-            phi = None
-            sigma = None
-            for j in range(m):
-                # The tilt angle - the angle of rotation about the x-y plane rotation axis.
-                if dims[j] in ['theta']:
-                    theta = acos(2.0*points[j, i] - 1.0)
-                    sobol_data.sobol_angles[j, i] = theta
-
-                # The angle defining the x-y plane rotation axis.
-                if dims[j] in ['phi']:
-                    phi = 2.0 * pi * points[j, i]
-                    sobol_data.sobol_angles[j, i] = phi
-
-                # The 1st torsion angle - the angle of rotation about the z' axis (or y' for the double motion models).
-                if dims[j] in ['sigma']:
-                    sigma = 2.0 * pi * (points[j, i] - 0.5)
-                    sobol_data.sobol_angles[j, i] = sigma
-
-                # The 2nd torsion angle - the angle of rotation about the x' axis.
-                if dims[j] in ['sigma2']:
-                    sigma2 = 2.0 * pi * (points[j, i] - 0.5)
-                    sobol_data.sobol_angles[j, i] = sigma2
-
-            # Pre-calculate the rotation matrices for the double motion models.
-            if 'sigma2' in dims:
-                # The 1st rotation about the y-axis.
-                c_sigma = cos(sigma)
-                s_sigma = sin(sigma)
-                sobol_data.Ri_prime[i, 0, 0] =  c_sigma
-                sobol_data.Ri_prime[i, 0, 2] =  s_sigma
-                sobol_data.Ri_prime[i, 1, 1] = 1.0
-                sobol_data.Ri_prime[i, 2, 0] = -s_sigma
-                sobol_data.Ri_prime[i, 2, 2] =  c_sigma
-
-                # The 2nd rotation about the x-axis.
-                c_sigma2 = cos(sigma2)
-                s_sigma2 = sin(sigma2)
-                sobol_data.Ri2_prime[i, 0, 0] = 1.0
-                sobol_data.Ri2_prime[i, 1, 1] =  c_sigma2
-                sobol_data.Ri2_prime[i, 1, 2] = -s_sigma2
-                sobol_data.Ri2_prime[i, 2, 1] =  s_sigma2
-                sobol_data.Ri2_prime[i, 2, 2] =  c_sigma2
-
-            # Pre-calculate the rotation matrix for the full tilt-torsion.
-            elif theta != None and phi != None and sigma != None:
-                tilt_torsion_to_R(phi, theta, sigma, sobol_data.Ri_prime[i])
-
-            # Pre-calculate the rotation matrix for the torsionless models.
-            elif sigma == None:
-                c_theta = cos(theta)
-                s_theta = sin(theta)
-                c_phi = cos(phi)
-                s_phi = sin(phi)
-                c_phi_c_theta = c_phi * c_theta
-                s_phi_c_theta = s_phi * c_theta
-                sobol_data.Ri_prime[i, 0, 0] =  c_phi_c_theta*c_phi + s_phi**2
-                sobol_data.Ri_prime[i, 0, 1] =  c_phi_c_theta*s_phi - c_phi*s_phi
-                sobol_data.Ri_prime[i, 0, 2] =  c_phi*s_theta
-                sobol_data.Ri_prime[i, 1, 0] =  s_phi_c_theta*c_phi - c_phi*s_phi
-                sobol_data.Ri_prime[i, 1, 1] =  s_phi_c_theta*s_phi + c_phi**2
-                sobol_data.Ri_prime[i, 1, 2] =  s_phi*s_theta
-                sobol_data.Ri_prime[i, 2, 0] = -s_theta*c_phi
-                sobol_data.Ri_prime[i, 2, 1] = -s_theta*s_phi
-                sobol_data.Ri_prime[i, 2, 2] =  c_theta
-
-            # Pre-calculate the rotation matrix for the rotor models.
-            else:
-                c_sigma = cos(sigma)
-                s_sigma = sin(sigma)
-                sobol_data.Ri_prime[i, 0, 0] =  c_sigma
-                sobol_data.Ri_prime[i, 0, 1] = -s_sigma
-                sobol_data.Ri_prime[i, 1, 0] =  s_sigma
-                sobol_data.Ri_prime[i, 1, 1] =  c_sigma
-                sobol_data.Ri_prime[i, 2, 2] = 1.0
+        sobol_data.sobol_angles, sobol_data.Ri_prime, sobol_data.Ri2_prime = sobol_data_load(cache_dir=self.sobol_cache_dir, model=self.model, dims=dims, total_num=total_num)
 
         # Printout (useful to see how long this takes!).
         print("   Oversampled to %s points." % total_num)
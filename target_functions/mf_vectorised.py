@@ -0,0 +1,802 @@
+###############################################################################
+#                                                                             #
+# Copyright (C) 2015 Edward d'Auvergne                                        #
+#                                                                             #
+# This file is part of the program relax (http://www.nmr-relax.com).          #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+# Module docstring.
+r"""The spin-vectorised model-free chi-squared function for the global diffusion tensor models.
+
+For the 'diff' and 'all' model types, the Mf.func_diff() and Mf.func_all() target functions loop over all spins, recalculating the direction cosines, weights, correlation times, spectral densities and relaxation rates of each spin one at a time.  Here all spins are instead packed into structure-of-arrays form, with the spin as the first dimension, so that a single chi-squared evaluation consists of a fixed number of numpy operations independent of the number of spins.  The diffusion tensor correlation times ti are global and are calculated only once per function call.
+
+All three model-free equations are handled by the single generic spectral density formula::
+
+                _k_
+             2  \           /       S2             (1 - S2f).tf'          (S2f - S2).ts'    \
+    J(w)  =  -   >  ci . ti | ------------  +  ---------------------  +  --------------------- |,
+             5  /__         \ 1 + (w.ti)^2     ti.(1 + (w.tf')^2)        ti.(1 + (w.ts')^2)  /
+                i=m
+
+where tf' = tf.ti/(tf + ti) and ts' = ts.ti/(ts + ti).  For the original model-free equation S2f = 1 and ts = te, and for the 'mf_ext2' equation S2 = S2f.S2s.  The absent order parameters default to one and the absent correlation times and Rex to zero.
+
+The chi-squared gradient and Hessian are calculated in the same way.  The partial derivatives of the relaxation data are first found with respect to the variables of each spin, these being the diffusion tensor parameters followed by the two factors of S2, S2f, tf, ts, Rex, r and CSA.  These are then summed into the elements of the parameter vector, the variables which are not optimised being discarded.
+"""
+
+# Python module imports.
+from math import pi
+from numpy import arange, array, bincount, concatenate, dot, einsum, float64, int32, stack, sum, transpose, where, zeros
+
+
+# The relaxation data types supported by the vectorised code.
+R1, R2, NOE = 0, 1, 2
+RI_TYPES = {'R1': R1, 'R2': R2, 'NOE': NOE}
+
+# The coefficients of the spectral densities J(0), J(wX), J(wH - wX), J(wH) and J(wH + wX) in the dipolar and CSA terms of R1, R2 and the NOE cross relaxation rate sigma_noe.
+DIP_COEFF = array([[0.0, 3.0, 1.0, 0.0, 6.0], [2.0, 1.5, 0.5, 3.0, 3.0], [0.0, 0.0, -1.0, 0.0, 6.0]], float64)
+CSA_COEFF = array([[0.0, 1.0, 0.0, 0.0, 0.0], [4.0/6.0, 0.5, 0.0, 0.0, 0.0], [0.0, 0.0, 0.0, 0.0, 0.0]], float64)
+
+
+class Spin_arrays:
+    """Empty container for the diffusion tensor data of all spins, as used by the lib.diffusion functions."""
+
+
+
+class Mf_vectorised:
+    def __init__(self, mf):
+        """Set up the structure-of-arrays data for all spins from the initialised model-free target function.
+
+        @param mf:  The model-free target function class instance, of the 'diff' or 'all' model type.
+        @type mf:   Mf instance
+        """
+
+        # Store the global data.
+        self.model_type = mf.model_type
+        self.diff_data = mf.diff_data
+        self.diff_end_index = mf.diff_end_index
+        self.scaling_flag = mf.scaling_flag
+        self.scaling_matrix = mf.scaling_matrix
+        self.num_spins = mf.num_spins
+        self.total_num_params = mf.total_num_params
+
+        # The dimensions.
+        num_frq = max([data.num_frq for data in mf.data])
+        num_ri = max([data.num_ri for data in mf.data])
+        num_indices = self.diff_data.num_indices
+        num_diff = self.diff_data.num_params
+
+        # The direction cosine, weight and correlation time structures for all spins, the spin being the last dimension.
+        self.spins = Spin_arrays()
+        self.spins.ci = zeros((num_indices, self.num_spins), float64)
+        self.spins.ti = zeros(num_indices, float64)
+        self.spins.tau_comps = zeros(num_indices, float64)
+        self.spins.tau_scale = zeros(num_indices, float64)
+        if self.diff_data.calc_di:
+            self.spins.xh_unit_vector = array([data.xh_unit_vector for data in mf.data], float64)
+
+        # The weight and correlation time gradients and Hessians (the correlation times only depend on the first 1, 2 or 3 diffusion parameters).
+        num_ti = {'sphere': 1, 'spheroid': 2, 'ellipsoid': 3}[self.diff_data.type]
+        self.spins.dci = zeros((num_diff, num_indices, self.num_spins), float64)
+        self.spins.d2ci = zeros((num_diff, num_diff, num_indices, self.num_spins), float64)
+        self.spins.dti = zeros((num_ti, num_indices), float64)
+        self.spins.d2ti = zeros((num_ti, num_ti, num_indices), float64)
+
+        # The direction cosine gradients and Hessians.
+        if self.diff_data.type == 'spheroid':
+            self.spins.ddz_dO = zeros((2, self.num_spins), float64)
+            self.spins.d2dz_dO2 = zeros((2, 2, self.num_spins), float64)
+        elif self.diff_data.type == 'ellipsoid':
+            for name in ['ddx_dO', 'ddy_dO', 'ddz_dO']:
+                setattr(self.spins, name, zeros((3, self.num_spins), float64))
+            for name in ['d2dx_dO2', 'd2dy_dO2', 'd2dz_dO2']:
+                setattr(self.spins, name, zeros((3, 3, self.num_spins), float64))
+
+        # The per-spin relaxation data structures, padded to the maximum number of frequencies and relaxation data.
+        self.frq_list = zeros((self.num_spins, num_frq, 5), float64)
+        self.ri_types = zeros((self.num_spins, num_ri), int32)
+        self.remap_table = zeros((self.num_spins, num_ri), int32)
+        self.relax_data = zeros((self.num_spins, num_ri), float64)
+        self.inv_var = zeros((self.num_spins, num_ri), float64)
+        self.csa_const_fixed = zeros((self.num_spins, num_ri), float64)
+        self.rex_const_fixed = zeros((self.num_spins, num_ri), float64)
+        self.dip_const_fixed = zeros(self.num_spins, float64)
+        self.g_ratio = zeros(self.num_spins, float64)
+        for i in range(self.num_spins):
+            data = mf.data[i]
+            self.frq_list[i, :data.num_frq] = data.frq_list
+            self.dip_const_fixed[i] = data.dip_const_fixed
+            self.g_ratio[i] = data.g_ratio
+            for j in range(data.num_ri):
+                self.ri_types[i, j] = RI_TYPES[data.ri_labels[j]]
+                self.remap_table[i, j] = data.remap_table[j]
+                self.relax_data[i, j] = data.relax_data[j]
+                self.inv_var[i, j] = 1.0 / data.errors[j]**2
+                self.csa_const_fixed[i, j] = data.csa_const_fixed[data.remap_table[j]]
+                if self.ri_types[i, j] == R2:
+                    self.rex_const_fixed[i, j] = (2.0 * pi * data.frq[data.remap_table[j]])**2
+
+        # The spectral density coefficients of each relaxation data point, and of the R1 value of the NOE denominator.
+        self.dip_coeff = DIP_COEFF[self.ri_types]
+        self.csa_coeff = CSA_COEFF[self.ri_types]
+        self.noe = self.ri_types == NOE
+
+        # The spin index for fancy indexing of the spectral densities.
+        self.spin_index = arange(self.num_spins)[:, None]
+
+        # The fixed values (one, zero, and then the fixed bond lengths and CSA values of all spins).
+        fixed = [1.0, 0.0]
+        for data in mf.data:
+            fixed.append(data.bond_length if data.bond_length != None else 0.0)
+            fixed.append(data.csa if data.csa != None else 0.0)
+        self.fixed = array(fixed, float64)
+
+        # The source of the model-free parameter values.
+        if self.model_type == 'diff':
+            values = []
+            offsets = []
+            for data in mf.data:
+                offsets.append(len(values))
+                values += list(data.param_values)
+            offset = len(values)
+            self.source = concatenate((array(values, float64), self.fixed))
+        else:
+            offsets = [0] * self.num_spins
+            offset = mf.total_num_params
+            self.source = None
+        one, zero = offset, offset + 1
+
+        # The indices of the model-free parameters of each spin in the source vector, S2 being the product of the values at the s2_i and s2s_i indices.
+        self.s2_i = zeros(self.num_spins, int32)
+        self.s2f_i = zeros(self.num_spins, int32)
+        self.s2s_i = zeros(self.num_spins, int32)
+        self.tf_i = zeros(self.num_spins, int32)
+        self.ts_i = zeros(self.num_spins, int32)
+        self.rex_i = zeros(self.num_spins, int32)
+        self.r_i = zeros(self.num_spins, int32)
+        self.csa_i = zeros(self.num_spins, int32)
+        for i in range(self.num_spins):
+            data = mf.data[i]
+
+            # Index helper function.
+            def index(param_i, default):
+                if param_i == None:
+                    return default
+                return offsets[i] + param_i
+
+            # The order parameters and correlation times.
+            if data.equations == 'mf_orig':
+                self.s2_i[i] = index(data.s2_i, one)
+                self.s2f_i[i] = one
+                self.s2s_i[i] = one
+                self.tf_i[i] = zero
+                self.ts_i[i] = index(data.te_i, zero)
+            elif data.equations == 'mf_ext':
+                self.s2_i[i] = index(data.s2_i, one)
+                self.s2f_i[i] = index(data.s2f_i, one)
+                self.s2s_i[i] = one
+                self.tf_i[i] = index(data.tf_i, zero)
+                self.ts_i[i] = index(data.ts_i, zero)
+            else:
+                self.s2_i[i] = index(data.s2f_i, one)
+                self.s2f_i[i] = index(data.s2f_i, one)
+                self.s2s_i[i] = index(data.s2s_i, one)
+                self.tf_i[i] = index(data.tf_i, zero)
+                self.ts_i[i] = index(data.ts_i, zero)
+
+            # Rex, the bond length and CSA.
+            self.rex_i[i] = index(data.rex_i, zero)
+            self.r_i[i] = index(data.r_i, offset + 2 + 2*i)
+            self.csa_i[i] = index(data.csa_i, offset + 3 + 2*i)
+
+        # The parameter vector index of the variables of each spin, the diffusion parameters followed by the two S2 factors, S2f, tf, ts, Rex, r and CSA.  The variables which are not optimised are given the index total_num_params, to be discarded.
+        self.num_diff = num_diff
+        self.param_index = zeros((self.num_spins, num_diff + 8), int32)
+        self.param_index[:, :num_diff] = arange(num_diff)
+        if self.model_type == 'diff':
+            self.param_index[:, num_diff:] = self.total_num_params
+        else:
+            local = transpose([self.s2_i, self.s2s_i, self.s2f_i, self.tf_i, self.ts_i, self.rex_i, self.r_i, self.csa_i])
+            self.param_index[:, num_diff:] = where(local < self.total_num_params, local, self.total_num_params)
+
+
+    def calc_ri_derivs(self, params, hessian=False):
+        """Calculate the relaxation data of all spins, together with the gradients and optionally the Hessians with respect to the variables of each spin.
+
+        @param params:      The vector of parameter values.
+        @type params:       numpy rank-1 array
+        @keyword hessian:   A flag which if True will cause the Hessians to be calculated.
+        @type hessian:      bool
+        @return:            The relaxation data, gradients and Hessians (None if not calculated), with the dimensions {spin, ri}, {spin, ri, variable} and {spin, ri, variable, variable}.
+        @rtype:             numpy rank-2 array, numpy rank-3 array, numpy rank-4 array or None
+        """
+
+        # The model-free parameter values, direction cosines, weights and correlation times.
+        source = self.setup(params)
+
+        # The direction cosine, weight and correlation time gradients.
+        if self.diff_data.calc_ddi:
+            self.diff_data.calc_ddi(self.spins, self.diff_data)
+        if self.diff_data.calc_dci:
+            self.diff_data.calc_dci(self.spins, self.diff_data)
+        self.diff_data.calc_dti(self.spins, self.diff_data)
+
+        # The direction cosine, weight and correlation time Hessians.
+        if hessian:
+            if self.diff_data.calc_d2di:
+                self.diff_data.calc_d2di(self.spins, self.diff_data)
+            if self.diff_data.calc_d2ci:
+                self.diff_data.calc_d2ci(self.spins, self.diff_data)
+            if self.diff_data.calc_d2ti:
+                self.diff_data.calc_d2ti(self.spins, self.diff_data)
+
+        # The correlation time derivatives for all diffusion parameters.
+        num_ti = self.spins.dti.shape[0]
+        dti = zeros((self.num_diff, self.diff_data.num_indices), float64)
+        dti[:num_ti] = self.spins.dti
+        d2ti = zeros((self.num_diff, self.num_diff, self.diff_data.num_indices), float64)
+        d2ti[:num_ti, :num_ti] = self.spins.d2ti
+
+        # The variables of all spins.
+        s2a = source[self.s2_i]
+        s2b = source[self.s2s_i]
+        s2f = source[self.s2f_i]
+        tf = source[self.tf_i]
+        ts = source[self.ts_i]
+        rex = source[self.rex_i]
+        r = source[self.r_i]
+        csa = source[self.csa_i]
+
+        # The spectral density gradients and Hessians with respect to the diffusion parameters and {S2, S2f, tf, ts}, with the dimensions {spin, frequency, 5 frequencies, ...}.
+        ci = transpose(self.spins.ci)
+        jw, djw_dG, djw_dZ, d2jw_dG2, d2jw_dGdZ, d2jw_dZ2 = calc_djw(self.frq_list[:, :, :, None], ci, self.spins.dci, self.spins.d2ci, self.spins.ti, dti, d2ti, (s2a*s2b)[:, None, None, None], s2f[:, None, None, None], tf[:, None, None, None], ts[:, None, None, None], hessian=hessian)
+
+        # The Jacobian of {S2, S2f, tf, ts} with respect to the two S2 factors, S2f, tf and ts.
+        jacobian = zeros((self.num_spins, 4, 5), float64)
+        jacobian[:, 0, 0] = s2b
+        jacobian[:, 0, 1] = s2a
+        jacobian[:, 1, 2] = 1.0
+        jacobian[:, 2, 3] = 1.0
+        jacobian[:, 3, 4] = 1.0
+
+        # The spectral density gradients with respect to all variables.
+        num_vars = self.num_diff + 8
+        index = self.num_diff
+        djw = zeros(jw.shape + (num_vars,), float64)
+        djw[..., :index] = djw_dG
+        djw[..., index:index+5] = einsum('sfwz,szu->sfwu', djw_dZ, jacobian)
+
+        # The spectral density Hessians with respect to all variables.
+        d2jw = None
+        if hessian:
+            d2jw = zeros(jw.shape + (num_vars, num_vars), float64)
+            d2jw[..., :index, :index] = d2jw_dG2
+            d2jw[..., :index, index:index+5] = einsum('sfwgz,szu->sfwgu', d2jw_dGdZ, jacobian)
+            d2jw[..., index:index+5, :index] = einsum('sfwgu->sfwug', d2jw[..., :index, index:index+5])
+            d2jw[..., index:index+5, index:index+5] = einsum('sfwyz,syu,szv->sfwuv', d2jw_dZ2, jacobian, jacobian)
+            d2jw[..., index, index+1] = d2jw[..., index+1, index] = djw_dZ[..., 0]
+
+        # The spectral densities at the frequency of each relaxation data point.
+        jw = jw[self.spin_index, self.remap_table]
+        djw = djw[self.spin_index, self.remap_table]
+        if hessian:
+            d2jw = d2jw[self.spin_index, self.remap_table]
+
+        # The dipolar constants and their bond length derivatives.
+        r_safe = where(r == 0.0, 1.0, r)
+        dip_const = calc_dip_const(self.dip_const_fixed, r)
+        dip_const_grad = where(r == 0.0, 0.0, -6.0 * dip_const / r_safe)
+        dip_const_hess = where(r == 0.0, 0.0, 42.0 * dip_const / r_safe**2)
+
+        # The CSA constants and their CSA derivatives.
+        csa_const = self.csa_const_fixed * (csa**2)[:, None]
+        csa_const_grad = 2.0 * self.csa_const_fixed * csa[:, None]
+        csa_const_hess = 2.0 * self.csa_const_fixed
+
+        # The constants.
+        consts = dip_const, dip_const_grad, dip_const_hess, csa_const, csa_const_grad, csa_const_hess
+
+        # The R1, R2 and sigma_noe values and derivatives.
+        ri, dri, d2ri = calc_linear_ri(jw, djw, d2jw, self.dip_coeff, self.csa_coeff, rex[:, None] * self.rex_const_fixed, self.rex_const_fixed, consts, index)
+
+        # The R1 values of the NOE denominators.
+        r1, dr1, d2r1 = calc_linear_ri(jw, djw, d2jw, DIP_COEFF[R1], CSA_COEFF[R1], 0.0, 0.0, consts, index)
+
+        # The NOE values.
+        zero_r1 = r1 == 0.0
+        r1_safe = where(zero_r1, 1.0, r1)
+        noe = 1.0 + self.g_ratio[:, None] * ri / r1_safe
+        noe = where(zero_r1, where(ri == 0.0, 1.0, 1e99), noe)
+
+        # The NOE gradients.
+        g = where(zero_r1, 0.0, self.g_ratio[:, None] / r1_safe)[:, :, None]
+        sigma = (ri / r1_safe)[:, :, None]
+        dnoe = g * (dri - sigma * dr1)
+
+        # The NOE Hessians.
+        if hessian:
+            g = g[:, :, :, None]
+            sigma = sigma[:, :, :, None]
+            inv_r1 = (1.0 / r1_safe)[:, :, None, None]
+            outer_r = einsum('sju,sjv->sjuv', dri, dr1)
+            outer_r = outer_r + einsum('sjuv->sjvu', outer_r)
+            d2noe = g * (d2ri - inv_r1 * outer_r - sigma * d2r1 + 2.0 * sigma * inv_r1 * einsum('sju,sjv->sjuv', dr1, dr1))
+            d2ri = where(self.noe[:, :, None, None], d2noe, d2ri)
+
+        # Replace the sigma_noe values by the NOE.
+        ri = where(self.noe, noe, ri)
+        dri = where(self.noe[:, :, None], dnoe, dri)
+
+        # Return the data.
+        return ri, dri, d2ri
+
+
+    def d2func(self, params):
+        """The chi-squared Hessian for all spins.
+
+        @param params:  The vector of parameter values.
+        @type params:   numpy rank-1 array
+        @return:        The chi-squared Hessian.
+        @rtype:         numpy rank-2 array
+        """
+
+        # The relaxation data, gradients and Hessians.
+        ri, dri, d2ri = self.calc_ri_derivs(params, hessian=True)
+
+        # The chi-squared Hessian of each spin with respect to its variables.
+        d2chi2 = 2.0 * (einsum('sj,sju,sjv->suv', self.inv_var, dri, dri) - einsum('sj,sjuv->suv', self.inv_var * (self.relax_data - ri), d2ri))
+
+        # Sum into the Hessian of the parameter vector, discarding the variables which are not optimised.
+        n = self.total_num_params + 1
+        index = self.param_index[:, :, None] * n + self.param_index[:, None, :]
+        hess = bincount(index.ravel(), weights=d2chi2.ravel(), minlength=n**2).reshape(n, n)[:-1, :-1]
+
+        # Diagonal scaling.
+        if self.scaling_flag:
+            hess = dot(self.scaling_matrix, dot(hess, self.scaling_matrix))
+
+        # Return the Hessian.
+        return hess
+
+
+    def dfunc(self, params):
+        """The chi-squared gradient for all spins.
+
+        @param params:  The vector of parameter values.
+        @type params:   numpy rank-1 array
+        @return:        The chi-squared gradient.
+        @rtype:         numpy rank-1 array
+        """
+
+        # The relaxation data and gradients.
+        ri, dri, d2ri = self.calc_ri_derivs(params)
+
+        # The chi-squared gradient of each spin with respect to its variables.
+        dchi2 = -2.0 * einsum('sj,sju->su', self.inv_var * (self.relax_data - ri), dri)
+
+        # Sum into the gradient of the parameter vector, discarding the variables which are not optimised.
+        grad = bincount(self.param_index.ravel(), weights=dchi2.ravel(), minlength=self.total_num_params+1)[:-1]
+
+        # Diagonal scaling.
+        if self.scaling_flag:
+            grad = dot(grad, self.scaling_matrix)
+
+        # Return the gradient.
+        return grad
+
+
+    def func(self, params):
+        """The chi-squared function for all spins.
+
+        @param params:  The vector of parameter values.
+        @type params:   numpy rank-1 array
+        @return:        The chi-squared value.
+        @rtype:         float
+        """
+
+        # The model-free parameter values, direction cosines, weights and correlation times.
+        source = self.setup(params)
+
+        # The model-free parameter values of all spins.
+        s2f = source[self.s2f_i]
+        s2 = source[self.s2_i] * source[self.s2s_i]
+        tf = source[self.tf_i]
+        ts = source[self.ts_i]
+
+        # The spectral densities, with the dimensions {spin, frequency, 5 frequencies}.
+        jw = calc_jw(self.frq_list[:, :, :, None], transpose(self.spins.ci)[:, None, None, :], self.spins.ti, s2[:, None, None, None], s2f[:, None, None, None], tf[:, None, None, None], ts[:, None, None, None])
+
+        # The spectral densities at the frequency of each relaxation data point.
+        jw = jw[self.spin_index, self.remap_table]
+
+        # The back-calculated relaxation data.
+        dip_const = calc_dip_const(self.dip_const_fixed, source[self.r_i])[:, None]
+        csa_const = self.csa_const_fixed * (source[self.csa_i]**2)[:, None]
+        rex_const = source[self.rex_i][:, None] * self.rex_const_fixed
+        ri = calc_ri(jw, self.ri_types, dip_const, csa_const, rex_const, self.g_ratio[:, None])
+
+        # The chi-squared value (the padding has zero weight).
+        return sum(self.inv_var * (self.relax_data - ri)**2)
+
+
+    def setup(self, params):
+        """Set the diffusion tensor parameters and calculate the direction cosines, weights and correlation times of all spins.
+
+        @param params:  The vector of parameter values.
+        @type params:   numpy rank-1 array
+        @return:        The source vector of the model-free parameter values, followed by the fixed values.
+        @rtype:         numpy rank-1 array
+        """
+
+        # Scaling.
+        if self.scaling_flag:
+            params = dot(params, self.scaling_matrix)
+
+        # Diffusion tensor parameters.
+        self.diff_data.params = params[0:self.diff_end_index]
+
+        # Direction cosines, weights and correlation times of all spins.
+        if self.diff_data.calc_di:
+            self.diff_data.calc_di(self.spins, self.diff_data)
+        self.diff_data.calc_ci(self.spins, self.diff_data)
+        self.diff_data.calc_ti(self.spins, self.diff_data)
+
+        # The source of the model-free parameter values.
+        if self.model_type == 'diff':
+            return self.source
+        return concatenate((params, self.fixed))
+
+
+
+def calc_dip_const(dip_const_fixed, r):
+    """Calculate the dipolar constants, as in lib.auto_relaxation.ri_comps.comp_dip_const_func().
+
+    @param dip_const_fixed: The fixed components of the dipolar constants.
+    @type dip_const_fixed:  numpy array
+    @param r:               The bond lengths, broadcastable with dip_const_fixed.
+    @type r:                numpy array
+    @return:                The dipolar constants, set to 1e99 for a zero bond length.
+    @rtype:                 numpy array
+    """
+
+    # The constants.
+    return where(r == 0.0, 1e99, 0.25 * dip_const_fixed * where(r == 0.0, 1.0, r)**-6)
+
+
+def calc_djw(w, ci, dci, d2ci, ti, dti, d2ti, s2, s2f, tf, ts, hessian=False):
+    """Calculate the generic model-free spectral densities and their diffusion tensor and model-free parameter derivatives.
+
+    The model-free variables Z are {S2, S2f, tf, ts}.  The diffusion tensor derivatives are found from the chain rule via the weight and correlation time derivatives.
+
+
+    @param w:           The frequencies, with the dimensions {spin, frequency, 5 frequencies, 1}.
+    @type w:            numpy rank-4 array
+    @param ci:          The diffusion tensor weights, with the dimensions {spin, component}.
+    @type ci:           numpy rank-2 array
+    @param dci:         The weight gradients, with the dimensions {diffusion parameter, component, spin}.
+    @type dci:          numpy rank-3 array
+    @param d2ci:        The weight Hessians, with the dimensions {diffusion parameter, diffusion parameter, component, spin}.
+    @type d2ci:         numpy rank-4 array
+    @param ti:          The diffusion tensor correlation times.
+    @type ti:           numpy rank-1 array
+    @param dti:         The correlation time gradients, with the dimensions {diffusion parameter, component}.
+    @type dti:          numpy rank-2 array
+    @param d2ti:        The correlation time Hessians, with the dimensions {diffusion parameter, diffusion parameter, component}.
+    @type d2ti:         numpy rank-3 array
+    @param s2:          The total order parameters.
+    @type s2:           numpy rank-4 array
+    @param s2f:         The fast internal motion order parameters.
+    @type s2f:          numpy rank-4 array
+    @param tf:          The fast internal correlation times.
+    @type tf:           numpy rank-4 array
+    @param ts:          The slow internal correlation times.
+    @type ts:           numpy rank-4 array
+    @keyword hessian:   A flag which if True will cause the Hessians to be calculated.
+    @type hessian:      bool
+    @return:            The spectral densities, the diffusion parameter gradients, the Z gradients, and the diffusion parameter, diffusion-Z and Z Hessians (None if not calculated).  The first dimensions are {spin, frequency, 5 frequencies}.
+    @rtype:             tuple of numpy arrays
+    """
+
+    # The Lorentzian components and their partial derivatives.
+    A, A_t, A_tt = calc_lorentzian(w, ti)
+    F, F_t, F_x, F_tt, F_tx, F_xx = lorentz_derivs(w, ti, tf)
+    S, S_t, S_x, S_tt, S_tx, S_xx = lorentz_derivs(w, ti, ts)
+
+    # The internal motion factors.
+    one_s2f = 1.0 - s2f
+    s2f_s2 = s2f - s2
+
+    # The components of the spectral density sum and their ti and Z partial derivatives.
+    K = s2*A + one_s2f*F + s2f_s2*S
+    K_t = s2*A_t + one_s2f*F_t + s2f_s2*S_t
+    K_z = stack([A - S, S - F, one_s2f*F_x, s2f_s2*S_x], axis=-1)
+
+    # The spectral densities and gradients.
+    jw = 0.4 * einsum('si,sfwi->sfw', ci, K)
+    djw_dG = 0.4 * (einsum('gis,sfwi->sfwg', dci, K) + einsum('si,sfwi,gi->sfwg', ci, K_t, dti))
+    djw_dZ = 0.4 * einsum('si,sfwiz->sfwz', ci, K_z)
+
+    # No Hessians.
+    if not hessian:
+        return jw, djw_dG, djw_dZ, None, None, None
+
+    # The second partial derivatives of the components.
+    K_tt = s2*A_tt + one_s2f*F_tt + s2f_s2*S_tt
+    K_tz = stack([A_t - S_t, S_t - F_t, one_s2f*F_tx, s2f_s2*S_tx], axis=-1)
+    K_zz = zeros(K.shape + (4, 4), float64)
+    K_zz[..., 0, 3] = K_zz[..., 3, 0] = -S_x
+    K_zz[..., 1, 2] = K_zz[..., 2, 1] = -F_x
+    K_zz[..., 1, 3] = K_zz[..., 3, 1] = S_x
+    K_zz[..., 2, 2] = one_s2f*F_xx
+    K_zz[..., 3, 3] = s2f_s2*S_xx
+
+    # The spectral density Hessians.
+    cross = einsum('gis,sfwi,hi->sfwgh', dci, K_t, dti)
+    d2jw_dG2 = 0.4 * (einsum('ghis,sfwi->sfwgh', d2ci, K) + cross + einsum('sfwgh->sfwhg', cross) + einsum('si,sfwi,gi,hi->sfwgh', ci, K_tt, dti, dti) + einsum('si,sfwi,ghi->sfwgh', ci, K_t, d2ti))
+    d2jw_dGdZ = 0.4 * (einsum('gis,sfwiz->sfwgz', dci, K_z) + einsum('si,sfwiz,gi->sfwgz', ci, K_tz, dti))
+    d2jw_dZ2 = 0.4 * einsum('si,sfwiyz->sfwyz', ci, K_zz)
+
+    # Return the values.
+    return jw, djw_dG, djw_dZ, d2jw_dG2, d2jw_dGdZ, d2jw_dZ2
+
+
+def calc_jw(w, ci, ti, s2, s2f, tf, ts):
+    """Calculate the generic model-free spectral densities.
+
+    All arguments must be broadcastable, with the diffusion tensor components as the last dimension.
+
+
+    @param w:   The frequencies.
+    @type w:    numpy array
+    @param ci:  The diffusion tensor weights.
+    @type ci:   numpy array
+    @param ti:  The diffusion tensor correlation times.
+    @type ti:   numpy array
+    @param s2:  The total order parameters.
+    @type s2:   numpy array
+    @param s2f: The fast internal motion order parameters.
+    @type s2f:  numpy array
+    @param tf:  The fast internal correlation times.
+    @type tf:   numpy array
+    @param ts:  The slow internal correlation times.
+    @type ts:   numpy array
+    @return:    The spectral densities, summed over the diffusion tensor components.
+    @rtype:     numpy array
+    """
+
+    # The three components.
+    jw = s2 * ti / (1.0 + (w*ti)**2)
+    jw = jw + (1.0 - s2f) * lorentz(w, ti, tf)
+    jw = jw + (s2f - s2) * lorentz(w, ti, ts)
+
+    # Sum over the diffusion tensor components.
+    return 0.4 * sum(ci * jw, axis=-1)
+
+
+def calc_linear_ri(jw, djw, d2jw, dip_coeff, csa_coeff, rex_value, rex_grad, consts, index):
+    """Calculate the R1, R2 or sigma_noe values, which are linear in the spectral densities, and their derivatives.
+
+    The variables of each spin are the diffusion parameters followed by the two S2 factors, S2f, tf, ts, Rex, r and CSA, the Rex variable being at position index+5.
+
+
+    @param jw:          The spectral densities, with the dimensions {spin, ri, 5 frequencies}.
+    @type jw:           numpy rank-3 array
+    @param djw:         The spectral density gradients, with the dimensions {spin, ri, 5 frequencies, variable}.
+    @type djw:          numpy rank-4 array
+    @param d2jw:        The spectral density Hessians, with the dimensions {spin, ri, 5 frequencies, variable, variable}, or None.
+    @type d2jw:         numpy rank-5 array or None
+    @param dip_coeff:   The coefficients of the spectral densities in the dipolar term.
+    @type dip_coeff:    numpy array
+    @param csa_coeff:   The coefficients of the spectral densities in the CSA term.
+    @type csa_coeff:    numpy array
+    @param rex_value:   The chemical exchange contributions.
+    @type rex_value:    numpy rank-2 array or float
+    @param rex_grad:    The Rex partial derivatives of the chemical exchange contributions.
+    @type rex_grad:     numpy rank-2 array or float
+    @param consts:      The dipolar constants with their bond length gradients and Hessians, and the CSA constants with their CSA gradients and Hessians.
+    @type consts:       tuple of numpy arrays
+    @param index:       The number of diffusion parameters.
+    @type index:        int
+    @return:            The relaxation data, gradients and Hessians (None if not calculated).
+    @rtype:             numpy rank-2 array, numpy rank-3 array, numpy rank-4 array or None
+    """
+
+    # Unpack the constants.
+    dip_const, dip_const_grad, dip_const_hess, csa_const, csa_const_grad, csa_const_hess = consts
+
+    # The dipolar and CSA spectral density sums.
+    dip_sum = sum(dip_coeff * jw, axis=-1)
+    csa_sum = sum(csa_coeff * jw, axis=-1)
+
+    # The relaxation data.
+    ri = dip_const[:, None] * dip_sum + csa_const * csa_sum + rex_value
+
+    # The gradients.
+    coeff = dip_const[:, None, None] * dip_coeff + csa_const[:, :, None] * csa_coeff
+    dri = sum(coeff[..., None] * djw, axis=-2)
+    dri[..., index+5] = rex_grad
+    dri[..., index+6] = dip_const_grad[:, None] * dip_sum
+    dri[..., index+7] = csa_const_grad * csa_sum
+
+    # No Hessians.
+    if d2jw is None:
+        return ri, dri, None
+
+    # The spectral density Hessian part.
+    d2ri = sum(coeff[..., None, None] * d2jw, axis=-3)
+
+    # The bond length and CSA parts.
+    cross = dip_const_grad[:, None, None] * sum(dip_coeff[..., None] * djw, axis=-2)
+    d2ri[..., index+6] += cross
+    d2ri[..., index+6, :] += cross
+    d2ri[..., index+6, index+6] = dip_const_hess[:, None] * dip_sum
+    cross = csa_const_grad[:, :, None] * sum(csa_coeff[..., None] * djw, axis=-2)
+    d2ri[..., index+7] += cross
+    d2ri[..., index+7, :] += cross
+    d2ri[..., index+7, index+7] = csa_const_hess * csa_sum
+
+    # Return the values.
+    return ri, dri, d2ri
+
+
+def calc_lorentzian(w, tau):
+    """Calculate the Lorentzian tau / (1 + (w.tau)^2) and its first and second tau partial derivatives.
+
+    @param w:   The frequencies.
+    @type w:    numpy array
+    @param tau: The correlation times.
+    @type tau:  numpy array
+    @return:    The Lorentzian and its first and second partial derivatives.
+    @rtype:     tuple of numpy arrays
+    """
+
+    # Repetitive calculations.
+    w_tau_sqrd = (w*tau)**2
+    inv_denom = 1.0 / (1.0 + w_tau_sqrd)
+
+    # The values.
+    return tau * inv_denom, (1.0 - w_tau_sqrd) * inv_denom**2, 2.0 * w**2 * tau * (w_tau_sqrd - 3.0) * inv_denom**3
+
+
+def calc_ri(jw, ri_types, dip_const, csa_const, rex_const, g_ratio):
+    """Calculate the R1, R2 and NOE relaxation data from the spectral densities.
+
+    All arguments must be broadcastable to the dimensions of the relaxation data, the spectral densities having the 5 frequencies as an extra last dimension.
+
+
+    @param jw:          The spectral densities at the frequency of each relaxation data point.
+    @type jw:           numpy array
+    @param ri_types:    The relaxation data type codes R1, R2 or NOE.
+    @type ri_types:     numpy int array
+    @param dip_const:   The dipolar constants.
+    @type dip_const:    numpy array
+    @param csa_const:   The CSA constants.
+    @type csa_const:    numpy array
+    @param rex_const:   The chemical exchange contributions to R2.
+    @type rex_const:    numpy array
+    @param g_ratio:     The ratio of the gyromagnetic ratios.
+    @type g_ratio:      numpy array
+    @return:            The back-calculated relaxation data.
+    @rtype:             numpy array
+    """
+
+    # Alias the spectral densities.
+    j0, j1, j2, j3, j4 = jw[..., 0], jw[..., 1], jw[..., 2], jw[..., 3], jw[..., 4]
+
+    # The R1, R2 and sigma_noe values.
+    r1 = dip_const * (j2 + 3.0*j1 + 6.0*j4) + csa_const * j1
+    r2 = dip_const / 2.0 * (4.0*j0 + j2 + 3.0*j1 + 6.0*j3 + 6.0*j4) + csa_const / 6.0 * (4.0*j0 + 3.0*j1) + rex_const
+    sigma_noe = dip_const * (6.0*j4 - j2)
+
+    # The NOE values.
+    noe = 1.0 + g_ratio * sigma_noe / where(r1 == 0.0, 1.0, r1)
+    noe = where(r1 == 0.0, where(sigma_noe == 0.0, 1.0, 1e99), noe)
+
+    # Select the relaxation data types.
+    return where(ri_types == R1, r1, where(ri_types == R2, r2, noe))
+
+
+def lorentz(w, ti, tx):
+    """The internal motion Lorentzian component of the spectral density, scaled by ti.
+
+    The equation is::
+
+                  (tx + ti).tx
+        ti . -------------------------,
+             (tx + ti)^2 + (w.tx.ti)^2
+
+    which is zero for tx = 0.
+
+
+    @param w:   The frequencies.
+    @type w:    numpy array
+    @param ti:  The diffusion tensor correlation times.
+    @type ti:   numpy array
+    @param tx:  The internal correlation times.
+    @type tx:   numpy array
+    @return:    The Lorentzian components.
+    @rtype:     numpy array
+    """
+
+    # The component.
+    tx_ti = tx + ti
+    return ti * tx_ti * tx / (tx_ti**2 + (w*tx*ti)**2)
+
+
+def lorentz_derivs(w, ti, tx):
+    """The internal motion Lorentzian component of the spectral density and its ti and tx partial derivatives.
+
+    The component is the Lorentzian of the effective correlation time tx' = tx.ti/(tx + ti), as in the lorentz() function.
+
+
+    @param w:   The frequencies.
+    @type w:    numpy array
+    @param ti:  The diffusion tensor correlation times.
+    @type ti:   numpy array
+    @param tx:  The internal correlation times.
+    @type tx:   numpy array
+    @return:    The component, the ti and tx gradients, and the ti-ti, ti-tx and tx-tx Hessians.
+    @rtype:     tuple of numpy arrays
+    """
+
+    # The effective correlation time and its partial derivatives.
+    inv_sum = 1.0 / (tx + ti)
+    tau = tx * ti * inv_sum
+    tau_t = (tx * inv_sum)**2
+    tau_x = (ti * inv_sum)**2
+    tau_tt = -2.0 * tx**2 * inv_sum**3
+    tau_tx = 2.0 * tx * ti * inv_sum**3
+    tau_xx = -2.0 * ti**2 * inv_sum**3
+
+    # The Lorentzian.
+    l, dl, d2l = calc_lorentzian(w, tau)
+
+    # The chain rule.
+    return l, dl*tau_t, dl*tau_x, d2l*tau_t**2 + dl*tau_tt, d2l*tau_t*tau_x + dl*tau_tx, d2l*tau_x**2 + dl*tau_xx
+
+
+def vectorisable(mf):
+    """Determine if the spin-vectorised chi-squared function can be used.
+
+    @param mf:  The model-free target function class instance.
+    @type mf:   Mf instance
+    @return:    True if the model type, equations, parameters and relaxation data types are all supported.
+    @rtype:     bool
+    """
+
+    # Only the global models.
+    if mf.model_type not in ['diff', 'all']:
+        return False
+
+    # Check each spin.
+    for data in mf.data:
+        # The equations and parameters.
+        if data.equations not in ['mf_orig', 'mf_ext', 'mf_ext2']:
+            return False
+        if 'local_tm' in data.param_types:
+            return False
+
+        # The relaxation data types.
+        for label in data.ri_labels:
+            if label not in RI_TYPES:
+                return False
+
+        # The bond vectors of the anisotropic diffusion tensors.
+        if mf.diff_data.calc_di and data.xh_unit_vector is None:
+            return False
+
+    # Supported.
+    return True
@@ -21,10 +21,10 @@
 
 # Python module imports.
 from math import sqrt
-from numpy import array, dot, eye, float64, ones, transpose, zeros
+from numpy import array, dot, einsum, eye, float64, ones, transpose, where, zeros
 
 # relax module imports.
-from lib.alignment.alignment_tensor import dAi_dAxx, dAi_dAyy, dAi_dAxy, dAi_dAxz, dAi_dAyz, to_tensor
+from lib.alignment.alignment_tensor import dAi_dAxx, dAi_dAyy, dAi_dAxy, dAi_dAxz, dAi_dAyz, projections_5D, to_5D, to_tensor
 from lib.alignment.paramag_centre import vectors_single_centre, vectors_centre_per_state
 from lib.alignment.pcs import ave_pcs_tensor, ave_pcs_tensor_ddeltaij_dAmn, ave_pcs_tensor_ddeltaij_dc, pcs_constant_grad, pcs_tensor
 from lib.alignment.rdc import ave_rdc_tensor, ave_rdc_tensor_dDij_dAmn, ave_rdc_tensor_pseudoatom, ave_rdc_tensor_pseudoatom_dDij_dAmn, rdc_tensor
@@ -388,20 +388,21 @@ class N_state_opt:
                 # Set up the paramagnetic info.
                 self.paramag_info()
 
-            # PCS function, gradient, and Hessian matrices.
+            # PCS function, gradient, and Hessian matrices (the Hessian is only created by d2func_standard(), as it is very large for big ensembles).
             self.deltaij_theta = zeros((self.num_align, self.num_spins), float64)
             self.ddeltaij_theta = zeros((self.total_num_params, self.num_align, self.num_spins), float64)
-            self.d2deltaij_theta = zeros((self.total_num_params, self.total_num_params, self.num_align, self.num_spins), float64)
+            self.d2deltaij_theta = None
 
-            # RDC function, gradient, and Hessian matrices.
+            # RDC function, gradient, and Hessian matrices (the Hessian is only created by d2func_standard(), as it is very large for big ensembles).
             self.rdc_theta = zeros((self.num_align, self.num_interatom), float64)
             self.drdc_theta = zeros((self.total_num_params, self.num_align, self.num_interatom), float64)
-            self.d2rdc_theta = zeros((self.total_num_params, self.total_num_params, self.num_align, self.num_interatom), float64)
+            self.d2rdc_theta = None
 
-            # Set the target function, gradient, and Hessian.
-            self.func = self.func_standard
-            self.dfunc = self.dfunc_standard
-            self.d2func = self.d2func_standard
+            # Set the target function, gradient, and Hessian to the versions vectorised over the alignments, spins and states (func_standard(), dfunc_standard() and d2func_standard() are the equivalent loop based versions).
+            self.init_ensemble()
+            self.func = self.func_ensemble
+            self.dfunc = self.dfunc_ensemble
+            self.d2func = self.d2func_ensemble
 
         # Variable probabilities.
         self.probs_fixed = True
@@ -1147,6 +1148,11 @@ class N_state_opt:
         # Initial chi-squared (or SSE) Hessian.
         self.d2chi2 = self.d2chi2 * 0.0
 
+        # Create the RDC and PCS Hessian matrices.
+        if self.d2rdc_theta is None:
+            self.d2deltaij_theta = zeros((self.total_num_params, self.total_num_params, self.num_align, self.num_spins), float64)
+            self.d2rdc_theta = zeros((self.total_num_params, self.total_num_params, self.num_align, self.num_interatom), float64)
+
         # Loop over each alignment.
         for align_index in range(self.num_align):
             # Construct the pc-Amn second partial derivative Hessian components.
@@ -1196,6 +1202,312 @@ class N_state_opt:
         return self.d2chi2 * 1.0
 
 
+    def func_ensemble(self, params):
+        """The target function for optimisation of the standard N-state model, vectorised over the alignments, spins and states.
+
+        This is equivalent to func_standard(), with the same equations, but the back-calculated RDCs and PCSs of all alignments and spins are calculated as array contractions over the states c weighted by the state probabilities.  The RDC and PCS unit vectors are projected onto the 5 alignment tensor elements {Axx, Ayy, Axy, Axz, Ayz} by init_ensemble(), so that for spin j and state c::
+
+              T                ___
+            mu_jc . Ai . mu_jc = \   Amn . Pjcm,
+                                /__
+                                 m
+
+        where Pjcm are the projections.  The probability weighted projections are stored for the gradient and Hessian.
+
+
+        @param params:  The vector of parameter values.
+        @type params:   numpy rank-1 array
+        @return:        The chi-squared or SSE value.
+        @rtype:         float
+        """
+
+        # Scaling.
+        if self.scaling_flag:
+            params = dot(params, self.scaling_matrix)
+
+        # Initial chi-squared (or SSE) value.
+        chi2_sum = 0.0
+
+        # Unpack both the probabilities (when the paramagnetic centre is also optimised).
+        if not self.probs_fixed and not self.centre_fixed:
+            # The probabilities.
+            self.probs = params[-(self.N-1)-3:-3]
+
+        # Unpack the probabilities (located at the end of the parameter array).
+        elif not self.probs_fixed:
+            self.probs = params[-(self.N-1):]
+
+        # Unpack the paramagnetic centre (also update the paramagnetic info).
+        if not self.centre_fixed:
+            self.paramag_centre = params[-3:]
+            self.paramag_info()
+
+        # The probabilities of all N states.
+        self.weights = array(self.probs, float64)
+        if len(self.weights) < self.N:
+            self.weights = array(list(self.weights) + [1.0 - self.weights.sum()], float64)
+
+        # Create the optimised tensors from the parameters.
+        for align_index in range(self.num_align):
+            index = self.tensor_index[align_index]
+            if index != None:
+                self.A_5D[align_index] = params[index:index+5]
+                to_tensor(self.A[align_index], params[index:index+5])
+
+        # The back calculated RDCs.
+        if self.rdc_flag_sum:
+            # The probability weighted projections, with the dimensions {j, m}.
+            self.rdc_proj_ave = einsum('c,jcm->jm', self.weights, self.rdc_proj)
+
+            # The RDCs, including the J couplings for the T = J+D values.
+            self.rdc_theta = self.rdc_mask * (dot(self.A_5D, self.rdc_proj_ave.T) + self.rdc_j)
+
+            # Take the absolute values.
+            self.rdc_theta = where(self.absolute_rdc, abs(self.rdc_theta), self.rdc_theta)
+
+            # The chi-squared value.
+            chi2_sum = chi2_sum + (self.rdc_inv_var * (self.rdc - self.rdc_theta)**2).sum()
+
+        # The back calculated PCSs.
+        if self.pcs_flag_sum:
+            # Update the projections for a moving paramagnetic centre.
+            if not self.centre_fixed:
+                self.pcs_proj = projections_5D(self.paramag_unit_vect)
+
+            # The probability weighted projections scaled by the PCS constants, with the dimensions {i, j, m}.
+            self.pcs_proj_ave = einsum('ijc,jcm->ijm', self.pcs_const * self.weights, self.pcs_proj)
+
+            # The PCSs.
+            self.deltaij_theta = self.pcs_mask * einsum('ijm,im->ij', self.pcs_proj_ave, self.A_5D)
+
+            # The chi-squared value.
+            chi2_sum = chi2_sum + (self.pcs_inv_var * (self.deltaij - self.deltaij_theta)**2).sum()
+
+        # Return the chi-squared value.
+        return chi2_sum
+
+
+    def dfunc_ensemble(self, params):
+        """The gradient function for optimisation of the standard N-state model, vectorised over the alignments, spins and states.
+
+        This is equivalent to dfunc_standard(), using the equations documented there, except that the probability partial derivatives account for the dependence of the last state probability pN = 1 - sum(pc) on the pc parameters.  The RDC and PCS gradients are stored for the Hessian.
+
+
+        @param params:  The vector of parameter values.  This is unused as it is assumed that func() was called first.
+        @type params:   numpy rank-1 array
+        @return:        The chi-squared or SSE gradient.
+        @rtype:         numpy rank-1 array
+        """
+
+        # Initial chi-squared (or SSE) gradient.
+        self.dchi2 = self.dchi2 * 0.0
+
+        # The index of the first probability parameter, and the number of probability parameters.
+        pc_index = self.num_align_params
+        num_pc = self.N - 1
+
+        # The RDC gradients.
+        if self.rdc_flag_sum:
+            # The Amn partial derivatives.
+            for align_index in range(self.num_align):
+                index = self.tensor_index[align_index]
+                if index == None:
+                    continue
+                if (self.T_flags[align_index] * self.rdc_mask[align_index]).any():
+                    raise RelaxError("Gradients for T = J+D data have not been implemented yet.")
+                self.drdc_theta[index:index+5, align_index] = self.rdc_proj_ave.T * self.rdc_mask[align_index]
+
+            # The pc partial derivatives, the RDC of each state minus that of the last state (as pN = 1 - sum(pc)), with the dimensions {c, i, j}.
+            if not self.probs_fixed:
+                self.drdc_theta[pc_index:pc_index+num_pc] = einsum('jcm,im,ij->cij', self.rdc_proj_diff(), self.A_5D, self.rdc_mask)
+
+            # The chi-squared gradient.
+            self.dchi2 = self.dchi2 + einsum('kij,ij->k', self.drdc_theta, -2.0 * self.rdc_inv_var * (self.rdc - self.rdc_theta))
+
+        # The PCS gradients.
+        if self.pcs_flag_sum:
+            # The Amn partial derivatives.
+            for align_index in range(self.num_align):
+                index = self.tensor_index[align_index]
+                if index != None:
+                    self.ddeltaij_theta[index:index+5, align_index] = transpose(self.pcs_proj_ave[align_index]) * self.pcs_mask[align_index]
+
+            # The pc partial derivatives, the PCS of each state minus that of the last state, with the dimensions {c, i, j}.
+            if not self.probs_fixed:
+                self.ddeltaij_theta[pc_index:pc_index+num_pc] = einsum('ijcm,im,ij->cij', self.pcs_proj_diff(), self.A_5D, self.pcs_mask)
+
+            # The paramagnetic centre partial derivatives.
+            if not self.centre_fixed:
+                # The alignment tensors applied to the unit vectors, with the dimensions {i, j, c, n}.
+                A_vect = einsum('inm,jcm->ijcn', self.A, self.paramag_unit_vect)
+
+                # The PCS of each state without the constant, and the distances, with the dimensions {i, j, c}.
+                vect_A_vect = einsum('jcm,im->ijc', self.pcs_proj, self.A_5D)
+                r = self.paramag_dist[None]
+
+                # The derivative terms for each coordinate, with the dimensions {i, j, c, x}.
+                terms = self.dpcs_const_theta * (r**2 * vect_A_vect)[:, :, :, None] + 2.0 * (self.pcs_const / r)[:, :, :, None] * einsum('xn,ijcn->ijcx', self.dr_theta, A_vect)
+
+                # Average and convert back to the Angstrom scale.
+                self.ddeltaij_theta[-3:] = 1e-10 * einsum('c,ijcx,ij->xij', self.weights, terms, self.pcs_mask)
+
+            # The chi-squared gradient.
+            self.dchi2 = self.dchi2 + einsum('kij,ij->k', self.ddeltaij_theta, -2.0 * self.pcs_inv_var * (self.deltaij - self.deltaij_theta))
+
+        # Diagonal scaling.
+        if self.scaling_flag:
+            self.dchi2 = dot(self.dchi2, self.scaling_matrix)
+
+        # Return a copy of the gradient.
+        return self.dchi2 * 1.0
+
+
+    def d2func_ensemble(self, params):
+        """The Hessian function for optimisation of the standard N-state model, vectorised over the alignments, spins and states.
+
+        This is equivalent to d2func_standard(), using the equations documented there, with the probability partial derivatives of dfunc_ensemble().  The only non-zero RDC and PCS second partial derivatives are those between the probability parameters pc and the alignment tensor elements Amn, and these are contracted directly with the chi-squared residuals rather than being stored.
+
+
+        @param params:  The vector of parameter values.  This is unused as it is assumed that dfunc() was called first.
+        @type params:   numpy rank-1 array
+        @return:        The chi-squared or SSE Hessian.
+        @rtype:         numpy rank-2 array
+        """
+
+        # The Hessian of the paramagnetic centre position.
+        if self.pcs_flag_sum and not self.centre_fixed:
+            raise RelaxError("The Hessian equations for optimising the paramagnetic centre position are not yet implemented.")
+
+        # Initial chi-squared (or SSE) Hessian.
+        self.d2chi2 = self.d2chi2 * 0.0
+
+        # The index of the first probability parameter, and the number of probability parameters.
+        pc_index = self.num_align_params
+        num_pc = self.N - 1
+
+        # The RDC part.
+        if self.rdc_flag_sum:
+            # The product of the gradients.
+            grad = self.drdc_theta.reshape(self.total_num_params, -1)
+            self.d2chi2 = self.d2chi2 + 2.0 * dot(grad * self.rdc_inv_var.reshape(-1), transpose(grad))
+
+            # The pc-Amn second partial derivatives, contracted with the residuals.
+            if not self.probs_fixed:
+                residuals = -2.0 * self.rdc_inv_var * (self.rdc - self.rdc_theta)
+                proj_diff = self.rdc_proj_diff()
+                for align_index in range(self.num_align):
+                    index = self.tensor_index[align_index]
+                    if index != None:
+                        block = einsum('j,jcm->cm', residuals[align_index], proj_diff)
+                        self.d2chi2[pc_index:pc_index+num_pc, index:index+5] += block
+                        self.d2chi2[index:index+5, pc_index:pc_index+num_pc] += transpose(block)
+
+        # The PCS part.
+        if self.pcs_flag_sum:
+            # The product of the gradients.
+            grad = self.ddeltaij_theta.reshape(self.total_num_params, -1)
+            self.d2chi2 = self.d2chi2 + 2.0 * dot(grad * self.pcs_inv_var.reshape(-1), transpose(grad))
+
+            # The pc-Amn second partial derivatives, contracted with the residuals.
+            if not self.probs_fixed:
+                residuals = -2.0 * self.pcs_inv_var * (self.deltaij - self.deltaij_theta)
+                proj_diff = self.pcs_proj_diff()
+                for align_index in range(self.num_align):
+                    index = self.tensor_index[align_index]
+                    if index != None:
+                        block = einsum('j,jcm->cm', residuals[align_index], proj_diff[align_index])
+                        self.d2chi2[pc_index:pc_index+num_pc, index:index+5] += block
+                        self.d2chi2[index:index+5, pc_index:pc_index+num_pc] += transpose(block)
+
+        # Diagonal scaling.
+        if self.scaling_flag:
+            self.d2chi2 = dot(self.scaling_matrix, dot(self.d2chi2, self.scaling_matrix))
+
+        # Return a copy of the Hessian.
+        return self.d2chi2 * 1.0
+
+
+    def init_ensemble(self):
+        """Set up the data structures for the target function, gradient and Hessian vectorised over the alignments, spins and states."""
+
+        # The parameter index of each optimised alignment tensor (None for the fixed tensors).
+        self.tensor_index = []
+        index = 0
+        for align_index in range(self.num_align):
+            if self.fixed_tensors[align_index]:
+                self.tensor_index.append(None)
+            else:
+                self.tensor_index.append(5*index)
+                index += 1
+
+        # The alignment tensors in the 5D form {Axx, Ayy, Axy, Axz, Ayz}.
+        self.A_5D = zeros((self.num_align, 5), float64)
+        for align_index in range(self.num_align):
+            if self.fixed_tensors[align_index]:
+                to_5D(self.A_5D[align_index], self.A[align_index])
+
+        # The RDC data.
+        if self.rdc_flag_sum:
+            # The projections of the unit vectors including the dipolar constants and the pseudo-atom averaging, with the dimensions {j, c, m}.
+            self.rdc_proj = zeros((self.num_interatom, self.N, 5), float64)
+            for j in range(self.num_interatom):
+                if self.rdc_pseudo_flags[j]:
+                    M = len(self.dip_const[j])
+                    for d in range(M):
+                        self.rdc_proj[j] += self.dip_const[j][d] / M * projections_5D(self.dip_vect[j][:, d])
+                else:
+                    self.rdc_proj[j] = self.dip_const[j] * projections_5D(self.dip_vect[j])
+
+            # The mask of the RDCs used in the chi-squared value, and the inverse variances.
+            self.rdc_mask = (1.0 - self.missing_rdc) * array(self.rdc_flag, float64)[:, None]
+            self.rdc_inv_var = self.rdc_mask / self.rdc_errors**2
+
+            # The J couplings for the T = J+D type data.
+            self.rdc_j = zeros((self.num_align, self.num_interatom), float64)
+            if self.j_couplings is not None:
+                self.rdc_j = self.T_flags * array(self.j_couplings, float64)[None, :]
+
+        # The PCS data.
+        if self.pcs_flag_sum:
+            # The projections of the paramagnetic centre to spin unit vectors, with the dimensions {j, c, m}.
+            self.pcs_proj = projections_5D(self.paramag_unit_vect)
+
+            # The mask of the PCSs used in the chi-squared value, and the inverse variances.
+            self.pcs_mask = (1.0 - self.missing_deltaij) * array(self.pcs_flag, float64)[:, None]
+            self.pcs_inv_var = self.pcs_mask / self.pcs_errors**2
+
+
+    def pcs_proj_diff(self):
+        """Return the PCS constant scaled projections of each probability parameter state minus those of the last state.
+
+        As the probability of the last state is pN = 1 - sum(pc), these are the partial derivatives of the probability weighted projections with respect to the probability parameters pc.
+
+
+        @return:    The projection differences, with the dimensions {i, j, c, m} for the N-1 states c.
+        @rtype:     numpy rank-4 array
+        """
+
+        # The PCS constant scaled projections, with the dimensions {i, j, c, m}.
+        proj = self.pcs_const[:, :, :, None] * self.pcs_proj[None]
+
+        # The difference.
+        return proj[:, :, :-1] - proj[:, :, -1:]
+
+
+    def rdc_proj_diff(self):
+        """Return the RDC projections of each probability parameter state minus those of the last state.
+
+        As the probability of the last state is pN = 1 - sum(pc), these are the partial derivatives of the probability weighted projections with respect to the probability parameters pc.
+
+
+        @return:    The projection differences, with the dimensions {j, c, m} for the N-1 states c.
+        @rtype:     numpy rank-3 array
+        """
+
+        # The difference.
+        return self.rdc_proj[:, :-1] - self.rdc_proj[:, -1:]
+
+
     def paramag_info(self):
         """Calculate the paramagnetic centre to spin vectors, distances and constants."""
 
@@ -26,17 +26,17 @@
 
 # Python module imports.
 from copy import deepcopy
-from numpy import all, arctan2, cos, dot, float64, int16, isfinite, max, multiply, ones, rollaxis, pi, sin, sum, zeros
+from numpy import all, arange, arctan2, argmin, argsort, array, clip, concatenate, cos, diag, dot, einsum, eye, float64, inf, int16, isfinite, max, multiply, ones, repeat, rollaxis, pi, sin, sum, zeros
 from numpy.ma import masked_equal
 
 # relax module imports.
-from lib.dispersion.b14 import r2eff_B14
-from lib.dispersion.cr72 import r2eff_CR72
-from lib.dispersion.dpl94 import r1rho_DPL94
+from lib.dispersion.b14 import dr2eff_B14, r2eff_B14
+from lib.dispersion.cr72 import dr2eff_CR72, r2eff_CR72
+from lib.dispersion.dpl94 import d2r1rho_DPL94, dr1rho_DPL94, r1rho_DPL94
 from lib.dispersion.it99 import r2eff_IT99
-from lib.dispersion.lm63 import r2eff_LM63
+from lib.dispersion.lm63 import d2r2eff_LM63, dr2eff_LM63, r2eff_LM63
 from lib.dispersion.lm63_3site import r2eff_LM63_3site
-from lib.dispersion.m61 import r1rho_M61
+from lib.dispersion.m61 import d2r1rho_M61, dr1rho_M61, r1rho_M61
 from lib.dispersion.m61b import r1rho_M61b
 from lib.dispersion.mp05 import r1rho_MP05
 from lib.dispersion.mmq_cr72 import r2eff_mmq_cr72
@@ -48,17 +48,21 @@ from lib.dispersion.ns_mmq_2site import r2eff_ns_mmq_2site_mq, r2eff_ns_mmq_2sit
 from lib.dispersion.ns_r1rho_2site import ns_r1rho_2site
 from lib.dispersion.ns_r1rho_3site import ns_r1rho_3site
 from lib.dispersion.ns_matrices import r180x_3d
-from lib.dispersion.tp02 import r1rho_TP02
-from lib.dispersion.tap03 import r1rho_TAP03
-from lib.dispersion.tsmfk01 import r2eff_TSMFK01
+from lib.dispersion.tp02 import dr1rho_TP02, r1rho_TP02
+from lib.dispersion.tap03 import dr1rho_TAP03, r1rho_TAP03
+from lib.dispersion.tsmfk01 import d2r2eff_TSMFK01, dr2eff_TSMFK01, r2eff_TSMFK01
 from lib.dispersion.variables import EXP_TYPE_CPMG_DQ, EXP_TYPE_CPMG_MQ, EXP_TYPE_CPMG_PROTON_MQ, EXP_TYPE_CPMG_PROTON_SQ, EXP_TYPE_CPMG_SQ, EXP_TYPE_CPMG_ZQ, EXP_TYPE_LIST_CPMG, EXP_TYPE_R1RHO, MODEL_B14, MODEL_B14_FULL, MODEL_CR72, MODEL_CR72_FULL, MODEL_DPL94, MODEL_IT99, MODEL_LIST_CPMG, MODEL_LIST_FULL, MODEL_LIST_DW_MIX_DOUBLE, MODEL_LIST_DW_MIX_QUADRUPLE, MODEL_LIST_INV_RELAX_TIMES, MODEL_LIST_R20B, MODEL_LIST_MMQ, MODEL_LIST_MQ_CPMG, MODEL_LIST_R1RHO, MODEL_LIST_R1RHO_OFF_RES, MODEL_LM63, MODEL_LM63_3SITE, MODEL_M61, MODEL_M61B, MODEL_MP05, MODEL_MMQ_CR72, MODEL_NOREX, MODEL_NS_CPMG_2SITE_3D, MODEL_NS_CPMG_2SITE_3D_FULL, MODEL_NS_CPMG_2SITE_EXPANDED, MODEL_NS_CPMG_2SITE_STAR, MODEL_NS_CPMG_2SITE_STAR_FULL, MODEL_NS_MMQ_2SITE, MODEL_NS_MMQ_3SITE, MODEL_NS_MMQ_3SITE_LINEAR, MODEL_NS_R1RHO_2SITE, MODEL_NS_R1RHO_3SITE, MODEL_NS_R1RHO_3SITE_LINEAR, MODEL_TAP03, MODEL_TP02, MODEL_TSMFK01
 from lib.errors import RelaxError
 from lib.float import isNaN
 from target_functions.chi2 import chi2_rankN
 
 
+# The maximum number of elements of the [NG][NE][NS][NM][NO][ND] back-calculated R2eff arrays of the vectorised grid search, used to cap the memory usage.
+GRID_CHUNK_SIZE = 2**21
+
+
 class Dispersion:
-    def __init__(self, model=None, num_params=None, num_spins=None, num_frq=None, exp_types=None, values=None, errors=None, missing=None, frqs=None, frqs_H=None, cpmg_frqs=None, spin_lock_nu1=None, chemical_shifts=None, offset=None, tilt_angles=None, r1=None, relax_times=None, scaling_matrix=None, recalc_tau=True, r1_fit=False):
+    def __init__(self, model=None, num_params=None, num_spins=None, num_frq=None, exp_types=None, values=None, errors=None, missing=None, frqs=None, frqs_H=None, cpmg_frqs=None, spin_lock_nu1=None, chemical_shifts=None, offset=None, tilt_angles=None, r1=None, relax_times=None, scaling_matrix=None, recalc_tau=True, r1_fit=False, r20_lower=None, r20_upper=None):
         """Relaxation dispersion target functions for optimisation.
 
         Models
@@ -163,6 +167,10 @@ class Dispersion:
         @type recalc_tau:           bool
         @keyword r1_fit:            A flag which if True will allow R1 values to be optimised.  If False, preloaded R1 values will be used instead.
         @type r1_fit:               bool
+        @keyword r20_lower:         The lower bounds of the scaled R20 parameters, used when these are profiled out of the optimisation via the func_r20_profile() method.
+        @type r20_lower:            None or numpy rank-1 float array
+        @keyword r20_upper:         The upper bounds of the scaled R20 parameters, used when these are profiled out of the optimisation via the func_r20_profile() method.
+        @type r20_upper:            None or numpy rank-1 float array
         """
 
         # Check the args.
@@ -574,6 +582,74 @@ class Dispersion:
         if model == MODEL_NS_MMQ_3SITE_LINEAR:
             self.func = self.func_ns_mmq_3site_linear
 
+        # The analytic gradients and Hessians.
+        self.dfunc = None
+        self.d2func = None
+        if model == MODEL_LM63:
+            self.dfunc = self.dfunc_LM63
+            self.d2func = self.d2func_LM63
+        if model == MODEL_CR72:
+            self.dfunc = self.dfunc_CR72
+        if model == MODEL_CR72_FULL:
+            self.dfunc = self.dfunc_CR72_full
+        if model == MODEL_TSMFK01:
+            self.dfunc = self.dfunc_TSMFK01
+            self.d2func = self.d2func_TSMFK01
+        if model == MODEL_B14:
+            self.dfunc = self.dfunc_B14
+        if model == MODEL_B14_FULL:
+            self.dfunc = self.dfunc_B14_full
+        if model == MODEL_M61:
+            self.dfunc = self.dfunc_M61
+            self.d2func = self.d2func_M61
+        if model == MODEL_DPL94:
+            if r1_fit:
+                self.dfunc = self.dfunc_DPL94_fit_r1
+                self.d2func = self.d2func_DPL94_fit_r1
+            else:
+                self.dfunc = self.dfunc_DPL94
+                self.d2func = self.d2func_DPL94
+        if model == MODEL_TP02:
+            if r1_fit:
+                self.dfunc = self.dfunc_TP02_fit_r1
+            else:
+                self.dfunc = self.dfunc_TP02
+        if model == MODEL_TAP03:
+            if r1_fit:
+                self.dfunc = self.dfunc_TAP03_fit_r1
+            else:
+                self.dfunc = self.dfunc_TAP03
+
+        # The mask of the data points contributing to the chi-squared value, for the gradient and Hessian.
+        self.deriv_mask = self.disp_struct * (1.0 - self.missing)
+
+        # The vectorised grid search functions, and the number of grid points per chunk.
+        self.grid_func = None
+        if model == MODEL_LM63:
+            self.grid_func = self.grid_LM63
+        if model == MODEL_CR72:
+            self.grid_func = self.grid_CR72
+        if model == MODEL_CR72_FULL:
+            self.grid_func = self.grid_CR72_full
+        if model == MODEL_TSMFK01:
+            self.grid_func = self.grid_TSMFK01
+        if model == MODEL_B14:
+            self.grid_func = self.grid_B14
+        if model == MODEL_B14_FULL:
+            self.grid_func = self.grid_B14_full
+        self.grid_chunk = GRID_CHUNK_SIZE // self.values.size
+        if self.grid_chunk < 1:
+            self.grid_chunk = 1
+
+        # The per-point R2eff/R1rho data for the vectorised functions, used in place of the values structure for the Monte Carlo simulations.
+        self.grid_values = None
+
+        # The variable projection of the R20 parameters.  The coefficients of the R20 parameters are calculated once, except for the off-resonance R1rho models where the tilt angle depends on the population averaged resonance position.
+        self.r20_lower = r20_lower
+        self.r20_upper = r20_upper
+        self.r20_coeff = None
+        self.r20_coeff_fixed = model not in [MODEL_TP02, MODEL_TAP03, MODEL_MP05]
+
 
     def calc_B14_chi2(self, R20A=None, R20B=None, dw=None, pA=None, kex=None):
         """Calculate the chi-squared value of the Baldwin (2014) 2-site exact solution model for all time scales.
@@ -654,6 +730,122 @@ class Dispersion:
         return chi2_rankN(self.values, self.back_calc, self.errors)
 
 
+    def calc_dchi2(self, dback_calc=None, param_types=None):
+        """Calculate the chi-squared gradient from the partial derivatives of the back-calculated values.
+
+        The parameter types are 'efm' for the parameters per experiment, spin and frequency (R20, R1rho', R1), 'r20ab' for the interleaved R20A and R20B parameters of the full models whereby the partial derivatives are given as a (R20A, R20B) pair, 'spin' for the per spin parameters (dw, phi_ex) whereby the partial derivatives must already be converted to ppm units, and 'global' for the cluster parameters (pA, kex).  This must be called after the target function, so that the back-calculated values are up to date.
+
+
+        @keyword dback_calc:    The partial derivatives of the back-calculated values for each block of parameters, in the order of the parameter vector.
+        @type dback_calc:       list of numpy float arrays of rank [NE][NS][NM][NO][ND]
+        @keyword param_types:   The type of each block of parameters.
+        @type param_types:      list of str
+        @return:                The chi-squared gradient.
+        @rtype:                 numpy rank-1 float array
+        """
+
+        # The chi-squared weights, which are zero for the padding and missing data points.
+        weights = 2.0 * (self.back_calc - self.values) / self.errors**2 * self.deriv_mask
+
+        # Loop over the parameter blocks.
+        grad = []
+        for deriv, param_type in zip(dback_calc, param_types):
+            # The interleaved R20A and R20B parameters.
+            if param_type == 'r20ab':
+                block = zeros((self.NS*2, self.NM), float64)
+                block[::2] = self.param_sum(weights*deriv[0], 'efm').reshape(self.NS, self.NM)
+                block[1::2] = self.param_sum(weights*deriv[1], 'efm').reshape(self.NS, self.NM)
+                grad.append(block.flatten())
+
+            # All other parameters.
+            else:
+                grad.append(self.param_sum(weights*deriv, param_type))
+        grad = concatenate(grad)
+
+        # Scaling.
+        if self.scaling_flag:
+            grad = dot(grad, self.scaling_matrix)
+
+        # Return the gradient.
+        return grad
+
+
+    def calc_d2chi2(self, dback_calc=None, d2back_calc=None, param_types=None):
+        """Calculate the chi-squared Hessian from the first and second partial derivatives of the back-calculated values.
+
+        The parameter types are as for the calc_dchi2() method, excluding 'r20ab'.  This must be called after the target function, so that the back-calculated values are up to date.
+
+
+        @keyword dback_calc:    The partial derivatives of the back-calculated values for each block of parameters, in the order of the parameter vector.
+        @type dback_calc:       list of numpy float arrays of rank [NE][NS][NM][NO][ND]
+        @keyword d2back_calc:   The non-zero second partial derivatives of the back-calculated values, with the keys being the (i, j) block indices for i <= j.
+        @type d2back_calc:      dict of numpy float arrays of rank [NE][NS][NM][NO][ND]
+        @keyword param_types:   The type of each block of parameters.
+        @type param_types:      list of str
+        @return:                The chi-squared Hessian.
+        @rtype:                 numpy rank-2 float array
+        """
+
+        # The chi-squared weights, which are zero for the padding and missing data points.
+        weights2 = 2.0 / self.errors**2 * self.deriv_mask
+        weights = weights2 * (self.back_calc - self.values)
+
+        # The block sizes and offsets.
+        sizes = {'efm': self.NE*self.NS*self.NM, 'spin': self.NS, 'global': 1}
+        offsets = [0]
+        for param_type in param_types:
+            offsets.append(offsets[-1] + sizes[param_type])
+
+        # Loop over the upper triangle of parameter blocks.
+        hessian = zeros((offsets[-1], offsets[-1]), float64)
+        for i in range(len(param_types)):
+            for j in range(i, len(param_types)):
+                # The Gauss-Newton and second derivative terms.
+                terms = weights2 * dback_calc[i] * dback_calc[j]
+                if (i, j) in d2back_calc:
+                    terms = terms + weights * d2back_calc[i, j]
+
+                # Store the block, and its transpose.
+                block = self.param_block(terms, param_types[i], param_types[j])
+                hessian[offsets[i]:offsets[i+1], offsets[j]:offsets[j+1]] = block
+                hessian[offsets[j]:offsets[j+1], offsets[i]:offsets[i+1]] = block.T
+
+        # Scaling.
+        if self.scaling_flag:
+            hessian = dot(self.scaling_matrix, dot(hessian, self.scaling_matrix))
+
+        # Return the Hessian.
+        return hessian
+
+
+    def calc_grid_chi2(self, back_calc=None):
+        """Calculate the chi-squared values for a block of grid points.
+
+        @keyword back_calc: The back-calculated R2eff values for each grid point.
+        @type back_calc:    numpy float array of rank [NG][NE][NS][NM][NO][ND]
+        @return:            The chi-squared value for each grid point.
+        @rtype:             numpy rank-1 float array
+        """
+
+        # The measured values, either shared by all points or for each point.
+        values = self.values
+        if self.grid_values is not None:
+            values = self.grid_values
+
+        # Clean the data for all values, which is left over at the end of arrays.
+        back_calc = back_calc*self.disp_struct
+
+        # For all missing data points, set the back-calculated value to the measured values so that it has no effect on the chi-squared value.
+        if self.has_missing:
+            if self.grid_values is not None:
+                back_calc[:, self.mask_replace_blank.mask] = values[:, self.mask_replace_blank.mask]
+            else:
+                back_calc[:, self.mask_replace_blank.mask] = values[self.mask_replace_blank.mask]
+
+        # Return the chi-squared value of each grid point.
+        return sum((((values - back_calc) / self.errors)**2).reshape(len(back_calc), -1), axis=1)
+
+
     def calc_DPL94(self, R1=None, r1rho_prime=None, phi_ex=None, kex=None):
         """Calculation function for the Davis, Perlman and London (1994) fast 2-site off-resonance exchange model for R1rho-type experiments.
 
@@ -1083,263 +1275,744 @@ class Dispersion:
         return chi2_rankN(self.values, self.back_calc, self.errors)
 
 
-    def experiment_type_setup(self):
-        """Check the experiment types and simplify data structures.
+    def d2func_DPL94(self, params):
+        """Target function Hessian for the Davis, Perlman and London (1994) fast 2-site off-resonance exchange model for R1rho-type experiments.
 
-        For the single experiment type models, the first dimension of the values, errors, and missing data structures will be removed to simplify the target functions.
+        @param params:  The vector of parameter values.
+        @type params:   numpy rank-1 float array
+        @return:        The chi-squared Hessian.
+        @rtype:         numpy rank-2 float array
         """
 
-        # The MMQ combined data type models.
-        if self.model in MODEL_LIST_MMQ:
-            # Alias the r2eff functions.
-            self.r2eff_ns_mmq = []
-
-            # Loop over the experiment types.
-            for ei in range(self.NE):
-                # SQ, DQ and ZQ data types.
-                if self.exp_types[ei] in [EXP_TYPE_CPMG_SQ, EXP_TYPE_CPMG_PROTON_SQ, EXP_TYPE_CPMG_DQ, EXP_TYPE_CPMG_ZQ]:
-                    if self.model == MODEL_NS_MMQ_2SITE:
-                        self.r2eff_ns_mmq.append(r2eff_ns_mmq_2site_sq_dq_zq)
-                    else:
-                        self.r2eff_ns_mmq.append(r2eff_ns_mmq_3site_sq_dq_zq)
+        # Back calculate the R1rho values.
+        self.func(params)
 
-                # MQ data types.
-                elif self.exp_types[ei] in [EXP_TYPE_CPMG_MQ, EXP_TYPE_CPMG_PROTON_MQ]:
-                    if self.model == MODEL_NS_MMQ_2SITE:
-                        self.r2eff_ns_mmq.append(r2eff_ns_mmq_2site_mq)
-                    else:
-                        self.r2eff_ns_mmq.append(r2eff_ns_mmq_3site_mq)
+        # Scaling.
+        if self.scaling_flag:
+            params = dot(params, self.scaling_matrix)
 
-        # The single data type models.
-        else:
-            # Check that the data is correct.
-            if self.model != MODEL_NOREX and self.model in MODEL_LIST_CPMG and self.exp_types[0] != EXP_TYPE_CPMG_SQ:
-                raise RelaxError("The '%s' CPMG model is not compatible with the '%s' experiment type." % (self.model, self.exp_types[0]))
-            if self.model != MODEL_NOREX and self.model in MODEL_LIST_R1RHO and self.exp_types[0] != EXP_TYPE_R1RHO:
-                raise RelaxError("The '%s' R1rho model is not compatible with the '%s' experiment type." % (self.model, self.exp_types[0]))
-            if self.model != MODEL_NOREX and self.model in MODEL_LIST_MQ_CPMG and self.exp_types[0] != EXP_TYPE_CPMG_MQ:
-                raise RelaxError("The '%s' CPMG model is not compatible with the '%s' experiment type." % (self.model, self.exp_types[0]))
+        # The kex parameter.
+        kex = params[self.end_index[1]]
 
+        # The partial derivatives.
+        dr1, dr1rho_prime, dphi_ex, dkex = dr1rho_DPL94(r1rho_prime=self.r1rho_prime_struct, phi_ex=self.phi_ex_struct, kex=kex, theta=self.tilt_angles, R1=self.r1, spin_lock_fields2=self.spin_lock_omega1_squared)
+        dphi_ex_dkex, dkex2 = d2r1rho_DPL94(r1rho_prime=self.r1rho_prime_struct, phi_ex=self.phi_ex_struct, kex=kex, theta=self.tilt_angles, R1=self.r1, spin_lock_fields2=self.spin_lock_omega1_squared)
 
-    def func_B14(self, params):
-        """Target function for the Baldwin (2014) 2-site exact solution model for all time scales, whereby the simplification R20A = R20B is assumed.
+        # Return the Hessian.
+        return self.calc_d2chi2(dback_calc=[dr1rho_prime, dphi_ex*self.frqs_squared, dkex], d2back_calc={(1, 2): dphi_ex_dkex*self.frqs_squared, (2, 2): dkex2}, param_types=['efm', 'spin', 'global'])
 
-        This assumes that pA > pB, and hence this must be implemented as a constraint.
 
+    def d2func_DPL94_fit_r1(self, params):
+        """Target function Hessian for the Davis, Perlman and London (1994) fast 2-site off-resonance exchange model for R1rho-type experiments, whereby R1 is fitted.
 
         @param params:  The vector of parameter values.
         @type params:   numpy rank-1 float array
-        @return:        The chi-squared value.
-        @rtype:         float
+        @return:        The chi-squared Hessian.
+        @rtype:         numpy rank-2 float array
         """
 
+        # Back calculate the R1rho values.
+        self.func(params)
+
         # Scaling.
         if self.scaling_flag:
             params = dot(params, self.scaling_matrix)
 
-        # Unpack the parameter values.
-        R20 = params[:self.end_index[0]]
-        dw = params[self.end_index[0]:self.end_index[1]]
-        pA = params[self.end_index[1]]
-        kex = params[self.end_index[1]+1]
-
-        # Calculate and return the chi-squared value.
-        return self.calc_B14_chi2(R20A=R20, R20B=R20, dw=dw, pA=pA, kex=kex)
+        # The kex parameter.
+        kex = params[self.end_index[2]]
 
+        # The partial derivatives.
+        dr1, dr1rho_prime, dphi_ex, dkex = dr1rho_DPL94(r1rho_prime=self.r1rho_prime_struct, phi_ex=self.phi_ex_struct, kex=kex, theta=self.tilt_angles, R1=self.r1_struct, spin_lock_fields2=self.spin_lock_omega1_squared)
+        dphi_ex_dkex, dkex2 = d2r1rho_DPL94(r1rho_prime=self.r1rho_prime_struct, phi_ex=self.phi_ex_struct, kex=kex, theta=self.tilt_angles, R1=self.r1_struct, spin_lock_fields2=self.spin_lock_omega1_squared)
 
-    def func_B14_full(self, params):
-        """Target function for the Baldwin (2014) 2-site exact solution model for all time scales.
+        # Return the Hessian.
+        return self.calc_d2chi2(dback_calc=[dr1, dr1rho_prime, dphi_ex*self.frqs_squared, dkex], d2back_calc={(2, 3): dphi_ex_dkex*self.frqs_squared, (3, 3): dkex2}, param_types=['efm', 'efm', 'spin', 'global'])
 
-        This assumes that pA > pB, and hence this must be implemented as a constraint.
 
+    def d2func_LM63(self, params):
+        """Target function Hessian for the Luz and Meiboom (1963) fast 2-site exchange model.
 
         @param params:  The vector of parameter values.
         @type params:   numpy rank-1 float array
-        @return:        The chi-squared value.
-        @rtype:         float
+        @return:        The chi-squared Hessian.
+        @rtype:         numpy rank-2 float array
         """
 
+        # Back calculate the R2eff values.
+        self.func(params)
+
         # Scaling.
         if self.scaling_flag:
             params = dot(params, self.scaling_matrix)
 
-        # Unpack the parameter values.
-        R20 = params[:self.end_index[1]].reshape(self.NS*2, self.NM)
-        R20A = R20[::2].flatten()
-        R20B = R20[1::2].flatten()
-        dw = params[self.end_index[1]:self.end_index[2]]
-        pA = params[self.end_index[2]]
-        kex = params[self.end_index[2]+1]
-
-        # Calculate and return the chi-squared value.
-        return self.calc_B14_chi2(R20A=R20A, R20B=R20B, dw=dw, pA=pA, kex=kex)
+        # The kex parameter.
+        kex = params[self.end_index[1]]
 
+        # The partial derivatives.
+        dr20, dphi_ex, dkex = dr2eff_LM63(r20=self.r20_struct, phi_ex=self.phi_ex_struct, kex=kex, cpmg_frqs=self.cpmg_frqs)
+        dphi_ex_dkex, dkex2 = d2r2eff_LM63(r20=self.r20_struct, phi_ex=self.phi_ex_struct, kex=kex, cpmg_frqs=self.cpmg_frqs)
 
-    def func_CR72(self, params):
-        """Target function for the reduced Carver and Richards (1972) 2-site exchange model on all time scales.
+        # Return the Hessian.
+        return self.calc_d2chi2(dback_calc=[dr20, dphi_ex*self.frqs_squared, dkex], d2back_calc={(1, 2): dphi_ex_dkex*self.frqs_squared, (2, 2): dkex2}, param_types=['efm', 'spin', 'global'])
 
-        This assumes that pA > pB, and hence this must be implemented as a constraint.  For this model, the simplification R20A = R20B is assumed.
 
+    def d2func_M61(self, params):
+        """Target function Hessian for the Meiboom (1961) fast 2-site exchange model for R1rho-type experiments.
 
         @param params:  The vector of parameter values.
         @type params:   numpy rank-1 float array
-        @return:        The chi-squared value.
-        @rtype:         float
+        @return:        The chi-squared Hessian.
+        @rtype:         numpy rank-2 float array
         """
 
+        # Back calculate the R1rho values.
+        self.func(params)
+
         # Scaling.
         if self.scaling_flag:
             params = dot(params, self.scaling_matrix)
 
-        # Unpack the parameter values.
-        R20 = params[:self.end_index[0]]
-        dw = params[self.end_index[0]:self.end_index[1]]
-        pA = params[self.end_index[1]]
-        kex = params[self.end_index[1]+1]
-
-        # Calculate and return the chi-squared value.
-        return self.calc_CR72_chi2(R20A=R20, R20B=R20, dw=dw, pA=pA, kex=kex)
+        # The kex parameter.
+        kex = params[self.end_index[1]]
 
+        # The partial derivatives.
+        dr1rho_prime, dphi_ex, dkex = dr1rho_M61(r1rho_prime=self.r20_struct, phi_ex=self.phi_ex_struct, kex=kex, spin_lock_fields2=self.spin_lock_omega1_squared)
+        dphi_ex_dkex, dkex2 = d2r1rho_M61(r1rho_prime=self.r20_struct, phi_ex=self.phi_ex_struct, kex=kex, spin_lock_fields2=self.spin_lock_omega1_squared)
 
-    def func_CR72_full(self, params):
-        """Target function for the full Carver and Richards (1972) 2-site exchange model on all time scales.
+        # Return the Hessian.
+        return self.calc_d2chi2(dback_calc=[dr1rho_prime, dphi_ex*self.frqs_squared, dkex], d2back_calc={(1, 2): dphi_ex_dkex*self.frqs_squared, (2, 2): dkex2}, param_types=['efm', 'spin', 'global'])
 
-        This assumes that pA > pB, and hence this must be implemented as a constraint.
 
+    def d2func_TSMFK01(self, params):
+        """Target function Hessian for the Tollinger et al. (2001) 2-site very-slow exchange model, range of microsecond to second time scale.
 
         @param params:  The vector of parameter values.
         @type params:   numpy rank-1 float array
-        @return:        The chi-squared value.
-        @rtype:         float
+        @return:        The chi-squared Hessian.
+        @rtype:         numpy rank-2 float array
         """
 
+        # Back calculate the R2eff values.
+        self.func(params)
+
         # Scaling.
         if self.scaling_flag:
             params = dot(params, self.scaling_matrix)
 
-        # Unpack the parameter values.
-        R20 = params[:self.end_index[1]].reshape(self.NS*2, self.NM)
-        R20A = R20[::2].flatten()
-        R20B = R20[1::2].flatten()
-        dw = params[self.end_index[1]:self.end_index[2]]
-        pA = params[self.end_index[2]]
-        kex = params[self.end_index[2]+1]
+        # The k_AB parameter.
+        k_AB = params[self.end_index[1]]
 
-        # Calculate and return the chi-squared value.
-        return self.calc_CR72_chi2(R20A=R20A, R20B=R20B, dw=dw, pA=pA, kex=kex)
+        # The partial derivatives.
+        dr20a, ddw, dk_AB = dr2eff_TSMFK01(r20a=self.r20a_struct, dw=self.dw_struct, k_AB=k_AB, tcp=self.tau_cpmg)
+        ddw2, ddw_dk_AB = d2r2eff_TSMFK01(r20a=self.r20a_struct, dw=self.dw_struct, k_AB=k_AB, tcp=self.tau_cpmg)
 
+        # Return the Hessian.
+        return self.calc_d2chi2(dback_calc=[dr20a, ddw*self.frqs, dk_AB], d2back_calc={(1, 1): ddw2*self.frqs**2, (1, 2): ddw_dk_AB*self.frqs}, param_types=['efm', 'spin', 'global'])
 
-    def func_DPL94(self, params):
-        """Target function for the Davis, Perlman and London (1994) fast 2-site off-resonance exchange model for R1rho-type experiments.
+
+    def dfunc_B14(self, params):
+        """Target function gradient for the Baldwin (2014) 2-site exact solution model for all time scales, whereby the simplification R20A = R20B is assumed.
 
         @param params:  The vector of parameter values.
         @type params:   numpy rank-1 float array
-        @return:        The chi-squared value.
-        @rtype:         float
+        @return:        The chi-squared gradient.
+        @rtype:         numpy rank-1 float array
         """
 
+        # Back calculate the R2eff values.
+        self.func(params)
+
         # Scaling.
         if self.scaling_flag:
             params = dot(params, self.scaling_matrix)
 
-        # Unpack the parameter values.
-        r1rho_prime = params[:self.end_index[0]]
-        phi_ex = params[self.end_index[0]:self.end_index[1]]
-        kex = params[self.end_index[1]]
+        # The global parameters.
+        pA = params[self.end_index[1]]
+        kex = params[self.end_index[1]+1]
 
-        # Calculate and return the chi-squared value.
-        return self.calc_DPL94(R1=self.r1, r1rho_prime=r1rho_prime, phi_ex=phi_ex, kex=kex)
+        # The partial derivatives.
+        dr20a, dr20b, ddw, dpA, dkex = dr2eff_B14(r20a=self.r20a_struct, r20b=self.r20b_struct, pA=pA, dw=self.dw_struct, kex=kex, ncyc=self.power, inv_tcpmg=self.inv_relax_times, tcp=self.tau_cpmg)
 
+        # Return the gradient.
+        return self.calc_dchi2(dback_calc=[dr20a+dr20b, ddw*self.frqs, dpA, dkex], param_types=['efm', 'spin', 'global', 'global'])
 
-    def func_DPL94_fit_r1(self, params):
-        """Target function for the Davis, Perlman and London (1994) fast 2-site off-resonance exchange model for R1rho-type experiments, whereby R1 is fitted.
+
+    def dfunc_B14_full(self, params):
+        """Target function gradient for the Baldwin (2014) 2-site exact solution model for all time scales.
 
         @param params:  The vector of parameter values.
         @type params:   numpy rank-1 float array
-        @return:        The chi-squared value.
-        @rtype:         float
+        @return:        The chi-squared gradient.
+        @rtype:         numpy rank-1 float array
         """
 
+        # Back calculate the R2eff values.
+        self.func(params)
+
         # Scaling.
         if self.scaling_flag:
             params = dot(params, self.scaling_matrix)
 
-        # Unpack the parameter values.
-        r1 = params[:self.end_index[0]]
-        r1rho_prime = params[self.end_index[0]:self.end_index[1]]
-        phi_ex = params[self.end_index[1]:self.end_index[2]]
-        kex = params[self.end_index[2]]
+        # The global parameters.
+        pA = params[self.end_index[2]]
+        kex = params[self.end_index[2]+1]
 
-        # Reshape R1 to per experiment, spin and frequency.
-        self.r1_struct[:] = multiply.outer( r1.reshape(self.NE, self.NS, self.NM), self.no_nd_ones )
+        # The partial derivatives.
+        dr20a, dr20b, ddw, dpA, dkex = dr2eff_B14(r20a=self.r20a_struct, r20b=self.r20b_struct, pA=pA, dw=self.dw_struct, kex=kex, ncyc=self.power, inv_tcpmg=self.inv_relax_times, tcp=self.tau_cpmg)
 
-        # Calculate and return the chi-squared value.
-        return self.calc_DPL94(R1=self.r1_struct, r1rho_prime=r1rho_prime, phi_ex=phi_ex, kex=kex)
+        # Return the gradient.
+        return self.calc_dchi2(dback_calc=[(dr20a, dr20b), ddw*self.frqs, dpA, dkex], param_types=['r20ab', 'spin', 'global', 'global'])
 
 
-    def func_IT99(self, params):
-        """Target function for the Ishima and Torchia (1999) 2-site model for all timescales with pA >> pB.
+    def dfunc_CR72(self, params):
+        """Target function gradient for the reduced Carver and Richards (1972) 2-site exchange model on all time scales.
 
         @param params:  The vector of parameter values.
         @type params:   numpy rank-1 float array
-        @return:        The chi-squared value.
-        @rtype:         float
+        @return:        The chi-squared gradient.
+        @rtype:         numpy rank-1 float array
         """
 
+        # Back calculate the R2eff values.
+        self.func(params)
+
         # Scaling.
         if self.scaling_flag:
             params = dot(params, self.scaling_matrix)
 
-        # Unpack the parameter values.
-        R20 = params[:self.end_index[0]]
-        dw = params[self.end_index[0]:self.end_index[1]]
+        # The global parameters.
         pA = params[self.end_index[1]]
-        tex = params[self.end_index[1]+1]
+        kex = params[self.end_index[1]+1]
 
-        # Convert dw from ppm to rad/s. Use the out argument, to pass directly to structure.
-        multiply( multiply.outer( dw.reshape(1, self.NS), self.nm_no_nd_ones ), self.frqs, out=self.dw_struct )
+        # The partial derivatives.
+        dr20a, dr20b, ddw, dpA, dkex = dr2eff_CR72(r20a=self.r20a_struct, r20b=self.r20b_struct, pA=pA, dw=self.dw_struct, kex=kex, cpmg_frqs=self.cpmg_frqs)
 
-        # Reshape R20 to per experiment, spin and frequency.
-        self.r20_struct[:] = multiply.outer( R20.reshape(self.NE, self.NS, self.NM), self.no_nd_ones )
+        # Return the gradient.
+        return self.calc_dchi2(dback_calc=[dr20a+dr20b, ddw*self.frqs, dpA, dkex], param_types=['efm', 'spin', 'global', 'global'])
+
+
+    def dfunc_CR72_full(self, params):
+        """Target function gradient for the full Carver and Richards (1972) 2-site exchange model on all time scales.
+
+        @param params:  The vector of parameter values.
+        @type params:   numpy rank-1 float array
+        @return:        The chi-squared gradient.
+        @rtype:         numpy rank-1 float array
+        """
 
         # Back calculate the R2eff values.
-        r2eff_IT99(r20=self.r20_struct, pA=pA, dw=self.dw_struct, dw_orig=dw, tex=tex, cpmg_frqs=self.cpmg_frqs, back_calc=self.back_calc)
+        self.func(params)
 
-        # Clean the data for all values, which is left over at the end of arrays.
-        self.back_calc = self.back_calc*self.disp_struct
+        # Scaling.
+        if self.scaling_flag:
+            params = dot(params, self.scaling_matrix)
 
-        # For all missing data points, set the back-calculated value to the measured values so that it has no effect on the chi-squared value.
-        if self.has_missing:
-            # Replace with values.
-            self.back_calc[self.mask_replace_blank.mask] = self.values[self.mask_replace_blank.mask]
+        # The global parameters.
+        pA = params[self.end_index[2]]
+        kex = params[self.end_index[2]+1]
 
-        # Return the total chi-squared value.
-        return chi2_rankN(self.values, self.back_calc, self.errors)
+        # The partial derivatives.
+        dr20a, dr20b, ddw, dpA, dkex = dr2eff_CR72(r20a=self.r20a_struct, r20b=self.r20b_struct, pA=pA, dw=self.dw_struct, kex=kex, cpmg_frqs=self.cpmg_frqs)
 
+        # Return the gradient.
+        return self.calc_dchi2(dback_calc=[(dr20a, dr20b), ddw*self.frqs, dpA, dkex], param_types=['r20ab', 'spin', 'global', 'global'])
 
-    def func_LM63_3site(self, params):
-        """Target function for the Luz and Meiboom (1963) fast 3-site exchange model.
+
+    def dfunc_DPL94(self, params):
+        """Target function gradient for the Davis, Perlman and London (1994) fast 2-site off-resonance exchange model for R1rho-type experiments.
 
         @param params:  The vector of parameter values.
         @type params:   numpy rank-1 float array
-        @return:        The chi-squared value.
-        @rtype:         float
+        @return:        The chi-squared gradient.
+        @rtype:         numpy rank-1 float array
         """
 
+        # Back calculate the R1rho values.
+        self.func(params)
+
         # Scaling.
         if self.scaling_flag:
             params = dot(params, self.scaling_matrix)
 
-        # Unpack the parameter values.
-        R20 = params[:self.end_index[0]]
-        phi_ex_B = params[self.end_index[0]:self.end_index[1]]
-        phi_ex_C = params[self.end_index[1]:self.end_index[2]]
-        kB = params[self.end_index[2]]
-        kC = params[self.end_index[2]+1]
+        # The kex parameter.
+        kex = params[self.end_index[1]]
 
-        # Convert phi_ex (or rex) from ppm^2 to (rad/s)^2.
-        multiply( multiply.outer( phi_ex_B.reshape(1, self.NS), self.nm_no_nd_ones ), self.frqs_squared, out=self.phi_ex_B_struct )
-        multiply( multiply.outer( phi_ex_C.reshape(1, self.NS), self.nm_no_nd_ones ), self.frqs_squared, out=self.phi_ex_C_struct )
+        # The partial derivatives.
+        dr1, dr1rho_prime, dphi_ex, dkex = dr1rho_DPL94(r1rho_prime=self.r1rho_prime_struct, phi_ex=self.phi_ex_struct, kex=kex, theta=self.tilt_angles, R1=self.r1, spin_lock_fields2=self.spin_lock_omega1_squared)
+
+        # Return the gradient.
+        return self.calc_dchi2(dback_calc=[dr1rho_prime, dphi_ex*self.frqs_squared, dkex], param_types=['efm', 'spin', 'global'])
+
+
+    def dfunc_DPL94_fit_r1(self, params):
+        """Target function gradient for the Davis, Perlman and London (1994) fast 2-site off-resonance exchange model for R1rho-type experiments, whereby R1 is fitted.
+
+        @param params:  The vector of parameter values.
+        @type params:   numpy rank-1 float array
+        @return:        The chi-squared gradient.
+        @rtype:         numpy rank-1 float array
+        """
+
+        # Back calculate the R1rho values.
+        self.func(params)
+
+        # Scaling.
+        if self.scaling_flag:
+            params = dot(params, self.scaling_matrix)
+
+        # The kex parameter.
+        kex = params[self.end_index[2]]
+
+        # The partial derivatives.
+        dr1, dr1rho_prime, dphi_ex, dkex = dr1rho_DPL94(r1rho_prime=self.r1rho_prime_struct, phi_ex=self.phi_ex_struct, kex=kex, theta=self.tilt_angles, R1=self.r1_struct, spin_lock_fields2=self.spin_lock_omega1_squared)
+
+        # Return the gradient.
+        return self.calc_dchi2(dback_calc=[dr1, dr1rho_prime, dphi_ex*self.frqs_squared, dkex], param_types=['efm', 'efm', 'spin', 'global'])
+
+
+    def dfunc_LM63(self, params):
+        """Target function gradient for the Luz and Meiboom (1963) fast 2-site exchange model.
+
+        @param params:  The vector of parameter values.
+        @type params:   numpy rank-1 float array
+        @return:        The chi-squared gradient.
+        @rtype:         numpy rank-1 float array
+        """
+
+        # Back calculate the R2eff values.
+        self.func(params)
+
+        # Scaling.
+        if self.scaling_flag:
+            params = dot(params, self.scaling_matrix)
+
+        # The kex parameter.
+        kex = params[self.end_index[1]]
+
+        # The partial derivatives.
+        dr20, dphi_ex, dkex = dr2eff_LM63(r20=self.r20_struct, phi_ex=self.phi_ex_struct, kex=kex, cpmg_frqs=self.cpmg_frqs)
+
+        # Return the gradient.
+        return self.calc_dchi2(dback_calc=[dr20, dphi_ex*self.frqs_squared, dkex], param_types=['efm', 'spin', 'global'])
+
+
+    def dfunc_M61(self, params):
+        """Target function gradient for the Meiboom (1961) fast 2-site exchange model for R1rho-type experiments.
+
+        @param params:  The vector of parameter values.
+        @type params:   numpy rank-1 float array
+        @return:        The chi-squared gradient.
+        @rtype:         numpy rank-1 float array
+        """
+
+        # Back calculate the R1rho values.
+        self.func(params)
+
+        # Scaling.
+        if self.scaling_flag:
+            params = dot(params, self.scaling_matrix)
+
+        # The kex parameter.
+        kex = params[self.end_index[1]]
+
+        # The partial derivatives.
+        dr1rho_prime, dphi_ex, dkex = dr1rho_M61(r1rho_prime=self.r20_struct, phi_ex=self.phi_ex_struct, kex=kex, spin_lock_fields2=self.spin_lock_omega1_squared)
+
+        # Return the gradient.
+        return self.calc_dchi2(dback_calc=[dr1rho_prime, dphi_ex*self.frqs_squared, dkex], param_types=['efm', 'spin', 'global'])
+
+
+    def dfunc_TAP03(self, params):
+        """Target function gradient for the Trott, Abergel and Palmer (2003) R1rho off-resonance 2-site model.
+
+        @param params:  The vector of parameter values.
+        @type params:   numpy rank-1 float array
+        @return:        The chi-squared gradient.
+        @rtype:         numpy rank-1 float array
+        """
+
+        # Back calculate the R1rho values.
+        self.func(params)
+
+        # Scaling.
+        if self.scaling_flag:
+            params = dot(params, self.scaling_matrix)
+
+        # The global parameters.
+        pA = params[self.end_index[1]]
+        kex = params[self.end_index[1]+1]
+
+        # The partial derivatives.
+        dr1, dr1rho_prime, ddw, dpA, dkex = dr1rho_TAP03(r1rho_prime=self.r1rho_prime_struct, omega=self.chemical_shifts, offset=self.offset, pA=pA, dw=self.dw_struct, kex=kex, R1=self.r1, spin_lock_fields=self.spin_lock_omega1, spin_lock_fields2=self.spin_lock_omega1_squared)
+
+        # Return the gradient.
+        return self.calc_dchi2(dback_calc=[dr1rho_prime, ddw*self.frqs, dpA, dkex], param_types=['efm', 'spin', 'global', 'global'])
+
+
+    def dfunc_TAP03_fit_r1(self, params):
+        """Target function gradient for the Trott, Abergel and Palmer (2003) R1rho off-resonance 2-site model, whereby R1 is fitted.
+
+        @param params:  The vector of parameter values.
+        @type params:   numpy rank-1 float array
+        @return:        The chi-squared gradient.
+        @rtype:         numpy rank-1 float array
+        """
+
+        # Back calculate the R1rho values.
+        self.func(params)
+
+        # Scaling.
+        if self.scaling_flag:
+            params = dot(params, self.scaling_matrix)
+
+        # The global parameters.
+        pA = params[self.end_index[2]]
+        kex = params[self.end_index[2]+1]
+
+        # The partial derivatives.
+        dr1, dr1rho_prime, ddw, dpA, dkex = dr1rho_TAP03(r1rho_prime=self.r1rho_prime_struct, omega=self.chemical_shifts, offset=self.offset, pA=pA, dw=self.dw_struct, kex=kex, R1=self.r1_struct, spin_lock_fields=self.spin_lock_omega1, spin_lock_fields2=self.spin_lock_omega1_squared)
+
+        # Return the gradient.
+        return self.calc_dchi2(dback_calc=[dr1, dr1rho_prime, ddw*self.frqs, dpA, dkex], param_types=['efm', 'efm', 'spin', 'global', 'global'])
+
+
+    def dfunc_TP02(self, params):
+        """Target function gradient for the Trott and Palmer (2002) R1rho off-resonance 2-site model.
+
+        @param params:  The vector of parameter values.
+        @type params:   numpy rank-1 float array
+        @return:        The chi-squared gradient.
+        @rtype:         numpy rank-1 float array
+        """
+
+        # Back calculate the R1rho values.
+        self.func(params)
+
+        # Scaling.
+        if self.scaling_flag:
+            params = dot(params, self.scaling_matrix)
+
+        # The global parameters.
+        pA = params[self.end_index[1]]
+        kex = params[self.end_index[1]+1]
+
+        # The partial derivatives.
+        dr1, dr1rho_prime, ddw, dpA, dkex = dr1rho_TP02(r1rho_prime=self.r1rho_prime_struct, omega=self.chemical_shifts, offset=self.offset, pA=pA, dw=self.dw_struct, kex=kex, R1=self.r1, spin_lock_fields=self.spin_lock_omega1, spin_lock_fields2=self.spin_lock_omega1_squared)
+
+        # Return the gradient.
+        return self.calc_dchi2(dback_calc=[dr1rho_prime, ddw*self.frqs, dpA, dkex], param_types=['efm', 'spin', 'global', 'global'])
+
+
+    def dfunc_TP02_fit_r1(self, params):
+        """Target function gradient for the Trott and Palmer (2002) R1rho off-resonance 2-site model, whereby R1 is fitted.
+
+        @param params:  The vector of parameter values.
+        @type params:   numpy rank-1 float array
+        @return:        The chi-squared gradient.
+        @rtype:         numpy rank-1 float array
+        """
+
+        # Back calculate the R1rho values.
+        self.func(params)
+
+        # Scaling.
+        if self.scaling_flag:
+            params = dot(params, self.scaling_matrix)
+
+        # The global parameters.
+        pA = params[self.end_index[2]]
+        kex = params[self.end_index[2]+1]
+
+        # The partial derivatives.
+        dr1, dr1rho_prime, ddw, dpA, dkex = dr1rho_TP02(r1rho_prime=self.r1rho_prime_struct, omega=self.chemical_shifts, offset=self.offset, pA=pA, dw=self.dw_struct, kex=kex, R1=self.r1_struct, spin_lock_fields=self.spin_lock_omega1, spin_lock_fields2=self.spin_lock_omega1_squared)
+
+        # Return the gradient.
+        return self.calc_dchi2(dback_calc=[dr1, dr1rho_prime, ddw*self.frqs, dpA, dkex], param_types=['efm', 'efm', 'spin', 'global', 'global'])
+
+
+    def dfunc_TSMFK01(self, params):
+        """Target function gradient for the Tollinger et al. (2001) 2-site very-slow exchange model, range of microsecond to second time scale.
+
+        @param params:  The vector of parameter values.
+        @type params:   numpy rank-1 float array
+        @return:        The chi-squared gradient.
+        @rtype:         numpy rank-1 float array
+        """
+
+        # Back calculate the R2eff values.
+        self.func(params)
+
+        # Scaling.
+        if self.scaling_flag:
+            params = dot(params, self.scaling_matrix)
+
+        # The k_AB parameter.
+        k_AB = params[self.end_index[1]]
+
+        # The partial derivatives.
+        dr20a, ddw, dk_AB = dr2eff_TSMFK01(r20a=self.r20a_struct, dw=self.dw_struct, k_AB=k_AB, tcp=self.tau_cpmg)
+
+        # Return the gradient.
+        return self.calc_dchi2(dback_calc=[dr20a, ddw*self.frqs, dk_AB], param_types=['efm', 'spin', 'global'])
+
+
+    def experiment_type_setup(self):
+        """Check the experiment types and simplify data structures.
+
+        For the single experiment type models, the first dimension of the values, errors, and missing data structures will be removed to simplify the target functions.
+        """
+
+        # The MMQ combined data type models.
+        if self.model in MODEL_LIST_MMQ:
+            # Alias the r2eff functions.
+            self.r2eff_ns_mmq = []
+
+            # Loop over the experiment types.
+            for ei in range(self.NE):
+                # SQ, DQ and ZQ data types.
+                if self.exp_types[ei] in [EXP_TYPE_CPMG_SQ, EXP_TYPE_CPMG_PROTON_SQ, EXP_TYPE_CPMG_DQ, EXP_TYPE_CPMG_ZQ]:
+                    if self.model == MODEL_NS_MMQ_2SITE:
+                        self.r2eff_ns_mmq.append(r2eff_ns_mmq_2site_sq_dq_zq)
+                    else:
+                        self.r2eff_ns_mmq.append(r2eff_ns_mmq_3site_sq_dq_zq)
+
+                # MQ data types.
+                elif self.exp_types[ei] in [EXP_TYPE_CPMG_MQ, EXP_TYPE_CPMG_PROTON_MQ]:
+                    if self.model == MODEL_NS_MMQ_2SITE:
+                        self.r2eff_ns_mmq.append(r2eff_ns_mmq_2site_mq)
+                    else:
+                        self.r2eff_ns_mmq.append(r2eff_ns_mmq_3site_mq)
+
+        # The single data type models.
+        else:
+            # Check that the data is correct.
+            if self.model != MODEL_NOREX and self.model in MODEL_LIST_CPMG and self.exp_types[0] != EXP_TYPE_CPMG_SQ:
+                raise RelaxError("The '%s' CPMG model is not compatible with the '%s' experiment type." % (self.model, self.exp_types[0]))
+            if self.model != MODEL_NOREX and self.model in MODEL_LIST_R1RHO and self.exp_types[0] != EXP_TYPE_R1RHO:
+                raise RelaxError("The '%s' R1rho model is not compatible with the '%s' experiment type." % (self.model, self.exp_types[0]))
+            if self.model != MODEL_NOREX and self.model in MODEL_LIST_MQ_CPMG and self.exp_types[0] != EXP_TYPE_CPMG_MQ:
+                raise RelaxError("The '%s' CPMG model is not compatible with the '%s' experiment type." % (self.model, self.exp_types[0]))
+
+
+    def func_B14(self, params):
+        """Target function for the Baldwin (2014) 2-site exact solution model for all time scales, whereby the simplification R20A = R20B is assumed.
+
+        This assumes that pA > pB, and hence this must be implemented as a constraint.
+
+
+        @param params:  The vector of parameter values.
+        @type params:   numpy rank-1 float array
+        @return:        The chi-squared value.
+        @rtype:         float
+        """
+
+        # Scaling.
+        if self.scaling_flag:
+            params = dot(params, self.scaling_matrix)
+
+        # Unpack the parameter values.
+        R20 = params[:self.end_index[0]]
+        dw = params[self.end_index[0]:self.end_index[1]]
+        pA = params[self.end_index[1]]
+        kex = params[self.end_index[1]+1]
+
+        # Calculate and return the chi-squared value.
+        return self.calc_B14_chi2(R20A=R20, R20B=R20, dw=dw, pA=pA, kex=kex)
+
+
+    def func_B14_full(self, params):
+        """Target function for the Baldwin (2014) 2-site exact solution model for all time scales.
+
+        This assumes that pA > pB, and hence this must be implemented as a constraint.
+
+
+        @param params:  The vector of parameter values.
+        @type params:   numpy rank-1 float array
+        @return:        The chi-squared value.
+        @rtype:         float
+        """
+
+        # Scaling.
+        if self.scaling_flag:
+            params = dot(params, self.scaling_matrix)
+
+        # Unpack the parameter values.
+        R20 = params[:self.end_index[1]].reshape(self.NS*2, self.NM)
+        R20A = R20[::2].flatten()
+        R20B = R20[1::2].flatten()
+        dw = params[self.end_index[1]:self.end_index[2]]
+        pA = params[self.end_index[2]]
+        kex = params[self.end_index[2]+1]
+
+        # Calculate and return the chi-squared value.
+        return self.calc_B14_chi2(R20A=R20A, R20B=R20B, dw=dw, pA=pA, kex=kex)
+
+
+    def func_CR72(self, params):
+        """Target function for the reduced Carver and Richards (1972) 2-site exchange model on all time scales.
+
+        This assumes that pA > pB, and hence this must be implemented as a constraint.  For this model, the simplification R20A = R20B is assumed.
+
+
+        @param params:  The vector of parameter values.
+        @type params:   numpy rank-1 float array
+        @return:        The chi-squared value.
+        @rtype:         float
+        """
+
+        # Scaling.
+        if self.scaling_flag:
+            params = dot(params, self.scaling_matrix)
+
+        # Unpack the parameter values.
+        R20 = params[:self.end_index[0]]
+        dw = params[self.end_index[0]:self.end_index[1]]
+        pA = params[self.end_index[1]]
+        kex = params[self.end_index[1]+1]
+
+        # Calculate and return the chi-squared value.
+        return self.calc_CR72_chi2(R20A=R20, R20B=R20, dw=dw, pA=pA, kex=kex)
+
+
+    def func_CR72_full(self, params):
+        """Target function for the full Carver and Richards (1972) 2-site exchange model on all time scales.
+
+        This assumes that pA > pB, and hence this must be implemented as a constraint.
+
+
+        @param params:  The vector of parameter values.
+        @type params:   numpy rank-1 float array
+        @return:        The chi-squared value.
+        @rtype:         float
+        """
+
+        # Scaling.
+        if self.scaling_flag:
+            params = dot(params, self.scaling_matrix)
+
+        # Unpack the parameter values.
+        R20 = params[:self.end_index[1]].reshape(self.NS*2, self.NM)
+        R20A = R20[::2].flatten()
+        R20B = R20[1::2].flatten()
+        dw = params[self.end_index[1]:self.end_index[2]]
+        pA = params[self.end_index[2]]
+        kex = params[self.end_index[2]+1]
+
+        # Calculate and return the chi-squared value.
+        return self.calc_CR72_chi2(R20A=R20A, R20B=R20B, dw=dw, pA=pA, kex=kex)
+
+
+    def func_DPL94(self, params):
+        """Target function for the Davis, Perlman and London (1994) fast 2-site off-resonance exchange model for R1rho-type experiments.
+
+        @param params:  The vector of parameter values.
+        @type params:   numpy rank-1 float array
+        @return:        The chi-squared value.
+        @rtype:         float
+        """
+
+        # Scaling.
+        if self.scaling_flag:
+            params = dot(params, self.scaling_matrix)
+
+        # Unpack the parameter values.
+        r1rho_prime = params[:self.end_index[0]]
+        phi_ex = params[self.end_index[0]:self.end_index[1]]
+        kex = params[self.end_index[1]]
+
+        # Calculate and return the chi-squared value.
+        return self.calc_DPL94(R1=self.r1, r1rho_prime=r1rho_prime, phi_ex=phi_ex, kex=kex)
+
+
+    def func_DPL94_fit_r1(self, params):
+        """Target function for the Davis, Perlman and London (1994) fast 2-site off-resonance exchange model for R1rho-type experiments, whereby R1 is fitted.
+
+        @param params:  The vector of parameter values.
+        @type params:   numpy rank-1 float array
+        @return:        The chi-squared value.
+        @rtype:         float
+        """
+
+        # Scaling.
+        if self.scaling_flag:
+            params = dot(params, self.scaling_matrix)
+
+        # Unpack the parameter values.
+        r1 = params[:self.end_index[0]]
+        r1rho_prime = params[self.end_index[0]:self.end_index[1]]
+        phi_ex = params[self.end_index[1]:self.end_index[2]]
+        kex = params[self.end_index[2]]
+
+        # Reshape R1 to per experiment, spin and frequency.
+        self.r1_struct[:] = multiply.outer( r1.reshape(self.NE, self.NS, self.NM), self.no_nd_ones )
+
+        # Calculate and return the chi-squared value.
+        return self.calc_DPL94(R1=self.r1_struct, r1rho_prime=r1rho_prime, phi_ex=phi_ex, kex=kex)
+
+
+    def func_IT99(self, params):
+        """Target function for the Ishima and Torchia (1999) 2-site model for all timescales with pA >> pB.
+
+        @param params:  The vector of parameter values.
+        @type params:   numpy rank-1 float array
+        @return:        The chi-squared value.
+        @rtype:         float
+        """
+
+        # Scaling.
+        if self.scaling_flag:
+            params = dot(params, self.scaling_matrix)
+
+        # Unpack the parameter values.
+        R20 = params[:self.end_index[0]]
+        dw = params[self.end_index[0]:self.end_index[1]]
+        pA = params[self.end_index[1]]
+        tex = params[self.end_index[1]+1]
+
+        # Convert dw from ppm to rad/s. Use the out argument, to pass directly to structure.
+        multiply( multiply.outer( dw.reshape(1, self.NS), self.nm_no_nd_ones ), self.frqs, out=self.dw_struct )
+
+        # Reshape R20 to per experiment, spin and frequency.
+        self.r20_struct[:] = multiply.outer( R20.reshape(self.NE, self.NS, self.NM), self.no_nd_ones )
+
+        # Back calculate the R2eff values.
+        r2eff_IT99(r20=self.r20_struct, pA=pA, dw=self.dw_struct, dw_orig=dw, tex=tex, cpmg_frqs=self.cpmg_frqs, back_calc=self.back_calc)
+
+        # Clean the data for all values, which is left over at the end of arrays.
+        self.back_calc = self.back_calc*self.disp_struct
+
+        # For all missing data points, set the back-calculated value to the measured values so that it has no effect on the chi-squared value.
+        if self.has_missing:
+            # Replace with values.
+            self.back_calc[self.mask_replace_blank.mask] = self.values[self.mask_replace_blank.mask]
+
+        # Return the total chi-squared value.
+        return chi2_rankN(self.values, self.back_calc, self.errors)
+
+
+    def func_LM63_3site(self, params):
+        """Target function for the Luz and Meiboom (1963) fast 3-site exchange model.
+
+        @param params:  The vector of parameter values.
+        @type params:   numpy rank-1 float array
+        @return:        The chi-squared value.
+        @rtype:         float
+        """
+
+        # Scaling.
+        if self.scaling_flag:
+            params = dot(params, self.scaling_matrix)
+
+        # Unpack the parameter values.
+        R20 = params[:self.end_index[0]]
+        phi_ex_B = params[self.end_index[0]:self.end_index[1]]
+        phi_ex_C = params[self.end_index[1]:self.end_index[2]]
+        kB = params[self.end_index[2]]
+        kC = params[self.end_index[2]+1]
+
+        # Convert phi_ex (or rex) from ppm^2 to (rad/s)^2.
+        multiply( multiply.outer( phi_ex_B.reshape(1, self.NS), self.nm_no_nd_ones ), self.frqs_squared, out=self.phi_ex_B_struct )
+        multiply( multiply.outer( phi_ex_C.reshape(1, self.NS), self.nm_no_nd_ones ), self.frqs_squared, out=self.phi_ex_C_struct )
 
         # Reshape R20 to per experiment, spin and frequency.
         self.r20_struct[:] = multiply.outer( R20.reshape(self.NE, self.NS, self.NM), self.no_nd_ones )
@@ -2169,6 +2842,349 @@ class Dispersion:
         return chi2_rankN(self.values, self.back_calc, self.errors)
 
 
+    def func_grid(self, points):
+        """Target function for the vectorised grid search, returning the chi-squared values for a block of grid points.
+
+        The grid points are evaluated in chunks of self.grid_chunk points to cap the memory usage.  For the models without a vectorised implementation, the target function is called for each grid point.
+
+
+        @param points:  The parameter vectors of all grid points.
+        @type points:   numpy rank-2 float array
+        @return:        The chi-squared value for each grid point.
+        @rtype:         numpy rank-1 float array
+        """
+
+        # Initialise.
+        chi2 = zeros(len(points), float64)
+
+        # No vectorised implementation.
+        if self.grid_func is None:
+            for i in range(len(points)):
+                chi2[i] = self.func(points[i])
+            return chi2
+
+        # Scaling.
+        if self.scaling_flag:
+            points = dot(points, self.scaling_matrix)
+
+        # Loop over the chunks.
+        for i in range(0, len(points), self.grid_chunk):
+            chi2[i:i+self.grid_chunk] = self.grid_func(points[i:i+self.grid_chunk])
+
+        # Return the chi-squared values.
+        return chi2
+
+
+    def grid_B14(self, points):
+        """The vectorised grid search function for the Baldwin (2014) 2-site exact solution model for all time scales, whereby the simplification R20A = R20B is assumed.
+
+        @param points:  The scaled parameter vectors of the chunk of grid points.
+        @type points:   numpy rank-2 float array
+        @return:        The chi-squared value for each grid point.
+        @rtype:         numpy rank-1 float array
+        """
+
+        # Unpack the parameter values.
+        R20 = points[:, :self.end_index[0]]
+        dw = points[:, self.end_index[0]:self.end_index[1]]
+        pA = points[:, self.end_index[1]]
+        kex = points[:, self.end_index[1]+1]
+
+        # Calculate and return the chi-squared values.
+        return self.grid_B14_chi2(R20A=R20, R20B=R20, dw=dw, pA=pA, kex=kex)
+
+
+    def grid_B14_chi2(self, R20A=None, R20B=None, dw=None, pA=None, kex=None):
+        """Calculate the chi-squared values of the Baldwin (2014) 2-site exact solution model for a chunk of grid points.
+
+        @keyword R20A:  The R2 value for state A in the absence of exchange for each grid point.
+        @type R20A:     numpy rank-2 float array
+        @keyword R20B:  The R2 value for state B in the absence of exchange for each grid point.
+        @type R20B:     numpy rank-2 float array
+        @keyword dw:    The chemical shift differences in ppm for each grid point and spin.
+        @type dw:       numpy rank-2 float array
+        @keyword pA:    The population of state A for each grid point.
+        @type pA:       numpy rank-1 float array
+        @keyword kex:   The rate of exchange for each grid point.
+        @type kex:      numpy rank-1 float array
+        @return:        The chi-squared value for each grid point.
+        @rtype:         numpy rank-1 float array
+        """
+
+        # The grid point structures.
+        dw_struct, r20a_struct, r20b_struct, back_calc = self.grid_structures(dw=dw, R20A=R20A, R20B=R20B)
+
+        # Back calculate the R2eff values.
+        r2eff_B14(r20a=r20a_struct, r20b=r20b_struct, pA=self.grid_struct(pA), dw=dw_struct, dw_orig=dw, kex=self.grid_struct(kex), ncyc=self.power, inv_tcpmg=self.inv_relax_times, tcp=self.tau_cpmg, back_calc=back_calc)
+
+        # Return the chi-squared values.
+        return self.calc_grid_chi2(back_calc=back_calc)
+
+
+    def grid_B14_full(self, points):
+        """The vectorised grid search function for the Baldwin (2014) 2-site exact solution model for all time scales.
+
+        @param points:  The scaled parameter vectors of the chunk of grid points.
+        @type points:   numpy rank-2 float array
+        @return:        The chi-squared value for each grid point.
+        @rtype:         numpy rank-1 float array
+        """
+
+        # Unpack the parameter values.
+        R20 = points[:, :self.end_index[1]].reshape(len(points), self.NS*2, self.NM)
+        R20A = R20[:, ::2].reshape(len(points), -1)
+        R20B = R20[:, 1::2].reshape(len(points), -1)
+        dw = points[:, self.end_index[1]:self.end_index[2]]
+        pA = points[:, self.end_index[2]]
+        kex = points[:, self.end_index[2]+1]
+
+        # Calculate and return the chi-squared values.
+        return self.grid_B14_chi2(R20A=R20A, R20B=R20B, dw=dw, pA=pA, kex=kex)
+
+
+    def grid_CR72(self, points):
+        """The vectorised grid search function for the reduced Carver and Richards (1972) 2-site exchange model on all time scales.
+
+        @param points:  The scaled parameter vectors of the chunk of grid points.
+        @type points:   numpy rank-2 float array
+        @return:        The chi-squared value for each grid point.
+        @rtype:         numpy rank-1 float array
+        """
+
+        # Unpack the parameter values.
+        R20 = points[:, :self.end_index[0]]
+        dw = points[:, self.end_index[0]:self.end_index[1]]
+        pA = points[:, self.end_index[1]]
+        kex = points[:, self.end_index[1]+1]
+
+        # Calculate and return the chi-squared values.
+        return self.grid_CR72_chi2(R20A=R20, R20B=R20, dw=dw, pA=pA, kex=kex)
+
+
+    def grid_CR72_chi2(self, R20A=None, R20B=None, dw=None, pA=None, kex=None):
+        """Calculate the chi-squared values of the Carver and Richards (1972) 2-site exchange model for a chunk of grid points.
+
+        @keyword R20A:  The R2 value for state A in the absence of exchange for each grid point.
+        @type R20A:     numpy rank-2 float array
+        @keyword R20B:  The R2 value for state B in the absence of exchange for each grid point.
+        @type R20B:     numpy rank-2 float array
+        @keyword dw:    The chemical shift differences in ppm for each grid point and spin.
+        @type dw:       numpy rank-2 float array
+        @keyword pA:    The population of state A for each grid point.
+        @type pA:       numpy rank-1 float array
+        @keyword kex:   The rate of exchange for each grid point.
+        @type kex:      numpy rank-1 float array
+        @return:        The chi-squared value for each grid point.
+        @rtype:         numpy rank-1 float array
+        """
+
+        # The grid point structures.
+        dw_struct, r20a_struct, r20b_struct, back_calc = self.grid_structures(dw=dw, R20A=R20A, R20B=R20B)
+
+        # Back calculate the R2eff values.
+        r2eff_CR72(r20a=r20a_struct, r20a_orig=R20A, r20b=r20b_struct, r20b_orig=R20B, pA=self.grid_struct(pA), dw=dw_struct, dw_orig=dw, kex=self.grid_struct(kex), cpmg_frqs=self.cpmg_frqs, back_calc=back_calc)
+
+        # Return the chi-squared values.
+        return self.calc_grid_chi2(back_calc=back_calc)
+
+
+    def grid_CR72_full(self, points):
+        """The vectorised grid search function for the full Carver and Richards (1972) 2-site exchange model on all time scales.
+
+        @param points:  The scaled parameter vectors of the chunk of grid points.
+        @type points:   numpy rank-2 float array
+        @return:        The chi-squared value for each grid point.
+        @rtype:         numpy rank-1 float array
+        """
+
+        # Unpack the parameter values.
+        R20 = points[:, :self.end_index[1]].reshape(len(points), self.NS*2, self.NM)
+        R20A = R20[:, ::2].reshape(len(points), -1)
+        R20B = R20[:, 1::2].reshape(len(points), -1)
+        dw = points[:, self.end_index[1]:self.end_index[2]]
+        pA = points[:, self.end_index[2]]
+        kex = points[:, self.end_index[2]+1]
+
+        # Calculate and return the chi-squared values.
+        return self.grid_CR72_chi2(R20A=R20A, R20B=R20B, dw=dw, pA=pA, kex=kex)
+
+
+    def grid_LM63(self, points):
+        """The vectorised grid search function for the Luz and Meiboom (1963) fast 2-site exchange model.
+
+        @param points:  The scaled parameter vectors of the chunk of grid points.
+        @type points:   numpy rank-2 float array
+        @return:        The chi-squared value for each grid point.
+        @rtype:         numpy rank-1 float array
+        """
+
+        # Unpack the parameter values.
+        R20 = points[:, :self.end_index[0]]
+        phi_ex = points[:, self.end_index[0]:self.end_index[1]]
+        kex = points[:, self.end_index[1]]
+
+        # Convert phi_ex from ppm^2 to (rad/s)^2, and reshape R20 to per grid point, experiment, spin and frequency.
+        phi_ex_struct, r20_struct, back_calc = self.grid_structures(dw=phi_ex, R20A=R20, frqs=self.frqs_squared)
+
+        # Back calculate the R2eff values.
+        r2eff_LM63(r20=r20_struct, phi_ex=phi_ex_struct, kex=self.grid_struct(kex), cpmg_frqs=self.cpmg_frqs, back_calc=back_calc)
+
+        # Return the chi-squared values.
+        return self.calc_grid_chi2(back_calc=back_calc)
+
+
+    def grid_struct(self, param):
+        """Convert a global parameter into the [NG][1][1][1][1][1] structure of the vectorised grid search.
+
+        @param param:   The parameter value for each grid point.
+        @type param:    numpy rank-1 float array
+        @return:        The parameter structure, broadcastable to the [NG][NE][NS][NM][NO][ND] dimensions.
+        @rtype:         numpy float array of rank [NG][1][1][1][1][1]
+        """
+
+        # Reshape and return.
+        return param.reshape(len(param), 1, 1, 1, 1, 1)
+
+
+    def grid_structures(self, dw=None, R20A=None, R20B=None, frqs=None):
+        """Create the [NG][NE][NS][NM][NO][ND] structures of the vectorised grid search.
+
+        @keyword dw:    The spin specific chemical shift differences in ppm (or phi_ex values in ppm^2) for each grid point.
+        @type dw:       numpy rank-2 float array
+        @keyword R20A:  The R2 value for state A in the absence of exchange for each grid point.
+        @type R20A:     numpy rank-2 float array
+        @keyword R20B:  The R2 value for state B in the absence of exchange for each grid point.  If not supplied, this structure will not be returned.
+        @type R20B:     None or numpy rank-2 float array
+        @keyword frqs:  The frequency structure used to convert dw.  This defaults to self.frqs.
+        @type frqs:     None or numpy float array of rank [NE][NS][NM][NO][ND]
+        @return:        The dw, R20A and, if R20B is given, R20B structures and the empty back-calculated R2eff structure.
+        @rtype:         tuple of numpy float arrays of rank [NG][NE][NS][NM][NO][ND]
+        """
+
+        # Defaults.
+        if frqs is None:
+            frqs = self.frqs
+
+        # The number of grid points.
+        NG = len(dw)
+
+        # Convert dw from ppm to rad/s.
+        dw_struct = multiply( multiply.outer( dw.reshape(NG, 1, self.NS), self.nm_no_nd_ones ), frqs )
+
+        # Reshape R20A and R20B to per grid point, experiment, spin and frequency.
+        structs = [dw_struct, multiply.outer( R20A.reshape(NG, self.NE, self.NS, self.NM), self.no_nd_ones )]
+        if R20B is not None:
+            structs.append(multiply.outer( R20B.reshape(NG, self.NE, self.NS, self.NM), self.no_nd_ones ))
+
+        # The back-calculated R2eff structure.
+        structs.append(zeros(dw_struct.shape, float64))
+
+        # Return the structures.
+        return tuple(structs)
+
+
+    def grid_TSMFK01(self, points):
+        """The vectorised grid search function for the Tollinger et al. (2001) 2-site very-slow exchange model.
+
+        @param points:  The scaled parameter vectors of the chunk of grid points.
+        @type points:   numpy rank-2 float array
+        @return:        The chi-squared value for each grid point.
+        @rtype:         numpy rank-1 float array
+        """
+
+        # Unpack the parameter values.
+        R20A = points[:, :self.end_index[0]]
+        dw = points[:, self.end_index[0]:self.end_index[1]]
+        k_AB = points[:, self.end_index[1]]
+
+        # The grid point structures.
+        dw_struct, r20a_struct, back_calc = self.grid_structures(dw=dw, R20A=R20A)
+
+        # Back calculate the R2eff values.
+        r2eff_TSMFK01(r20a=r20a_struct, dw=dw_struct, dw_orig=dw, k_AB=self.grid_struct(k_AB), tcp=self.tau_cpmg, back_calc=back_calc)
+
+        # Return the chi-squared values.
+        return self.calc_grid_chi2(back_calc=back_calc)
+
+
+    def dfunc_r20_profile(self, params):
+        """Target function gradient for the optimisation with the R20 parameters profiled out.
+
+        As the R20 parameters are at their optimal values for the given parameters, the gradient is simply the gradient of the full model with respect to the remaining parameters.
+
+
+        @param params:  The vector of parameter values, excluding the R20 parameters.
+        @type params:   numpy rank-1 float array
+        @return:        The chi-squared gradient.
+        @rtype:         numpy rank-1 float array
+        """
+
+        # The full parameter vector.
+        full_params = self.r20_profile_params(params)
+
+        # Return the gradient for the remaining parameters.
+        return self.dfunc(full_params)[self.end_index[0]:]
+
+
+    def func_r20_profile(self, params):
+        """Target function for the optimisation with the R20 parameters profiled out (variable projection).
+
+        This is only valid for the models of the MODEL_LIST_R20_PROFILE list, without R1 optimisation.  For these, the R20 parameters of each experiment, spin and field strength enter the back-calculated values linearly, so that their optimal values can be found by weighted linear least squares for each set of the remaining parameters.
+
+
+        @param params:  The vector of parameter values, excluding the R20 parameters.
+        @type params:   numpy rank-1 float array
+        @return:        The chi-squared value.
+        @rtype:         float
+        """
+
+        # Profile out the R20 parameters, updating the back-calculated values.
+        self.r20_profile_params(params)
+
+        # Return the total chi-squared value.
+        return chi2_rankN(self.values, self.back_calc, self.errors)
+
+
+    def func_sims(self, points, values):
+        """Target function for the Monte Carlo simulations, returning the chi-squared value of each parameter vector against its own R2eff/R1rho data.
+
+        The points are evaluated in chunks of self.grid_chunk points using the vectorised grid search functions.  For the models without a vectorised implementation, the target function is called for each point.
+
+
+        @param points:  The parameter vectors.
+        @type points:   numpy rank-2 float array
+        @param values:  The R2eff/R1rho data for each parameter vector, as created by the pack_values() method.
+        @type values:   numpy float array of rank [N][NE][NS][NM][NO][ND]
+        @return:        The chi-squared value for each parameter vector.
+        @rtype:         numpy rank-1 float array
+        """
+
+        # Initialise.
+        chi2 = zeros(len(points), float64)
+
+        # No vectorised implementation, so swap the data for each point.
+        if self.grid_func is None:
+            values_orig = self.values
+            for i in range(len(points)):
+                self.values = values[i]
+                chi2[i] = self.func(points[i])
+            self.values = values_orig
+            return chi2
+
+        # Scaling.
+        if self.scaling_flag:
+            points = dot(points, self.scaling_matrix)
+
+        # Loop over the chunks.
+        for i in range(0, len(points), self.grid_chunk):
+            self.grid_values = values[i:i+self.grid_chunk]
+            chi2[i:i+self.grid_chunk] = self.grid_func(points[i:i+self.grid_chunk])
+        self.grid_values = None
+
+        # Return the chi-squared values.
+        return chi2
+
+
     def get_back_calc(self):
         """Class function to return back_calc as lists of lists.  Number of values in should match number of dispersion points or spin_lock.
 
@@ -2192,3 +3208,306 @@ class Dispersion:
 
         return back_calc_return
 
+
+    def minimise_sims(self, x0, values, A=None, b=None, func_tol=1e-25, max_iterations=10000000):
+        """Nelder-Mead simplex optimisation of all Monte Carlo simulations in lock-step.
+
+        Each simulation has its own simplex and convergence state, and all simulations start from the same parameter vector.  The reflection, expansion, contraction and shrink steps of all active simulations are evaluated together via the func_sims() method, and converged simulations are removed from the active set.  The linear constraints A.x >= b are enforced by assigning an infinite chi-squared value to all infeasible points.
+
+
+        @param x0:                  The scaled starting parameter vector.
+        @type x0:                   numpy rank-1 float array (P)
+        @param values:              The R2eff/R1rho data of each simulation, as created by the pack_values() method.
+        @type values:               numpy float array of rank [N][NE][NS][NM][NO][ND]
+        @keyword A:                 The linear constraint matrix.
+        @type A:                    None or numpy rank-2 float array
+        @keyword b:                 The linear constraint scalar vector.
+        @type b:                    None or numpy rank-1 float array
+        @keyword func_tol:          The function tolerance which, when reached, terminates optimisation of the simulation.
+        @type func_tol:             float
+        @keyword max_iterations:    The maximum number of iterations.
+        @type max_iterations:       int
+        @return:                    The optimised scaled parameters, chi-squared values, iteration counts, function counts and warnings of each simulation.
+        @rtype:                     numpy rank-2 float array (N, P), numpy rank-1 float array (N), numpy rank-1 int array (N), numpy rank-1 int array (N), list of str or None
+        """
+
+        # Initialise.
+        num_sims = len(values)
+        n = len(x0)
+        iter_count = zeros(num_sims, int)
+        f_count = zeros(num_sims, int)
+        warning = [None] * num_sims
+
+        # The initial simplices, with a 5% perturbation of each parameter (or 0.00025 for zero values).
+        simplex = x0 * ones((num_sims, n+1, n), float64)
+        for j in range(n):
+            if x0[j] != 0.0:
+                simplex[:, j+1, j] = 1.05 * x0[j]
+            else:
+                simplex[:, j+1, j] = 0.00025
+
+        # The chi-squared values of the initial simplices.
+        chi2 = self.sims_chi2(simplex.reshape(-1, n), repeat(values, n+1, axis=0), A=A, b=b).reshape(num_sims, n+1)
+        f_count += n + 1
+
+        # Iterate.
+        active = ones(num_sims, bool)
+        for k in range(max_iterations+1):
+            # The active simulations.
+            index = active.nonzero()[0]
+            if not len(index):
+                break
+
+            # Sort the simplex vertices by their chi-squared values.
+            rows = arange(len(index))[:, None]
+            order = argsort(chi2[index], axis=1)
+            s = simplex[index][rows, order]
+            f = chi2[index][rows, order]
+            simplex[index] = s
+            chi2[index] = f
+
+            # Convergence, or no feasible vertex.
+            conv = f[:, -1] - f[:, 0] <= func_tol
+            infeasible = ~isfinite(f[:, 0])
+            for i in index[infeasible]:
+                warning[i] = "Infeasible starting point."
+            active[index[conv | infeasible]] = False
+
+            # The maximum number of iterations has been reached.
+            if k == max_iterations:
+                break
+
+            # Remove the finished simulations.
+            keep = ~(conv | infeasible)
+            index = index[keep]
+            if not len(index):
+                break
+            s = s[keep]
+            f = f[keep]
+            v = values[index]
+            iter_count[index] += 1
+
+            # The centroid of the best vertices and the worst vertex.
+            c = s[:, :-1].mean(axis=1)
+            w = s[:, -1]
+
+            # Reflection.
+            xr = 2.0*c - w
+            fr = self.sims_chi2(xr, v, A=A, b=b)
+            f_count[index] += 1
+
+            # The replacement of the worst vertex (by default the reflected point).
+            x_new = xr.copy()
+            f_new = fr.copy()
+
+            # Expansion.
+            expand = (fr < f[:, 0]).nonzero()[0]
+            if len(expand):
+                xe = 3.0*c[expand] - 2.0*w[expand]
+                fe = self.sims_chi2(xe, v[expand], A=A, b=b)
+                f_count[index[expand]] += 1
+                better = fe < fr[expand]
+                x_new[expand[better]] = xe[better]
+                f_new[expand[better]] = fe[better]
+
+            # Contraction, outside for reflected points better than the worst vertex and inside otherwise.
+            contract = (fr >= f[:, -2]).nonzero()[0]
+            shrink = []
+            if len(contract):
+                outside = fr[contract] < f[contract, -1]
+                xc = c[contract] + 0.5*(w[contract] - c[contract])
+                xc[outside] = c[contract][outside] + 0.5*(xr[contract][outside] - c[contract][outside])
+                fc = self.sims_chi2(xc, v[contract], A=A, b=b)
+                f_count[index[contract]] += 1
+
+                # Accept the contraction or shrink the simplex.
+                accept = fc < f[contract, -1]
+                accept[outside] = fc[outside] <= fr[contract][outside]
+                x_new[contract[accept]] = xc[accept]
+                f_new[contract[accept]] = fc[accept]
+                x_new[contract[~accept]] = w[contract[~accept]]
+                f_new[contract[~accept]] = f[contract[~accept], -1]
+                shrink = contract[~accept]
+
+            # Replace the worst vertices.
+            s[:, -1] = x_new
+            f[:, -1] = f_new
+
+            # Shrink the simplices towards the best vertex.
+            if len(shrink):
+                s[shrink, 1:] = s[shrink, :1] + 0.5*(s[shrink, 1:] - s[shrink, :1])
+                f[shrink, 1:] = self.sims_chi2(s[shrink, 1:].reshape(-1, n), repeat(v[shrink], n, axis=0), A=A, b=b).reshape(len(shrink), n)
+                f_count[index[shrink]] += n
+
+            # Store the updated simplices.
+            simplex[index] = s
+            chi2[index] = f
+
+        # The maximum number of iterations has been reached.
+        for i in active.nonzero()[0]:
+            warning[i] = "Maximum number of iterations reached"
+
+        # The best vertices.
+        best = argmin(chi2, axis=1)
+        sims = arange(num_sims)
+
+        # Return the results.
+        return simplex[sims, best], chi2[sims, best], iter_count, f_count, warning
+
+
+    def pack_values(self, values):
+        """Convert the R2eff/R1rho data of a Monte Carlo simulation into the values structure.
+
+        @param values:  The R2eff/R1rho data, as returned by the return_r2eff_arrays() function.  The dimensions are {Ei, Si, Mi, Oi, Di}.
+        @type values:   rank-4 list of numpy rank-1 float arrays
+        @return:        The data in the same structure as the values of the target function.
+        @rtype:         numpy float array of rank [NE][NS][NM][NO][ND]
+        """
+
+        # Initialise.
+        packed = zeros(self.values.shape, float64)
+
+        # Fill in the data.
+        for ei in range(self.NE):
+            for si in range(self.NS):
+                for mi in range(self.NM):
+                    for oi in range(self.NO):
+                        num = self.num_disp_points[ei, si, mi, oi]
+                        packed[ei, si, mi, oi, :num] = values[ei][si][mi][oi]
+
+        # Return the structure.
+        return packed
+
+
+    def param_block(self, data, param_type_i, param_type_j):
+        """Sum the Hessian terms into the block for two parameter types.
+
+        @param data:            The Hessian terms for each data point.
+        @type data:             numpy float array of rank [NE][NS][NM][NO][ND]
+        @param param_type_i:    The parameter type of the block rows, one of 'efm', 'spin' or 'global'.  This must not come after the column type in this order.
+        @type param_type_i:     str
+        @param param_type_j:    The parameter type of the block columns, one of 'efm', 'spin' or 'global'.
+        @type param_type_j:     str
+        @return:                The Hessian block.
+        @rtype:                 numpy rank-2 float array
+        """
+
+        # Blocks of the same type, which are diagonal for the per experiment, spin and frequency, and per spin parameters.
+        if param_type_i == param_type_j:
+            if param_type_i == 'global':
+                return array([[sum(data)]])
+            return diag(self.param_sum(data, param_type_i))
+
+        # Blocks with the global parameters as columns.
+        if param_type_j == 'global':
+            return self.param_sum(data, param_type_i).reshape(-1, 1)
+
+        # The per experiment, spin and frequency rows and per spin columns, which are only non-zero for the same spin.
+        return einsum('esm,st->esmt', sum(data, axis=(3, 4)), eye(self.NS)).reshape(-1, self.NS)
+
+
+    def param_sum(self, data, param_type):
+        """Sum the gradient terms over all data points of each parameter.
+
+        @param data:        The gradient terms for each data point.
+        @type data:         numpy float array of rank [NE][NS][NM][NO][ND]
+        @param param_type:  The parameter type, one of 'efm' for the parameters per experiment, spin and frequency, 'spin' for the per spin parameters, or 'global' for the cluster parameters.
+        @type param_type:   str
+        @return:            The sums for each parameter.
+        @rtype:             numpy rank-1 float array
+        """
+
+        # The per experiment, spin and frequency parameters.
+        if param_type == 'efm':
+            return sum(data, axis=(3, 4)).flatten()
+
+        # The per spin parameters.
+        if param_type == 'spin':
+            return sum(data, axis=(0, 2, 3, 4))
+
+        # The global parameters.
+        return array([sum(data)])
+
+
+    def r20_profile_params(self, params):
+        """Find the optimal R20 parameters for the given parameters, returning the full parameter vector.
+
+        The back-calculated values are updated to those of the full parameter vector.
+
+
+        @param params:  The vector of parameter values, excluding the R20 parameters.
+        @type params:   numpy rank-1 float array
+        @return:        The full vector of parameter values, with the optimal R20 values.
+        @rtype:         numpy rank-1 float array
+        """
+
+        # The number of R20 parameters.
+        num = self.end_index[0]
+
+        # The back-calculated values without the R20 contribution.
+        full_params = concatenate([zeros(num, float64), params])
+        self.func(full_params)
+        back_calc_r20_zero = self.back_calc.copy()
+
+        # The coefficients of the R20 parameters for the data points contributing to the chi-squared value.
+        if self.r20_coeff is None or not self.r20_coeff_fixed:
+            full_params[:num] = 1.0
+            if self.scaling_flag:
+                full_params[:num] = 1.0 / diag(self.scaling_matrix)[:num]
+            self.func(full_params)
+            self.r20_coeff = (self.back_calc - back_calc_r20_zero) * self.deriv_mask
+
+        # The weighted linear least squares solution for each experiment, spin and field strength.
+        weights = self.r20_coeff / self.errors**2
+        numer = self.param_sum(weights * (self.values - back_calc_r20_zero), 'efm')
+        denom = self.param_sum(weights * self.r20_coeff, 'efm')
+        r20 = zeros(num, float64)
+        r20[denom > 0.0] = numer[denom > 0.0] / denom[denom > 0.0]
+
+        # Scaling and the parameter bounds.
+        if self.scaling_flag:
+            r20 = r20 / diag(self.scaling_matrix)[:num]
+        if self.r20_lower is not None or self.r20_upper is not None:
+            r20 = clip(r20, self.r20_lower, self.r20_upper)
+        full_params[:num] = r20
+        if self.scaling_flag:
+            r20 = r20 * diag(self.scaling_matrix)[:num]
+
+        # The back-calculated values of the full parameter vector.
+        self.back_calc = back_calc_r20_zero + self.r20_coeff * multiply.outer(r20.reshape(self.NE, self.NS, self.NM), self.no_nd_ones)
+
+        # Return the full parameter vector.
+        return full_params
+
+
+    def sims_chi2(self, points, values, A=None, b=None):
+        """Return the chi-squared values for the Monte Carlo simulations, with infinite values for the points violating the linear constraints.
+
+        @param points:  The scaled parameter vectors.
+        @type points:   numpy rank-2 float array
+        @param values:  The R2eff/R1rho data for each parameter vector, as created by the pack_values() method.
+        @type values:   numpy float array of rank [N][NE][NS][NM][NO][ND]
+        @keyword A:     The linear constraint matrix.
+        @type A:        None or numpy rank-2 float array
+        @keyword b:     The linear constraint scalar vector.
+        @type b:        None or numpy rank-1 float array
+        @return:        The chi-squared value for each parameter vector.
+        @rtype:         numpy rank-1 float array
+        """
+
+        # Initialise.
+        chi2 = inf * ones(len(points), float64)
+
+        # The points satisfying the linear constraints A.x >= b.
+        feasible = ones(len(points), bool)
+        if A is not None:
+            feasible = all(dot(points, A.T) >= b, axis=1)
+        if not feasible.any():
+            return chi2
+
+        # The chi-squared values of the feasible points, treating NaN values as infinite.
+        chi2[feasible] = self.func_sims(points[feasible], values[feasible])
+        chi2[~isfinite(chi2)] = inf
+
+        # Return the values.
+        return chi2
@@ -21,7 +21,9 @@
 
 /* This include must come first. */
 #include <Python.h>
+#include <math.h>
 #include <stdio.h>
+#include <string.h>
 
 /* Include all of the variable definitions. */
 #include "relax_fit.h"
@@ -787,6 +789,573 @@ jacobian_chi2_sat(PyObject *self, PyObject *args) {
 }
 
 
+/*********************************************************************************/
+/* The re-entrant fitter object.                                                 */
+/*                                                                               */
+/* All of the data is stored in the object rather than in the module globals, so */
+/* that many fitters can coexist.  The object is never modified after creation,  */
+/* hence the target functions release the GIL and can be used concurrently from  */
+/* multiple threads.                                                             */
+/*********************************************************************************/
+
+/* The curve types. */
+#define FITTER_EXP 0
+#define FITTER_INV 1
+#define FITTER_SAT 2
+
+/* The maximum number of parameters of all curve types. */
+#define FITTER_MAX_PARAMS 3
+
+typedef struct {
+    PyObject_HEAD
+
+    /* The curve type and dimensions. */
+    int model;
+    int num_params;
+    int num_times;
+
+    /* The data, allocated to the number of time points. */
+    double *values;
+    double *variance;
+    double *relax_times;
+
+    /* The diagonalised scaling matrix. */
+    double scaling_matrix[FITTER_MAX_PARAMS];
+} Fitter;
+
+
+static void
+fitter_point(Fitter *self, double *p, int i, double *I, double dI[FITTER_MAX_PARAMS], double d2I[FITTER_MAX_PARAMS][FITTER_MAX_PARAMS]) {
+    /* Calculate the back calculated intensity, and its first and second partial derivatives, for time point i.
+     *
+     * The parameters p are unscaled and in the order [R, I0] for 'exp', [R, I0, Iinf] for 'inv', and [R, Iinf] for 'sat'.
+     * The derivative arrays are not touched if they are NULL.
+     */
+
+    /* Declarations. */
+    double t = self->relax_times[i];
+    double e = exp(-p[0] * t);
+
+    /* The two parameter exponential. */
+    if (self->model == FITTER_EXP) {
+        *I = p[1] * e;
+        if (dI) {
+            dI[0] = -t * p[1] * e;
+            dI[1] = e;
+        }
+        if (d2I) {
+            d2I[0][0] = t * t * p[1] * e;
+            d2I[0][1] = d2I[1][0] = -t * e;
+            d2I[1][1] = 0.0;
+        }
+    }
+
+    /* The inversion recovery experiment. */
+    else if (self->model == FITTER_INV) {
+        *I = p[2] - (p[2] - p[1]) * e;
+        if (dI) {
+            dI[0] = t * (p[2] - p[1]) * e;
+            dI[1] = e;
+            dI[2] = 1.0 - e;
+        }
+        if (d2I) {
+            d2I[0][0] = -t * t * (p[2] - p[1]) * e;
+            d2I[0][1] = d2I[1][0] = -t * e;
+            d2I[0][2] = d2I[2][0] = t * e;
+            d2I[1][1] = d2I[1][2] = d2I[2][1] = d2I[2][2] = 0.0;
+        }
+    }
+
+    /* The saturation recovery experiment. */
+    else {
+        *I = p[1] * (1.0 - e);
+        if (dI) {
+            dI[0] = t * p[1] * e;
+            dI[1] = 1.0 - e;
+        }
+        if (d2I) {
+            d2I[0][0] = -t * t * p[1] * e;
+            d2I[0][1] = d2I[1][0] = t * e;
+            d2I[1][1] = 0.0;
+        }
+    }
+}
+
+
+static void
+fitter_eval(Fitter *self, double *params, double *chi2_val, double grad[FITTER_MAX_PARAMS], double hess[FITTER_MAX_PARAMS][FITTER_MAX_PARAMS], double *back_calc_vals, double *jacobian_vals, double *jacobian_chi2_vals) {
+    /* Calculate the chi-squared value, gradient, Hessian, back calculated intensities and Jacobians.
+     *
+     * This only touches the immutable object data and the output arrays, and is therefore safe to call without the GIL.
+     * All outputs are optional and are skipped if NULL.  The Jacobians are returned unscaled, with the parameter as the
+     * first dimension and time as the second.
+     */
+
+    /* Declarations. */
+    double p[FITTER_MAX_PARAMS];
+    double I, res, dI[FITTER_MAX_PARAMS], d2I[FITTER_MAX_PARAMS][FITTER_MAX_PARAMS];
+    int need_grad = (grad || hess || jacobian_vals || jacobian_chi2_vals);
+    int i, j, k, n = self->num_params;
+
+    /* Unscale the parameters. */
+    for (j = 0; j < n; j++)
+        p[j] = params[j] * self->scaling_matrix[j];
+
+    /* Initialise the sums. */
+    if (chi2_val)
+        *chi2_val = 0.0;
+    for (j = 0; j < n; j++) {
+        if (grad)
+            grad[j] = 0.0;
+        for (k = 0; k < n; k++) {
+            if (hess)
+                hess[j][k] = 0.0;
+        }
+    }
+
+    /* Loop over the time points. */
+    for (i = 0; i < self->num_times; i++) {
+        /* The back calculation and derivatives. */
+        fitter_point(self, p, i, &I, need_grad ? dI : NULL, hess ? d2I : NULL);
+        res = self->values[i] - I;
+
+        /* Store the back calculated data and Jacobians. */
+        if (back_calc_vals)
+            back_calc_vals[i] = I;
+        for (j = 0; j < n; j++) {
+            if (jacobian_vals)
+                jacobian_vals[j*self->num_times + i] = dI[j];
+            if (jacobian_chi2_vals)
+                jacobian_chi2_vals[j*self->num_times + i] = -2.0 / self->variance[i] * res * dI[j];
+        }
+
+        /* The chi-squared value. */
+        if (chi2_val)
+            *chi2_val += square(res) / self->variance[i];
+
+        /* The gradient and Hessian. */
+        for (j = 0; j < n; j++) {
+            if (grad)
+                grad[j] += -2.0 / self->variance[i] * res * dI[j];
+            for (k = 0; k < n; k++) {
+                if (hess)
+                    hess[j][k] += 2.0 / self->variance[i] * (dI[j] * dI[k] - res * d2I[j][k]);
+            }
+        }
+    }
+
+    /* Scale the gradient and Hessian. */
+    for (j = 0; j < n; j++) {
+        if (grad)
+            grad[j] *= self->scaling_matrix[j];
+        for (k = 0; k < n; k++) {
+            if (hess)
+                hess[j][k] *= self->scaling_matrix[j] * self->scaling_matrix[k];
+        }
+    }
+}
+
+
+static int
+fitter_params(Fitter *self, PyObject *args, double params[FITTER_MAX_PARAMS]) {
+    /* Convert the parameter sequence argument into a C array, returning 0 on failure. */
+
+    /* Declarations. */
+    PyObject *params_arg, *element;
+    int i;
+
+    /* Parse the function arguments, the only argument should be the parameter array. */
+    if (!PyArg_ParseTuple(args, "O", &params_arg))
+        return 0;
+
+    /* Check the length. */
+    if (PySequence_Size(params_arg) != self->num_params) {
+        PyErr_Format(PyExc_ValueError, "The parameter vector must be of length %d.", self->num_params);
+        return 0;
+    }
+
+    /* Place the parameter array elements into the C array. */
+    for (i = 0; i < self->num_params; i++) {
+        element = PySequence_GetItem(params_arg, i);
+        if (!element)
+            return 0;
+        params[i] = PyFloat_AsDouble(element);
+        Py_CLEAR(element);
+    }
+
+    /* Catch conversion errors. */
+    if (PyErr_Occurred())
+        return 0;
+    return 1;
+}
+
+
+static PyObject *
+fitter_vector_to_list(double *vector, int n) {
+    /* Convert a C array into a Python list. */
+
+    /* Declarations. */
+    PyObject *list;
+    int i;
+
+    /* Build the list. */
+    list = PyList_New(n);
+    for (i = 0; i < n; i++)
+        PyList_SET_ITEM(list, i, PyFloat_FromDouble(vector[i]));
+
+    /* Return the list. */
+    return list;
+}
+
+
+static PyObject *
+fitter_matrix_to_list(double *matrix, int rows, int cols) {
+    /* Convert a C row-major matrix into a Python list of lists. */
+
+    /* Declarations. */
+    PyObject *list, *row;
+    int i, j;
+
+    /* Build the lists. */
+    list = PyList_New(rows);
+    for (i = 0; i < rows; i++) {
+        row = PyList_New(cols);
+        for (j = 0; j < cols; j++)
+            PyList_SET_ITEM(row, j, PyFloat_FromDouble(matrix[i*cols + j]));
+        PyList_SET_ITEM(list, i, row);
+    }
+
+    /* Return the list. */
+    return list;
+}
+
+
+static void
+fitter_dealloc(Fitter *self) {
+    /* Free the fitter object. */
+
+    PyMem_Free(self->values);
+    PyMem_Free(self->variance);
+    PyMem_Free(self->relax_times);
+    Py_TYPE(self)->tp_free((PyObject *)self);
+}
+
+
+static PyObject *
+fitter_func(Fitter *self, PyObject *args) {
+    /* Target function for calculating and returning the chi-squared value. */
+
+    /* Declarations. */
+    double params[FITTER_MAX_PARAMS], chi2_val;
+
+    /* Convert the parameters. */
+    if (!fitter_params(self, args, params))
+        return NULL;
+
+    /* Calculate the chi-squared value without the GIL. */
+    Py_BEGIN_ALLOW_THREADS
+    fitter_eval(self, params, &chi2_val, NULL, NULL, NULL, NULL, NULL);
+    Py_END_ALLOW_THREADS
+
+    /* Return the chi-squared value. */
+    return PyFloat_FromDouble(chi2_val);
+}
+
+
+static PyObject *
+fitter_dfunc(Fitter *self, PyObject *args) {
+    /* Target function for calculating and returning the chi-squared gradient. */
+
+    /* Declarations. */
+    double params[FITTER_MAX_PARAMS], grad[FITTER_MAX_PARAMS];
+
+    /* Convert the parameters. */
+    if (!fitter_params(self, args, params))
+        return NULL;
+
+    /* Calculate the gradient without the GIL. */
+    Py_BEGIN_ALLOW_THREADS
+    fitter_eval(self, params, NULL, grad, NULL, NULL, NULL, NULL);
+    Py_END_ALLOW_THREADS
+
+    /* Return the gradient. */
+    return fitter_vector_to_list(grad, self->num_params);
+}
+
+
+static PyObject *
+fitter_d2func(Fitter *self, PyObject *args) {
+    /* Target function for calculating and returning the chi-squared Hessian. */
+
+    /* Declarations. */
+    double params[FITTER_MAX_PARAMS], hess[FITTER_MAX_PARAMS][FITTER_MAX_PARAMS];
+    double flat[FITTER_MAX_PARAMS*FITTER_MAX_PARAMS];
+    int j, k;
+
+    /* Convert the parameters. */
+    if (!fitter_params(self, args, params))
+        return NULL;
+
+    /* Calculate the Hessian without the GIL. */
+    Py_BEGIN_ALLOW_THREADS
+    fitter_eval(self, params, NULL, NULL, hess, NULL, NULL, NULL);
+    Py_END_ALLOW_THREADS
+
+    /* Return the Hessian. */
+    for (j = 0; j < self->num_params; j++) {
+        for (k = 0; k < self->num_params; k++)
+            flat[j*self->num_params + k] = hess[j][k];
+    }
+    return fitter_matrix_to_list(flat, self->num_params, self->num_params);
+}
+
+
+static PyObject *
+fitter_back_calc(Fitter *self, PyObject *args) {
+    /* Return the back calculated peak intensities for the given parameters as a Python list. */
+
+    /* Declarations. */
+    double params[FITTER_MAX_PARAMS];
+    double *back_calc_vals;
+    PyObject *list;
+
+    /* Convert the parameters. */
+    if (!fitter_params(self, args, params))
+        return NULL;
+
+    /* Calculate without the GIL. */
+    back_calc_vals = PyMem_Malloc(self->num_times * sizeof(double));
+    if (!back_calc_vals)
+        return PyErr_NoMemory();
+    Py_BEGIN_ALLOW_THREADS
+    fitter_eval(self, params, NULL, NULL, NULL, back_calc_vals, NULL, NULL);
+    Py_END_ALLOW_THREADS
+
+    /* Return the list. */
+    list = fitter_vector_to_list(back_calc_vals, self->num_times);
+    PyMem_Free(back_calc_vals);
+    return list;
+}
+
+
+static PyObject *
+fitter_jacobian_common(Fitter *self, PyObject *args, int chi2_flag) {
+    /* Return the unscaled Jacobian of the curve or of the chi-squared function as a Python list of lists. */
+
+    /* Declarations. */
+    double params[FITTER_MAX_PARAMS];
+    double *matrix;
+    PyObject *list;
+
+    /* Convert the parameters. */
+    if (!fitter_params(self, args, params))
+        return NULL;
+
+    /* Calculate without the GIL. */
+    matrix = PyMem_Malloc(self->num_params * self->num_times * sizeof(double));
+    if (!matrix)
+        return PyErr_NoMemory();
+    Py_BEGIN_ALLOW_THREADS
+    if (chi2_flag)
+        fitter_eval(self, params, NULL, NULL, NULL, NULL, NULL, matrix);
+    else
+        fitter_eval(self, params, NULL, NULL, NULL, NULL, matrix, NULL);
+    Py_END_ALLOW_THREADS
+
+    /* Return the list of lists. */
+    list = fitter_matrix_to_list(matrix, self->num_params, self->num_times);
+    PyMem_Free(matrix);
+    return list;
+}
+
+
+static PyObject *
+fitter_jacobian(Fitter *self, PyObject *args) {
+    /* Return the Jacobian matrix of the curve as a Python list of lists. */
+
+    return fitter_jacobian_common(self, args, 0);
+}
+
+
+static PyObject *
+fitter_jacobian_chi2(Fitter *self, PyObject *args) {
+    /* Return the Jacobian matrix of the chi-squared function as a Python list of lists. */
+
+    return fitter_jacobian_common(self, args, 1);
+}
+
+
+/* The fitter object method table. */
+static PyMethodDef fitter_methods[] = {
+    {
+        "func",
+        (PyCFunction)fitter_func,
+        METH_VARARGS,
+        "Target function for calculating and returning the chi-squared value."
+    }, {
+        "dfunc",
+        (PyCFunction)fitter_dfunc,
+        METH_VARARGS,
+        "Target function for calculating and returning the chi-squared gradient."
+    }, {
+        "d2func",
+        (PyCFunction)fitter_d2func,
+        METH_VARARGS,
+        "Target function for calculating and returning the chi-squared Hessian."
+    }, {
+        "back_calc",
+        (PyCFunction)fitter_back_calc,
+        METH_VARARGS,
+        "Return the back calculated peak intensities for the given parameters as a Python list."
+    }, {
+        "jacobian",
+        (PyCFunction)fitter_jacobian,
+        METH_VARARGS,
+        "Return the Jacobian matrix of the curve as a Python list of lists."
+    }, {
+        "jacobian_chi2",
+        (PyCFunction)fitter_jacobian_chi2,
+        METH_VARARGS,
+        "Return the Jacobian matrix of the chi-squared function as a Python list of lists."
+    },
+        {NULL, NULL, 0, NULL}        /* Sentinel. */
+};
+
+
+/* The fitter object type. */
+static PyTypeObject FitterType = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    "relax_fit.Fitter",                 /* tp_name */
+    sizeof(Fitter),                     /* tp_basicsize */
+    0,                                  /* tp_itemsize */
+    (destructor)fitter_dealloc,         /* tp_dealloc */
+    0,                                  /* tp_print */
+    0,                                  /* tp_getattr */
+    0,                                  /* tp_setattr */
+    0,                                  /* tp_compare */
+    0,                                  /* tp_repr */
+    0,                                  /* tp_as_number */
+    0,                                  /* tp_as_sequence */
+    0,                                  /* tp_as_mapping */
+    0,                                  /* tp_hash */
+    0,                                  /* tp_call */
+    0,                                  /* tp_str */
+    0,                                  /* tp_getattro */
+    0,                                  /* tp_setattro */
+    0,                                  /* tp_as_buffer */
+    Py_TPFLAGS_DEFAULT,                 /* tp_flags */
+    "The re-entrant exponential curve-fitting target function object created by setup_fitter().",  /* tp_doc */
+    0,                                  /* tp_traverse */
+    0,                                  /* tp_clear */
+    0,                                  /* tp_richcompare */
+    0,                                  /* tp_weaklistoffset */
+    0,                                  /* tp_iter */
+    0,                                  /* tp_iternext */
+    fitter_methods,                     /* tp_methods */
+};
+
+
+static int
+fitter_sequence_to_c(PyObject *seq, double *array, int n, const char *name) {
+    /* Copy the Python sequence into the C array, returning 0 on failure. */
+
+    /* Declarations. */
+    PyObject *element;
+    int i;
+
+    /* Check the length. */
+    if (PySequence_Size(seq) != n) {
+        PyErr_Format(PyExc_ValueError, "The '%s' argument must be of length %d.", name, n);
+        return 0;
+    }
+
+    /* Copy the elements. */
+    for (i = 0; i < n; i++) {
+        element = PySequence_GetItem(seq, i);
+        if (!element)
+            return 0;
+        array[i] = PyFloat_AsDouble(element);
+        Py_CLEAR(element);
+    }
+
+    /* Catch conversion errors. */
+    if (PyErr_Occurred())
+        return 0;
+    return 1;
+}
+
+
+static PyObject *
+setup_fitter(PyObject *self, PyObject *args, PyObject *keywords) {
+    /* Create a re-entrant fitter object holding its own copy of the data. */
+
+    /* Python object declarations. */
+    PyObject *values_arg, *sd_arg, *relax_times_arg, *scaling_matrix_arg;
+    Fitter *fitter;
+
+    /* Normal declarations. */
+    char *model;
+    int i, num_times;
+
+    /* The keyword list. */
+    static char *keyword_list[] = {"model", "values", "sd", "relax_times", "scaling_matrix", NULL};
+
+    /* Parse the function arguments. */
+    if (!PyArg_ParseTupleAndKeywords(args, keywords, "sOOOO", keyword_list, &model, &values_arg, &sd_arg, &relax_times_arg, &scaling_matrix_arg))
+        return NULL;
+
+    /* The number of time points. */
+    num_times = (int)PySequence_Size(relax_times_arg);
+    if (num_times < 0)
+        return NULL;
+
+    /* Create the object. */
+    fitter = PyObject_New(Fitter, &FitterType);
+    if (!fitter)
+        return NULL;
+    fitter->num_times = num_times;
+    fitter->values = PyMem_Malloc((num_times + 1) * sizeof(double));
+    fitter->variance = PyMem_Malloc((num_times + 1) * sizeof(double));
+    fitter->relax_times = PyMem_Malloc((num_times + 1) * sizeof(double));
+    if (!fitter->values || !fitter->variance || !fitter->relax_times) {
+        Py_DECREF(fitter);
+        return PyErr_NoMemory();
+    }
+
+    /* The curve type. */
+    if (strcmp(model, "exp") == 0) {
+        fitter->model = FITTER_EXP;
+        fitter->num_params = 2;
+    } else if (strcmp(model, "inv") == 0) {
+        fitter->model = FITTER_INV;
+        fitter->num_params = 3;
+    } else if (strcmp(model, "sat") == 0) {
+        fitter->model = FITTER_SAT;
+        fitter->num_params = 2;
+    } else {
+        PyErr_Format(PyExc_ValueError, "The curve type '%s' is unknown.", model);
+        Py_DECREF(fitter);
+        return NULL;
+    }
+
+    /* Copy the data. */
+    if (!fitter_sequence_to_c(scaling_matrix_arg, fitter->scaling_matrix, fitter->num_params, "scaling_matrix") ||
+        !fitter_sequence_to_c(values_arg, fitter->values, num_times, "values") ||
+        !fitter_sequence_to_c(sd_arg, fitter->variance, num_times, "sd") ||
+        !fitter_sequence_to_c(relax_times_arg, fitter->relax_times, num_times, "relax_times")) {
+        Py_DECREF(fitter);
+        return NULL;
+    }
+
+    /* Convert the errors to variances to avoid duplicated maths operations for faster calculations. */
+    for (i = 0; i < num_times; i++)
+        fitter->variance[i] = square(fitter->variance[i]);
+
+    /* Return the object. */
+    return (PyObject *)fitter;
+}
+
+
 /* The method table for the functions called by Python. */
 static PyMethodDef relax_fit_methods[] = {
     {
@@ -794,6 +1363,11 @@ static PyMethodDef relax_fit_methods[] = {
         (PyCFunction)setup,
         METH_VARARGS | METH_KEYWORDS,
         "Set up the module in preparation for calls to the target function."
+    }, {
+        "setup_fitter",
+        (PyCFunction)setup_fitter,
+        METH_VARARGS | METH_KEYWORDS,
+        "Create a re-entrant fitter object, with its own copy of the data, for calls to its target function methods."
     }, {
         "func_exp",
         func_exp,
@@ -899,11 +1473,19 @@ PyMODINIT_FUNC
 #if PY_MAJOR_VERSION >= 3
     PyInit_relax_fit(void)
     {
+        /* Initialise the fitter object type. */
+        if (PyType_Ready(&FitterType) < 0)
+            return NULL;
+
         return PyModule_Create(&moduledef);
     }
 #else
     initrelax_fit(void)
     {
+        /* Initialise the fitter object type. */
+        if (PyType_Ready(&FitterType) < 0)
+            return;
+
         (void) Py_InitModule("relax_fit", relax_fit_methods);
     }
 #endif
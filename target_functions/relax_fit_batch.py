@@ -0,0 +1,401 @@
+###############################################################################
+#                                                                             #
+# Copyright (C) 2015 Edward d'Auvergne                                        #
+#                                                                             #
+# This file is part of the program relax (http://www.nmr-relax.com).          #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+# Module docstring.
+"""The vectorised multi-spin R1 and R2 exponential relaxation curve fitting target functions.
+
+In contrast to the target_functions.relax_fit C module which stores the data of a single spin as global module state, the target functions of this module operate on a batch of N spins and M relaxation times stored as rank-2 numpy arrays.  The chi-squared value, gradient and Hessian are returned for all spins simultaneously, and the Levenberg-Marquardt optimiser of the Relax_fit_batch.minimise() method steps all spins in lock-step.
+
+The parameter order of the three curve types matches that of the C module::
+
+    exp:    [Rx, I0],
+    inv:    [Rx, I0, Iinf],
+    sat:    [Rx, Iinf].
+"""
+
+# Python module imports.
+from numpy import abs, any, asarray, einsum, exp, float64, isfinite, maximum, ones, zeros
+from numpy.linalg import LinAlgError, solve
+
+# relax module imports.
+from lib.errors import RelaxError
+
+
+class Relax_fit_batch:
+    def __init__(self, model=None, values=None, errors=None, relax_times=None, mask=None, scaling_matrix=None):
+        """Set up the batched target functions for optimising N spins.
+
+        @keyword model:             The exponential curve type.  This can be 'exp' for the standard two parameter exponential curve, 'inv' for the inversion recovery experiment, and 'sat' for the saturation recovery experiment.
+        @type model:                str
+        @keyword values:            The peak intensities, with the first dimension being the spin and the second the relaxation time.
+        @type values:               numpy rank-2 array (N, M)
+        @keyword errors:            The peak intensity errors, with the same dimensions as the values.
+        @type errors:               numpy rank-2 array (N, M)
+        @keyword relax_times:       The relaxation times, either shared by all spins or per spin.
+        @type relax_times:          numpy rank-1 array (M) or rank-2 array (N, M)
+        @keyword mask:              The data mask for spins with fewer than M time points.  Elements set to False are excluded from the chi-squared sum.  If not supplied, all points are used.
+        @type mask:                 None or numpy rank-2 bool array (N, M)
+        @keyword scaling_matrix:    The diagonalised scaling matrix, either shared by all spins or per spin.
+        @type scaling_matrix:       None, numpy rank-1 array (P) or rank-2 array (N, P)
+        """
+
+        # Check the model.
+        if model not in ['exp', 'inv', 'sat']:
+            raise RelaxError("The curve type '%s' is unknown." % model)
+
+        # Store the data.
+        self.model = model
+        self.values = asarray(values, float64)
+        self.errors = asarray(errors, float64)
+        self.num_spins, self.num_times = self.values.shape
+        self.num_params = {'exp': 2, 'inv': 3, 'sat': 2}[model]
+
+        # The relaxation times, expanded to all spins.
+        self.relax_times = asarray(relax_times, float64) * ones((self.num_spins, self.num_times), float64)
+
+        # The data mask.
+        if mask is None:
+            mask = ones((self.num_spins, self.num_times), bool)
+        mask = asarray(mask, bool)
+
+        # The chi-squared weights (1/sigma^2), zero for the missing points.
+        self.weights = zeros((self.num_spins, self.num_times), float64)
+        self.weights[mask] = 1.0 / self.errors[mask]**2
+
+        # Replace the masked values to avoid NaN propagation.
+        self.values = self.values * mask
+        self.relax_times = self.relax_times * mask
+
+        # The parameter scaling, expanded to all spins.
+        if scaling_matrix is None:
+            scaling_matrix = ones(self.num_params, float64)
+        self.scaling = asarray(scaling_matrix, float64) * ones((self.num_spins, self.num_params), float64)
+
+
+    def _unpack(self, params, index):
+        """Convert the scaled parameter array into the unscaled model parameters.
+
+        @param params:  The scaled parameter values.
+        @type params:   numpy rank-2 array (n, P)
+        @param index:   The spin indices of the batch, or None for all spins.
+        @type index:    None or numpy rank-1 int array
+        @return:        The relaxation rates, initial intensities and intensities at infinity, each as rank-2 arrays broadcastable to (n, M) and with None for parameters absent from the model.  The relaxation times and the exponential decay are also returned.
+        @rtype:         tuple of numpy arrays or None
+        """
+
+        # The unscaled parameters and times.
+        p = asarray(params, float64) * self._select(self.scaling, index)
+        times = self._select(self.relax_times, index)
+
+        # Split up the parameters.
+        r = p[:, 0:1]
+        i0 = None
+        iinf = None
+        if self.model == 'exp':
+            i0 = p[:, 1:2]
+        elif self.model == 'inv':
+            i0 = p[:, 1:2]
+            iinf = p[:, 2:3]
+        else:
+            iinf = p[:, 1:2]
+
+        # The decay.
+        decay = exp(-r * times)
+
+        # Return the components.
+        return r, i0, iinf, times, decay
+
+
+    def _select(self, data, index):
+        """Return the spin subset of the data array.
+
+        @param data:    The data with the spin as the first dimension.
+        @type data:     numpy array
+        @param index:   The spin indices of the batch, or None for all spins.
+        @type index:    None or numpy rank-1 int array
+        @return:        The subset.
+        @rtype:         numpy array
+        """
+
+        # All spins.
+        if index is None:
+            return data
+
+        # The subset.
+        return data[index]
+
+
+    def back_calc(self, params, index=None):
+        """Back-calculate the peak intensities of all spins.
+
+        @param params:  The scaled parameter values.
+        @type params:   numpy rank-2 array (n, P)
+        @keyword index: The spin indices of the batch, or None for all spins.
+        @type index:    None or numpy rank-1 int array
+        @return:        The back-calculated peak intensities.
+        @rtype:         numpy rank-2 array (n, M)
+        """
+
+        # Unpack.
+        r, i0, iinf, times, decay = self._unpack(params, index)
+
+        # The curves.
+        if self.model == 'exp':
+            return i0 * decay
+        elif self.model == 'inv':
+            return iinf - (iinf - i0) * decay
+        else:
+            return iinf * (1.0 - decay)
+
+
+    def jacobian(self, params, index=None):
+        """The partial derivatives of the peak intensities with respect to the scaled parameters.
+
+        @param params:  The scaled parameter values.
+        @type params:   numpy rank-2 array (n, P)
+        @keyword index: The spin indices of the batch, or None for all spins.
+        @type index:    None or numpy rank-1 int array
+        @return:        The Jacobian, with dimensions of spin, parameter and time.
+        @rtype:         numpy rank-3 array (n, P, M)
+        """
+
+        # Unpack.
+        r, i0, iinf, times, decay = self._unpack(params, index)
+        jac = zeros((len(r), self.num_params, self.num_times), float64)
+
+        # The partial derivatives.
+        if self.model == 'exp':
+            jac[:, 0] = -times * i0 * decay
+            jac[:, 1] = decay
+        elif self.model == 'inv':
+            jac[:, 0] = times * (iinf - i0) * decay
+            jac[:, 1] = decay
+            jac[:, 2] = 1.0 - decay
+        else:
+            jac[:, 0] = times * iinf * decay
+            jac[:, 1] = 1.0 - decay
+
+        # Parameter scaling.
+        return jac * self._select(self.scaling, index)[:, :, None]
+
+
+    def hessian(self, params, index=None):
+        """The second partial derivatives of the peak intensities with respect to the scaled parameters.
+
+        @param params:  The scaled parameter values.
+        @type params:   numpy rank-2 array (n, P)
+        @keyword index: The spin indices of the batch, or None for all spins.
+        @type index:    None or numpy rank-1 int array
+        @return:        The Hessian, with dimensions of spin, parameter, parameter and time.
+        @rtype:         numpy rank-4 array (n, P, P, M)
+        """
+
+        # Unpack.
+        r, i0, iinf, times, decay = self._unpack(params, index)
+        hess = zeros((len(r), self.num_params, self.num_params, self.num_times), float64)
+
+        # The second partial derivatives.
+        if self.model == 'exp':
+            hess[:, 0, 0] = times**2 * i0 * decay
+            hess[:, 0, 1] = hess[:, 1, 0] = -times * decay
+        elif self.model == 'inv':
+            hess[:, 0, 0] = -times**2 * (iinf - i0) * decay
+            hess[:, 0, 1] = hess[:, 1, 0] = -times * decay
+            hess[:, 0, 2] = hess[:, 2, 0] = times * decay
+        else:
+            hess[:, 0, 0] = -times**2 * iinf * decay
+            hess[:, 0, 1] = hess[:, 1, 0] = times * decay
+
+        # Parameter scaling.
+        scaling = self._select(self.scaling, index)
+        return hess * (scaling[:, :, None] * scaling[:, None, :])[:, :, :, None]
+
+
+    def func(self, params, index=None):
+        """The chi-squared values of all spins.
+
+        @param params:  The scaled parameter values.
+        @type params:   numpy rank-2 array (n, P)
+        @keyword index: The spin indices of the batch, or None for all spins.
+        @type index:    None or numpy rank-1 int array
+        @return:        The chi-squared values.
+        @rtype:         numpy rank-1 array (n)
+        """
+
+        # The residuals.
+        res = self._select(self.values, index) - self.back_calc(params, index)
+
+        # The weighted sum of squares.
+        return (self._select(self.weights, index) * res**2).sum(axis=1)
+
+
+    def dfunc(self, params, index=None):
+        """The chi-squared gradients of all spins.
+
+        @param params:  The scaled parameter values.
+        @type params:   numpy rank-2 array (n, P)
+        @keyword index: The spin indices of the batch, or None for all spins.
+        @type index:    None or numpy rank-1 int array
+        @return:        The chi-squared gradients.
+        @rtype:         numpy rank-2 array (n, P)
+        """
+
+        # The weighted residuals.
+        res = self._select(self.weights, index) * (self._select(self.values, index) - self.back_calc(params, index))
+
+        # dchi2/dp = -2 sum_t w (I - Ic) dIc/dp.
+        return -2.0 * einsum('nt,npt->np', res, self.jacobian(params, index))
+
+
+    def d2func(self, params, index=None):
+        """The chi-squared Hessians of all spins.
+
+        @param params:  The scaled parameter values.
+        @type params:   numpy rank-2 array (n, P)
+        @keyword index: The spin indices of the batch, or None for all spins.
+        @type index:    None or numpy rank-1 int array
+        @return:        The chi-squared Hessians.
+        @rtype:         numpy rank-3 array (n, P, P)
+        """
+
+        # The components.
+        weights = self._select(self.weights, index)
+        res = self._select(self.values, index) - self.back_calc(params, index)
+        jac = self.jacobian(params, index)
+
+        # d2chi2/dp2 = 2 sum_t w (dIc/dpj dIc/dpk - (I - Ic) d2Ic/dpjdpk).
+        return 2.0 * (einsum('nt,njt,nkt->njk', weights, jac, jac) - einsum('nt,njkt->njk', weights*res, self.hessian(params, index)))
+
+
+    def minimise(self, x0, func_tol=1e-25, max_iterations=10000000, constraints=True, lambda_init=1e-3):
+        """Levenberg-Marquardt optimisation of all spins in lock-step.
+
+        Each spin has its own damping factor and convergence state.  Converged spins are removed from the active set so that the cost of each iteration decreases as the optimisation proceeds.  The constraints Rx >= 0, I0 >= 0 and Iinf >= 0 are enforced by projection of the trial steps onto the feasible region, with the parameters at the zero bound held fixed when the step would leave the feasible region.  Spins which cannot be optimised or for which no further progress is possible have their warning set.
+
+
+        @param x0:                  The scaled starting parameter values.
+        @type x0:                   numpy rank-2 array (N, P)
+        @keyword func_tol:          The function tolerance which, when reached, terminates optimisation of the spin.
+        @type func_tol:             float
+        @keyword max_iterations:    The maximum number of iterations.
+        @type max_iterations:       int
+        @keyword constraints:       A flag which if True will enforce the non-negativity of all parameters.
+        @type constraints:          bool
+        @keyword lambda_init:       The initial Levenberg-Marquardt damping factor.
+        @type lambda_init:          float
+        @return:                    The optimised scaled parameters, chi-squared values, iteration counts, function counts, gradient counts and warnings.
+        @rtype:                     numpy rank-2 array (N, P), numpy rank-1 array (N), numpy rank-1 int array (N), numpy rank-1 int array (N), numpy rank-1 int array (N), list of str or None
+        """
+
+        # Initialise.
+        x = asarray(x0, float64).copy()
+        if constraints:
+            x = maximum(x, 0.0)
+        chi2 = self.func(x)
+        lam = lambda_init * ones(self.num_spins, float64)
+        active = isfinite(chi2)
+        iter_count = zeros(self.num_spins, int)
+        f_count = ones(self.num_spins, int)
+        g_count = zeros(self.num_spins, int)
+        warning = [None] * self.num_spins
+        diag = range(self.num_params)
+
+        # Spins which cannot be optimised.
+        for i in (~active).nonzero()[0]:
+            warning[i] = "The function value at the starting position is not finite."
+
+        # Iterate.
+        for k in range(max_iterations):
+            # Termination.
+            if not any(active):
+                break
+
+            # The active spins.
+            index = active.nonzero()[0]
+            xa = x[index]
+
+            # The Gauss-Newton approximation of the Hessian, and the gradient.
+            weights = self.weights[index]
+            jac = self.jacobian(xa, index)
+            res = weights * (self.values[index] - self.back_calc(xa, index))
+            alpha = einsum('nt,njt,nkt->njk', weights, jac, jac)
+            beta = einsum('nt,npt->np', res, jac)
+            g_count[index] += 1
+
+            # Damping, with a tiny ridge to avoid singular matrices for data-less directions.
+            curv = alpha[:, diag, diag]
+            alpha[:, diag, diag] = curv * (1.0 + lam[index, None]) + 1e-30 + 1e-15 * abs(curv).max(axis=1)[:, None]
+
+            # The active bounds, holding the parameters at zero which would otherwise be stepped into the infeasible region.
+            if constraints:
+                fixed = (xa <= 0.0) & (beta < 0.0)
+                beta[fixed] = 0.0
+                coupled = fixed[:, :, None] | fixed[:, None, :]
+                coupled[:, diag, diag] = False
+                alpha[coupled] = 0.0
+
+            # The Levenberg-Marquardt steps.
+            try:
+                step = solve(alpha, beta[:, :, None])[:, :, 0]
+            except LinAlgError:
+                step = zeros(beta.shape, float64)
+                for i in range(len(index)):
+                    try:
+                        step[i] = solve(alpha[i], beta[i])
+                    except LinAlgError:
+                        active[index[i]] = False
+                        warning[index[i]] = "Singular matrix."
+
+            # The trial parameters.
+            xt = xa + step
+            if constraints:
+                xt = maximum(xt, 0.0)
+            chi2_trial = self.func(xt, index)
+            f_count[index] += 1
+            iter_count[index] += 1
+
+            # Accept the improved steps.
+            accept = chi2_trial <= chi2[index]
+            good = index[accept]
+            x[good] = xt[accept]
+            lam[good] /= 10.0
+
+            # Convergence of the accepted steps.
+            conv = abs(chi2[good] - chi2_trial[accept]) <= func_tol
+            chi2[good] = chi2_trial[accept]
+            active[good[conv]] = False
+
+            # Reject the bad steps.
+            bad = index[~accept]
+            lam[bad] *= 10.0
+
+            # No further progress is possible, either from rejected steps or from steps too small to change the function value.
+            stuck = index[lam[index] > 1e16]
+            active[stuck] = False
+            for i in stuck:
+                warning[i] = "Infinite Levenberg-Marquardt damping factor, no further progress is possible."
+
+        # The maximum number of iterations has been reached.
+        for i in active.nonzero()[0]:
+            warning[i] = "Maximum number of iterations reached"
+
+        # Return the results.
+        return x, chi2, iter_count, f_count, g_count, warning
@@ -33,11 +33,14 @@ from dep_check import C_module_exp_fn
 
 # C modules.
 if C_module_exp_fn:
-    from target_functions.relax_fit import back_calc_I, d2func_exp, d2func_inv, d2func_sat, dfunc_exp, dfunc_inv, dfunc_sat, func_exp, func_inv, func_sat, jacobian_chi2_exp, jacobian_chi2_inv, jacobian_chi2_sat, jacobian_exp, jacobian_inv, jacobian_sat, setup 
+    from target_functions.relax_fit import setup_fitter
 
 
 class Relax_fit_opt:
-    """The exponential curve-fitting Python to C wrapper target function class."""
+    """The exponential curve-fitting Python to C wrapper target function class.
+
+    Each instance holds its own re-entrant C fitter object created by the setup_fitter() function of the relax_fit C module.  Different instances therefore do not interfere with each other, and as the C target functions release the GIL, the instances can be used concurrently from multiple threads.
+    """
 
     def __init__(self, model=None, num_params=None, values=None, errors=None, relax_times=None, scaling_matrix=None):
         """Set up the target function class and alias the target functions.
@@ -59,88 +62,52 @@ class Relax_fit_opt:
         # Store the args.
         self.model = model
 
-        # Initialise the C code.
-        setup(num_params=num_params, num_times=len(relax_times), values=values, sd=errors, relax_times=relax_times, scaling_matrix=scaling_matrix)
-
-        # Alias the target functions.
-        if model == 'exp':
-            self.func = self.func_exp
-            self.dfunc = self.dfunc_exp
-            self.d2func = self.d2func_exp
-        elif model == 'inv':
-            self.func = self.func_inv
-            self.dfunc = self.dfunc_inv
-            self.d2func = self.d2func_inv
-        elif model == 'sat':
-            self.func = self.func_sat
-            self.dfunc = self.dfunc_sat
-            self.d2func = self.d2func_sat
-
-        # Alias the Jacobian C functions.
-        if model == 'exp':
-            self.jacobian = jacobian_exp
-            self.jacobian_chi2 = jacobian_chi2_exp
-        elif model == 'inv':
-            self.jacobian = jacobian_inv
-            self.jacobian_chi2 = jacobian_chi2_inv
-        elif model == 'sat':
-            self.jacobian = jacobian_sat
-            self.jacobian_chi2 = jacobian_chi2_sat
-
-
-    def back_calc_data(self):
-        """Return the back-calculated data from the C code.
+        # Convert if necessary.
+        if isinstance(values, ndarray):
+            values = values.tolist()
+        if isinstance(errors, ndarray):
+            errors = errors.tolist()
+        if isinstance(relax_times, ndarray):
+            relax_times = relax_times.tolist()
 
-        @return:    The back-calculated peak intensities.
-        @rtype:     list of float
-        """
+        # Initialise the C fitter object.
+        self.fitter = setup_fitter(model=model, values=values, sd=errors, relax_times=relax_times, scaling_matrix=list(scaling_matrix)[:num_params])
 
-        # Return the data.
-        return back_calc_I()
+        # The last parameter vector, for the back_calc_data() method.
+        self.params = None
 
 
-    def func_exp(self, params):
-        """Wrapper function for the C module, for converting numpy arrays.
+    def _convert(self, params):
+        """Convert the parameters into a Python list, and store them for the back-calculation.
 
         @param params:  The parameter array from the minimisation code.
-        @type params:   numpy array
-        @return:        The function value generated by the C module.
-        @rtype:         float
+        @type params:   numpy array or list of float
+        @return:        The parameter list.
+        @rtype:         list of float
         """
 
         # Convert if necessary.
         if isinstance(params, ndarray):
             params = params.tolist()
 
-        # Call the C code.
-        chi2 = func_exp(params)
-
-        # Return the chi2 value.
-        return nan_to_num(chi2)
+        # Store and return.
+        self.params = params
+        return params
 
 
-    def func_inv(self, params):
-        """Wrapper function for the C module, for converting numpy arrays.
+    def back_calc_data(self):
+        """Return the back-calculated data for the last parameter vector sent to the target functions.
 
-        @param params:  The parameter array from the minimisation code.
-        @type params:   numpy array
-        @return:        The function value generated by the C module.
-        @rtype:         float
+        @return:    The back-calculated peak intensities.
+        @rtype:     list of float
         """
 
-        # Convert if necessary.
-        if isinstance(params, ndarray):
-            params = params.tolist()
-
-        # Call the C code.
-        chi2 = func_inv(params)
-
-        # Return the chi2 value.
-        return nan_to_num(chi2)
+        # Return the data.
+        return self.fitter.back_calc(self.params)
 
 
-    def func_sat(self, params):
-        """Wrapper function for the C module, for converting numpy arrays.
+    def func(self, params):
+        """Wrapper function for the C fitter object, for converting numpy arrays.
 
         @param params:  The parameter array from the minimisation code.
         @type params:   numpy array
@@ -148,59 +115,15 @@ class Relax_fit_opt:
         @rtype:         float
         """
 
-        # Convert if necessary.
-        if isinstance(params, ndarray):
-            params = params.tolist()
-
         # Call the C code.
-        chi2 = func_sat(params)
+        chi2 = self.fitter.func(self._convert(params))
 
         # Return the chi2 value.
         return nan_to_num(chi2)
 
 
-    def dfunc_exp(self, params):
-        """Wrapper function for the C module, for converting numpy arrays.
-
-        @param params:  The parameter array from the minimisation code.
-        @type params:   numpy array
-        @return:        The gradient generated by the C module converted to numpy format.
-        @rtype:         numpy float64 array
-        """
-
-        # Convert if necessary.
-        if isinstance(params, ndarray):
-            params = params.tolist()
-
-        # Call the C code.
-        dchi2 = dfunc_exp(params)
-
-        # Return the chi2 gradient as a numpy array.
-        return array(dchi2, float64)
-
-
-    def dfunc_inv(self, params):
-        """Wrapper function for the C module, for converting numpy arrays.
-
-        @param params:  The parameter array from the minimisation code.
-        @type params:   numpy array
-        @return:        The gradient generated by the C module converted to numpy format.
-        @rtype:         numpy float64 array
-        """
-
-        # Convert if necessary.
-        if isinstance(params, ndarray):
-            params = params.tolist()
-
-        # Call the C code.
-        dchi2 = dfunc_inv(params)
-
-        # Return the chi2 gradient as a numpy array.
-        return array(dchi2, float64)
-
-
-    def dfunc_sat(self, params):
-        """Wrapper function for the C module, for converting numpy arrays.
+    def dfunc(self, params):
+        """Wrapper function for the C fitter object, for converting numpy arrays.
 
         @param params:  The parameter array from the minimisation code.
         @type params:   numpy array
@@ -208,19 +131,15 @@ class Relax_fit_opt:
         @rtype:         numpy float64 array
         """
 
-        # Convert if necessary.
-        if isinstance(params, ndarray):
-            params = params.tolist()
-
         # Call the C code.
-        dchi2 = dfunc_sat(params)
+        dchi2 = self.fitter.dfunc(self._convert(params))
 
         # Return the chi2 gradient as a numpy array.
         return array(dchi2, float64)
 
 
-    def d2func_exp(self, params):
-        """Wrapper function for the C module, for converting numpy arrays.
+    def d2func(self, params):
+        """Wrapper function for the C fitter object, for converting numpy arrays.
 
         @param params:  The parameter array from the minimisation code.
         @type params:   numpy array
@@ -228,52 +147,34 @@ class Relax_fit_opt:
         @rtype:         numpy float64 rank-2 array
         """
 
-        # Convert if necessary.
-        if isinstance(params, ndarray):
-            params = params.tolist()
-
         # Call the C code.
-        d2chi2 = d2func_exp(params)
+        d2chi2 = self.fitter.d2func(self._convert(params))
 
         # Return the chi2 Hessian as a numpy array.
         return array(d2chi2, float64)
 
 
-    def d2func_inv(self, params):
-        """Wrapper function for the C module, for converting numpy arrays.
+    def jacobian(self, params):
+        """Return the Jacobian matrix of the exponential curve.
 
         @param params:  The parameter array from the minimisation code.
         @type params:   numpy array
-        @return:        The Hessian generated by the C module converted to numpy format.
-        @rtype:         numpy float64 rank-2 array
+        @return:        The unscaled Jacobian, with the parameter as the first dimension and the time as the second.
+        @rtype:         list of lists of float
         """
 
-        # Convert if necessary.
-        if isinstance(params, ndarray):
-            params = params.tolist()
-
         # Call the C code.
-        d2chi2 = d2func_inv(params)
-
-        # Return the chi2 Hessian as a numpy array.
-        return array(d2chi2, float64)
+        return self.fitter.jacobian(self._convert(params))
 
 
-    def d2func_sat(self, params):
-        """Wrapper function for the C module, for converting numpy arrays.
+    def jacobian_chi2(self, params):
+        """Return the Jacobian matrix of the chi-squared function.
 
         @param params:  The parameter array from the minimisation code.
         @type params:   numpy array
-        @return:        The Hessian generated by the C module converted to numpy format.
-        @rtype:         numpy float64 rank-2 array
+        @return:        The unscaled chi-squared Jacobian, with the parameter as the first dimension and the time as the second.
+        @rtype:         list of lists of float
         """
 
-        # Convert if necessary.
-        if isinstance(params, ndarray):
-            params = params.tolist()
-
         # Call the C code.
-        d2chi2 = d2func_sat(params)
-
-        # Return the chi2 Hessian as a numpy array.
-        return array(d2chi2, float64)
+        return self.fitter.jacobian_chi2(self._convert(params))
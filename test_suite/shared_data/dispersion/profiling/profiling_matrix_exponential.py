@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+
+###############################################################################
+#                                                                             #
+# Copyright (C) 2015 Edward d'Auvergne                                        #
+#                                                                             #
+# This file is part of the program relax (http://www.nmr-relax.com).          #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+# Python module imports.
+from os import getcwd, path
+from numpy import abs, array, int16, random
+from numpy.linalg import matrix_power
+import sys
+from timeit import default_timer
+
+# Add to system path, according to
+if len(sys.argv) == 1:
+    path_to_base = path.join(getcwd(), '..', '..', '..', '..')
+else:
+    path_to_base = path.abspath(sys.argv[1])
+sys.path.insert(0, path_to_base)
+
+# relax module imports.
+from lib.dispersion.matrix_exponential import matrix_exponential, matrix_exponential_eig
+from lib.dispersion.matrix_power import matrix_power_rank_NE_NS_NM_NO_ND_x_x
+
+
+# Module variables.
+NUM_SPINS = 100
+NUM_FRQ = 2
+NUM_POINTS = 20
+REPEATS = 10
+
+
+def matrix_power_looped(A, power):
+    """Calculate the matrix power by looping over numpy's matrix_power() for each matrix.
+
+    @param A:       The square matrices.
+    @type A:        numpy float or complex array of rank [NE][NS][NM][NO][ND][X][X]
+    @param power:   The integer powers.
+    @type power:    numpy int array of rank [NE][NS][NM][NO][ND]
+    @return:        The matrix powers.
+    @rtype:         numpy float or complex array of rank [NE][NS][NM][NO][ND][X][X]
+    """
+
+    # Loop over the flattened matrices.
+    size = A.shape[-1]
+    return array([matrix_power(A_i, int(p_i)) for A_i, p_i in zip(A.reshape((-1, size, size)), power.ravel())]).reshape(A.shape)
+
+
+def random_matrices(size, complex_flag=True):
+    """Create a batch of random relaxation-like matrices of rank [1][NS][NM][1][ND][X][X].
+
+    @param size:            The matrix dimension X.
+    @type size:             int
+    @keyword complex_flag:  A flag which if True will create complex matrices.
+    @type complex_flag:     bool
+    @return:                The matrices.
+    @rtype:                 numpy float or complex array of rank [1][NS][NM][1][ND][X][X]
+    """
+
+    # The shape.
+    shape = (1, NUM_SPINS, NUM_FRQ, 1, NUM_POINTS, size, size)
+
+    # The matrices, with negative diagonals as for relaxation.
+    A = random.normal(size=shape)
+    if complex_flag:
+        A = A + 1.j * random.normal(size=shape)
+    for i in range(size):
+        A[..., i, i] -= 2.0
+
+    # Return the matrices.
+    return A
+
+
+def time_it(func, *args):
+    """Return the average time of a function call.
+
+    @param func:    The function to time.
+    @type func:     function
+    @param args:    The function arguments.
+    @type args:     tuple
+    @return:        The average time in seconds and the function result.
+    @rtype:         float, anything
+    """
+
+    # Time the repeats.
+    start = default_timer()
+    for i in range(REPEATS):
+        result = func(*args)
+
+    # Return the average time and last result.
+    return (default_timer() - start) / REPEATS, result
+
+
+def main():
+    """Compare the new and original matrix exponential and matrix power implementations."""
+
+    # Printout.
+    print("Batch of %i matrices ([1][%i][%i][1][%i]), %i repetitions.\n" % (NUM_SPINS*NUM_FRQ*NUM_POINTS, NUM_SPINS, NUM_FRQ, NUM_POINTS, REPEATS))
+    print("%-35s %15s %15s %10s %15s" % ("Matrix exponential", "eig (s)", "new (s)", "Speedup", "Max diff"))
+
+    # The matrix exponential for the 2-site and 3-site CPMG, and 3D R1rho sizes.
+    for size, complex_flag, label in [(2, True, "2x2 complex (2-site CPMG)"), (3, True, "3x3 complex (3-site MMQ)"), (3, False, "3x3 real"), (6, False, "6x6 real (2-site R1rho, fallback)")]:
+        A = random_matrices(size, complex_flag=complex_flag)
+        time_eig, eA_eig = time_it(matrix_exponential_eig, A)
+        time_new, eA_new = time_it(matrix_exponential, A)
+        print("%-35s %15.6f %15.6f %10.1f %15.3g" % (label, time_eig, time_new, time_eig/time_new, abs(eA_eig - eA_new).max()))
+
+    # The matrix power, compared to looping over numpy's matrix_power() for each matrix (as done previously in the dispersion target functions).
+    print("\n%-35s %15s %15s %10s %15s" % ("Matrix power", "looped (s)", "new (s)", "Speedup", "Max diff"))
+    for size, complex_flag, label in [(2, True, "2x2 complex (2-site CPMG)"), (3, True, "3x3 complex (3-site MMQ)"), (7, False, "7x7 real (2-site 3D CPMG)")]:
+        A = random_matrices(size, complex_flag=complex_flag) * 0.1
+        power = random.randint(1, 50, size=A.shape[:-2]).astype(int16)
+        time_old, power_old = time_it(matrix_power_looped, A, power)
+        time_new, power_new = time_it(matrix_power_rank_NE_NS_NM_NO_ND_x_x, A, power)
+        print("%-35s %15.6f %15.6f %10.1f %15.3g" % (label, time_old, time_new, time_old/time_new, abs(power_old - power_new).max()))
+
+
+# Execute main function.
+if __name__ == "__main__":
+    main()
@@ -3872,6 +3872,19 @@ class Relax_disp(SystemTestCase):
         estimate_r2eff(method='minfx', min_algor='Newton', c_code=True, constraints=False, chi2_jacobian=False)
         estimate_r2eff(method='minfx', min_algor='Newton', c_code=True, constraints=False, chi2_jacobian=True)
 
+        # The curves fitted one at a time.
+        estimate_r2eff(method='minfx', min_algor='simplex', c_code=True, constraints=False, chi2_jacobian=False)
+        serial = {}
+        for cur_spin, spin_id in spin_loop(return_id=True, skip_desel=True):
+            serial[spin_id] = [copy.deepcopy(cur_spin.r2eff), copy.deepcopy(cur_spin.i0), copy.deepcopy(cur_spin.r2eff_err)]
+
+        # The curves fitted concurrently in a pool of threads must give identical results.
+        estimate_r2eff(method='minfx', min_algor='simplex', c_code=True, constraints=False, chi2_jacobian=False, threads=4)
+        for cur_spin, spin_id in spin_loop(return_id=True, skip_desel=True):
+            self.assertEqual(cur_spin.r2eff, serial[spin_id][0])
+            self.assertEqual(cur_spin.i0, serial[spin_id][1])
+            self.assertEqual(cur_spin.r2eff_err, serial[spin_id][2])
+
 
 
     def test_exp_fit(self):
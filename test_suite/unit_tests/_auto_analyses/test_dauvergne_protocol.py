@@ -0,0 +1,238 @@
+###############################################################################
+#                                                                             #
+# Copyright (C) 2015 Edward d'Auvergne                                        #
+#                                                                             #
+# This file is part of the program relax (http://www.nmr-relax.com).          #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+
+# Python module imports.
+from os import listdir, sep
+from shutil import rmtree
+from tempfile import mkdtemp
+
+# relax module imports.
+from auto_analyses.dauvergne_protocol import Container, dAuvergne_protocol
+from pipe_control import pipes
+from pipe_control.mol_res_spin import create_spin, return_spin
+from prompt.interpreter import Interpreter
+from specific_analyses.model_free.uf import select_model
+from test_suite.unit_tests.base_classes import UnitTestCase
+
+
+class Test_dauvergne_protocol(UnitTestCase):
+    """Unit tests for the incremental mode of the auto_analyses.dauvergne_protocol module."""
+
+    def setUp(self):
+        """Set up the protocol object, without executing the analysis."""
+
+        # The temporary directory.
+        self.tmpdir = mkdtemp()
+
+        # The protocol object.
+        self.protocol = dAuvergne_protocol.__new__(dAuvergne_protocol)
+        self.protocol.pipe_bundle = 'mf'
+        self.protocol.results_dir = self.tmpdir + sep
+        self.protocol.diff_model = 'sphere'
+        self.protocol.round = 2
+        self.protocol.conv_data = Container()
+        self.protocol.conv_data.diff_params = ['tm']
+
+        # The interpreter.
+        self.protocol.interpreter = Interpreter(show_script=False, raise_relax_error=True)
+        self.protocol.interpreter.populate_self()
+        self.protocol.interpreter.on(verbose=False)
+
+
+    def tearDown(self):
+        """Remove the temporary directory and reset relax."""
+
+        # Remove the temporary directory.
+        rmtree(self.tmpdir)
+        del self.tmpdir
+
+        # Reset relax.
+        super(Test_dauvergne_protocol, self).tearDown()
+
+
+    def create_previous(self, tm=None):
+        """Create the 'previous' data pipe holding the current diffusion tensor.
+
+        @keyword tm:    The global correlation time of the spherical diffusion tensor.
+        @type tm:       float
+        """
+
+        # The data pipe and tensor.
+        self.create_spins(pipe=self.protocol.name_pipe('previous'))
+        self.protocol.interpreter.diffusion_tensor.init(tm)
+
+
+    def create_spins(self, pipe=None):
+        """Create a data pipe with three spins.
+
+        @keyword pipe:  The name of the data pipe.
+        @type pipe:     str
+        """
+
+        # The data pipe.
+        pipes.create(pipe, 'mf', bundle='mf')
+
+        # The spins.
+        for i in range(3):
+            create_spin(spin_num=i+1, spin_name='N', res_num=i+1, res_name='GLY')
+
+
+    def round_dir(self, round=None, model=None):
+        """Return the results directory of the model-free model for the given round.
+
+        @keyword round: The round of optimisation.
+        @type round:    int
+        @keyword model: The model-free model.
+        @type model:    str
+        @return:        The directory.
+        @rtype:         str
+        """
+
+        # The directory.
+        return self.tmpdir + sep + 'sphere' + sep + 'round_' + repr(round) + sep + model
+
+
+    def test_reuse_results_changed_tensor(self):
+        """Test that the results of the previous round are not reused when the diffusion tensor has changed."""
+
+        # The results of the previous round and the changed tensor.
+        self.write_round(round=1, model='m2', tm=1e-8)
+        self.create_previous(tm=2e-8)
+
+        # Checks.
+        dir = self.round_dir(round=2, model='m2')
+        self.assertFalse(self.protocol.reuse_results(pipe=self.protocol.name_pipe('m2'), model='m2', dir=dir))
+        self.assertFalse(pipes.has_pipe(self.protocol.name_pipe('m2')))
+        self.assertFalse(self.protocol.has_results(dir))
+
+
+    def test_reuse_results_first_round(self):
+        """Test that nothing is reused in the first round."""
+
+        # The first round.
+        self.protocol.round = 1
+        self.create_previous(tm=1e-8)
+
+        # Checks.
+        dir = self.round_dir(round=1, model='m2')
+        self.assertFalse(self.protocol.reuse_results(pipe=self.protocol.name_pipe('m2'), model='m2', dir=dir))
+        self.assertFalse(pipes.has_pipe(self.protocol.name_pipe('m2')))
+
+
+    def test_reuse_results_resume(self):
+        """Test the resumption of an interrupted round, with the tensor changed since the previous round."""
+
+        # The previous round results of both models, the changed tensor, and the checkpoint of the first model of the interrupted round.
+        self.write_round(round=1, model='m1', tm=1e-8)
+        self.write_round(round=1, model='m2', tm=1e-8)
+        self.write_round(round=2, model='m1', tm=2e-8)
+        self.create_previous(tm=2e-8)
+
+        # The checkpointed model is loaded.
+        self.assertTrue(self.protocol.reuse_results(pipe=self.protocol.name_pipe('m1'), model='m1', dir=self.round_dir(round=2, model='m1')))
+        self.assertEqual(pipes.cdp_name(), self.protocol.name_pipe('m1'))
+        self.assertEqual(return_spin(spin_id=':1').model, 'm1')
+
+        # The optimisation resumes with the next model.
+        self.assertFalse(self.protocol.reuse_results(pipe=self.protocol.name_pipe('m2'), model='m2', dir=self.round_dir(round=2, model='m2')))
+        self.assertFalse(pipes.has_pipe(self.protocol.name_pipe('m2')))
+
+
+    def test_reuse_results_unchanged_tensor(self):
+        """Test the reuse of the results of the previous round when the diffusion tensor is unchanged."""
+
+        # The results of the previous round and the unchanged tensor.
+        self.write_round(round=1, model='m2', tm=1e-8)
+        self.create_previous(tm=1e-8)
+
+        # Reuse.
+        dir = self.round_dir(round=2, model='m2')
+        self.assertTrue(self.protocol.reuse_results(pipe=self.protocol.name_pipe('m2'), model='m2', dir=dir))
+
+        # The results are loaded and checkpointed for this round.
+        self.assertEqual(pipes.cdp_name(), self.protocol.name_pipe('m2'))
+        self.assertEqual(return_spin(spin_id=':1').model, 'm2')
+        self.assertTrue(self.protocol.has_results(dir))
+
+
+    def test_warm_start_spins(self):
+        """Test the warm starting of the spins from the previous round."""
+
+        # The previous round, the first spin with model m2, the second with m1, and the third with m2 but a missing te value.
+        self.create_spins(pipe=self.protocol.name_pipe('previous'))
+        for spin_id, model, s2, te in [[':1', 'm2', 0.8, 20e-12], [':2', 'm1', 0.9, None], [':3', 'm2', 0.7, None]]:
+            spin = return_spin(spin_id=spin_id)
+            spin.model = model
+            spin.s2 = s2
+            spin.te = te
+
+        # The current round, with model m2 selected.
+        self.create_spins(pipe=self.protocol.name_pipe('m2'))
+        select_model(model='m2')
+
+        # Warm start.
+        seeded = self.protocol.warm_start_spins(model='m2')
+
+        # Only the first spin is warm started.
+        self.assertEqual(len(seeded), 1)
+        self.assertTrue(seeded[0] is return_spin(spin_id=':1'))
+        self.assertEqual(seeded[0].s2, 0.8)
+        self.assertEqual(seeded[0].te, 20e-12)
+        self.assertEqual(return_spin(spin_id=':2').s2, None)
+        self.assertEqual(return_spin(spin_id=':3').s2, None)
+
+
+    def test_write_checkpoint(self):
+        """Test the writing of the results file via a temporary file."""
+
+        # A partially written results file is not a result.
+        self.create_spins(pipe='test')
+        file = open(self.tmpdir + sep + 'results.tmp.bz2', 'w')
+        file.close()
+        self.assertFalse(self.protocol.has_results(self.tmpdir))
+
+        # Write the results.
+        self.protocol.write_checkpoint(dir=self.tmpdir)
+
+        # Checks.
+        self.assertTrue(self.protocol.has_results(self.tmpdir))
+        self.assertEqual(sorted(listdir(self.tmpdir)), ['results.bz2'])
+
+
+    def write_round(self, round=None, model=None, tm=None):
+        """Write the results of a model-free model for the given round.
+
+        @keyword round: The round of optimisation.
+        @type round:    int
+        @keyword model: The model-free model.
+        @type model:    str
+        @keyword tm:    The global correlation time of the spherical diffusion tensor used in the round.
+        @type tm:       float
+        """
+
+        # The data pipe, tensor and model.
+        self.create_spins(pipe='round %i - %s' % (round, model))
+        self.protocol.interpreter.diffusion_tensor.init(tm)
+        select_model(model=model)
+
+        # Write the results.
+        self.protocol.write_checkpoint(dir=self.round_dir(round=round, model=model))
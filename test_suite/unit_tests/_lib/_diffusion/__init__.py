@@ -21,5 +21,6 @@
 
 
 __all__ = [
-    'test___init__'
+    'test___init__',
+    'test_memo'
 ]
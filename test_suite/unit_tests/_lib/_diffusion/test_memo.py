@@ -0,0 +1,122 @@
+###############################################################################
+#                                                                             #
+# Copyright (C) 2015 Edward d'Auvergne                                        #
+#                                                                             #
+# This file is part of the program relax (http://www.nmr-relax.com).          #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+# Python module imports.
+from math import sqrt
+from numpy import array, float64, zeros
+from unittest import TestCase
+
+# relax module imports.
+from lib.diffusion.correlation_time import calc_spheroid_ti
+from lib.diffusion.direction_cosine import calc_spheroid_di
+from lib.diffusion.memo import Geometry_memo
+from lib.diffusion.weights import calc_spheroid_ci
+
+
+class Container:
+    """Empty container for the data."""
+
+
+
+class Test_memo(TestCase):
+    """Unit tests for the lib.diffusion.memo module."""
+
+    def setUp(self):
+        """Set up the spheroid diffusion tensor and two spins."""
+
+        # The diffusion tensor data.
+        self.diff_data = Container()
+        self.diff_data.params = array([10e-9, 3e6, 0.5, 1.0], float64)
+        self.diff_data.dpar = zeros(3, float64)
+        self.diff_data.calc_di = calc_spheroid_di
+        self.diff_data.calc_ci = calc_spheroid_ci
+        self.diff_data.calc_ti = calc_spheroid_ti
+
+        # The spin data.
+        self.spins = []
+        for vector in [array([1.0, 0.0, 0.0]), array([0.0, 1.0, 1.0]) / sqrt(2.0)]:
+            self.spins.append(self.spin_data(vector))
+
+
+    def calc(self, diff_data, data):
+        """Calculate the direction cosine, weights and correlation times of the spin.
+
+        @param diff_data:   The diffusion tensor data.
+        @type diff_data:    Container instance
+        @param data:        The spin data.
+        @type data:         Container instance
+        """
+
+        # The geometry.
+        diff_data.calc_di(data, diff_data)
+        diff_data.calc_ci(data, diff_data)
+        diff_data.calc_ti(data, diff_data)
+
+
+    def spin_data(self, vector):
+        """Create the spin data container.
+
+        @param vector:  The XH unit vector.
+        @type vector:   numpy rank-1 array
+        @return:        The spin data.
+        @rtype:         Container instance
+        """
+
+        # The data.
+        data = Container()
+        data.xh_unit_vector = vector
+        data.ci = zeros(3, float64)
+        data.ti = zeros(3, float64)
+        data.tau_scale = zeros(3, float64)
+        return data
+
+
+    def test_geometry_memo(self):
+        """Check the reuse and recalculation of the memoised diffusion tensor geometry."""
+
+        # The memo.
+        memo = Geometry_memo(self.diff_data)
+        self.assertEqual(self.diff_data.memo, memo)
+
+        # Repeated calls for a fixed tensor.
+        for i in range(3):
+            for data in self.spins:
+                self.calc(self.diff_data, data)
+        self.assertEqual(memo.calls, 18)
+        self.assertEqual(memo.hits, 12)
+        self.assertAlmostEqual(memo.reuse_rate(), 2.0/3.0)
+
+        # Change the tensor, and compare to the non-memoised functions.
+        self.diff_data.params[1] = 5e6
+        self.diff_data.params[2] = 1.2
+        for data in self.spins:
+            self.calc(self.diff_data, data)
+            ref = self.spin_data(data.xh_unit_vector)
+            ref_diff = Container()
+            ref_diff.params = self.diff_data.params
+            ref_diff.dpar = zeros(3, float64)
+            calc_spheroid_di(ref, ref_diff)
+            calc_spheroid_ci(ref, ref_diff)
+            calc_spheroid_ti(ref, ref_diff)
+            for j in range(3):
+                self.assertEqual(data.ci[j], ref.ci[j])
+                self.assertEqual(data.ti[j], ref.ti[j])
+        self.assertEqual(memo.hits, 12)
@@ -32,6 +32,7 @@ __all__ = [
     'test_m61',
     'test_m61b',
     'test_matrix_exponential',
+    'test_matrix_power',
     'test_mmq_cr72',
     'test_mp05',
     'test_ns_cpmg_2site_3d',
@@ -190,3 +190,30 @@ class Test_cr72(TestCase):
 
         # Calculate and check the R2eff values.
         self.calc_r2eff()
+
+
+    def test_cr72_grid(self):
+        """Test the r2eff_cr72() function in the grid search mode, with a leading grid point axis, against single grid point calculations."""
+
+        # The grid points, including points without exchange.
+        pA = array([0.95, 1.0, 0.8, 0.95, 0.6])
+        kex = array([1000.0, 1000.0, 0.0, 5000.0, 20000.0])
+        r20a = array([2.0, 3.0, 4.0, 2.0, 10.0])
+        dw = array([2.0, 1.0, 3.0, 0.5, 4.0])
+        num_grid = len(pA)
+
+        # Build the grid structures.
+        k_AB, k_BA, pB, dw_frq = self.param_conversion(pA=pA, kex=kex, dw=dw, sfrq=self.sfrq)
+        a = ones([num_grid, self.num_points])
+        r20a_struct = r20a[:, None] * a
+        dw_struct = dw_frq[:, None] * a
+        R2eff = zeros([num_grid, self.num_points], float64)
+
+        # Calculate the R2eff values for all grid points.
+        r2eff_CR72(r20a=r20a_struct, r20a_orig=r20a, r20b=r20a_struct, r20b_orig=r20a, pA=pA.reshape(num_grid, 1), dw=dw_struct, dw_orig=dw_frq, kex=kex.reshape(num_grid, 1), cpmg_frqs=self.cpmg_frqs, back_calc=R2eff)
+
+        # Check against the individual grid points.
+        for i in range(num_grid):
+            r2eff_CR72(r20a=r20a_struct[i], r20a_orig=r20a_struct[i], r20b=r20a_struct[i], r20b_orig=r20a_struct[i], pA=pA[i], dw=dw_struct[i], dw_orig=dw_struct[i], kex=kex[i], cpmg_frqs=self.cpmg_frqs, back_calc=self.R2eff)
+            for j in range(self.num_points):
+                self.assertAlmostEqual(R2eff[i, j], self.R2eff[j])
@@ -21,14 +21,15 @@
 
 # Python module imports.
 from os import sep
-from numpy import complex64, load, sum
+from numpy import array, complex64, complex128, exp, float64, load, sum, version, zeros
 from unittest import TestCase
 
 # relax module imports.
 from lib.dispersion.ns_cpmg_2site_3d import rcpmg_3d_rankN
 from lib.dispersion.ns_mmq_2site import rmmq_2site_rankN
 from lib.linear_algebra.matrix_exponential import matrix_exponential as np_matrix_exponential
-from lib.dispersion.matrix_exponential import matrix_exponential
+import lib.dispersion.matrix_exponential
+from lib.dispersion.matrix_exponential import matrix_exponential, matrix_exponential_eig, stacked_linalg
 from status import Status; status = Status()
 
 
@@ -92,6 +93,116 @@ class Test_matrix_exponential(TestCase):
         return M0, r20a, r20b, pA, dw, dwH, kex, inv_tcpmg, tcp, num_points, power, back_calc, pB, k_BA, k_AB
 
 
+    def test_dispatch(self):
+        """Test the selection of the closed form 2x2, Pade 3x3 and eigenvalue decomposition matrix exponentials for different numpy versions."""
+
+        # The matrices.
+        A2 = array([[[[[[[-3.0 + 10.0j, 2.0], [1.0, -4.0 - 10.0j]]]]]]])
+        A3 = zeros((1, 1, 1, 1, 1, 3, 3), complex128)
+        A3[0, 0, 0, 0, 0] = [[-5.0 + 10.0j, 2.0, 1.0], [3.0, -4.0, 0.5], [0.5, 2.0, -1.0 - 30.0j]]
+
+        # Count the calls of the specialised functions.
+        calls = []
+        module = lib.dispersion.matrix_exponential
+        orig_2x2, orig_pade, orig_version = module.matrix_exponential_2x2, module.matrix_exponential_pade, version.version
+        module.matrix_exponential_2x2 = lambda A: calls.append(2) or orig_2x2(A)
+        module.matrix_exponential_pade = lambda A: calls.append(3) or orig_pade(A)
+
+        # Loop over the numpy versions, and whether the specialised functions should be used.
+        try:
+            for numpy_version, specialised in [['1.7.1', False], ['1.8.0', True], ['1.10.4', True], ['1.16.6', True], ['1.26.4', True], ['2.0.0', True]]:
+                # Set the version.
+                version.version = numpy_version
+                self.assertEqual(stacked_linalg(), specialised)
+
+                # The exponentials.
+                del calls[:]
+                eA2 = module.matrix_exponential(A2)
+                eA3 = module.matrix_exponential(A3)
+
+                # Check the dispatch.
+                if specialised:
+                    self.assertEqual(calls, [2, 3])
+                else:
+                    self.assertEqual(calls, [])
+
+                # Check the values.
+                self.assertAlmostEqual(abs(eA2[0, 0, 0, 0, 0] - np_matrix_exponential(A2[0, 0, 0, 0, 0])).max(), 0.0)
+                self.assertAlmostEqual(abs(eA3[0, 0, 0, 0, 0] - np_matrix_exponential(A3[0, 0, 0, 0, 0])).max(), 0.0)
+
+        # Restore the module.
+        finally:
+            module.matrix_exponential_2x2, module.matrix_exponential_pade, version.version = orig_2x2, orig_pade, orig_version
+
+
+    def test_matrix_exponential_2x2(self):
+        """Test the closed form 2x2 matrix exponential against the eigenvalue decomposition, including the degenerate and real cases."""
+
+        # A batch of 2x2 matrices of rank [1][1][1][1][4][2][2].
+        A = zeros((1, 1, 1, 1, 4, 2, 2), complex128)
+
+        # A general complex matrix, as for the 2-site CPMG models.
+        A[0, 0, 0, 0, 0] = [[-10.0 + 200.0j, 50.0], [30.0, -15.0 - 200.0j]]
+
+        # A degenerate matrix, which is not diagonalisable.
+        A[0, 0, 0, 0, 1] = [[-1.0, 1.0], [0.0, -1.0]]
+
+        # A nearly degenerate matrix.
+        A[0, 0, 0, 0, 2] = [[-2.0, 1e-8], [1e-8, -2.0 + 1e-9j]]
+
+        # The zero matrix.
+        A[0, 0, 0, 0, 3] = 0.0
+
+        # The exponentials.
+        eA = matrix_exponential(A)
+        eA_eig = np_matrix_exponential(A[0, 0, 0, 0, 0])
+
+        # Check the general matrix against the eigenvalue decomposition.
+        for i in range(2):
+            for j in range(2):
+                self.assertAlmostEqual(eA[0, 0, 0, 0, 0, i, j] / eA_eig[i, j], 1.0)
+
+        # Check the degenerate matrix against the analytic solution exp(-1) * [[1, 1], [0, 1]].
+        self.assertAlmostEqual(eA[0, 0, 0, 0, 1, 0, 0], exp(-1.0))
+        self.assertAlmostEqual(eA[0, 0, 0, 0, 1, 0, 1], exp(-1.0))
+        self.assertAlmostEqual(eA[0, 0, 0, 0, 1, 1, 0], 0.0)
+        self.assertAlmostEqual(eA[0, 0, 0, 0, 1, 1, 1], exp(-1.0))
+
+        # Check the nearly degenerate matrix.
+        self.assertAlmostEqual(eA[0, 0, 0, 0, 2, 0, 0], exp(-2.0))
+        self.assertAlmostEqual(eA[0, 0, 0, 0, 2, 0, 1] / exp(-2.0), 1e-8)
+
+        # Check the zero matrix.
+        self.assertAlmostEqual(eA[0, 0, 0, 0, 3, 0, 0], 1.0)
+        self.assertAlmostEqual(eA[0, 0, 0, 0, 3, 0, 1], 0.0)
+
+        # Real matrices give a real result.
+        A_real = array([[[[[[[-3.0, 2.0], [1.0, -4.0]]]]]]])
+        eA_real = matrix_exponential(A_real)
+        self.assertEqual(eA_real.dtype, float64)
+        self.assertAlmostEqual(abs(eA_real[0, 0, 0, 0, 0] - np_matrix_exponential(A_real[0, 0, 0, 0, 0])).max(), 0.0)
+
+
+    def test_matrix_exponential_3x3(self):
+        """Test the Pade 3x3 matrix exponential against the eigenvalue decomposition."""
+
+        # A batch of 3x3 matrices of rank [1][2][1][1][1][3][3], as for the 3-site MMQ models.
+        A = zeros((1, 2, 1, 1, 1, 3, 3), complex128)
+        A[0, 0, 0, 0, 0] = [[-500.0 + 1000.0j, 200.0, 10.0], [300.0, -400.0, 50.0], [5.0, 20.0, -100.0 - 3000.0j]]
+        A[0, 1, 0, 0, 0] = [[-0.1, 0.2, 0.0], [0.0, -0.1, 0.2], [0.0, 0.0, -0.1]]
+
+        # The exponentials.
+        eA = matrix_exponential(A)
+
+        # Compare to the eigenvalue decomposition, relative to the largest element.
+        eA_eig = np_matrix_exponential(A[0, 0, 0, 0, 0])
+        self.assertAlmostEqual(abs(eA[0, 0, 0, 0, 0] - eA_eig).max() / abs(eA_eig).max(), 0.0)
+
+        # The non-diagonalisable matrix (for which the eigenvalue decomposition fails), compared to the analytic solution.
+        eA_true = exp(-0.1) * array([[1.0, 0.2, 0.02], [0.0, 1.0, 0.2], [0.0, 0.0, 1.0]])
+        self.assertAlmostEqual(abs(eA[0, 1, 0, 0, 0] - eA_true).max(), 0.0)
+
+
     def test_ns_cpmg_2site_3d_hansen_cpmg_data(self):
         """Test the matrix_exponential() function for higher dimensional data, and compare to matrix_exponential.  This uses the data from systemtest Relax_disp.test_hansen_cpmg_data_to_ns_cpmg_2site_3D."""
 
@@ -0,0 +1,70 @@
+###############################################################################
+#                                                                             #
+# Copyright (C) 2014 Troels E. Linnet                                         #
+#                                                                             #
+# This file is part of the program relax (http://www.nmr-relax.com).          #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+# Python module imports.
+
+# Python module imports.
+from numpy import array, complex128, float64, int16, zeros
+from numpy.linalg import matrix_power
+from unittest import TestCase
+
+# relax module imports.
+from lib.dispersion.matrix_power import matrix_power_rank_NE_NS_NM_NO_ND_x_x
+
+
+class Test_matrix_power(TestCase):
+    """Unit tests for the lib.dispersion.matrix_power relax module."""
+
+    def test_matrix_power_rank_NE_NS_NM_NO_ND_x_x_complex(self):
+        """Test the batched matrix_power_rank_NE_NS_NM_NO_ND_x_x() function for complex 2x2 matrices with different powers."""
+
+        # The matrices of rank [1][1][1][1][4][2][2], and the powers.
+        A = zeros((1, 1, 1, 1, 4, 2, 2), complex128)
+        A[0, 0, 0, 0] = array([[0.9 + 0.1j, 0.05], [0.02, 0.8 - 0.2j]])
+        A[0, 0, 0, 0, 1] *= 1.1
+        power = array([[[[[0, 1, 7, 40]]]]], int16)
+
+        # The powers.
+        A_power = matrix_power_rank_NE_NS_NM_NO_ND_x_x(A, power)
+
+        # Checks.
+        self.assertEqual(A_power.dtype, complex128)
+        for di in range(4):
+            A_power_di = matrix_power(A[0, 0, 0, 0, di], int(power[0, 0, 0, 0, di]))
+            self.assertAlmostEqual(abs(A_power[0, 0, 0, 0, di] - A_power_di).max(), 0.0)
+
+
+    def test_matrix_power_rank_NE_NS_NM_NO_ND_x_x_real(self):
+        """Test the batched matrix_power_rank_NE_NS_NM_NO_ND_x_x() function for real 3x3 matrices."""
+
+        # The matrices of rank [1][2][1][1][1][3][3], and the powers.
+        A = zeros((1, 2, 1, 1, 1, 3, 3), float64)
+        A[0, 0, 0, 0, 0] = [[0.5, 0.1, 0.0], [0.2, 0.6, 0.1], [0.0, 0.3, 0.4]]
+        A[0, 1, 0, 0, 0] = [[1.0, 1.0, 0.0], [0.0, 1.0, 1.0], [0.0, 0.0, 1.0]]
+        power = array([[[[[13]]], [[[5]]]]], int16)
+
+        # The powers.
+        A_power = matrix_power_rank_NE_NS_NM_NO_ND_x_x(A, power)
+
+        # Checks.
+        self.assertEqual(A_power.dtype, float64)
+        self.assertAlmostEqual(abs(A_power[0, 0, 0, 0, 0] - matrix_power(A[0, 0, 0, 0, 0], 13)).max(), 0.0)
+        self.assertAlmostEqual(abs(A_power[0, 1, 0, 0, 0] - array([[1.0, 5.0, 10.0], [0.0, 1.0, 5.0], [0.0, 0.0, 1.0]])).max(), 0.0)
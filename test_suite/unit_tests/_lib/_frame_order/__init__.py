@@ -23,4 +23,5 @@
 __all__ = [
     'test___init__',
     'test_matrix_ops',
+    'test_sobol',
 ]
@@ -21,7 +21,7 @@
 
 # Python module imports.
 from math import pi
-from numpy import array, float64, zeros
+from numpy import array, dot, float64, random, uint8, zeros
 from unittest import TestCase
 
 # relax module imports.
@@ -35,7 +35,8 @@ from lib.frame_order.pseudo_ellipse import compile_2nd_matrix_pseudo_ellipse
 from lib.frame_order.pseudo_ellipse_free_rotor import compile_2nd_matrix_pseudo_ellipse_free_rotor
 from lib.frame_order.pseudo_ellipse_torsionless import compile_2nd_matrix_pseudo_ellipse_torsionless
 from lib.frame_order.rotor import compile_2nd_matrix_rotor
-from lib.frame_order.matrix_ops import reduce_alignment_tensor
+from lib.frame_order.matrix_ops import pcs_sum_adaptive_qr_int, pcs_sum_states_qr_int, reduce_alignment_tensor
+from lib.compat import norm
 from lib.geometry.coord_transform import cartesian_to_spherical, spherical_to_cartesian
 from lib.geometry.rotations import euler_to_R_zyz, two_vect_to_R
 from lib.linear_algebra.kronecker_product import kron_prod, transpose_23
@@ -1070,6 +1071,86 @@ class Test_matrix_ops(TestCase):
                 self.assertTrue(abs(f2[i, j] - real[i, j]) < 1e-3)
 
 
+    def test_pcs_sum_adaptive_qr_int(self):
+        """Test the adaptive state summation of lib.frame_order.matrix_ops.pcs_sum_adaptive_qr_int()."""
+
+        # PCS values which converge on 1 ppm, the state k contributing 1 + (-1)**k / (k+1) ppm.
+        values = array([1.0 + (-1)**k / (k + 1.0) for k in range(1000)]) * 1e-6
+        def func(start, end):
+            pcs_theta[0, 0] += values[start:end].sum()
+        c = array([[1.0]])
+
+        # No tolerance, so all states are used.
+        pcs_theta = zeros((1, 1), float64)
+        self.assertEqual(pcs_sum_adaptive_qr_int(func=func, num=1000, c=c, tol=None, pcs_theta=pcs_theta), 1000)
+        self.assertAlmostEqual(pcs_theta[0, 0], values.sum())
+
+        # A loose tolerance, the change in the average on doubling being approximately ln(2)/(2N) ppm.
+        pcs_theta = zeros((1, 1), float64)
+        num = pcs_sum_adaptive_qr_int(func=func, num=1000, c=c, tol=0.01, pcs_theta=pcs_theta)
+        self.assertEqual(num, 128)
+        self.assertAlmostEqual(pcs_theta[0, 0], values[:128].sum())
+
+        # An unreachable tolerance, so all states are used.
+        pcs_theta = zeros((1, 1), float64)
+        self.assertEqual(pcs_sum_adaptive_qr_int(func=func, num=1000, c=c, tol=1e-10, pcs_theta=pcs_theta), 1000)
+
+
+    def test_pcs_sum_adaptive_qr_int_chunks(self):
+        """Test the summation of lib.frame_order.matrix_ops.pcs_sum_adaptive_qr_int() in chunks of states."""
+
+        # PCS values which converge on 1 ppm, recording the state ranges of each call.
+        values = array([1.0 + (-1)**k / (k + 1.0) for k in range(1000)]) * 1e-6
+        calls = []
+        def func(start, end):
+            calls.append((start, end))
+            pcs_theta[0, 0] += values[start:end].sum()
+        c = array([[1.0]])
+
+        # All states in chunks of 300.
+        pcs_theta = zeros((1, 1), float64)
+        self.assertEqual(pcs_sum_adaptive_qr_int(func=func, num=1000, c=c, tol=None, pcs_theta=pcs_theta, chunk=300), 1000)
+        self.assertEqual(calls, [(0, 300), (300, 600), (600, 900), (900, 1000)])
+        self.assertAlmostEqual(pcs_theta[0, 0], values.sum())
+
+        # The doubling blocks are split into chunks of 50, without changing the convergence.
+        calls = []
+        pcs_theta = zeros((1, 1), float64)
+        self.assertEqual(pcs_sum_adaptive_qr_int(func=func, num=1000, c=c, tol=0.01, pcs_theta=pcs_theta, chunk=50), 128)
+        self.assertEqual(calls, [(0, 16), (16, 32), (32, 64), (64, 114), (114, 128)])
+        self.assertAlmostEqual(pcs_theta[0, 0], values[:128].sum())
+
+
+    def test_pcs_sum_states_qr_int(self):
+        """Test the state summed PCS of lib.frame_order.matrix_ops.pcs_sum_states_qr_int() against a loop over the states, atoms and alignments."""
+
+        # The data, with the 2nd alignment using the reversed vectors and one missing PCS.
+        random.seed(0)
+        full_in_ref_frame = array([1, 0, 1], uint8)
+        rot_vect = random.uniform(5.0, 10.0, (4, 5, 3))
+        rot_vect_rev = random.uniform(5.0, 10.0, (4, 5, 3))
+        A = random.uniform(-1e-4, 1e-4, (3, 3, 3))
+        missing_pcs = zeros((3, 5), uint8)
+        missing_pcs[2, 1] = 1
+
+        # The vectorised sum.
+        pcs_theta = zeros((3, 5), float64)
+        pcs_sum_states_qr_int(full_in_ref_frame=full_in_ref_frame, rot_vect=rot_vect, rot_vect_rev=rot_vect_rev, A=A, pcs_theta=pcs_theta, missing_pcs=missing_pcs)
+
+        # Loop over the states, atoms and alignments.
+        for i in range(3):
+            for j in range(5):
+                pcs = 0.0
+                if not missing_pcs[i, j]:
+                    for k in range(4):
+                        if full_in_ref_frame[i]:
+                            vect = rot_vect[k, j]
+                        else:
+                            vect = rot_vect_rev[k, j]
+                        pcs += dot(vect, dot(A[i], vect)) / norm(vect)**5
+                self.assertAlmostEqual(pcs_theta[i, j]*1e8, pcs*1e8, 10)
+
+
     def test_reduce_alignment_tensor_order(self):
         """Test the alignment tensor reduction for the order identity matrix."""
 
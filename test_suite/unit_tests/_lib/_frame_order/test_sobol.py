@@ -0,0 +1,145 @@
+###############################################################################
+#                                                                             #
+# Copyright (C) 2015 Edward d'Auvergne                                        #
+#                                                                             #
+# This file is part of the program relax (http://www.nmr-relax.com).          #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+# Python module imports.
+from numpy import dot, eye, float64, memmap, sin, zeros
+from os import listdir, sep
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+# relax module imports.
+from lib.frame_order.sobol import sobol_cache_file, sobol_data_generate, sobol_data_load
+from lib.geometry.rotations import tilt_torsion_to_R
+
+
+class Test_sobol(TestCase):
+    """Unit tests for the lib.frame_order.sobol relax module."""
+
+    def setUp(self):
+        """Create a temporary directory for the cache."""
+
+        # The temporary directory.
+        self.tmpdir = mkdtemp()
+
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+
+        # Delete the directory and its contents.
+        rmtree(self.tmpdir)
+
+
+    def check_rotations(self, Ri_prime):
+        """Check that all matrices are rotation matrices.
+
+        @param Ri_prime:    The rotation matrices.
+        @type Ri_prime:     numpy rank-3 array
+        """
+
+        # Loop over the matrices.
+        for i in range(len(Ri_prime)):
+            R = Ri_prime[i].astype(float64)
+            self.assertTrue(abs(dot(R, R.T) - eye(3)).max() < 1e-6)
+
+
+    def test_sobol_data_generate_double_rotor(self):
+        """Check the double rotor data of lib.frame_order.sobol.sobol_data_generate()."""
+
+        # Generate the data.
+        angles, Ri_prime, Ri2_prime = sobol_data_generate(dims=['sigma', 'sigma2'], total_num=100)
+
+        # Checks.
+        self.assertEqual(angles.shape, (2, 100))
+        self.check_rotations(Ri_prime)
+        self.check_rotations(Ri2_prime)
+        self.assertAlmostEqual(Ri_prime[5, 0, 2], sin(angles[0, 5]), 6)
+        self.assertAlmostEqual(Ri2_prime[5, 2, 1], sin(angles[1, 5]), 6)
+
+
+    def test_sobol_data_generate_tilt_torsion(self):
+        """Check the full tilt-torsion data of lib.frame_order.sobol.sobol_data_generate() against lib.geometry.rotations.tilt_torsion_to_R()."""
+
+        # Generate the data.
+        angles, Ri_prime, Ri2_prime = sobol_data_generate(dims=['theta', 'phi', 'sigma'], total_num=200)
+
+        # Compare to the single point function.
+        R = zeros((3, 3), float64)
+        for i in range(200):
+            tilt_torsion_to_R(float(angles[1, i]), float(angles[0, i]), float(angles[2, i]), R)
+            self.assertTrue(abs(Ri_prime[i] - R).max() < 1e-6)
+
+        # The second matrices are unused.
+        self.assertEqual(abs(Ri2_prime).max(), 0.0)
+
+
+    def test_sobol_data_generate_torsionless(self):
+        """Check the torsionless data of lib.frame_order.sobol.sobol_data_generate() against lib.geometry.rotations.tilt_torsion_to_R()."""
+
+        # Generate the data.
+        angles, Ri_prime, Ri2_prime = sobol_data_generate(dims=['theta', 'phi'], total_num=200)
+
+        # Compare to the single point function with zero torsion.
+        R = zeros((3, 3), float64)
+        for i in range(200):
+            tilt_torsion_to_R(float(angles[1, i]), float(angles[0, i]), 0.0, R)
+            self.assertTrue(abs(Ri_prime[i] - R).max() < 1e-6)
+
+
+    def test_sobol_data_load(self):
+        """Check the on-disk cache of lib.frame_order.sobol.sobol_data_load()."""
+
+        # The cache directory (not yet created).
+        cache_dir = self.tmpdir + sep + 'cache'
+
+        # Create the cache.
+        data = sobol_data_load(cache_dir=cache_dir, model='iso cone', dims=['theta', 'phi', 'sigma'], total_num=50)
+
+        # The files, without any temporary files left behind.
+        files = [cache_dir + sep + file_name for file_name in listdir(cache_dir)]
+        self.assertEqual(len(files), 3)
+        for name in ['sobol_angles', 'Ri_prime', 'Ri2_prime']:
+            self.assertTrue(sobol_cache_file(cache_dir=cache_dir, model='iso cone', dims=['theta', 'phi', 'sigma'], total_num=50, name=name) in files)
+
+        # The data is memory mapped, read-only, and identical to the generated data.
+        ref = sobol_data_generate(dims=['theta', 'phi', 'sigma'], total_num=50)
+        for i in range(3):
+            self.assertTrue(isinstance(data[i], memmap))
+            self.assertFalse(data[i].flags.writeable)
+            self.assertEqual(abs(data[i] - ref[i]).max(), 0.0)
+
+        # Reload from the cache.
+        data2 = sobol_data_load(cache_dir=cache_dir, model='iso cone', dims=['theta', 'phi', 'sigma'], total_num=50)
+        for i in range(3):
+            self.assertEqual(abs(data2[i] - ref[i]).max(), 0.0)
+        self.assertEqual(len(listdir(cache_dir)), 3)
+
+
+    def test_sobol_data_load_no_cache(self):
+        """Check lib.frame_order.sobol.sobol_data_load() without a cache directory."""
+
+        # Generate the data.
+        data = sobol_data_load(cache_dir=None, model='rotor', dims=['sigma'], total_num=20)
+
+        # Checks.
+        self.assertFalse(isinstance(data[0], memmap))
+        self.assertEqual(data[1].shape, (20, 3, 3))
+        self.check_rotations(data[1])
@@ -20,5 +20,12 @@
 ###############################################################################
 
 
-__all__ = ['test___init__'
+__all__ = ['test___init__',
+           'test_journal',
+           'test_local_processor',
+           'test_mpi_buffers',
+           'test_multi_processor_base',
+           'test_processor',
+           'test_shared_arrays',
+           'test_trace'
 ]
@@ -0,0 +1,163 @@
+###############################################################################
+#                                                                             #
+# Copyright (C) 2015 Edward d'Auvergne                                        #
+#                                                                             #
+# This file is part of the program relax (http://www.nmr-relax.com).          #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+# Python module imports.
+from numpy import arange
+from os import sep
+from os.path import getsize
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+# relax module imports.
+from multi.journal import Queue_journal, command_hash
+from multi.memo import Memo
+from multi.result_commands import Result_command
+from multi.slave_commands import Slave_command
+from multi.uni_processor import Uni_processor
+
+
+# The values of the executed commands.
+EXECUTED = []
+
+
+class Square_command(Slave_command):
+    """A slave command for testing."""
+
+    def __init__(self, value=None):
+        super(Square_command, self).__init__()
+        self.value = value
+
+    def run(self, processor, completed):
+        EXECUTED.append(self.value)
+        processor.return_object(Square_result(processor=processor, memo_id=self.memo_id, value=self.value**2, completed=completed))
+
+
+
+class Square_result(Result_command):
+    """A result command for testing."""
+
+    def __init__(self, processor=None, memo_id=None, value=None, completed=True):
+        super(Square_result, self).__init__(processor=processor, completed=completed)
+        self.memo_id = memo_id
+        self.value = value
+
+    def run(self, processor, memo):
+        memo.results.append(self.value)
+
+
+
+class Square_memo(Memo):
+    """A memo for testing."""
+
+    def __init__(self, results=None):
+        super(Square_memo, self).__init__()
+        self.results = results
+
+
+
+class Test_journal(TestCase):
+    """Unit tests for the multi.journal module."""
+
+    def setUp(self):
+        """Create a temporary directory for the journal."""
+
+        self.tmpdir = mkdtemp()
+        self.file_name = self.tmpdir + sep + 'journal'
+
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+
+        rmtree(self.tmpdir)
+
+
+    def run_queue(self, values, results):
+        """Run a queue of commands on a new uni-processor with the journal.
+
+        @param values:  The values to square.
+        @type values:   list of int
+        @param results: The list to store the results in.
+        @type results:  list
+        @return:        The number of commands executed.
+        @rtype:         int
+        """
+
+        # Set up.
+        processor = Uni_processor(processor_size=1, callback=None)
+        processor.set_journal(file_name=self.file_name, checkpoint_freq=2)
+        del EXECUTED[:]
+
+        # Queue the commands.
+        for value in values:
+            processor.add_to_queue(Square_command(value=value), Square_memo(results=results))
+
+        # Execute.
+        processor.run_queue()
+
+        # Return the number of executed commands.
+        return len(EXECUTED)
+
+
+    def test_command_hash(self):
+        """Test the deterministic command hashes."""
+
+        # Identical commands with different memo IDs.
+        command1 = Square_command(value=arange(5))
+        command1.memo_id = 1
+        command2 = Square_command(value=arange(5))
+        command2.memo_id = 2
+
+        # Checks.
+        self.assertEqual(command_hash(command1), command_hash(command2))
+        self.assertNotEqual(command_hash(command1), command_hash(Square_command(value=arange(6))))
+
+
+    def test_resume(self):
+        """Test the replay of the journalled results."""
+
+        # The first run.
+        results = []
+        self.assertEqual(self.run_queue([1, 2, 3], results), 3)
+        self.assertEqual(results, [1, 4, 9])
+
+        # The second run with extra commands.
+        results = []
+        self.assertEqual(self.run_queue([1, 2, 3, 4], results), 1)
+        self.assertEqual(sorted(results), [1, 4, 9, 16])
+
+
+    def test_truncated(self):
+        """Test the loading of a journal with a truncated final record."""
+
+        # Create the journal.
+        self.run_queue([1, 2], [])
+
+        # Truncate the file.
+        size = getsize(self.file_name)
+        file = open(self.file_name, 'rb+')
+        file.truncate(size - 5)
+        file.close()
+
+        # Reload and check.
+        journal = Queue_journal(file_name=self.file_name)
+        self.assertEqual(len(journal.results), 1)
+        self.assertTrue(getsize(self.file_name) < size - 5)
@@ -0,0 +1,376 @@
+###############################################################################
+#                                                                             #
+# Copyright (C) 2015 Edward d'Auvergne                                        #
+#                                                                             #
+# This file is part of the program relax (http://www.nmr-relax.com).          #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+
+# Python module imports.
+from io import StringIO
+from numpy import arange, float64
+import sys
+from unittest import TestCase
+
+# relax module imports.
+from multi import Memo, Processor_box, Result_command, Slave_command, fetch_shared_array
+from multi.local_processor import Local_processor
+from multi.misc import Verbosity; verbosity = Verbosity()
+
+
+class Registry_command(Slave_command):
+    """Slave command for summing a shared array and reporting the contents of the shared array registry of the slave."""
+
+    def __init__(self, handle=None):
+        """Store the shared array handle.
+
+        @keyword handle:    The shared array handle, or None to only report the registry contents.
+        @type handle:       Shared_array instance or None
+        """
+
+        # Initialise the base class.
+        super(Registry_command, self).__init__()
+
+        # Store the argument.
+        self.handle = handle
+
+
+    def run(self, processor, completed):
+        """Sum the array on the slave.
+
+        @param processor:   The slave processor the command is running on.
+        @type processor:    Processor instance
+        @param completed:   The flag used in batching result returns to indicate that the sequence of batched result commands has completed.
+        @type completed:    bool
+        """
+
+        # The sum.
+        total = None
+        if self.handle != None:
+            total = fetch_shared_array(self.handle).sum()
+
+        # Return the result.
+        processor.return_object(Registry_result_command(processor=processor, memo_id=self.memo_id, total=total, names=sorted(processor.shared_arrays.keys()), completed=completed))
+
+
+
+class Registry_memo(Memo):
+    """The memo for storing the registry results on the master."""
+
+    def __init__(self, results):
+        """Store the results list.
+
+        @param results: The list of results.
+        @type results:  list
+        """
+
+        # Store the argument.
+        self.results = results
+
+
+
+class Registry_result_command(Result_command):
+    """The result command for storing the sum and registry contents on the master."""
+
+    def __init__(self, processor, memo_id=None, total=None, names=None, completed=True):
+        """Store the results from the slave.
+
+        @param processor:   The slave processor.
+        @type processor:    Processor instance
+        @keyword memo_id:   The ID of the memo.
+        @type memo_id:      str
+        @keyword total:     The sum of the array.
+        @type total:        float or None
+        @keyword names:     The names of the arrays in the shared array registry of the slave.
+        @type names:        list of str
+        @keyword completed: A flag which if True indicates that the slave command has completed.
+        @type completed:    bool
+        """
+
+        # Initialise the base class.
+        super(Registry_result_command, self).__init__(processor=processor, completed=completed, memo_id=memo_id)
+
+        # Store the arguments.
+        self.total = total
+        self.names = names
+
+
+    def run(self, processor, memo):
+        """Store the results in the memo.
+
+        @param processor:   The master processor.
+        @type processor:    Processor instance
+        @param memo:        The memo of the command.
+        @type memo:         Registry_memo instance
+        """
+
+        # Store.
+        memo.results.append((self.total, self.names))
+
+
+
+class Square_command(Slave_command):
+    """Slave command for squaring a number and reporting the slave rank."""
+
+    def __init__(self, value):
+        """Store the number.
+
+        @param value:   The number to square.
+        @type value:    int
+        """
+
+        # Initialise the base class.
+        super(Square_command, self).__init__()
+
+        # Store the argument.
+        self.value = value
+
+
+    def run(self, processor, completed):
+        """Square the number on the slave.
+
+        @param processor:   The slave processor the command is running on.
+        @type processor:    Processor instance
+        @param completed:   The flag used in batching result returns to indicate that the sequence of batched result commands has completed.
+        @type completed:    bool
+        """
+
+        # The rank as seen by the API functions.
+        box_processor = Processor_box().processor
+
+        # Return the result.
+        processor.return_object(Square_result_command(processor=processor, memo_id=self.memo_id, square=self.value**2, rank=box_processor.rank(), on_master=box_processor.on_master(), completed=completed))
+
+
+
+class Square_memo(Memo):
+    """The memo for storing the results on the master."""
+
+    def __init__(self, value, results):
+        """Store the number and the results dictionary.
+
+        @param value:   The number to square.
+        @type value:    int
+        @param results: The dictionary of results, with the numbers as keys.
+        @type results:  dict
+        """
+
+        # Store the arguments.
+        self.value = value
+        self.results = results
+
+
+
+class Square_result_command(Result_command):
+    """The result command for storing the square and slave rank on the master."""
+
+    def __init__(self, processor, memo_id=None, square=None, rank=None, on_master=None, completed=True):
+        """Store the results from the slave.
+
+        @param processor:   The slave processor.
+        @type processor:    Processor instance
+        @keyword memo_id:   The ID of the memo.
+        @type memo_id:      str
+        @keyword square:    The square of the number.
+        @type square:       int
+        @keyword rank:      The rank of the processor from Processor_box on the slave.
+        @type rank:         int
+        @keyword on_master: The on_master() value of the processor from Processor_box on the slave.
+        @type on_master:    bool
+        @keyword completed: A flag which if True indicates that the slave command has completed.
+        @type completed:    bool
+        """
+
+        # Initialise the base class.
+        super(Square_result_command, self).__init__(processor=processor, completed=completed, memo_id=memo_id)
+
+        # Store the arguments.
+        self.square = square
+        self.box_rank = rank
+        self.on_master = on_master
+
+
+    def run(self, processor, memo):
+        """Store the results in the memo.
+
+        @param processor:   The master processor.
+        @type processor:    Processor instance
+        @param memo:        The memo of the command.
+        @type memo:         Square_memo instance
+        """
+
+        # Store.
+        memo.results[memo.value] = (self.square, self.box_rank, self.on_master)
+
+
+
+class Test_local_processor(TestCase):
+    """Unit tests for the multi.local_processor module."""
+
+    def setUp(self):
+        """Store the processor of the Processor_box and the verbosity level."""
+
+        # Store.
+        self.box_processor = getattr(Processor_box(), 'processor', None)
+        self.verbosity = verbosity.level()
+        verbosity.set(0)
+
+
+    def tearDown(self):
+        """Restore the processor of the Processor_box and the verbosity level."""
+
+        # Restore.
+        Processor_box().processor = self.box_processor
+        verbosity.set(self.verbosity)
+
+
+    def test_run_queue(self):
+        """Run a queue of slave commands and memos on 2 local slaves."""
+
+        # Set up the master and start the slaves.
+        processor = Local_processor(processor_size=2, callback=None)
+        Processor_box().processor = processor
+        processor._start_slaves()
+
+        # Run the queue.
+        results = {}
+        try:
+            for value in range(10):
+                processor.add_to_queue(Square_command(value), Square_memo(value, results))
+            processor.run_queue()
+
+        # Terminate the slaves.
+        finally:
+            processor._stop_slaves()
+
+        # Checks.
+        self.assertEqual(sorted(results.keys()), list(range(10)))
+        for value in range(10):
+            square, rank, on_master = results[value]
+            self.assertEqual(square, value**2)
+            self.assertTrue(rank in [1, 2])
+            self.assertFalse(on_master)
+        self.assertEqual(processor.slave_stats.ranks, [1, 2])
+        self.assertEqual(sum(processor.slave_stats.commands.values()), 10)
+
+
+    def test_run_queue_static_scheduling(self):
+        """Run a queue of slave commands and memos on 2 local slaves as fixed chunks of commands."""
+
+        # Set up the master and start the slaves.
+        processor = Local_processor(processor_size=2, callback=None)
+        Processor_box().processor = processor
+        processor.set_dynamic_scheduling(False)
+        processor._start_slaves()
+
+        # Run the queue.
+        results = {}
+        try:
+            for value in range(10):
+                processor.add_to_queue(Square_command(value), Square_memo(value, results))
+            processor.run_queue()
+
+        # Terminate the slaves.
+        finally:
+            processor._stop_slaves()
+
+        # Checks.
+        self.assertEqual(sorted(results.keys()), list(range(10)))
+        for value in range(10):
+            self.assertEqual(results[value][0], value**2)
+        self.assertEqual(processor.slave_stats.commands, {1: 5, 2: 5})
+
+
+    def test_run_queue_statistics(self):
+        """Check that the slave utilisation statistics are printed at the zero verbosity level."""
+
+        # Set up the master and start the slaves.
+        processor = Local_processor(processor_size=2, callback=None)
+        Processor_box().processor = processor
+        processor._start_slaves()
+
+        # Run the queue, capturing the master's STDOUT.
+        results = {}
+        stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            for value in range(4):
+                processor.add_to_queue(Square_command(value), Square_memo(value, results))
+            processor.run_queue()
+            text = sys.stdout.getvalue()
+
+        # Restore STDOUT and terminate the slaves.
+        finally:
+            sys.stdout = stdout
+            processor._stop_slaves()
+
+        # Checks.
+        self.assertTrue("Slave utilisation statistics:" in text)
+        self.assertTrue("Wall time" in text)
+
+
+    def test_temporary_shared_array(self):
+        """Check the release of a temporary shared array on the master and 2 local slaves."""
+
+        # Set up the master and start the slaves.
+        processor = Local_processor(processor_size=2, callback=None)
+        Processor_box().processor = processor
+        processor._start_slaves()
+
+        # Run the queues.
+        results = []
+        registry = []
+        try:
+            # Use the array on both slaves.
+            handle = processor.share_array(name='sim', value=arange(5, dtype=float64), temporary=True)
+            for i in range(2):
+                processor.add_to_queue(Registry_command(handle=handle), Registry_memo(results))
+            processor.run_queue()
+
+            # The registries after the release.
+            for i in range(2):
+                processor.add_to_queue(Registry_command(), Registry_memo(registry))
+            processor.run_queue()
+
+        # Terminate the slaves.
+        finally:
+            processor._stop_slaves()
+
+        # Checks.
+        self.assertEqual(results, [(10.0, ['sim']), (10.0, ['sim'])])
+        self.assertEqual(registry, [(None, []), (None, [])])
+        self.assertEqual(processor.shared_arrays, {})
+
+
+    def test_temporary_shared_array_failure(self):
+        """Check the release of a temporary shared array on the master when the queue execution fails."""
+
+        # Set up the master, with the execution of the queue failing.
+        processor = Local_processor(processor_size=2, callback=None)
+        Processor_box().processor = processor
+        def run_command_queue(queue):
+            raise RuntimeError("The queue execution failed.")
+        processor.run_command_queue = run_command_queue
+
+        # Run the queue.
+        handle = processor.share_array(name='sim', value=arange(5, dtype=float64), temporary=True)
+        processor.add_to_queue(Registry_command(handle=handle), Registry_memo([]))
+        self.assertRaises(RuntimeError, processor.run_queue)
+
+        # Checks.
+        self.assertEqual(processor.shared_arrays, {})
+        self.assertEqual(processor._temporary_shared_arrays, [])
@@ -0,0 +1,70 @@
+###############################################################################
+#                                                                             #
+# Copyright (C) 2015 Edward d'Auvergne                                        #
+#                                                                             #
+# This file is part of the program relax (http://www.nmr-relax.com).          #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+# Python module imports.
+from numpy import arange, array, float64, int32, ones
+from unittest import TestCase
+
+# relax module imports.
+from multi.mpi_buffers import Comm_stats, empty_arrays, pack_object, unpack_object
+
+
+class Test_mpi_buffers(TestCase):
+    """Unit tests for the multi.mpi_buffers module."""
+
+    def test_pack_unpack(self):
+        """Test the extraction and reinsertion of the numpy arrays of an object."""
+
+        # A nested structure with large, small and non-contiguous arrays.
+        big = arange(1000, dtype=float64).reshape((10, 100))
+        obj = {'a': [big, ones(3)], 'b': (big[:, ::2], arange(500, dtype=int32)), 'c': 'text'}
+
+        # Pack.
+        header, arrays = pack_object(obj)
+        self.assertEqual(len(arrays), 3)
+        self.assertEqual(header[1][1], ((10, 50), big.dtype.str))
+
+        # Simulate the buffer transfer.
+        received = empty_arrays(header)
+        for i in range(len(arrays)):
+            received[i][...] = arrays[i]
+
+        # Unpack and check.
+        new = unpack_object(header, arrays=received)
+        self.assertEqual(new['a'][0].tolist(), big.tolist())
+        self.assertEqual(new['a'][1].tolist(), [1.0, 1.0, 1.0])
+        self.assertEqual(new['b'][0].tolist(), big[:, ::2].tolist())
+        self.assertEqual(new['b'][1].dtype, int32)
+        self.assertEqual(new['c'], 'text')
+
+
+    def test_comm_stats(self):
+        """Test the communication statistics."""
+
+        # Add some messages.
+        stats = Comm_stats()
+        stats.add(direction='send', name='Cmd', header_bytes=100, buffer_bytes=8000, time=0.002)
+        stats.add(direction='send', name='Cmd', header_bytes=50, buffer_bytes=0, time=0.004)
+
+        # Checks.
+        self.assertEqual(stats.stats[('send', 'Cmd')][:3], [2, 150, 8000])
+        self.assertAlmostEqual(stats.stats[('send', 'Cmd')][4], 0.004)
+        self.assertEqual(len(stats.format().splitlines()), 2)
@@ -0,0 +1,128 @@
+###############################################################################
+#                                                                             #
+# Copyright (C) 2015 Edward d'Auvergne                                        #
+#                                                                             #
+# This file is part of the program relax (http://www.nmr-relax.com).          #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+# Python module imports.
+from unittest import TestCase
+
+# relax module imports.
+from multi import Slave_command
+from multi.local_processor import Local_processor
+
+
+class Cost_command(Slave_command):
+    """Slave command with a given cost estimate."""
+
+    def __init__(self, name, cost):
+        """Store the name and cost.
+
+        @param name:    The name of the command.
+        @type name:     str
+        @param cost:    The cost estimate.
+        @type cost:     float
+        """
+
+        # Initialise the base class.
+        super(Cost_command, self).__init__()
+
+        # Store the arguments.
+        self.name = name
+        self._cost = cost
+
+
+    def cost(self):
+        """Return the cost estimate.
+
+        @return:    The cost estimate.
+        @rtype:     float
+        """
+
+        return self._cost
+
+
+
+class Named_command(object):
+    """Command without a cost() method, as for commands not derived from Slave_command."""
+
+    def __init__(self, name):
+        """Store the name.
+
+        @param name:    The name of the command.
+        @type name:     str
+        """
+
+        # Store the argument.
+        self.name = name
+
+
+
+class Test_multi_processor_base(TestCase):
+    """Unit tests for the multi.multi_processor_base module."""
+
+    def setUp(self):
+        """Set up a local processor without starting the slaves."""
+
+        # The processor.
+        self.processor = Local_processor(processor_size=2, callback=None)
+
+
+    def test_chunk_queue(self):
+        """Check the splitting of the queue into chunks by Multi_processor.chunk_queue()."""
+
+        # The queue.
+        queue = [Cost_command(str(i), 1.0) for i in range(5)]
+
+        # Split.
+        chunks = self.processor.chunk_queue(queue)
+
+        # Checks.
+        self.assertEqual([[command.name for command in chunk] for chunk in chunks], [['0', '1', '4'], ['2', '3']])
+
+
+    def test_cost_sort_queue(self):
+        """Check the ordering of the queue by Multi_processor.cost_sort_queue()."""
+
+        # The queue.
+        queue = [Cost_command('a', 2.0), Cost_command('b', 10.0), Cost_command('c', 0.5), Cost_command('d', 5.0)]
+
+        # Sort.
+        queue = self.processor.cost_sort_queue(queue)
+
+        # The dispatch order, as the commands are popped off the end of the queue.
+        order = [command.name for command in reversed(queue)]
+
+        # Checks.
+        self.assertEqual(order, ['b', 'd', 'a', 'c'])
+
+
+    def test_cost_sort_queue_ties(self):
+        """Check that Multi_processor.cost_sort_queue() dispatches commands of equal cost in the original queue order."""
+
+        # The queue, including a command without a cost() method.
+        queue = [Cost_command('a', 1.0), Cost_command('b', 3.0), Cost_command('c', 1.0), Cost_command('d', 3.0), Named_command('e'), Cost_command('f', 1.0)]
+
+        # Sort.
+        queue = self.processor.cost_sort_queue(queue)
+
+        # The dispatch order, as the commands are popped off the end of the queue.
+        order = [command.name for command in reversed(queue)]
+
+        # Checks.
+        self.assertEqual(order, ['b', 'd', 'a', 'c', 'e', 'f'])
@@ -0,0 +1,101 @@
+###############################################################################
+#                                                                             #
+# Copyright (C) 2015 Edward d'Auvergne                                        #
+#                                                                             #
+# This file is part of the program relax (http://www.nmr-relax.com).          #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+# Python module imports.
+from io import StringIO
+import sys
+from time import sleep
+from unittest import TestCase
+
+# relax module imports.
+from multi.local_processor import Local_processor
+from multi.processor import Slave_statistics
+
+
+class Test_processor(TestCase):
+    """Unit tests for the multi.processor module."""
+
+    def test_set_dynamic_scheduling(self):
+        """Check the switching between the dynamic and static scheduling via Processor.set_dynamic_scheduling()."""
+
+        # The processor, without starting the slaves.
+        processor = Local_processor(processor_size=2, callback=None)
+
+        # The default.
+        self.assertTrue(processor.dynamic_scheduling)
+
+        # Switch.
+        processor.set_dynamic_scheduling(False)
+        self.assertFalse(processor.dynamic_scheduling)
+        processor.set_dynamic_scheduling()
+        self.assertTrue(processor.dynamic_scheduling)
+
+
+    def test_slave_statistics(self):
+        """Check the command counts and busy times of the Slave_statistics class."""
+
+        # Initialise.
+        stats = Slave_statistics(3)
+        self.assertEqual(stats.ranks, [1, 2, 3])
+        self.assertEqual(stats.commands, {1: 0, 2: 0, 3: 0})
+        self.assertEqual(stats.busy_time, {1: 0.0, 2: 0.0, 3: 0.0})
+
+        # A single command on slave 1 and a chunk of 3 commands on slave 2.
+        stats.dispatch(1, object())
+        stats.dispatch(2, [object(), object(), object()])
+        sleep(0.01)
+        stats.complete(1)
+        stats.complete(2)
+
+        # A second command on slave 1.
+        stats.dispatch(1, object())
+        sleep(0.01)
+        stats.complete(1)
+
+        # Completions without a dispatch are ignored.
+        stats.complete(2)
+        stats.complete(3)
+        stats.finish()
+
+        # The command counts.
+        self.assertEqual(stats.commands, {1: 2, 2: 3, 3: 0})
+
+        # The busy times.
+        self.assertTrue(stats.busy_time[1] >= 0.02)
+        self.assertTrue(stats.busy_time[2] >= 0.01)
+        self.assertTrue(stats.busy_time[1] > stats.busy_time[2])
+        self.assertEqual(stats.busy_time[3], 0.0)
+        self.assertTrue(stats.end_time - stats.start_time >= stats.busy_time[1])
+
+        # The table.
+        stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            stats.print_table()
+            table = sys.stdout.getvalue()
+        finally:
+            sys.stdout = stdout
+        lines = table.strip().split('\n')
+        self.assertEqual(len(lines), 6)
+        self.assertEqual(lines[2].split()[:2], ['1', '2'])
+        self.assertEqual(lines[3].split()[:2], ['2', '3'])
+        self.assertEqual(lines[4].split()[:3], ['3', '0', '0.000'])
+        self.assertEqual(lines[5].split()[:3], ['Wall', 'time', '5'])
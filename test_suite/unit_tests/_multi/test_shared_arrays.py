@@ -0,0 +1,101 @@
+###############################################################################
+#                                                                             #
+# Copyright (C) 2015 Edward d'Auvergne                                        #
+#                                                                             #
+# This file is part of the program relax (http://www.nmr-relax.com).          #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+# Python module imports.
+from numpy import arange, float64
+from pickle import dumps, loads
+from unittest import TestCase
+
+# relax module imports.
+from multi.shared_arrays import Shared_array, attach_shm_array, close_shm, create_shm_array, shared_memory
+from multi.uni_processor import Uni_processor
+
+
+class Test_shared_arrays(TestCase):
+    """Unit tests for the multi.shared_arrays module and the shared array registry."""
+
+    def test_registry(self):
+        """Test the shared array registry of the uni-processor."""
+
+        # Share an array.
+        processor = Uni_processor(processor_size=1, callback=None)
+        value = arange(12, dtype=float64).reshape((3, 4))
+        handle = processor.share_array(name='test', value=value)
+
+        # Checks.
+        self.assertEqual(handle.shape, (3, 4))
+        self.assertEqual(handle.dtype, value.dtype.str)
+        self.assertTrue(processor.fetch_shared_array(handle) is value)
+        self.assertEqual(processor.fetch_shared_array(2), 2)
+
+        # Replace the array.
+        new_handle = processor.share_array(name='test', value=2.0*value)
+        self.assertNotEqual(handle.key, new_handle.key)
+        self.assertEqual(processor.fetch_shared_array(new_handle)[0, 1], 2.0)
+
+        # Release the array.
+        processor.release_shared_array('test')
+        self.assertEqual(processor.shared_arrays, {})
+
+
+    def test_reuse_temporary(self):
+        """Test the reuse of identical arrays and the release of temporary arrays at the end of the queue execution."""
+
+        # Share an array twice.
+        processor = Uni_processor(processor_size=1, callback=None)
+        value = arange(6, dtype=float64)
+        handle = processor.share_array(name='common', value=value, reuse=True)
+        self.assertTrue(processor.share_array(name='common', value=value.copy(), reuse=True) is handle)
+
+        # A changed array is shared again.
+        new_handle = processor.share_array(name='common', value=2.0*value, reuse=True)
+        self.assertNotEqual(handle.key, new_handle.key)
+
+        # A temporary array.
+        processor.share_array(name='sim', value=value, temporary=True)
+        self.assertEqual(sorted(processor.shared_arrays.keys()), ['common', 'sim'])
+
+        # Execute the queue, releasing the temporary array.
+        processor.run_queue()
+        self.assertEqual(list(processor.shared_arrays.keys()), ['common'])
+
+
+    def test_shm_round_trip(self):
+        """Test the transfer of an array via POSIX shared memory and a pickled handle."""
+
+        # Python versions without shared memory support.
+        if shared_memory == None:
+            return
+
+        # Create the segment.
+        value = arange(20, dtype=float64).reshape((4, 5))
+        shm, array = create_shm_array(value=value)
+        handle = loads(dumps(Shared_array(name='test', key='test-1', shape=value.shape, dtype=value.dtype.str, shm_name=shm.name)))
+
+        # Attach and check.
+        shm2, array2 = attach_shm_array(handle=handle)
+        self.assertEqual(array2.tolist(), value.tolist())
+        self.assertFalse(array2.flags.writeable)
+
+        # Clean up.
+        del array, array2
+        close_shm(shm=shm2)
+        close_shm(shm=shm, unlink=True)
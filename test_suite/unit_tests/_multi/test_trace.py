@@ -0,0 +1,76 @@
+###############################################################################
+#                                                                             #
+# Copyright (C) 2015 Edward d'Auvergne                                        #
+#                                                                             #
+# This file is part of the program relax (http://www.nmr-relax.com).          #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+# Python module imports.
+from json import load
+from os import sep
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+# relax module imports.
+from multi.trace import RESULT_TRACK, Trace_recorder, command_name
+
+
+class Test_trace(TestCase):
+    """Unit tests for the multi.trace module."""
+
+    def test_command_name(self):
+        """Test the naming of the commands and chunks of commands."""
+
+        # Checks.
+        self.assertEqual(command_name(self), 'Test_trace')
+        self.assertEqual(command_name([self, self]), 'Chunk of 2 commands')
+
+
+    def test_trace_export(self):
+        """Test the recording, summary and Chrome trace export of the events."""
+
+        # Set up.
+        tmpdir = mkdtemp()
+        file_name = tmpdir + sep + 'trace.json'
+        trace = Trace_recorder(file_name=file_name)
+        origin = trace.origin
+
+        # Record some events.
+        trace.span(name='Cmd', cat='send', track=0, start=origin+0.001, end=origin+0.002, args={'dest': 1})
+        trace.span(name='Cmd', cat='slave', track=1, start=origin+0.001, end=origin+0.011)
+        trace.span(name='Cmd', cat='slave', track=1, start=origin+0.012, end=origin+0.042)
+        trace.span(name='Result', cat='result', track=RESULT_TRACK, start=origin+0.043, end=origin+0.044)
+
+        # The summary.
+        table = trace.format_summary(trace.events, title="Title")
+        self.assertTrue("slave      Cmd" in table)
+        self.assertTrue("20.000" in table)
+
+        # Write and read the trace.
+        trace.write()
+        file = open(file_name)
+        data = load(file)
+        file.close()
+        rmtree(tmpdir)
+
+        # Checks.
+        events = data['traceEvents']
+        self.assertEqual(len(events), 7)
+        self.assertEqual([event['args']['name'] for event in events[:3]], ['Result processing', 'Master', 'Slave 1'])
+        self.assertTrue(abs(events[4]['ts'] - 1000.0) < 1.0)
+        self.assertTrue(abs(events[5]['dur'] - 30000.0) < 1.0)
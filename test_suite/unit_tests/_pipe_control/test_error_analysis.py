@@ -0,0 +1,73 @@
+###############################################################################
+#                                                                             #
+# Copyright (C) 2015 Edward d'Auvergne                                        #
+#                                                                             #
+# This file is part of the program relax (http://www.nmr-relax.com).          #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+# relax module imports.
+from data_store import Relax_data_store; ds = Relax_data_store()
+from pipe_control import error_analysis, pipes
+from test_suite.unit_tests.base_classes import UnitTestCase
+
+
+class Test_error_analysis(UnitTestCase):
+    """Unit tests for the functions of the 'pipe_control.error_analysis' module."""
+
+    def setUp(self):
+        """Set up for all the error analysis unit tests."""
+
+        # Add a data pipe to the data store.
+        ds.add(pipe_name='orig', pipe_type='relax_fit')
+        pipes.switch('orig')
+
+        # Set up 5 simulations.
+        cdp.sim_number = 5
+        cdp.sim_state = True
+
+        # Simulation data for the single spin.
+        spin = cdp.mol[0].res[0].spin[0]
+        spin.rx_sim = [None, None, None, None, None]
+        spin.chi2_sim = [None, None, None, None, None]
+        spin.rx = 1.0
+
+
+    def test_sim_extract_merge(self):
+        """Test the extraction and merging of a block of simulation results.
+
+        The functions tested are pipe_control.error_analysis._sim_extract() and _sim_merge().
+        """
+
+        # Copy the data pipe to act as the slave copy, and set some simulation results.
+        pipes.copy('orig', 'slave')
+        spin = ds['slave'].mol[0].res[0].spin[0]
+        spin.rx_sim = [0.0, 1.1, 2.0, 3.3, 4.0]
+        spin.chi2_sim = [0.0, 10.0, 20.0, 30.0, 40.0]
+        spin.i0_sim = [5.0, 6.0, 7.0, 8.0, 9.0]
+
+        # Extract and merge the block of simulations 1 and 3.
+        sim_data = error_analysis._sim_extract(ds['slave'], [1, 3])
+        error_analysis._sim_merge(ds['orig'], [1, 3], sim_data)
+
+        # Check the merged data.
+        spin = ds['orig'].mol[0].res[0].spin[0]
+        self.assertEqual(spin.rx_sim, [None, 1.1, None, 3.3, None])
+        self.assertEqual(spin.chi2_sim, [None, 10.0, None, 30.0, None])
+        self.assertEqual(spin.i0_sim, [None, 6.0, None, 8.0, None])
+
+        # The non-simulation data should be untouched.
+        self.assertEqual(spin.rx, 1.0)
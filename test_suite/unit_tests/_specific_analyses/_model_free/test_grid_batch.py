@@ -0,0 +1,114 @@
+###############################################################################
+#                                                                             #
+# Copyright (C) 2015 Edward d'Auvergne                                        #
+#                                                                             #
+# This file is part of the program relax (http://www.nmr-relax.com).          #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+# Python module imports.
+from math import sqrt
+from numpy import argmin, array, diag, float64, linspace, meshgrid, transpose
+from unittest import TestCase
+
+# relax module imports.
+from lib.physical_constants import N15_CSA, NH_BOND_LENGTH, h_bar, mu0
+from specific_analyses.model_free.grid_batch import MF_grid_batch
+from target_functions.mf import Mf
+
+
+class Test_grid_batch(TestCase):
+    """Unit tests for the specific_analyses.model_free.grid_batch module."""
+
+    def setUp(self):
+        """Set up the relaxation data for three spins."""
+
+        # The relaxation data, the last spin having an NOE without the matching R1 data and a single field strength.
+        self.ri_labels = [['R1', 'R2', 'NOE', 'R1', 'R2', 'NOE'], ['R1', 'R2', 'NOE', 'R1', 'R2', 'NOE'], ['R2', 'NOE']]
+        self.remap_table = [[0, 0, 0, 1, 1, 1], [0, 0, 0, 1, 1, 1], [0, 0]]
+        self.noe_r1_table = [[None, None, 0, None, None, 3], [None, None, 0, None, None, 3], [None, None]]
+        self.relax_data = [array([1.5, 13.0, 0.75, 1.2, 15.0, 0.8]), array([1.3, 12.0, 0.6, 1.0, 14.0, 0.7]), array([11.0, 0.5])]
+        self.errors = [array([0.03, 0.3, 0.05, 0.02, 0.4, 0.05]), array([0.03, 0.3, 0.05, 0.02, 0.4, 0.05]), array([0.3, 0.05])]
+        self.num_frq = [2, 2, 1]
+        self.frq = [[600e6, 800e6], [600e6, 800e6], [600e6]]
+
+        # The XH unit vectors.
+        self.vectors = [array([1.0, 0.0, 0.0]), array([0.0, 1.0, 1.0]) / sqrt(2.0), array([1.0, -2.0, 3.0]) / sqrt(14.0)]
+
+
+    def check_grid(self, model_type=None, equation=None, param_types=None, lower=None, upper=None, scaling=None, diff_type='sphere', diff_params=[10e-9]):
+        """Compare the vectorised grid search to the per-spin target functions.
+
+        @keyword model_type:    The model type, either 'mf' or 'local_tm'.
+        @type model_type:       str
+        @keyword equation:      The model-free equation.
+        @type equation:         str
+        @keyword param_types:   The model-free parameters.
+        @type param_types:      list of str
+        @keyword lower:         The lower bounds of the grid.
+        @type lower:            list of float
+        @keyword upper:         The upper bounds of the grid.
+        @type upper:            list of float
+        @keyword scaling:       The diagonal scaling factors.
+        @type scaling:          list of float
+        @keyword diff_type:     The diffusion tensor type.
+        @type diff_type:        str
+        @keyword diff_params:   The diffusion tensor parameters.
+        @type diff_params:      list of float
+        """
+
+        # The scaled grid with 4 increments per dimension.
+        axes = [linspace(lower[i], upper[i], 4) / scaling[i] for i in range(len(lower))]
+        points = transpose(array([x.flatten() for x in meshgrid(*axes, indexing='ij')]))
+
+        # The target functions of each spin.
+        models = []
+        for i in range(3):
+            models.append(Mf(init_params=points[0], model_type=model_type, diff_type=diff_type, diff_params=diff_params, scaling_matrix=diag(scaling), num_spins=1, equations=[equation], param_types=[param_types], param_values=None, relax_data=[self.relax_data[i]], errors=[self.errors[i]], bond_length=[NH_BOND_LENGTH], csa=[N15_CSA], num_frq=[self.num_frq[i]], frq=[self.frq[i]], num_ri=[len(self.ri_labels[i])], remap_table=[self.remap_table[i]], noe_r1_table=[self.noe_r1_table[i]], ri_labels=[self.ri_labels[i]], gx=[-2.7126e7], gh=[26.7522212e7], h_bar=h_bar, mu0=mu0, num_params=[len(param_types)], vectors=[self.vectors[i]]))
+
+        # The vectorised grid search, with a small chunk size.
+        batch = MF_grid_batch(models=models, chunk_size=1000)
+        chi2 = batch.chi2(points)
+        index, best_chi2 = batch.search(points)
+
+        # Compare to the per-spin target functions.
+        for i in range(3):
+            loop = array([models[i].func(point) for point in points], float64)
+            for j in range(len(points)):
+                self.assertAlmostEqual(chi2[i, j] / loop[j], 1.0, 10)
+            self.assertEqual(index[i], argmin(loop))
+            self.assertAlmostEqual(best_chi2[i] / loop[index[i]], 1.0, 10)
+
+
+    def test_local_tm_mf_ext(self):
+        """Check the vectorised grid search for a local tm model with the extended model-free equation."""
+
+        # Check.
+        self.check_grid(model_type='local_tm', equation='mf_ext', param_types=['local_tm', 's2f', 'tf', 's2', 'ts'], lower=[5e-9, 0.7, 0.0, 0.5, 0.0], upper=[15e-9, 1.0, 100e-12, 1.0, 5e-9], scaling=[1e-12, 1.0, 1e-12, 1.0, 1e-12])
+
+
+    def test_mf_orig_ellipsoid(self):
+        """Check the vectorised grid search for the original model-free equation with Rex, the bond length and CSA and an ellipsoid."""
+
+        # Check.
+        self.check_grid(model_type='mf', equation='mf_orig', param_types=['s2', 'te', 'rex', 'r', 'csa'], lower=[0.5, 0.0, 0.0, 1.0e-10, -200e-6], upper=[1.0, 500e-12, 5.0 / (2.0*3.1415926*600e6)**2, 1.05e-10, -150e-6], scaling=[1.0, 1e-12, 1.0 / (2.0*3.1415926*600e6)**2, 1e-10, 1e-6], diff_type='ellipsoid', diff_params=[10e-9, 3e6, 0.3, 0.5, 1.0, 2.0])
+
+
+    def test_mf_ext_spheroid(self):
+        """Check the vectorised grid search for the extended model-free equation without tf and a spheroid."""
+
+        # Check.
+        self.check_grid(model_type='mf', equation='mf_ext', param_types=['s2f', 's2', 'ts'], lower=[0.7, 0.5, 0.0], upper=[1.0, 1.0, 5e-9], scaling=[1.0, 1.0, 1e-12], diff_type='spheroid', diff_params=[10e-9, 3e6, 0.5, 1.0])
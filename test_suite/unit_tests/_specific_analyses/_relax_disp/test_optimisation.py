@@ -0,0 +1,218 @@
+###############################################################################
+#                                                                             #
+# Copyright (C) 2015 Edward d'Auvergne                                        #
+#                                                                             #
+# This file is part of the program relax (http://www.nmr-relax.com).          #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+# Python module imports.
+from minfx.grid import grid
+from numpy import array, float64, inf, zeros
+
+# relax module imports.
+from lib.errors import RelaxError
+from specific_analyses.relax_disp.optimisation import grid_search, r20_bounds_separable, r20_profile_constraints
+from test_suite.unit_tests.base_classes import UnitTestCase
+
+
+class Grid_recorder:
+    """A target function class recording the grid points in the order of evaluation."""
+
+    def __init__(self, grid_chunk=None):
+        """Set up the target function.
+
+        @keyword grid_chunk:    The number of grid points per block of the vectorised grid search.
+        @type grid_chunk:       int
+        """
+
+        # Store the data.
+        self.grid_chunk = grid_chunk
+        self.points = []
+
+
+    def func(self, params):
+        """The target function, with a single minimum at [1, 2, 3].
+
+        @param params:  The parameter vector.
+        @type params:   numpy rank-1 float array
+        @return:        The function value.
+        @rtype:         float
+        """
+
+        # Record the point.
+        self.points.append(list(params))
+
+        # The function value.
+        return float(((params - array([1.0, 2.0, 3.0])[:len(params)])**2).sum())
+
+
+    def func_grid(self, points):
+        """The target function for a block of grid points.
+
+        @param points:  The parameter vectors of the grid points.
+        @type points:   numpy rank-2 float array
+        @return:        The function values.
+        @rtype:         numpy rank-1 float array
+        """
+
+        # Loop over the points.
+        chi2 = zeros(len(points), float64)
+        for i in range(len(points)):
+            chi2[i] = self.func(points[i])
+
+        # Return the values.
+        return chi2
+
+
+
+class Test_optimisation(UnitTestCase):
+    """Unit tests for the functions of the specific_analyses.relax_disp.optimisation module."""
+
+    def check_grid_search(self, inc=None, lower=None, upper=None, A=None, b=None):
+        """Compare grid_search() to the minfx grid search.
+
+        @keyword inc:   The number of increments for each dimension of the grid search.
+        @type inc:      list of int
+        @keyword lower: The lower bounds of the grid search.
+        @type lower:    list of float
+        @keyword upper: The upper bounds of the grid search.
+        @type upper:    list of float
+        @keyword A:     The linear constraint matrix.
+        @type A:        None or numpy rank-2 float array
+        @keyword b:     The linear constraint scalar vector.
+        @type b:        None or numpy rank-1 float array
+        """
+
+        # The minfx grid search.
+        minfx_model = Grid_recorder()
+        minfx_results = grid(func=minfx_model.func, args=(), num_incs=inc, lower=lower, upper=upper, A=A, b=b, verbosity=0)
+
+        # The vectorised grid search, with blocks not aligned to the grid dimensions.
+        model = Grid_recorder(grid_chunk=7)
+        results = grid_search(model=model, inc=inc, lower=lower, upper=upper, A=A, b=b)
+
+        # The same points in the same order (the last point of grid_search() is the recalculation of the minimum).
+        self.assertEqual(model.points[:-1], minfx_model.points)
+        self.assertEqual(model.points[-1], list(results[0]))
+
+        # The same minimum.
+        self.assertEqual(list(results[0]), list(minfx_results[0]))
+        self.assertEqual(results[1], minfx_results[1])
+        self.assertEqual(results[2], len(minfx_model.points))
+
+
+    def test_grid_search(self):
+        """Compare grid_search() to the minfx grid search for the point order and minimum."""
+
+        # Check.
+        self.check_grid_search(inc=[5, 4, 3], lower=[0.0, 0.0, 0.0], upper=[4.0, 3.0, 4.0])
+
+
+    def test_grid_search_constraints(self):
+        """Compare grid_search() to the minfx grid search with the grid points filtered by the linear constraints A.x >= b."""
+
+        # The constraints x0 >= 1, x1 - x0 >= 0, and -x2 >= -3.
+        A = array([
+            [ 1.0,  0.0,  0.0],
+            [-1.0,  1.0,  0.0],
+            [ 0.0,  0.0, -1.0]
+        ], float64)
+        b = array([1.0, 0.0, -3.0], float64)
+
+        # Check.
+        self.check_grid_search(inc=[5, 4, 3], lower=[0.0, 0.0, 0.0], upper=[4.0, 3.0, 4.0], A=A, b=b)
+
+
+    def test_grid_search_midpoint(self):
+        """Compare grid_search() to the minfx grid search for the midpoint of a dimension with a single increment."""
+
+        # Check.
+        self.check_grid_search(inc=[5, 1, 3], lower=[0.0, 1.0, 0.0], upper=[4.0, 3.0, 4.0])
+
+        # The midpoint.
+        results = grid_search(model=Grid_recorder(grid_chunk=7), inc=[5, 1, 3], lower=[0.0, 1.0, 0.0], upper=[4.0, 3.0, 4.0])
+        self.assertEqual(results[0][1], 2.0)
+
+
+    def test_r20_bounds_separable(self):
+        """Test r20_bounds_separable() for constraints which are simple bounds on the R20 parameters."""
+
+        # The R20 bounds, and a constraint on the remaining parameters.
+        A = array([
+            [ 1.0,  0.0,  0.0],
+            [-1.0,  0.0,  0.0],
+            [ 0.0,  1.0,  0.0],
+            [ 0.0,  0.0,  1.0]
+        ], float64)
+
+        # Checks.
+        self.assertTrue(r20_bounds_separable(A=A, num=2))
+        self.assertTrue(r20_bounds_separable(A=None, num=2))
+
+
+    def test_r20_bounds_separable_coupled(self):
+        """Test r20_bounds_separable() for a constraint coupling two R20 parameters, or an R20 parameter to another parameter."""
+
+        # The R20 parameters coupled together.
+        A = array([
+            [ 1.0, -1.0,  0.0],
+            [ 0.0,  0.0,  1.0]
+        ], float64)
+        self.assertFalse(r20_bounds_separable(A=A, num=2))
+
+        # An R20 parameter coupled to another parameter.
+        A = array([
+            [ 1.0,  0.0,  0.0],
+            [ 0.0,  1.0, -1.0]
+        ], float64)
+        self.assertFalse(r20_bounds_separable(A=A, num=2))
+
+
+    def test_r20_profile_constraints(self):
+        """Test the splitting of the linear constraints by r20_profile_constraints()."""
+
+        # The constraints 0 <= R20_1 <= 200, R20_2 >= 0, and x >= 1.
+        A = array([
+            [ 1.0,  0.0,  0.0],
+            [-1.0,  0.0,  0.0],
+            [ 0.0,  1.0,  0.0],
+            [ 0.0,  0.0,  1.0]
+        ], float64)
+        b = array([0.0, -200.0, 0.0, 1.0], float64)
+
+        # Split.
+        A_new, b_new, lower, upper = r20_profile_constraints(A=A, b=b, num=2)
+
+        # Checks.
+        self.assertEqual(A_new.tolist(), [[1.0]])
+        self.assertEqual(b_new.tolist(), [1.0])
+        self.assertEqual(lower.tolist(), [0.0, 0.0])
+        self.assertEqual(upper.tolist(), [200.0, inf])
+
+
+    def test_r20_profile_constraints_coupled(self):
+        """Test that r20_profile_constraints() raises a RelaxError when a constraint couples an R20 parameter to another parameter."""
+
+        # An R20 parameter coupled to another parameter.
+        A = array([
+            [ 1.0,  0.0,  0.0],
+            [ 0.0,  1.0, -1.0]
+        ], float64)
+        b = array([0.0, 0.0], float64)
+
+        # The error.
+        self.assertRaises(RelaxError, r20_profile_constraints, A=A, b=b, num=2)
@@ -0,0 +1,143 @@
+###############################################################################
+#                                                                             #
+# Copyright (C) 2015 Edward d'Auvergne                                        #
+#                                                                             #
+# This file is part of the program relax (http://www.nmr-relax.com).          #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+# Python module imports.
+from minfx.grid import grid
+from numpy import array, float64
+from unittest import TestCase
+
+# relax module imports.
+from lib.errors import RelaxError
+from multi import Processor_box
+from multi.local_processor import Local_processor
+from multi.misc import Verbosity; verbosity = Verbosity()
+from specific_analyses.api_base import API_base
+from specific_analyses.grid_split import reduce_grid_results
+
+
+def double_well(params):
+    """A target function with two equal minima at x = -1 and x = 1, and y = 0.5.
+
+    @param params:  The parameter vector [x, y].
+    @type params:   numpy rank-1 array
+    @return:        The function value.
+    @rtype:         float
+    """
+
+    # The function value.
+    return min((params[0] - 1.0)**2, (params[0] + 1.0)**2) + (params[1] - 0.5)**2
+
+
+
+class Test_grid_split(TestCase):
+    """Unit tests for the specific_analyses.grid_split module and the API_base.grid_search_split() method."""
+
+    def setUp(self):
+        """Store the processor of the Processor_box and the verbosity level."""
+
+        # Store.
+        self.box_processor = getattr(Processor_box(), 'processor', None)
+        self.verbosity = verbosity.level()
+        verbosity.set(0)
+
+
+    def tearDown(self):
+        """Restore the processor of the Processor_box and the verbosity level."""
+
+        # Restore.
+        Processor_box().processor = self.box_processor
+        verbosity.set(self.verbosity)
+
+
+    def check_grid_search_split(self, dynamic_scheduling=True):
+        """Compare the grid search split over 3 local slaves to the minfx grid search of the full grid.
+
+        @keyword dynamic_scheduling:    The scheduling of the processor queue.
+        @type dynamic_scheduling:       bool
+        """
+
+        # The grid.
+        lower = [-2.0, -1.0]
+        upper = [2.0, 1.0]
+        inc = [9, 5]
+
+        # The reference grid search.
+        param_vector, chi2, iter_count, warning = grid(func=double_well, args=(), num_incs=inc, lower=lower, upper=upper, verbosity=0)
+
+        # Set up the master and start the slaves.
+        processor = Local_processor(processor_size=3, callback=None)
+        Processor_box().processor = processor
+        processor.set_dynamic_scheduling(dynamic_scheduling)
+        processor._start_slaves()
+
+        # The split grid search.
+        try:
+            results = API_base().grid_search_split(func=double_well, lower=lower, upper=upper, inc=inc, verbosity=0)
+
+        # Terminate the slaves.
+        finally:
+            processor._stop_slaves()
+
+        # Checks.
+        self.assertEqual(list(results[0]), list(param_vector))
+        self.assertEqual(results[1], chi2)
+        self.assertEqual(results[2], iter_count)
+
+
+    def test_grid_search_split(self):
+        """Compare the grid search split over 3 local slaves with dynamic scheduling to the minfx grid search of the full grid."""
+
+        # Check.
+        self.check_grid_search_split()
+
+
+    def test_grid_search_split_static(self):
+        """Compare the grid search split over 3 local slaves with static scheduling to the minfx grid search of the full grid."""
+
+        # Check.
+        self.check_grid_search_split(dynamic_scheduling=False)
+
+
+    def test_reduce_grid_results(self):
+        """Check that reduce_grid_results() keeps the first of equal minima in subdivision order."""
+
+        # The subdivision results, in an arbitrary completion order.
+        results = [
+            (2, (array([1.0, 0.0], float64), 0.0, 4, None)),
+            (0, (array([-2.0, 0.0], float64), 1.0, 4, None)),
+            (1, (array([-1.0, 0.0], float64), 0.0, 4, None))
+        ]
+
+        # Reduce.
+        param_vector, chi2, iter_count, warning = reduce_grid_results(results)
+
+        # Checks.
+        self.assertEqual(list(param_vector), [-1.0, 0.0])
+        self.assertEqual(chi2, 0.0)
+        self.assertEqual(iter_count, 12)
+        self.assertEqual(warning, None)
+
+
+    def test_reduce_grid_results_empty(self):
+        """Check that reduce_grid_results() raises a RelaxError when no grid points remain."""
+
+        # The error.
+        self.assertRaises(RelaxError, reduce_grid_results, [])
@@ -21,5 +21,8 @@
 
 
 __all__ = [
-    'test_relax_fit'
+    'test_mf_vectorised',
+    'test_relax_disp',
+    'test_relax_fit',
+    'test_relax_fit_batch'
 ]
@@ -0,0 +1,163 @@
+###############################################################################
+#                                                                             #
+# Copyright (C) 2015 Edward d'Auvergne                                        #
+#                                                                             #
+# This file is part of the program relax (http://www.nmr-relax.com).          #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+# Python module imports.
+from math import sqrt
+from numpy import array, diag, float64, zeros
+from unittest import TestCase
+
+# relax module imports.
+from lib.physical_constants import N15_CSA, NH_BOND_LENGTH, h_bar, mu0
+from target_functions.mf import Mf
+
+
+class Test_mf_vectorised(TestCase):
+    """Unit tests for the target_functions.mf_vectorised module."""
+
+    def setUp(self):
+        """Set up the data for three spins with different model-free equations and relaxation data sets."""
+
+        # The model-free equations, parameters and values of the spins.
+        self.equations = ['mf_orig', 'mf_ext', 'mf_ext2']
+        self.param_types = [['s2', 'te', 'rex'], ['s2f', 'tf', 's2', 'ts', 'r', 'csa'], ['s2f', 'tf', 's2s', 'ts']]
+        self.mf_params = [0.8, 20e-12, 1.5, 0.85, 15e-12, 0.6, 1e-9, 1.03e-10, -160e-6, 0.9, 10e-12, 0.7, 2e-9]
+
+        # The relaxation data, the last spin having an NOE without the matching R1 data.
+        self.ri_labels = [['R1', 'R2', 'NOE', 'R1', 'R2', 'NOE'], ['R1', 'R2', 'NOE', 'R1', 'R2', 'NOE'], ['R2', 'NOE', 'R1']]
+        self.remap_table = [[0, 0, 0, 1, 1, 1], [0, 0, 0, 1, 1, 1], [0, 0, 1]]
+        self.noe_r1_table = [[None, None, 0, None, None, 3], [None, None, 0, None, None, 3], [None, None, None]]
+        self.relax_data = [array([1.5, 13.0, 0.75, 1.2, 15.0, 0.8]), array([1.3, 12.0, 0.6, 1.0, 14.0, 0.7]), array([11.0, 0.5, 1.1])]
+        self.errors = [array([0.03, 0.3, 0.05, 0.02, 0.4, 0.05]), array([0.03, 0.3, 0.05, 0.02, 0.4, 0.05]), array([0.3, 0.05, 0.02])]
+        self.frq = [[600e6, 800e6], [600e6, 800e6], [600e6, 800e6]]
+
+        # The XH unit vectors.
+        self.vectors = [array([1.0, 0.0, 0.0]), array([0.0, 1.0, 1.0]) / sqrt(2.0), array([1.0, -2.0, 3.0]) / sqrt(14.0)]
+
+
+    def check_derivatives(self, mf, params, loop_grad):
+        """Check the spin-vectorised gradient and Hessian.
+
+        The gradient is compared to that of the per-spin loop.  The Hessian is compared to the central differences of the gradient, allowing for the round off error of the differences.
+
+
+        @param mf:          The model-free target function.
+        @type mf:           Mf instance
+        @param params:      The parameter vector.
+        @type params:       numpy rank-1 array
+        @param loop_grad:   The gradient of the per-spin loop.
+        @type loop_grad:    numpy rank-1 array
+        """
+
+        # The vectorised gradient and Hessian.
+        grad = mf.dfunc(params)
+        hess = mf.d2func(params)
+
+        # Check the gradient.
+        n = len(params)
+        for i in range(n):
+            self.assertAlmostEqual(grad[i] / loop_grad[i], 1.0, 10)
+
+        # The central differences of the gradient.
+        steps = 1e-6 * abs(params)
+        num_hess = zeros((n, n), float64)
+        for i in range(n):
+            step = zeros(n, float64)
+            step[i] = steps[i]
+            num_hess[:, i] = (mf.dfunc(params + step) - mf.dfunc(params - step)) / (2.0 * steps[i])
+
+        # Check the Hessian.
+        for i in range(n):
+            for j in range(n):
+                self.assertTrue(abs(num_hess[i, j] - hess[i, j]) <= 1e-5 * abs(hess[i, j]) + 1e-10 * abs(grad[i]) / steps[j])
+
+
+    def check_target(self, model_type=None, diff_type=None, diff_params=None, scaling_matrix=None):
+        """Compare the spin-vectorised target functions to those of the per-spin loop.
+
+        @keyword model_type:        The model type, either 'diff' or 'all'.
+        @type model_type:           str
+        @keyword diff_type:         The diffusion tensor type.
+        @type diff_type:            str
+        @keyword diff_params:       The diffusion tensor parameters.
+        @type diff_params:          list of float
+        @keyword scaling_matrix:    The diagonal scaling matrix.
+        @type scaling_matrix:       None or numpy rank-2 array
+        """
+
+        # The gradients of the 'mf_ext2' equation are not implemented in the per-spin loop for the 'all' model type, so convert the last spin to the equivalent 'mf_ext' model.
+        if model_type == 'all':
+            self.equations[2] = 'mf_ext'
+            self.param_types[2] = ['s2f', 'tf', 's2', 'ts']
+            self.mf_params[11] = self.mf_params[9] * self.mf_params[11]
+
+        # The parameter vector.
+        if model_type == 'diff':
+            params = array(diff_params, float64)
+        else:
+            params = array(diff_params + self.mf_params, float64)
+        if scaling_matrix is not None:
+            params = params / diag(scaling_matrix)
+
+        # Set up the target function.
+        num_params = [len(types) for types in self.param_types]
+        mf = Mf(init_params=params, model_type=model_type, diff_type=diff_type, diff_params=diff_params, scaling_matrix=scaling_matrix, num_spins=3, equations=self.equations, param_types=self.param_types, param_values=[array(self.mf_params)]*3, relax_data=self.relax_data, errors=self.errors, bond_length=[NH_BOND_LENGTH, None, NH_BOND_LENGTH], csa=[N15_CSA, None, N15_CSA], num_frq=[2, 2, 2], frq=self.frq, num_ri=[6, 6, 3], remap_table=self.remap_table, noe_r1_table=self.noe_r1_table, ri_labels=self.ri_labels, gx=[-2.7126e7]*3, gh=[26.7522212e7]*3, h_bar=h_bar, mu0=mu0, num_params=num_params, vectors=self.vectors)
+
+        # The vectorised function must be active.
+        self.assertTrue(hasattr(mf, 'vectorised'))
+
+        # Compare at the initial point and a perturbed point.
+        for factor in [1.0, 1.1]:
+            vect = params * factor
+            if model_type == 'diff':
+                loop = mf.func_diff(vect)
+            else:
+                loop = mf.func_all(vect)
+            self.assertAlmostEqual(mf.func(vect) / loop, 1.0, 10)
+
+        # Check the gradient and Hessian at the initial point and a perturbed point.
+        for factor in [1.0, 1.1]:
+            vect = params * factor
+            if model_type == 'diff':
+                loop = mf.dfunc_diff(vect)
+            else:
+                loop = mf.dfunc_all(vect)
+            self.check_derivatives(mf, vect, loop)
+
+
+    def test_func_all_ellipsoid(self):
+        """Check the spin-vectorised target functions for the 'all' model type and an ellipsoid."""
+
+        # Check.
+        self.check_target(model_type='all', diff_type='ellipsoid', diff_params=[10e-9, 3e6, 0.3, 0.5, 1.0, 2.0], scaling_matrix=diag([1e-9, 1e6, 1.0, 1.0, 1.0, 1.0] + [1.0, 1e-12, 1.0, 1.0, 1e-12, 1.0, 1e-12, 1e-10, 1e-6, 1.0, 1e-12, 1.0, 1e-12]))
+
+
+    def test_func_all_sphere(self):
+        """Check the spin-vectorised target functions for the 'all' model type and a sphere."""
+
+        # Check.
+        self.check_target(model_type='all', diff_type='sphere', diff_params=[10e-9])
+
+
+    def test_func_diff_spheroid(self):
+        """Check the spin-vectorised target functions for the 'diff' model type and a spheroid."""
+
+        # Check.
+        self.check_target(model_type='diff', diff_type='spheroid', diff_params=[10e-9, 3e6, 0.5, 1.0])
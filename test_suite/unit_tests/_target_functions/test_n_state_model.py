@@ -21,7 +21,9 @@
 
 # Python module imports.
 from math import pi
-from numpy import array, float64, ones
+from numpy import array, float64, int32, nan, ones, zeros
+from numpy.linalg import norm
+from numpy.random import RandomState
 from unittest import TestCase
 
 # relax module imports.
@@ -143,4 +145,165 @@ class Test_n_state_model(TestCase):
             self.assertAlmostEqual(chi2, 0.0)
 
 
+    def setup_ensemble(self, model='population', centre_fixed=True, pseudo=False, absolute=True):
+        """Set up the N-state model with RDC and PCS data for comparing the loop based and vectorised functions.
 
+        There are 3 states, 2 alignments with optimised tensors, 4 interatomic vectors and 3 spins, with one missing RDC and PCS.
+
+
+        @keyword model:         The N-state model type, either 'population' or 'fixed'.
+        @type model:            str
+        @keyword centre_fixed:  The flag which if False will cause the paramagnetic centre to be optimised.
+        @type centre_fixed:     bool
+        @keyword pseudo:        The flag which if True will make the last interatomic vector a pseudo-atom pair.
+        @type pseudo:           bool
+        @keyword absolute:      The flag which if True will make one of the RDCs an absolute value.
+        @type absolute:         bool
+        @return:                The target function class and the parameter vector.
+        @rtype:                 N_state_opt instance, numpy rank-1 array
+        """
+
+        # Random, but reproducible data.
+        rand = RandomState(1000)
+        N = 3
+
+        # The RDC data.
+        rdcs = rand.uniform(-10.0, 10.0, (2, 4))
+        rdcs[1, 2] = nan
+        rdc_vect = []
+        dip_const = []
+        for j in range(4):
+            if pseudo and j == 3:
+                vect = rand.normal(size=(N, 2, 3))
+                rdc_vect.append(vect / norm(vect, axis=2)[:, :, None])
+                dip_const.append([-7e4, -6e4])
+            else:
+                vect = rand.normal(size=(N, 3))
+                rdc_vect.append(vect / norm(vect, axis=1)[:, None])
+                dip_const.append(-7e4)
+        absolute_rdc = zeros((2, 4), int32)
+        if absolute:
+            absolute_rdc[0, 1] = 1
+
+        # The PCS data.
+        pcs = rand.uniform(-1e-6, 1e-6, (2, 3))
+        pcs[0, 1] = nan
+        atomic_pos = rand.uniform(-10.0, 10.0, (3, N, 3))
+
+        # The parameters, the tensors followed by the probabilities and the paramagnetic centre.
+        params = list(rand.uniform(-5e-4, 5e-4, 10))
+        probs = None
+        if model == 'population':
+            params += [0.3, 0.45]
+        else:
+            probs = [0.2, 0.3, 0.5]
+        if not centre_fixed:
+            params += [1.0, -2.0, 0.5]
+        params = array(params, float64)
+
+        # Set up the class.
+        target = N_state_opt(model=model, N=N, init_params=params, probs=probs, fixed_tensors=[False, False], pcs=pcs, pcs_errors=0.1e-6*ones((2, 3)), pcs_weights=ones((2, 3)), rdcs=rdcs, rdc_errors=ones((2, 4)), rdc_weights=ones((2, 4)), rdc_vect=rdc_vect, T_flags=zeros((2, 4), int32), rdc_pseudo_flags=array([0, 0, 0, int(pseudo)], int32), temp=array([303.0, 303.0]), frq=array([600e6, 800e6]), dip_const=dip_const, absolute_rdc=absolute_rdc, atomic_pos=atomic_pos, paramag_centre=array([0.5, 0.5, 0.5]), centre_fixed=centre_fixed)
+
+        # Return the class and parameters.
+        return target, params
+
+
+    def check_ensemble(self, target, params, hessian=True):
+        """Compare the vectorised target function, gradient and Hessian to the loop based versions.
+
+        @param target:      The target function class.
+        @type target:       N_state_opt instance
+        @param params:      The parameter vector.
+        @type params:       numpy rank-1 array
+        @keyword hessian:   A flag which if True will also compare the Hessians.
+        @type hessian:      bool
+        """
+
+        # The loop based versions.
+        chi2 = target.func_standard(params)
+        dchi2 = target.dfunc_standard(params)
+        if hessian:
+            d2chi2 = target.d2func_standard(params)
+
+        # The vectorised versions.
+        self.assertEqual(target.func, target.func_ensemble)
+        self.assertAlmostEqual(target.func(params) / chi2, 1.0, 12)
+        grad = target.dfunc(params)
+        for k in range(len(params)):
+            self.assertAlmostEqual(grad[k] / max(abs(dchi2)), dchi2[k] / max(abs(dchi2)), 12)
+        if hessian:
+            hess = target.d2func(params)
+            for j in range(len(params)):
+                for k in range(len(params)):
+                    self.assertAlmostEqual(hess[j, k] / abs(d2chi2).max(), d2chi2[j, k] / abs(d2chi2).max(), 12)
+
+
+    def test_ensemble_fixed(self):
+        """Compare the vectorised functions to the loop based functions for fixed probabilities with a pseudo-atom RDC."""
+
+        # Set up and check.
+        target, params = self.setup_ensemble(model='fixed', pseudo=True)
+        self.check_ensemble(target, params)
+
+
+    def test_ensemble_fixed_centre(self):
+        """Compare the vectorised functions to the loop based functions for fixed probabilities and an optimised paramagnetic centre."""
+
+        # Set up and check.
+        target, params = self.setup_ensemble(model='fixed', centre_fixed=False)
+        self.check_ensemble(target, params, hessian=False)
+
+
+    def check_numeric(self, target, params, hessian=True):
+        """Check the vectorised gradient and Hessian against the central differences of the target function and gradient.
+
+        @param target:      The target function class.
+        @type target:       N_state_opt instance
+        @param params:      The parameter vector.
+        @type params:       numpy rank-1 array
+        @keyword hessian:   A flag which if True will also check the Hessian.
+        @type hessian:      bool
+        """
+
+        # The analytic gradient and Hessian.
+        target.func(params)
+        grad = target.dfunc(params)
+        if hessian:
+            hess = target.d2func(params)
+
+        # Loop over all parameters.
+        for k in range(len(params)):
+            # The step size, relative to the parameter value.
+            h = 1e-6 * max(abs(params[k]), 1e-4)
+            step = zeros(len(params))
+            step[k] = h
+
+            # The gradient element from the central difference of the target function.
+            numeric = (target.func(params + step) - target.func(params - step)) / (2.0 * h)
+            self.assertAlmostEqual(grad[k] / abs(grad).max(), numeric / abs(grad).max(), 6)
+
+            # The Hessian column from the central difference of the gradient.
+            if hessian:
+                target.func(params + step)
+                upper = target.dfunc(params + step)
+                target.func(params - step)
+                lower = target.dfunc(params - step)
+                numeric = (upper - lower) / (2.0 * h)
+                for j in range(len(params)):
+                    self.assertAlmostEqual(hess[j, k] / abs(hess).max(), numeric[j] / abs(hess).max(), 6)
+
+
+    def test_ensemble_population(self):
+        """Check the vectorised gradient and Hessian numerically for optimised probabilities."""
+
+        # Set up and check.
+        target, params = self.setup_ensemble(model='population', absolute=False)
+        self.check_numeric(target, params)
+
+
+    def test_ensemble_population_centre(self):
+        """Check the vectorised gradient numerically for optimised probabilities and an optimised paramagnetic centre."""
+
+        # Set up and check.
+        target, params = self.setup_ensemble(model='population', centre_fixed=False, absolute=False)
+        self.check_numeric(target, params, hessian=False)
@@ -0,0 +1,443 @@
+###############################################################################
+#                                                                             #
+# Copyright (C) 2015 Edward d'Auvergne                                        #
+#                                                                             #
+# This file is part of the program relax (http://www.nmr-relax.com).          #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+# Python module imports.
+from numpy import arctan2, array, diag, eye, pi, random, zeros
+from unittest import TestCase
+
+# relax module imports.
+from lib.dispersion.variables import EXP_TYPE_CPMG_SQ, EXP_TYPE_R1RHO, MODEL_B14, MODEL_B14_FULL, MODEL_CR72, MODEL_CR72_FULL, MODEL_DPL94, MODEL_LIST_CPMG, MODEL_LIST_R20B, MODEL_LIST_VECTORISED, MODEL_LM63, MODEL_M61, MODEL_NS_CPMG_2SITE_3D, MODEL_TAP03, MODEL_TP02, MODEL_TSMFK01
+from target_functions.relax_disp import Dispersion
+
+
+class Test_relax_disp(TestCase):
+    """Unit tests for the target_functions.relax_disp module."""
+
+    def check_derivatives(self, model=None, r1_fit=False, hessian=False):
+        """Compare the analytic gradient and Hessian of the target function to central finite differences.
+
+        @keyword model:     The dispersion model.
+        @type model:        str
+        @keyword r1_fit:    A flag which if True will cause R1 to be optimised.
+        @type r1_fit:       bool
+        @keyword hessian:   A flag which if True will cause the Hessian to also be checked.
+        @type hessian:      bool
+        """
+
+        # Set up the target function.
+        target, params = self.setup_target(model=model, r1_fit=r1_fit)
+
+        # Check the gradient.
+        grad = target.dfunc(params)
+        grad_num = self.num_deriv(target.func, params)
+        self.assertEqual(len(grad), len(params))
+        self.assertTrue(abs(grad - grad_num).max() < 1e-6 * abs(grad_num).max())
+
+        # Check the Hessian.
+        if hessian:
+            hess = target.d2func(params)
+            hess_num = self.num_deriv(target.dfunc, params)
+            self.assertTrue(abs(hess - hess.T).max() < 1e-12 * abs(hess).max())
+            self.assertTrue(abs(hess - hess_num).max() < 1e-6 * abs(hess_num).max())
+        else:
+            self.assertEqual(target.d2func, None)
+
+
+    def check_grid(self, model=None):
+        """Check the vectorised grid search target function against the standard target function.
+
+        @keyword model:     The dispersion model.
+        @type model:        str
+        """
+
+        # Set up the target function.
+        target, params = self.setup_target(model=model)
+        self.assertEqual(target.grid_func is not None, model in MODEL_LIST_VECTORISED)
+
+        # Randomised grid points, including the original parameter vector.
+        points = array([params] + [params * random.uniform(0.5, 1.5, len(params)) for i in range(10)])
+
+        # Small chunks, so that the points are split over several chunks.
+        target.grid_chunk = 3
+
+        # Compare to the target function for each grid point.
+        chi2 = target.func_grid(points)
+        self.assertEqual(len(chi2), len(points))
+        for i in range(len(points)):
+            self.assertAlmostEqual(chi2[i] / target.func(points[i]), 1.0, 10)
+
+
+    def check_r20_profile(self, model=None):
+        """Check the target function and gradient with the R20 parameters profiled out.
+
+        @keyword model:     The dispersion model.
+        @type model:        str
+        """
+
+        # Set up the target function.
+        target, params = self.setup_target(model=model)
+        num = target.end_index[0]
+
+        # The profiled chi-squared value must match the full model at the optimal R20 values, and be no worse than the random R20 values.
+        chi2_full = target.func(params)
+        chi2 = target.func_r20_profile(params[num:])
+        full_params = target.r20_profile_params(params[num:])
+        self.assertAlmostEqual(chi2, target.func(full_params), 6)
+        self.assertTrue(chi2 <= chi2_full)
+
+        # The R20 values must be at the minimum.
+        grad = target.dfunc(full_params)
+        self.assertTrue(abs(grad[:num]).max() < 1e-8 * abs(grad[num:]).max())
+
+        # Check the gradient of the profiled target function.
+        grad = target.dfunc_r20_profile(params[num:])
+        grad_num = self.num_deriv(target.func_r20_profile, params[num:])
+        self.assertEqual(len(grad), len(params) - num)
+        self.assertTrue(abs(grad - grad_num).max() < 1e-6 * abs(grad_num).max())
+
+
+    def check_sims(self, model=None):
+        """Check the target function for the Monte Carlo simulations against the standard target function.
+
+        @keyword model:     The dispersion model.
+        @type model:        str
+        """
+
+        # Set up the target function.
+        target, params = self.setup_target(model=model)
+
+        # The packing of the R2eff/R1rho data.
+        self.assertEqual(abs(target.pack_values(target.values_orig) - target.values).max(), 0.0)
+
+        # Randomised simulation data and parameter vectors.
+        values = array([target.values + random.normal(0.0, 1.0, target.values.shape) * target.disp_struct for i in range(5)])
+        points = array([params * random.uniform(0.95, 1.05, len(params)) for i in range(5)])
+
+        # Compare to the target function for each simulation.
+        chi2 = target.func_sims(points, values)
+        values_orig = target.values
+        for i in range(5):
+            target.values = values[i]
+            self.assertAlmostEqual(chi2[i] / target.func(points[i]), 1.0, 10)
+        target.values = values_orig
+
+
+    def num_deriv(self, func, x):
+        """The central finite difference derivatives of the function.
+
+        @param func:    The function.
+        @type func:     callable
+        @param x:       The parameter vector.
+        @type x:        numpy rank-1 float array
+        @return:        The derivatives.
+        @rtype:         numpy rank-1 float array
+        """
+
+        # Loop over the parameters.
+        deriv = []
+        for i in range(len(x)):
+            h = 1e-6 * max(1.0, abs(x[i]))
+            x_plus = x.copy()
+            x_plus[i] += h
+            x_minus = x.copy()
+            x_minus[i] -= h
+            deriv.append((func(x_plus) - func(x_minus)) / (2.0*h))
+
+        # Return the derivatives.
+        return array(deriv)
+
+
+    def test_dfunc_B14(self):
+        """Unit test for the gradient of the B14 model target function."""
+
+        # Check the derivatives.
+        self.check_derivatives(model=MODEL_B14)
+
+
+    def test_dfunc_B14_full(self):
+        """Unit test for the gradient of the B14 full model target function."""
+
+        # Check the derivatives.
+        self.check_derivatives(model=MODEL_B14_FULL)
+
+
+    def test_dfunc_CR72(self):
+        """Unit test for the gradient of the CR72 model target function."""
+
+        # Check the derivatives.
+        self.check_derivatives(model=MODEL_CR72)
+
+
+    def test_dfunc_CR72_full(self):
+        """Unit test for the gradient of the CR72 full model target function."""
+
+        # Check the derivatives.
+        self.check_derivatives(model=MODEL_CR72_FULL)
+
+
+    def test_dfunc_DPL94(self):
+        """Unit test for the gradient and Hessian of the DPL94 model target function."""
+
+        # Check the derivatives.
+        self.check_derivatives(model=MODEL_DPL94, hessian=True)
+
+
+    def test_dfunc_DPL94_fit_r1(self):
+        """Unit test for the gradient and Hessian of the DPL94 model target function, whereby R1 is fitted."""
+
+        # Check the derivatives.
+        self.check_derivatives(model=MODEL_DPL94, r1_fit=True, hessian=True)
+
+
+    def test_dfunc_LM63(self):
+        """Unit test for the gradient and Hessian of the LM63 model target function."""
+
+        # Check the derivatives.
+        self.check_derivatives(model=MODEL_LM63, hessian=True)
+
+
+    def test_dfunc_M61(self):
+        """Unit test for the gradient and Hessian of the M61 model target function."""
+
+        # Check the derivatives.
+        self.check_derivatives(model=MODEL_M61, hessian=True)
+
+
+    def test_dfunc_TAP03(self):
+        """Unit test for the gradient of the TAP03 model target function."""
+
+        # Check the derivatives.
+        self.check_derivatives(model=MODEL_TAP03)
+
+
+    def test_dfunc_TAP03_fit_r1(self):
+        """Unit test for the gradient of the TAP03 model target function, whereby R1 is fitted."""
+
+        # Check the derivatives.
+        self.check_derivatives(model=MODEL_TAP03, r1_fit=True)
+
+
+    def test_dfunc_TP02(self):
+        """Unit test for the gradient of the TP02 model target function."""
+
+        # Check the derivatives.
+        self.check_derivatives(model=MODEL_TP02)
+
+
+    def test_dfunc_TP02_fit_r1(self):
+        """Unit test for the gradient of the TP02 model target function, whereby R1 is fitted."""
+
+        # Check the derivatives.
+        self.check_derivatives(model=MODEL_TP02, r1_fit=True)
+
+
+    def test_dfunc_TSMFK01(self):
+        """Unit test for the gradient and Hessian of the TSMFK01 model target function."""
+
+        # Check the derivatives.
+        self.check_derivatives(model=MODEL_TSMFK01, hessian=True)
+
+
+    def test_dfunc_numeric(self):
+        """Check that the numeric models have no analytic gradients or Hessians."""
+
+        # Set up the target function.
+        target = Dispersion(model=MODEL_NS_CPMG_2SITE_3D, num_spins=1, num_frq=1, exp_types=[EXP_TYPE_CPMG_SQ], values=[[[[array([10.0, 8.0])]]]], errors=[[[[array([1.0, 1.0])]]]], missing=[[[[array([0, 0])]]]], frqs=[[[2*pi*60.8]]], cpmg_frqs=[[[array([100.0, 200.0])]]], offset=[[[[0.0]]]], relax_times=[[[[[0.04], [0.04]]]]])
+
+        # Checks.
+        self.assertEqual(target.dfunc, None)
+        self.assertEqual(target.d2func, None)
+
+
+    def test_func_grid_B14(self):
+        """Unit test for the vectorised grid search target function of the B14 model."""
+
+        # Check the target function.
+        self.check_grid(model=MODEL_B14)
+
+
+    def test_func_grid_B14_full(self):
+        """Unit test for the vectorised grid search target function of the B14 full model."""
+
+        # Check the target function.
+        self.check_grid(model=MODEL_B14_FULL)
+
+
+    def test_func_grid_CR72(self):
+        """Unit test for the vectorised grid search target function of the CR72 model."""
+
+        # Check the target function.
+        self.check_grid(model=MODEL_CR72)
+
+
+    def test_func_grid_CR72_full(self):
+        """Unit test for the vectorised grid search target function of the CR72 full model."""
+
+        # Check the target function.
+        self.check_grid(model=MODEL_CR72_FULL)
+
+
+    def test_func_grid_LM63(self):
+        """Unit test for the vectorised grid search target function of the LM63 model."""
+
+        # Check the target function.
+        self.check_grid(model=MODEL_LM63)
+
+
+    def test_func_grid_TSMFK01(self):
+        """Unit test for the vectorised grid search target function of the TSMFK01 model."""
+
+        # Check the target function.
+        self.check_grid(model=MODEL_TSMFK01)
+
+
+    def test_func_grid_M61(self):
+        """Unit test for the grid search target function of the M61 model, without a vectorised implementation."""
+
+        # Check the target function.
+        self.check_grid(model=MODEL_M61)
+
+
+    def test_func_sims_CR72(self):
+        """Unit test for the Monte Carlo simulation target function of the vectorised CR72 model."""
+
+        # Check the target function.
+        self.check_sims(model=MODEL_CR72)
+
+
+    def test_func_sims_M61(self):
+        """Unit test for the Monte Carlo simulation target function of the M61 model, without a vectorised implementation."""
+
+        # Check the target function.
+        self.check_sims(model=MODEL_M61)
+
+
+    def test_func_r20_profile_CR72(self):
+        """Unit test for the R20 profiled target function of the CR72 model."""
+
+        # Check the target function.
+        self.check_r20_profile(model=MODEL_CR72)
+
+
+    def test_func_r20_profile_LM63(self):
+        """Unit test for the R20 profiled target function of the LM63 model."""
+
+        # Check the target function.
+        self.check_r20_profile(model=MODEL_LM63)
+
+
+    def test_func_r20_profile_TP02(self):
+        """Unit test for the R1rho' profiled target function of the off-resonance TP02 model."""
+
+        # Check the target function.
+        self.check_r20_profile(model=MODEL_TP02)
+
+
+    def test_minimise_sims_LM63(self):
+        """Unit test for the lock-step simplex optimisation of the Monte Carlo simulations of the LM63 model."""
+
+        # Set up the target function, simulation data back-calculated from the parameters, and the constraints that all parameters are positive.
+        target, params = self.setup_target(model=MODEL_LM63)
+        target.func(params)
+        values = array([target.back_calc + random.normal(0.0, 0.2, target.values.shape) * target.disp_struct for i in range(4)])
+        A = eye(len(params))
+        b = zeros(len(params))
+
+        # Optimise.
+        x, chi2, iter_count, f_count, warning = target.minimise_sims(params, values, A=A, b=b, func_tol=1e-10, max_iterations=5000)
+
+        # Checks.
+        chi2_init = target.func_sims(array([params]*4), values)
+        for i in range(4):
+            self.assertEqual(warning[i], None)
+            self.assertTrue(chi2[i] < chi2_init[i])
+            self.assertTrue(min(x[i]) >= 0.0)
+            self.assertTrue(iter_count[i] > 0)
+            self.assertTrue(f_count[i] > iter_count[i])
+
+        # The lock-step optimisation of each simulation must be identical to the optimisation of the simulation on its own.
+        for i in range(4):
+            results = target.minimise_sims(params, values[i:i+1], A=A, b=b, func_tol=1e-10, max_iterations=5000)
+            self.assertEqual(abs(results[0][0] - x[i]).max(), 0.0)
+            self.assertEqual(results[1][0], chi2[i])
+            self.assertEqual(results[2][0], iter_count[i])
+
+
+    def setup_target(self, model=None, r1_fit=False):
+        """Set up the target function and a scaled parameter vector for a random data set.
+
+        A cluster of 3 spins and 2 fields with unequal numbers of dispersion points, a missing data point and parameter scaling is used.
+
+
+        @keyword model:     The dispersion model.
+        @type model:        str
+        @keyword r1_fit:    A flag which if True will cause R1 to be optimised.
+        @type r1_fit:       bool
+        @return:            The target function and the scaled parameter vector.
+        @rtype:             Dispersion instance, numpy rank-1 float array
+        """
+
+        # The cluster.
+        random.seed(0)
+        NS = 3
+        frqs = [2*pi*60.8, 2*pi*81.1]
+        nd = [8, 6]
+        cpmg = model in MODEL_LIST_CPMG
+
+        # The data structures.
+        disp = [[[random.uniform(50.0, 1000.0, nd[mi]) if cpmg else random.uniform(500.0, 3000.0, nd[mi])] for mi in range(2)]]
+        values = [[[[random.uniform(5.0, 30.0, nd[mi])] for mi in range(2)] for si in range(NS)]]
+        errors = [[[[random.uniform(0.5, 1.5, nd[mi])] for mi in range(2)] for si in range(NS)]]
+        missing = [[[[zeros(nd[mi], int)] for mi in range(2)] for si in range(NS)]]
+        missing[0][1][0][0][2] = 1
+        shifts = [[[random.uniform(-2.0, 2.0)*frqs[mi] for mi in range(2)] for si in range(NS)]]
+        offsets = [[[[random.uniform(-2.0, 2.0)*frqs[mi]] for mi in range(2)] for si in range(NS)]]
+        tilt_angles = [[[[arctan2(2*pi*disp[0][mi][0], shifts[0][si][mi] - offsets[0][si][mi][0])] for mi in range(2)] for si in range(NS)]]
+        r1 = [[random.uniform(1.0, 2.0) for mi in range(2)] for si in range(NS)]
+        relax_times = [[[[[0.04]]*nd[mi]] for mi in range(2)]]
+
+        # Set up the target function.
+        kwargs = {}
+        if cpmg:
+            kwargs['cpmg_frqs'] = disp
+        else:
+            kwargs.update(spin_lock_nu1=disp, chemical_shifts=shifts, tilt_angles=tilt_angles)
+        target = Dispersion(model=model, num_spins=NS, num_frq=2, exp_types=[cpmg and EXP_TYPE_CPMG_SQ or EXP_TYPE_R1RHO], values=values, errors=errors, missing=missing, frqs=[[frqs]*NS], frqs_H=[[frqs]*NS], offset=offsets, r1=r1, relax_times=relax_times, r1_fit=r1_fit, **kwargs)
+
+        # The parameter vector.
+        params = list(random.uniform(5.0, 20.0, target.end_index[0]))
+        if r1_fit or model in MODEL_LIST_R20B:
+            params += list(random.uniform(5.0, 20.0, target.end_index[0]))
+        if model in [MODEL_LM63, MODEL_M61, MODEL_DPL94]:
+            params += list(random.uniform(0.1, 0.6, NS)) + [1500.0]
+        elif model == MODEL_TSMFK01:
+            params += list(random.uniform(0.5, 2.0, NS)) + [300.0]
+        else:
+            params += list(random.uniform(0.5, 2.0, NS)) + [0.9, 1500.0]
+
+        # Parameter scaling.
+        scaling = random.uniform(0.5, 2.0, len(params))
+        target.scaling_matrix = diag(scaling)
+        target.scaling_flag = True
+        params = array(params) / scaling
+
+        # Return the target function and parameters.
+        return target, params
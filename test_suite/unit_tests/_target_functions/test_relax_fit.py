@@ -27,7 +27,7 @@ from unittest import TestCase
 from dep_check import C_module_exp_fn
 from status import Status; status = Status()
 if C_module_exp_fn:
-    from target_functions.relax_fit import setup, func_exp, dfunc_exp, d2func_exp, jacobian_exp, jacobian_chi2_exp
+    from target_functions.relax_fit import setup, setup_fitter, func_exp, dfunc_exp, d2func_exp, jacobian_exp, jacobian_chi2_exp
 
 
 class Test_relax_fit(TestCase):
@@ -72,6 +72,11 @@ class Test_relax_fit(TestCase):
         # Setup the C module.
         setup(num_params=2, num_times=len(relax_times), values=I, sd=errors, relax_times=relax_times, scaling_matrix=self.scaling_list)
 
+        # Store the data for the fitter object tests.
+        self.relax_times = relax_times
+        self.I = I
+        self.errors = errors
+
 
     def test_func_exp(self):
         """Unit test for the value returned by the func_exp() function at the minimum."""
@@ -290,3 +295,48 @@ class Test_relax_fit(TestCase):
         for i in range(len(matrix)):
             for j in range(len(matrix[i])):
                 self.assertAlmostEqual(matrix[i, j], real[i, j], 3)
+
+
+    def test_fitter_exp(self):
+        """Unit test for the re-entrant fitter object, compared to the module level functions away from the minimum."""
+
+        # Set up the fitter object.
+        fitter = setup_fitter(model='exp', values=self.I, sd=self.errors, relax_times=self.relax_times, scaling_matrix=self.scaling_list)
+
+        # The off-minimum parameter values.
+        params = [2.0/self.scaling_list[0], 500.0/self.scaling_list[1]]
+
+        # The chi-squared value, gradient and Hessian.
+        self.assertAlmostEqual(fitter.func(params), func_exp(params))
+        grad = fitter.dfunc(params)
+        hess = fitter.d2func(params)
+        real_grad = dfunc_exp(params)
+        real_hess = d2func_exp(params)
+        for i in range(2):
+            self.assertAlmostEqual(grad[i], real_grad[i], 6)
+            for j in range(2):
+                self.assertAlmostEqual(hess[i][j], real_hess[i][j], 6)
+
+        # The Jacobians.
+        for matrix, real in [[fitter.jacobian(params), jacobian_exp(params)], [fitter.jacobian_chi2(params), jacobian_chi2_exp(params)]]:
+            for i in range(2):
+                for j in range(len(self.relax_times)):
+                    self.assertAlmostEqual(matrix[i][j], real[i][j], 6)
+
+
+    def test_fitter_independence(self):
+        """Unit test for checking that multiple fitter objects do not share data."""
+
+        # Two fitter objects with different data.
+        fitter1 = setup_fitter(model='exp', values=self.I, sd=self.errors, relax_times=self.relax_times, scaling_matrix=self.scaling_list)
+        fitter2 = setup_fitter(model='exp', values=[2.0*x for x in self.I], sd=self.errors, relax_times=self.relax_times, scaling_matrix=self.scaling_list)
+
+        # Each fitter has its own minimum.
+        self.assertAlmostEqual(fitter1.func(self.params), 0.0)
+        self.assertAlmostEqual(fitter2.func([self.params[0], 2.0*self.params[1]]), 0.0)
+        self.assertAlmostEqual(fitter1.func(self.params), 0.0)
+
+        # The back-calculated data.
+        back_calc = fitter2.back_calc(self.params)
+        for i in range(len(self.relax_times)):
+            self.assertAlmostEqual(back_calc[i], self.I[i], 6)
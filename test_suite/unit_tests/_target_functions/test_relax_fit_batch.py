@@ -0,0 +1,182 @@
+###############################################################################
+#                                                                             #
+# Copyright (C) 2015 Edward d'Auvergne                                        #
+#                                                                             #
+# This file is part of the program relax (http://www.nmr-relax.com).          #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+# Python module imports.
+from numpy import array, exp, eye
+from unittest import TestCase
+
+# relax module imports.
+from target_functions.relax_fit_batch import Relax_fit_batch
+
+
+class Test_relax_fit_batch(TestCase):
+    """Unit tests for the target_functions.relax_fit_batch module."""
+
+    def setUp(self):
+        """Create a batch of three spins for the calculation and testing of the relaxation curve-fitting equations."""
+
+        # The parameter scaling.
+        self.scaling_list = [1.0, 1000.0]
+
+        # The time points.
+        self.relax_times = array([0.0, 1.0, 2.0, 3.0, 4.0])
+
+        # The parameter values at the minimum for three spins.
+        self.R = array([1.0, 2.0, 0.5])
+        self.I0 = array([1000.0, 500.0, 2000.0])
+
+        # The intensities for the above I0 and R.
+        self.values = self.I0[:, None] * exp(-self.R[:, None] * self.relax_times)
+
+        # The intensity errors.
+        self.errors = 10.0 * array([[1.0]*5]*3)
+
+        # Set up the target function.
+        self.model = Relax_fit_batch(model='exp', values=self.values, errors=self.errors, relax_times=self.relax_times, scaling_matrix=self.scaling_list)
+
+
+    def test_func(self):
+        """Unit test for the chi-squared values of the batch at the minimum."""
+
+        # The parameters.
+        params = array([self.R, self.I0/1000.0]).T
+
+        # Get the chi-squared values.
+        chi2 = self.model.func(params)
+
+        # Check the values.
+        for i in range(3):
+            self.assertAlmostEqual(chi2[i], 0.0)
+
+
+    def test_dfunc_off_minimum(self):
+        """Unit test for the batched gradient away from the minimum, using the values of the relax_fit C module unit tests.
+
+        This uses the data from test_suite/shared_data/curve_fitting/numeric_gradient/integrate.log.
+        """
+
+        # The off-minimum parameter values for the first spin.
+        params = array([[2.0, 0.5], [2.0, 0.5], [0.5, 2.0]])
+
+        # Get the chi-squared gradients.
+        grad = self.model.dfunc(params)
+
+        # Check that the gradient matches the numerically derived values.
+        self.assertAlmostEqual(grad[0, 0], 456.36655522098829*self.scaling_list[0], 3)
+        self.assertAlmostEqual(grad[0, 1], -10.8613338920982*self.scaling_list[1], 3)
+
+        # The second spin is at the minimum.
+        self.assertAlmostEqual(grad[1, 0], 0.0, 6)
+        self.assertAlmostEqual(grad[1, 1], 0.0, 6)
+
+
+    def test_d2func_off_minimum(self):
+        """Unit test for the batched Hessian away from the minimum, using the values of the relax_fit C module unit tests.
+
+        This uses the data from test_suite/shared_data/curve_fitting/numeric_gradient/Hessian.log.
+        """
+
+        # The off-minimum parameter values for the first spin.
+        params = array([[2.0, 0.5], [2.0, 0.5], [0.5, 2.0]])
+
+        # Get the chi-squared Hessians.
+        hess = self.model.d2func(params)
+
+        # Check that the Hessian matches the numerically derived values.
+        self.assertAlmostEqual(hess[0, 0, 0], -4.11964848e+02*self.scaling_list[0]**2, 3)
+        self.assertAlmostEqual(hess[0, 0, 1],  7.22678641e-01*self.scaling_list[0]*self.scaling_list[1], 3)
+        self.assertAlmostEqual(hess[0, 1, 0],  7.22678641e-01*self.scaling_list[0]*self.scaling_list[1], 3)
+        self.assertAlmostEqual(hess[0, 1, 1],  2.03731472e-02*self.scaling_list[1]**2, 3)
+
+
+    def test_derivatives_inv(self):
+        """Check the inversion recovery gradient and Hessian against finite differences."""
+
+        # Set up the target function.
+        model = Relax_fit_batch(model='inv', values=self.values, errors=self.errors, relax_times=self.relax_times, scaling_matrix=[1.0, 1000.0, 1000.0])
+
+        # Finite difference derivatives.
+        params = array([[1.2, 0.9, 0.3]]*3)
+        h = 1e-6
+        grad = model.dfunc(params)
+        hess = model.d2func(params)
+        for j in range(3):
+            step = h * eye(3)[j]
+            num_grad = (model.func(params+step) - model.func(params-step)) / (2.0*h)
+            num_hess = (model.dfunc(params+step) - model.dfunc(params-step)) / (2.0*h)
+            for i in range(3):
+                self.assertAlmostEqual(grad[i, j] / num_grad[i], 1.0, 5)
+                for k in range(3):
+                    self.assertAlmostEqual(hess[i, j, k], num_hess[i, k], 2)
+
+
+    def test_minimise(self):
+        """Unit test for the lock-step Levenberg-Marquardt optimisation of the batch."""
+
+        # Optimise from a common starting point, with one missing data point for the third spin.
+        mask = array([[True]*5, [True]*5, [True]*4 + [False]])
+        model = Relax_fit_batch(model='exp', values=self.values, errors=self.errors, relax_times=self.relax_times, mask=mask, scaling_matrix=self.scaling_list)
+        params, chi2, iter_count, f_count, g_count, warning = model.minimise(array([[1.0, 1.0]]*3))
+
+        # Check the parameters.
+        for i in range(3):
+            self.assertAlmostEqual(params[i, 0], self.R[i], 5)
+            self.assertAlmostEqual(params[i, 1]*1000.0, self.I0[i], 3)
+            self.assertAlmostEqual(chi2[i], 0.0, 5)
+            self.assertEqual(warning[i], None)
+
+
+    def test_minimise_bounds(self):
+        """Check the constrained Levenberg-Marquardt optimisation of a spin with the rate at the zero bound."""
+
+        # Intensities increasing with time for the first spin, so that the constrained rate is held at zero.
+        times = array([0.1, 0.2, 0.4, 0.8, 1.6])
+        values = array([[10.0, 12.0, 15.0, 20.0, 30.0], 100.0*exp(-2.0*times)])
+        model = Relax_fit_batch(model='exp', values=values, errors=array([[1.0]*5]*2), relax_times=times, scaling_matrix=[1.0, 1.0])
+        params, chi2, iter_count, f_count, g_count, warning = model.minimise(array([[1.0, 10.0], [1.0, 100.0]]), constraints=True)
+
+        # The spin at the bound, with I0 being the mean intensity.
+        self.assertEqual(params[0, 0], 0.0)
+        self.assertAlmostEqual(params[0, 1], 17.4, 5)
+        self.assertAlmostEqual(chi2[0], 255.2, 5)
+        self.assertEqual(warning[0], None)
+
+        # The normal spin.
+        self.assertAlmostEqual(params[1, 0], 2.0, 5)
+        self.assertAlmostEqual(params[1, 1], 100.0, 3)
+        self.assertEqual(warning[1], None)
+
+
+    def test_minimise_non_finite(self):
+        """Check the warning of a spin with a non-finite function value at the starting position."""
+
+        # A NaN intensity for the second spin.
+        values = self.values.copy()
+        values[1, 2] = float('nan')
+        model = Relax_fit_batch(model='exp', values=values, errors=self.errors, relax_times=self.relax_times, scaling_matrix=self.scaling_list)
+        params, chi2, iter_count, f_count, g_count, warning = model.minimise(array([[1.0, 1.0]]*3))
+
+        # Checks.
+        self.assertEqual(warning[0], None)
+        self.assertEqual(warning[1], "The function value at the starting position is not finite.")
+        self.assertEqual(iter_count[1], 0)
+        self.assertEqual(list(params[1]), [1.0, 1.0])
+        self.assertEqual(warning[2], None)
@@ -612,6 +612,20 @@ uf.add_keyarg(
     desc = "The generation of the Sobol' sequence oversamples as N * Ov * 10**M, where N is the maximum number of points, Ov is the oversamling value, and M is the number of dimensions or torsion-tilt angles used in the system.",
     wiz_element_type = "spin"
 )
+uf.add_keyarg(
+    name = "tol",
+    basic_types = ["float"],
+    desc_short = "adaptive integration tolerance",
+    desc = "The PCS error tolerance, in ppm, for the adaptive numerical integration.  If supplied, the number of Sobol' points used will be increased from a small initial number until the integration error estimate for all spins is below this tolerance, with the maximum number of points as the upper limit.",
+    can_be_none = True
+)
+uf.add_keyarg(
+    name = "cache_dir",
+    arg_type = "dir",
+    desc_short = "cache directory",
+    desc = "The directory for the on-disk cache of the Sobol' points and pre-calculated rotation matrices.  If supplied, these will be reused between relax sessions and shared between all processes.",
+    can_be_none = True
+)
 # Description.
 uf.desc.append(Desc_container())
 uf.desc[-1].add_paragraph("This allows the maximum number of integration points N used during the frame order target function optimisation to be specified.  This is used in the quasi-random Sobol' sequence for the numerical integration of the PCS.  The formula used to find the total number of Sobol' points is:")
@@ -627,6 +641,8 @@ uf.desc[-1].add_list_element("Generate the Sobol' sequence for the total number
 uf.desc[-1].add_list_element("Convert all points to the torsion-tilt angle system.")
 uf.desc[-1].add_list_element("Skip all Sobol' points with angles greater than the current parameter values.")
 uf.desc[-1].add_list_element("Terminate the loop over the Sobol' points once the maximum number of points has been reached.")
+uf.desc[-1].add_paragraph("For the adaptive numerical integration, a PCS error tolerance in ppm can be supplied.  The Sobol' points within the distribution are then summed in blocks, doubling the number of points each time, and the change in the averaged PCS values is used as the integration error estimate.  The summation terminates as soon as this error estimate for all spins is below the tolerance, or when the maximum number of points N has been reached.  This allows cheap, low precision PCS values to be used in the early stages of optimisation, by setting a large tolerance, and more precise values in the final stages.")
+uf.desc[-1].add_paragraph("As the generation of the Sobol' points and rotation matrices can be expensive for the large number of points required, a cache directory can be specified.  The data will then be saved as numpy .npy files, one set per model and total number of points, and these are opened as read-only memory maps.  This allows the data to be reused between relax sessions and to be shared between all processes on the same machine.")
 uf.backend = sobol_setup
 uf.menu_text = "&sobol_setup"
 uf.gui_icon = "oxygen.actions.edit-rename"
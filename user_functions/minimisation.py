@@ -263,6 +263,7 @@ table.add_headings(["Minimisation algorithm", "Patterns"])
 table.add_row(["Simplex", "'^[Ss]implex$'"])
 table.add_row(["Levenberg-Marquardt", "'^[Ll][Mm]$' or '^[Ll]evenburg-[Mm]arquardt$'"])
 uf.desc[-1].add_table(table.label)
+uf.desc[-1].add_paragraph("For the relaxation curve-fitting analysis, the Levenberg-Marquardt algorithm optimises all spins simultaneously, split into batches of spins for the slave processors.  This batched optimisation is only available for the Levenberg-Marquardt algorithm.  It uses the function tolerance, maximum number of iterations and constraint settings, whereas the gradient tolerance and the minimisation options are ignored.  Spins for which no further progress can be made will have the optimisation warning set.  All other algorithms, including the grid search, optimise each spin individually on the slave processors.")
 uf.desc[-1].add_paragraph("Global minimisation methods:")
 table = uf_tables.add_table(label="table: min - global", caption="Minimisation algorithms -- global minimisation methods.")
 table.add_headings(["Minimisation algorithm", "Patterns"])
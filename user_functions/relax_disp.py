@@ -28,7 +28,7 @@
 from os import sep
 
 # relax module imports.
-from lib.dispersion.variables import EXP_TYPE_CPMG_DQ, EXP_TYPE_CPMG_MQ, EXP_TYPE_CPMG_SQ, EXP_TYPE_CPMG_ZQ, EXP_TYPE_CPMG_PROTON_MQ, EXP_TYPE_CPMG_PROTON_SQ, EXP_TYPE_R1RHO, MODEL_B14, MODEL_B14_FULL, MODEL_CR72, MODEL_CR72_FULL, MODEL_DPL94, MODEL_IT99, MODEL_LIST_FIT_R1, MODEL_LM63, MODEL_LM63_3SITE, MODEL_M61, MODEL_M61B, MODEL_MMQ_CR72, MODEL_MP05, MODEL_NOREX, MODEL_NS_CPMG_2SITE_3D, MODEL_NS_CPMG_2SITE_3D_FULL, MODEL_NS_CPMG_2SITE_EXPANDED, MODEL_NS_CPMG_2SITE_STAR, MODEL_NS_CPMG_2SITE_STAR_FULL, MODEL_NS_MMQ_2SITE, MODEL_NS_MMQ_3SITE, MODEL_NS_MMQ_3SITE_LINEAR, MODEL_NS_R1RHO_2SITE, MODEL_NS_R1RHO_3SITE, MODEL_NS_R1RHO_3SITE_LINEAR, MODEL_R2EFF, MODEL_TAP03, MODEL_TP02, MODEL_TSMFK01
+from lib.dispersion.variables import EXP_TYPE_CPMG_DQ, EXP_TYPE_CPMG_MQ, EXP_TYPE_CPMG_SQ, EXP_TYPE_CPMG_ZQ, EXP_TYPE_CPMG_PROTON_MQ, EXP_TYPE_CPMG_PROTON_SQ, EXP_TYPE_R1RHO, MODEL_B14, MODEL_B14_FULL, MODEL_CR72, MODEL_CR72_FULL, MODEL_DPL94, MODEL_IT99, MODEL_LIST_FIT_R1, MODEL_LIST_R20_PROFILE, MODEL_LM63, MODEL_LM63_3SITE, MODEL_M61, MODEL_M61B, MODEL_MMQ_CR72, MODEL_MP05, MODEL_NOREX, MODEL_NS_CPMG_2SITE_3D, MODEL_NS_CPMG_2SITE_3D_FULL, MODEL_NS_CPMG_2SITE_EXPANDED, MODEL_NS_CPMG_2SITE_STAR, MODEL_NS_CPMG_2SITE_STAR_FULL, MODEL_NS_MMQ_2SITE, MODEL_NS_MMQ_3SITE, MODEL_NS_MMQ_3SITE_LINEAR, MODEL_NS_R1RHO_2SITE, MODEL_NS_R1RHO_3SITE, MODEL_NS_R1RHO_3SITE_LINEAR, MODEL_R2EFF, MODEL_TAP03, MODEL_TP02, MODEL_TSMFK01
 from lib.text.gui import dw, dw_AB, dw_BC, dwH, dwH_AB, dwH_BC, i0, kex, kAB, kBC, kAC, phi_ex, phi_exB, phi_exC, nu_1, nu_cpmg, r1rho, r1rho_prime, r2, r2a, r2b, r2eff, tex, theta, w_eff, w_rf
 from graphics import ANALYSIS_IMAGE_PATH, WIZARD_IMAGE_PATH
 from pipe_control import pipes, spectrum
@@ -1042,6 +1042,28 @@ uf.wizard_size = (900, 600)
 uf.wizard_apply_button = False
 
 
+# The relax_disp.r20_profile user function.
+uf = uf_info.add_uf('relax_disp.r20_profile')
+uf.title = "Switch the variable projection of the R20 parameters on or off for optimisation."
+uf.title_short = "R20 variable projection flag."
+uf.add_keyarg(
+    name = "flag",
+    default = True,
+    basic_types = ["bool"],
+    desc_short = "R20 variable projection flag",
+    desc = "The flag which if True will cause the R20 parameters to be profiled out of the optimisation."
+)
+# Description.
+uf.desc.append(Desc_container())
+uf.desc[-1].add_paragraph("This user function allows the R20, R20A or R1rho' parameters to be profiled out of the optimisation of the relaxation dispersion models (variable projection).  As the back-calculated R2eff or R1rho values of these models are linear in these parameters, their optimal values for each experiment, spin and magnetic field strength can be found by weighted linear least squares within the target function.  The optimisation algorithm then only sees the remaining parameters, for example the per-spin dw and cluster pA and kex parameters.  For large spin clusters, this massively reduces the dimensionality of the optimisation problem.  The final R20 values are stored as normal.")
+uf.desc[-1].add_paragraph("This setting only affects the minimisation and not the grid search, and is not used for the Newton algorithm.  It is ignored when the R1 parameters are optimised.  Only the models %s support the R20 variable projection." % MODEL_LIST_R20_PROFILE)
+uf.backend = relax_disp_uf.r20_profile
+uf.menu_text = "r20_&profile"
+uf.gui_icon = "oxygen.status.object-locked"
+uf.wizard_size = (800, 500)
+uf.wizard_image = ANALYSIS_IMAGE_PATH + 'relax_disp_200x200.png'
+
+
 # The relax_disp.sherekhan_input user function.
 uf = uf_info.add_uf('relax_disp.sherekhan_input')
 uf.title = "Create the input files for Adam Mazur's ShereKhan program."